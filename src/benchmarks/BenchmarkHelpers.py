@@ -0,0 +1,91 @@
+# SPDX-License-Identifier: BSD-3-Clause
+#
+# Copyright (c) 2021 Vít Labuda. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+# following conditions are met:
+#  1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+#     disclaimer.
+#  2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the
+#     following disclaimer in the documentation and/or other materials provided with the distribution.
+#  3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote
+#     products derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+from typing import Callable, List, Sequence
+import atexit
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+
+class BenchmarkHelpers:
+    """
+    The benchmarks are standalone scripts run from the src directory, e.g. "python3 benchmarks/catalog_benchmark.py".
+    Those which use the app must call use_temporary_data_directory() before importing the selfdroid package, so that
+    they don't touch the configured data directory.
+    """
+
+    SRC_DIRECTORY: str = os.path.realpath(os.path.join(os.path.dirname(os.path.realpath(__file__)), ".."))
+    TESTS_DIRECTORY: str = os.path.join(SRC_DIRECTORY, "tests")
+
+    @staticmethod
+    def use_temporary_data_directory() -> str:
+        """
+        :return: The path of the data directory, which is deleted once the benchmark exits.
+        """
+
+        data_directory = tempfile.mkdtemp(prefix="selfdroid-benchmark-")
+        os.environ["SELFDROID_DATA_DIRECTORY"] = data_directory
+        atexit.register(shutil.rmtree, data_directory, True)
+
+        return data_directory
+
+    @staticmethod
+    def make_apk_builder_importable() -> None:
+        # The APK files are generated by the tests' APKBuilder
+        if BenchmarkHelpers.TESTS_DIRECTORY not in sys.path:
+            sys.path.append(BenchmarkHelpers.TESTS_DIRECTORY)
+
+    @staticmethod
+    def measure_durations(function: Callable[[], None], repetitions: int) -> List[float]:
+        """
+        :return: The durations of the function's calls (in seconds); the function is called once more beforehand to warm up.
+        """
+
+        function()
+
+        durations = []
+        for _ in range(repetitions):
+            started_at = time.perf_counter()
+            function()
+            durations.append(time.perf_counter() - started_at)
+
+        return durations
+
+    @staticmethod
+    def format_durations(durations: Sequence[float], in_microseconds: bool = False) -> str:
+        multiplier, unit = ((1000000, "us") if in_microseconds else (1000, "ms"))
+
+        return "median {0:9.3f} {2}, min {1:9.3f} {2}".format(statistics.median(durations) * multiplier, min(durations) * multiplier, unit)
+
+    @staticmethod
+    def print_table(header: Sequence[str], rows: Sequence[Sequence[object]]) -> None:
+        rows = [[str(cell) for cell in row] for row in rows]
+        widths = [max(len(str(header[column])), *(len(row[column]) for row in rows)) for column in range(len(header))]
+
+        print("  ".join(str(cell).ljust(width) for cell, width in zip(header, widths)))
+        print("  ".join("-" * width for width in widths))
+        for row in rows:
+            print("  ".join(cell.ljust(width) for cell, width in zip(row, widths)))
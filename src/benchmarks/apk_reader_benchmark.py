@@ -0,0 +1,126 @@
+# SPDX-License-Identifier: BSD-3-Clause
+#
+# Copyright (c) 2021 Vít Labuda. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+# following conditions are met:
+#  1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+#     disclaimer.
+#  2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the
+#     following disclaimer in the documentation and/or other materials provided with the distribution.
+#  3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote
+#     products derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+# Compares the time and the peak memory usage of extracting an APK file's metadata (everything APKParser reads) using
+#  FastAPKReader and pyaxmlparser. The APK files are generated by the tests' APKBuilder, and each engine reads each file
+#  in a fresh process, so that the peak resident set sizes don't influence each other.
+#
+# Each APK file is generated with a tiny resources.arsc and with one containing many string resources, as
+#  pyaxmlparser parses the whole resource table, whereas FastAPKReader looks up only the app's name and icon.
+#
+# Usage (in the src directory):
+#  python3 benchmarks/apk_reader_benchmark.py [--sizes 0,1,16,64,150] [--extra-strings 100000] [--repetitions 5]
+
+
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), ".."))
+
+from typing import Dict, Any
+import argparse
+import json
+import resource
+import subprocess
+import tempfile
+import zipfile
+from benchmarks.BenchmarkHelpers import BenchmarkHelpers
+
+
+_ENGINES = ("fast", "pyaxmlparser")
+
+
+def read_apk_metadata(engine: str, apk_path: str) -> None:
+    from selfdroid.appstorage.apk.FastAPKReader import FastAPKReader
+    import pyaxmlparser
+
+    apk = (FastAPKReader(apk_path) if engine == "fast" else pyaxmlparser.APK(apk_path))
+
+    # The same calls as APKParser makes
+    assert apk.is_valid_APK()
+    apk.get_app_name()
+    apk.packagename
+    apk.version_code
+    apk.version_name
+    apk.get_min_sdk_version()
+    apk.get_max_sdk_version()
+    apk.get_file(apk.get_app_icon(640))
+
+
+def measure_in_this_process(engine: str, apk_path: str, repetitions: int) -> Dict[str, Any]:
+    BenchmarkHelpers.use_temporary_data_directory()
+
+    # The imports (which initialize the app as well) aren't included in the memory usage
+    import selfdroid.appstorage.apk.FastAPKReader
+    import pyaxmlparser
+    max_rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    durations = BenchmarkHelpers.measure_durations(lambda: read_apk_metadata(engine, apk_path), repetitions)
+
+    return {
+        "durations": durations,
+        "max_rss_increase": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - max_rss_before  # in KiB
+    }
+
+
+def measure_in_new_process(engine: str, apk_path: str, repetitions: int) -> Dict[str, Any]:
+    output = subprocess.check_output([sys.executable, os.path.realpath(__file__), "--measure", engine, apk_path, "--repetitions", str(repetitions)])
+
+    return json.loads(output)
+
+
+def main() -> None:
+    argument_parser = argparse.ArgumentParser(description="Benchmarks the APK metadata extraction engines.")
+    argument_parser.add_argument("--sizes", default="0,1,16,64,150", help="The comma-separated sizes of the generated APK files' padding (in MiB).")
+    argument_parser.add_argument("--extra-strings", type=int, default=100000, help="The number of string resources in the large resource tables.")
+    argument_parser.add_argument("--repetitions", type=int, default=5)
+    argument_parser.add_argument("--measure", nargs=2, metavar=("ENGINE", "APK_PATH"), help=argparse.SUPPRESS)  # Used internally
+    arguments = argument_parser.parse_args()
+
+    if arguments.measure is not None:
+        print(json.dumps(measure_in_this_process(arguments.measure[0], arguments.measure[1], arguments.repetitions)))
+        return
+
+    BenchmarkHelpers.make_apk_builder_importable()
+    from APKBuilder import APKBuilder
+
+    rows = []
+    with tempfile.TemporaryDirectory(prefix="selfdroid-benchmark-") as temporary_directory:
+        for size_in_megabytes in (int(size) for size in arguments.sizes.split(",")):
+            for extra_string_count in (0, arguments.extra_strings):
+                apk_path = os.path.join(temporary_directory, "{}-{}.apk".format(size_in_megabytes, extra_string_count))
+                APKBuilder(padding_size=size_in_megabytes * 1024 * 1024, extra_string_count=extra_string_count).build(apk_path)
+                apk_file_size = os.path.getsize(apk_path)
+
+                with zipfile.ZipFile(apk_path) as apk_file:
+                    resource_table_size = apk_file.getinfo("resources.arsc").file_size
+
+                for engine in _ENGINES:
+                    result = measure_in_new_process(engine, apk_path, arguments.repetitions)
+                    rows.append(("{:.1f} MiB".format(apk_file_size / (1024 * 1024)), "{:.1f} KiB".format(resource_table_size / 1024), engine, BenchmarkHelpers.format_durations(result["durations"]), "{:.1f} MiB".format(result["max_rss_increase"] / 1024)))
+
+                os.remove(apk_path)
+
+    BenchmarkHelpers.print_table(("APK file size", "resources.arsc size", "engine", "duration", "peak RSS increase"), rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+# SPDX-License-Identifier: BSD-3-Clause
+#
+# Copyright (c) 2021 Vít Labuda. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+# following conditions are met:
+#  1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+#     disclaimer.
+#  2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the
+#     following disclaimer in the documentation and/or other materials provided with the distribution.
+#  3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote
+#     products derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+# Compares serving the app catalog (GET /api/v1/app-details) from the materialized catalog (see MaterializedCatalog)
+#  with generating it from the database on every request, as the app used to do.
+#
+# Usage (in the src directory): python3 benchmarks/catalog_benchmark.py [--apps 10000] [--repetitions 20]
+
+
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), ".."))
+
+import argparse
+import base64
+import gzip
+import hashlib
+import bcrypt
+import flask
+from benchmarks.BenchmarkHelpers import BenchmarkHelpers
+
+BenchmarkHelpers.use_temporary_data_directory()
+
+from selfdroid.Settings import Settings
+from selfdroid import app, db
+from selfdroid.appstorage.AppMetadataDBModel import AppMetadataDBModel
+from selfdroid.appstorage.AppStorageHelpers import AppStorageHelpers
+from selfdroid.appstorage.MaterializedCatalog import MaterializedCatalog
+from selfdroid.appstorage.crud.AppGetter import AppGetter
+
+
+_USER_PASSWORD: bytes = b"benchmark"
+_USER_PASSWORD_HASH: str = bcrypt.hashpw(_USER_PASSWORD, bcrypt.gensalt(4)).decode("utf-8")
+
+
+def insert_fake_apps(app_count: int) -> None:
+    # Only the database rows are needed to generate the catalog, so no files are stored
+    rows = []
+    for app_index in range(app_count):
+        rows.append({
+            "app_name": "Benchmark App {}".format(app_index),
+            "package_name": "com.example.benchmark.app{}".format(app_index),
+            "version_code": app_index + 1,
+            "version_name": "1.{}".format(app_index),
+            "min_api_level": 21,
+            "max_api_level": None,
+            "apk_file_size": 10 * 1024 * 1024 + app_index,
+            "apk_sha256": hashlib.sha256(b"apk" + str(app_index).encode("ascii")).hexdigest(),
+            "icon_sha256": hashlib.sha256(b"icon" + str(app_index).encode("ascii")).hexdigest()
+        })
+
+    with AppStorageHelpers.lock_app_storage(), AppStorageHelpers.lock_catalog():
+        db.session.rollback()
+        db.session.bulk_insert_mappings(AppMetadataDBModel, rows)
+        db.session.commit()
+
+
+def regenerate_catalog() -> None:
+    with AppStorageHelpers.lock_app_storage(), AppStorageHelpers.lock_catalog():
+        db.session.rollback()
+        MaterializedCatalog().regenerate_while_locked()
+
+
+def generate_catalog_dynamically(compress: bool) -> bytes:
+    # What the endpoint used to do on every request (without the authentication and the response's overhead)
+    with app.test_request_context():
+        app_getter = AppGetter()
+        app_getter.start_new_snapshot()
+
+        json_bytes = flask.jsonify([app_metadata.to_api_dict() for app_metadata in app_getter.get_all_metadata()]).get_data()
+
+    return (gzip.compress(json_bytes, compresslevel=6) if compress else json_bytes)
+
+
+def main() -> None:
+    argument_parser = argparse.ArgumentParser(description="Benchmarks the materialized app catalog.")
+    argument_parser.add_argument("--apps", type=int, default=10000, help="The number of apps in the catalog.")
+    argument_parser.add_argument("--repetitions", type=int, default=20)
+    arguments = argument_parser.parse_args()
+
+    Settings.get_user_password_hash = staticmethod(lambda: _USER_PASSWORD_HASH)
+    Settings.IN_PROCESS_APP_STORAGE_JOB_WORKER = False
+
+    insert_fake_apps(arguments.apps)
+    regeneration_durations = BenchmarkHelpers.measure_durations(regenerate_catalog, max(1, arguments.repetitions // 4))
+
+    client = app.test_client()
+    headers = {"X-SelfdroidAPI-Password": base64.b64encode(_USER_PASSWORD).decode("utf-8")}
+
+    def request_materialized_catalog(encoding: str) -> None:
+        response = client.get("/api/v1/app-details", headers={**headers, "Accept-Encoding": encoding}, base_url="https://localhost")
+        assert response.status_code == 200
+        response.get_data()
+
+    # The materialized catalog must contain exactly the bytes that would be generated dynamically
+    assert client.get("/api/v1/app-details", headers={**headers, "Accept-Encoding": "identity"}, base_url="https://localhost").get_data() == generate_catalog_dynamically(False)
+
+    rows = [
+        ("dynamic, identity (ORM + JSON only)", BenchmarkHelpers.format_durations(BenchmarkHelpers.measure_durations(lambda: generate_catalog_dynamically(False), arguments.repetitions))),
+        ("dynamic, gzip (ORM + JSON + gzip only)", BenchmarkHelpers.format_durations(BenchmarkHelpers.measure_durations(lambda: generate_catalog_dynamically(True), arguments.repetitions))),
+        ("materialized, identity (whole request)", BenchmarkHelpers.format_durations(BenchmarkHelpers.measure_durations(lambda: request_materialized_catalog("identity"), arguments.repetitions))),
+        ("materialized, gzip (whole request)", BenchmarkHelpers.format_durations(BenchmarkHelpers.measure_durations(lambda: request_materialized_catalog("gzip"), arguments.repetitions))),
+        ("regeneration after a modification", BenchmarkHelpers.format_durations(regeneration_durations)),
+    ]
+
+    print("Catalog of {} apps ({} bytes of JSON)".format(arguments.apps, len(generate_catalog_dynamically(False))))
+    BenchmarkHelpers.print_table(("path", "duration"), rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+# SPDX-License-Identifier: BSD-3-Clause
+#
+# Copyright (c) 2021 Vít Labuda. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+# following conditions are met:
+#  1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+#     disclaimer.
+#  2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the
+#     following disclaimer in the documentation and/or other materials provided with the distribution.
+#  3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote
+#     products derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+# Compares acquiring and releasing the app storage lock using a process-wide FlockBasedLock instance (see
+#  AppStorageHelpers) with creating a single-use instance for every request, as the app used to do. The lock-related
+#  system calls are counted by wrapping the os and fcntl functions which make them.
+#
+# Usage (in the src directory): python3 benchmarks/lock_handle_benchmark.py [--repetitions 100000]
+
+
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), ".."))
+
+from typing import Callable, Dict
+import argparse
+import collections
+import fcntl
+import functools
+import tempfile
+from benchmarks.BenchmarkHelpers import BenchmarkHelpers
+from flockbasedlock.flockbasedlock import FlockBasedLock
+
+
+class SyscallCounter:
+    _WRAPPED_FUNCTIONS = ((os, "open"), (os, "close"), (os, "ftruncate"), (fcntl, "flock"))
+
+    def __init__(self):
+        self.counts: Dict[str, int] = collections.Counter()
+
+        for module, function_name in self._WRAPPED_FUNCTIONS:
+            setattr(module, function_name, self._wrap_function(function_name, getattr(module, function_name)))
+
+    def _wrap_function(self, function_name: str, function: Callable) -> Callable:
+        @functools.wraps(function)
+        def _wrapper(*args, **kwargs):
+            self.counts[function_name] += 1
+            return function(*args, **kwargs)
+
+        return _wrapper
+
+
+def lock_legacy(lock_path: str) -> None:
+    # What FlockBasedLock(lock_path, single_use=True) used to do - the file was opened with O_TRUNC, which truncates
+    #  (and thus modifies the inode of) the lock file every time
+    fd = os.open(lock_path, os.O_WRONLY | os.O_TRUNC | os.O_CREAT)
+    fcntl.flock(fd, fcntl.LOCK_EX)
+    fcntl.flock(fd, fcntl.LOCK_UN)
+    os.close(fd)
+
+
+def lock_single_use(lock_path: str) -> None:
+    with FlockBasedLock(lock_path, single_use=True):
+        pass
+
+
+def lock_process_wide(lock_path: str) -> None:
+    with FlockBasedLock.get_process_wide_instance(lock_path):
+        pass
+
+
+def main() -> None:
+    argument_parser = argparse.ArgumentParser(description="Benchmarks the process-wide app storage lock handle.")
+    argument_parser.add_argument("--repetitions", type=int, default=100000)
+    arguments = argument_parser.parse_args()
+
+    syscall_counter = SyscallCounter()
+
+    rows = []
+    with tempfile.TemporaryDirectory(prefix="selfdroid-benchmark-") as temporary_directory:
+        lock_path = os.path.join(temporary_directory, "app_storage.lock")
+
+        for label, lock_function in (("open(O_TRUNC) + flock + close (legacy)", lock_legacy), ("single-use FlockBasedLock", lock_single_use), ("process-wide FlockBasedLock", lock_process_wide)):
+            durations = BenchmarkHelpers.measure_durations(lambda: lock_function(lock_path), arguments.repetitions)
+
+            syscall_counter.counts.clear()
+            lock_function(lock_path)
+            syscalls = ", ".join("{} {}".format(count, function_name) for function_name, count in sorted(syscall_counter.counts.items()))
+
+            rows.append((label, BenchmarkHelpers.format_durations(durations, in_microseconds=True), syscalls))
+
+    print("Acquiring and releasing an uncontended lock (the wrapping of the system calls' functions is included in the durations)")
+    BenchmarkHelpers.print_table(("path", "duration per acquire + release", "lock-related system calls per acquire + release"), rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+# SPDX-License-Identifier: BSD-3-Clause
+#
+# Copyright (c) 2021 Vít Labuda. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+# following conditions are met:
+#  1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+#     disclaimer.
+#  2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the
+#     following disclaimer in the documentation and/or other materials provided with the distribution.
+#  3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote
+#     products derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+# Measures the read throughput of multiple processes guarding their reads with FlockBasedLock in the shared mode,
+#  compared with the exclusive mode (which every reader had to use before the shared mode was added), with and
+#  without a concurrent writer process.
+#
+# Usage (in the src directory): python3 benchmarks/shared_locking_benchmark.py [--readers 4] [--duration 3]
+
+
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), ".."))
+
+from typing import Optional
+import argparse
+import multiprocessing
+import tempfile
+import time
+from benchmarks.BenchmarkHelpers import BenchmarkHelpers
+from flockbasedlock.flockbasedlock import FlockBasedLock
+
+
+# The work done while holding the lock; sleeping simulates a read which waits for I/O (e.g. a database query)
+_READ_DURATION: float = 0.001  # in seconds
+_WRITE_DURATION: float = 0.005  # in seconds
+_WRITE_INTERVAL: float = 0.020  # in seconds; the pause between the writer's writes
+
+
+def run_reader(lock_path: str, shared: bool, start_at: float, stop_at: float, read_count_queue: multiprocessing.Queue) -> None:
+    lock = FlockBasedLock(lock_path)
+    lock_context_manager_factory = (lock.shared if shared else lock.exclusive)
+
+    while time.time() < start_at:
+        time.sleep(0.001)
+
+    read_count = 0
+    while time.time() < stop_at:
+        with lock_context_manager_factory():
+            time.sleep(_READ_DURATION)
+        read_count += 1
+
+    lock.close()
+    read_count_queue.put(read_count)
+
+
+def run_writer(lock_path: str, start_at: float, stop_at: float) -> None:
+    lock = FlockBasedLock(lock_path)
+
+    while time.time() < start_at:
+        time.sleep(0.001)
+
+    while time.time() < stop_at:
+        with lock.exclusive():
+            time.sleep(_WRITE_DURATION)
+        time.sleep(_WRITE_INTERVAL)
+
+    lock.close()
+
+
+def measure_read_throughput(lock_path: str, reader_count: int, duration: float, shared: bool, with_writer: bool) -> float:
+    """
+    :return: The number of reads per second done by all the readers together.
+    """
+
+    # The processes are started before the measured period begins, so that their startup isn't measured
+    start_at = time.time() + 0.5
+    stop_at = start_at + duration
+
+    read_count_queue = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=run_reader, args=(lock_path, shared, start_at, stop_at, read_count_queue)) for _ in range(reader_count)]
+    if with_writer:
+        processes.append(multiprocessing.Process(target=run_writer, args=(lock_path, start_at, stop_at)))
+
+    for process in processes:
+        process.start()
+
+    total_read_count = sum(read_count_queue.get() for _ in range(reader_count))
+
+    for process in processes:
+        process.join()
+
+    return total_read_count / duration
+
+
+def main() -> None:
+    argument_parser = argparse.ArgumentParser(description="Benchmarks the shared mode of FlockBasedLock.")
+    argument_parser.add_argument("--readers", type=int, default=4, help="The number of reader processes.")
+    argument_parser.add_argument("--duration", type=float, default=3.0, help="The duration of each measurement (in seconds).")
+    arguments = argument_parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="selfdroid-benchmark-") as temporary_directory:
+        lock_path = os.path.join(temporary_directory, "benchmark.lock")
+
+        rows = []
+        for with_writer in (False, True):
+            exclusive_throughput: Optional[float] = None
+            for shared in (False, True):
+                throughput = measure_read_throughput(lock_path, arguments.readers, arguments.duration, shared, with_writer)
+                speedup = ("" if exclusive_throughput is None else "{:.2f}x".format(throughput / exclusive_throughput))
+                exclusive_throughput = throughput
+
+                rows.append((("shared" if shared else "exclusive"), ("yes" if with_writer else "no"), "{:.0f} reads/s".format(throughput), speedup))
+
+    print("{} reader processes, {:.1f} ms per read".format(arguments.readers, _READ_DURATION * 1000))
+    BenchmarkHelpers.print_table(("reader lock mode", "writer", "read throughput", "vs. exclusive"), rows)
+
+
+if __name__ == "__main__":
+    main()
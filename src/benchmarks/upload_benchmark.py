@@ -0,0 +1,111 @@
+# SPDX-License-Identifier: BSD-3-Clause
+#
+# Copyright (c) 2021 Vít Labuda. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+# following conditions are met:
+#  1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+#     disclaimer.
+#  2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the
+#     following disclaimer in the documentation and/or other materials provided with the distribution.
+#  3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote
+#     products derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+# Compares receiving an uploaded APK file using SelfdroidRequest, which streams it into the app's temporary directory
+#  (see StreamedUploadFile), with flask.Request, which spools it into werkzeug's temporary file, from which the app
+#  used to copy it into the temporary directory. The amounts of data written and read by the process are taken from
+#  /proc/self/io (Linux only).
+#
+# Usage (in the src directory): python3 benchmarks/upload_benchmark.py [--size 64] [--repetitions 5]
+
+
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), ".."))
+
+from typing import Callable, Dict, Any, Type
+import argparse
+import io
+import flask
+import werkzeug.test
+import werkzeug.datastructures
+from benchmarks.BenchmarkHelpers import BenchmarkHelpers
+
+BenchmarkHelpers.use_temporary_data_directory()
+
+from selfdroid.Settings import Settings
+from selfdroid import app
+from selfdroid.SelfdroidRequest import SelfdroidRequest
+from selfdroid.appstorage.AppStorageHelpers import AppStorageHelpers
+
+
+def read_process_io_counters() -> Dict[str, int]:
+    with open("/proc/self/io") as io_file:
+        return {key: int(value) for key, value in (line.split(": ") for line in io_file)}
+
+
+def receive_upload_legacy(environ: Dict[str, Any]) -> None:
+    # What the app used to do - werkzeug spools the file, and AppStorageHelpers.save_uploaded_apk() copied it
+    def save_uploaded_apk(uploaded_apk: werkzeug.datastructures.FileStorage, apk_path: str) -> str:
+        with open(apk_path, "wb") as apk_file:
+            return AppStorageHelpers._hash_stream(uploaded_apk.stream, apk_file)
+
+    receive_upload(environ, flask.Request, save_uploaded_apk)
+
+
+def receive_upload_streamed(environ: Dict[str, Any]) -> None:
+    receive_upload(environ, SelfdroidRequest, AppStorageHelpers.save_uploaded_apk)
+
+
+def receive_upload(environ: Dict[str, Any], request_class: Type[flask.Request], save_uploaded_apk: Callable) -> None:
+    environ["wsgi.input"].seek(0)
+
+    apk_path = AppStorageHelpers.generate_temp_filepath_for_apk()
+    request = request_class(environ)
+    try:
+        save_uploaded_apk(request.files["apk_file"], apk_path)
+    finally:
+        request.close()
+        os.remove(apk_path)
+
+
+def main() -> None:
+    argument_parser = argparse.ArgumentParser(description="Benchmarks the receiving of uploaded APK files.")
+    argument_parser.add_argument("--size", type=int, default=64, help="The size of the uploaded file (in MiB).")
+    argument_parser.add_argument("--repetitions", type=int, default=5)
+    arguments = argument_parser.parse_args()
+
+    upload_size = arguments.size * 1024 * 1024
+    app.config["MAX_CONTENT_LENGTH"] = Settings.MAX_UPLOAD_SIZE = max(Settings.MAX_UPLOAD_SIZE, 2 * upload_size)
+
+    # The request body is encoded only once; the file's contents don't matter, as the APK file isn't parsed
+    environ = werkzeug.test.EnvironBuilder(method="POST", data={"apk_file": (io.BytesIO(os.urandom(upload_size)), "app.apk", "application/vnd.android.package-archive")}).get_environ()
+
+    rows = []
+    with app.app_context():
+        for label, receive_upload_function in (("spooled by werkzeug + copied (legacy)", receive_upload_legacy), ("streamed into the temporary directory", receive_upload_streamed)):
+            durations = BenchmarkHelpers.measure_durations(lambda: receive_upload_function(environ), arguments.repetitions)
+
+            io_counters_before = read_process_io_counters()
+            receive_upload_function(environ)
+            io_counters_after = read_process_io_counters()
+
+            written_megabytes = (io_counters_after["wchar"] - io_counters_before["wchar"]) / (1024 * 1024)
+            read_megabytes = (io_counters_after["rchar"] - io_counters_before["rchar"]) / (1024 * 1024)
+            rows.append((label, BenchmarkHelpers.format_durations(durations), "{:.1f} MiB".format(written_megabytes), "{:.1f} MiB".format(read_megabytes)))
+
+    print("Upload of a {} MiB file (the request body is read from memory)".format(arguments.size))
+    BenchmarkHelpers.print_table(("path", "duration", "written", "read"), rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -20,8 +20,13 @@
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
 
+from __future__ import annotations
+from typing import Callable, Dict, Optional, Hashable
 import os
+import time
+import asyncio
 import threading
+import contextlib
 import fcntl
 
 
@@ -31,7 +36,45 @@ class FlockBasedLock:
     release atomic locks bound to a specific file. As the name suggests, it uses the flock() syscall to perform the
     (un)locking.
 
-    The locking may be performed using the "with" statement, or the acquire() and release() methods.
+    The lock can be acquired either in the exclusive mode (only one holder at a time), or in the shared mode (any number
+    of holders at a time, but not while the lock is held in the exclusive mode) - a reader-writer lock.
+
+    The locking may be performed using the "with" statement (exclusive mode), the shared() and exclusive() context
+    managers, or the acquire_shared(), acquire_exclusive() and release() methods (acquire() is an alias of
+    acquire_exclusive()).
+
+    Within a process, an instance may be shared by multiple threads - the threads are coordinated using the instance's
+    condition variable, so that the instance's file descriptor is locked in the shared mode while at least one thread
+    holds the lock in the shared mode, and in the exclusive mode while one thread holds it in the exclusive mode. Threads
+    waiting for the exclusive mode take precedence over newly arriving threads requesting the shared mode. Different
+    instances (even within the same process) use different file descriptors, so they're coordinated by flock() itself.
+    get_process_wide_instance() returns an instance which is meant to be shared by all the threads of a process.
+
+    The lock is re-entrant per thread - a thread which holds the lock may acquire it again (in the shared mode, or in the
+    same mode it holds it in), and the lock is released once the thread has released it as many times as it acquired it.
+    A thread holding the lock in the shared mode must use upgrade_to_exclusive() to obtain the exclusive mode.
+
+    Coroutines running in an asyncio event loop may use the exclusive_async() and shared_async() asynchronous context
+    managers, or the acquire_exclusive_async(), acquire_shared_async() and release_async() methods. They repeatedly try
+    to acquire the lock without blocking and yield to the event loop between the attempts. Each asyncio task is a
+    separate holder (and the re-entrancy described above applies to tasks instead of threads). The asynchronous
+    holders cannot upgrade or downgrade the lock.
+
+    If poll_flock is enabled when the instance is created, flock() is never called in the blocking mode; instead, it's
+    retried in the non-blocking mode with an exponential backoff using time.sleep(). This is meant for green threads
+    (e.g. gevent with monkey-patching, where time.sleep() and the threading module yield to the hub, but a blocking
+    flock() call would block all the green threads of the process).
+
+    By default, the acquisition blocks until the lock is available. The acquire*() methods and the context managers may
+    also be given a timeout (the in-process waiting is then bounded by the condition variable, and flock() is retried in
+    the non-blocking mode with an exponential backoff), or be told not to block at all - LockTimeoutException is raised
+    if the lock cannot be acquired in time.
+
+    The time each thread spends waiting for the lock and holding it can be observed using set_hold_listener().
+
+    The lock may be upgraded from the shared to the exclusive mode and downgraded back - see upgrade_to_exclusive() and
+    downgrade_to_shared(). NOTE: flock() doesn't guarantee that the conversion is atomic; the existing lock might be
+    removed before the new one is placed, so another process might acquire the lock in between!
 
     The library has been written for Linux, but it will probably work on other Unixes as well.
     Tested on Debian 10 (Linux 4.19) with Python 3.7.
@@ -46,47 +89,508 @@ class FlockBasedLock:
         def __init__(self):
             super().__init__("The lock has been closed!")
 
-    LIBRARY_VERSION: int = 1
+    class LockStateException(Exception):
+        """
+        This exception is raised when the lock is upgraded, downgraded or released while it's not held in the mode
+        the operation requires.
+        """
+
+        def __init__(self, message: str):
+            super().__init__(message)
+
+    class LockTimeoutException(Exception):
+        """
+        This exception is raised when the lock cannot be acquired within the specified timeout (or immediately, in case
+        of a non-blocking acquisition).
+        """
+
+        def __init__(self):
+            super().__init__("The lock couldn't be acquired in time!")
+
+    class HoldStatistics:
+        """
+        Describes how long a thread waited for the lock and then held it - from its first acquisition until its last
+        release (re-entrant acquisitions are a part of the same holding). See set_hold_listener().
+        """
+
+        def __init__(self, was_held_exclusively: bool, wait_duration: float):
+            self.was_held_exclusively: bool = was_held_exclusively  # Also True if the lock was upgraded during the holding
+            self.wait_duration: float = wait_duration  # in seconds; includes the time spent waiting for upgrades & downgrades
+            self.hold_duration: float = 0.0  # in seconds; set when the lock is released
 
-    def __init__(self, filepath: str, single_use: bool = False):
+    LIBRARY_VERSION: int = 6
+
+    # The delays between non-blocking flock() attempts when the acquisition has a timeout
+    _FLOCK_RETRY_INITIAL_DELAY: float = 0.001  # in seconds
+    _FLOCK_RETRY_MAX_DELAY: float = 0.1  # in seconds
+
+    # See get_process_wide_instance(); the lock is replaced in a forked process, as it might have been held by another
+    #  thread of the parent process when it forked
+    _process_wide_instances: Dict[str, FlockBasedLock] = {}
+    _process_wide_instances_lock: threading.Lock = threading.Lock()
+    _process_wide_instances_lock_pid: int = os.getpid()
+
+    def __init__(self, filepath: str, single_use: bool = False, poll_flock: bool = False):
         """
         Initializes a new FlockBasedLock instance.
 
         :param filepath: The path of the file to bind the lock to.
-        :param single_use: If True, the lock is automatically closed when it is released.
+        :param single_use: If True, the lock is automatically closed when it is released (by all of its holders).
+        :param poll_flock: If True, flock() is polled in the non-blocking mode instead of being called in the blocking mode.
         """
 
-        self._fd = os.open(filepath, os.O_WRONLY | os.O_TRUNC | os.O_CREAT)
+        # The file's contents are irrelevant, so it's neither truncated nor written to
+        self._fd = os.open(filepath, os.O_WRONLY | os.O_CREAT)
         self._is_open: bool = True
+        self._creator_pid: int = os.getpid()  # See get_process_wide_instance()
         self._single_use: bool = single_use
+        self._poll_flock: bool = poll_flock
         self._threading_lock: threading.Lock = threading.Lock()
+        self._condition: threading.Condition = threading.Condition(self._threading_lock)
 
-    def acquire(self) -> None:
-        """Acquire the lock."""
+        # The following attributes are protected by the condition variable (and its underlying lock). The holders are
+        #  identified by thread identifiers, or by asyncio.Task objects in case of the asynchronous holders.
+        self._hold_counts: Dict[Hashable, int] = {}  # Holder -> how many times the holder has acquired the lock
+        self._exclusive_holder: Optional[Hashable] = None  # The holder which holds the lock in the exclusive mode
+        self._waiting_for_exclusive_count: int = 0
+        self._is_upgrade_pending: bool = False
+        # Set while a thread is performing a (potentially blocking) flock() call without holding the condition's lock
+        self._is_flock_in_progress: bool = False
+        self._holds: Dict[Hashable, FlockBasedLock.HoldStatistics] = {}  # Holder -> the holder's current holding
+        self._hold_start_times: Dict[Hashable, float] = {}  # Holder -> time.monotonic() when the lock was acquired
+        self._hold_listener: Optional[Callable[[FlockBasedLock.HoldStatistics], None]] = None
 
-        with self._threading_lock:
-            self._acquire()
+    def set_hold_listener(self, listener: Optional[Callable[[FlockBasedLock.HoldStatistics], None]]) -> None:
+        """
+        Sets a function which is called each time a thread has released the lock for the last time (i.e. when its
+        holding ends), or removes it if None is passed. The function is called in the releasing thread after the lock
+        has been released, and it shouldn't raise any exceptions.
 
-    def _acquire(self) -> None:
-        if not self._is_open:
-            raise FlockBasedLock.LockClosedException()
+        Acquisitions which fail (e.g. time out) aren't reported - the caller can measure those itself.
+        """
 
-        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        with self._condition:
+            self._hold_listener = listener
 
-    def release(self) -> None:
-        """Release the previously acquired lock."""
+    @classmethod
+    def get_process_wide_instance(cls, filepath: str, poll_flock: bool = False) -> FlockBasedLock:
+        """
+        Returns an instance bound to the specified file which is shared by all the threads of the calling process, so
+        that the lock file doesn't have to be opened and closed every time the lock is used. The poll_flock parameter
+        (see __init__()) is used only when the instance is created.
+
+        The instances are fork-safe: flock() locks belong to open file descriptions, which a child process shares with
+        its parent after fork(), so an instance inherited from the parent process is replaced by a new one (with its own
+        file descriptor) the first time the child process asks for it. The process ID is checked on every call instead of
+        relying on os.register_at_fork(), as the Python-level fork hooks aren't run when a process is forked from C code
+        (e.g. by uWSGI, which forks its workers after loading the app unless the lazy-apps option is enabled).
+        """
+
+        current_pid = os.getpid()
+        if cls._process_wide_instances_lock_pid != current_pid:
+            # The calling thread is the only thread of a freshly forked process, unless the process starts other threads
+            #  before getting its first instance
+            cls._process_wide_instances_lock = threading.Lock()
+            cls._process_wide_instances_lock_pid = current_pid
+
+        with cls._process_wide_instances_lock:
+            instance = cls._process_wide_instances.get(filepath)
+            if instance is not None and instance._creator_pid != current_pid:
+                instance._abandon_inherited_file_descriptor()
+                instance = None
+
+            if instance is None:
+                instance = cls(filepath, poll_flock=poll_flock)
+                cls._process_wide_instances[filepath] = instance
+
+            return instance
+
+    def _abandon_inherited_file_descriptor(self) -> None:
+        # The instance's condition variable might have been held by another thread of the parent process when it forked,
+        #  so it isn't used. The parent's flock() locks are kept, as its own file descriptor still refers to the shared
+        #  open file description.
+        if self._is_open:
+            try:
+                os.close(self._fd)
+            except OSError:
+                pass
+
+            self._is_open = False
+
+    def acquire(self, blocking: bool = True, timeout: Optional[float] = None) -> None:
+        """Acquire the lock in the exclusive mode. See acquire_exclusive()."""
+
+        self.acquire_exclusive(blocking, timeout)
+
+    def acquire_exclusive(self, blocking: bool = True, timeout: Optional[float] = None) -> None:
+        """
+        Acquire the lock in the exclusive mode.
+
+        :param blocking: If False, LockTimeoutException is raised if the lock cannot be acquired immediately.
+        :param timeout: The maximum number of seconds to wait for the lock (None = wait indefinitely), after which
+                        LockTimeoutException is raised. Cannot be specified for a non-blocking acquisition.
+        """
+
+        wait_started_at = time.monotonic()
+        self._acquire_exclusive(threading.get_ident(), self._get_deadline(blocking, timeout), wait_started_at)
+
+    def _acquire_exclusive(self, holder_id: Hashable, deadline: Optional[float], wait_started_at: float) -> None:
+        with self._condition:
+            self._check_if_open()
+
+            if self._exclusive_holder == holder_id:
+                self._hold_counts[holder_id] += 1
+                return
+
+            if holder_id in self._hold_counts:
+                raise FlockBasedLock.LockStateException("The lock is held in the shared mode by this thread or task - it must be upgraded instead!")
+
+            self._waiting_for_exclusive_count += 1
+            try:
+                self._wait_for_condition(lambda: not self._hold_counts and not self._is_flock_in_progress, deadline)
+            finally:
+                self._waiting_for_exclusive_count -= 1
+                self._condition.notify_all()  # If the wait timed out, the threads waiting for the shared mode might be able to proceed
+
+            self._check_if_open()
+            self._is_flock_in_progress = True
+
+        self._flock_outside_condition(fcntl.LOCK_EX, on_success=lambda: self._mark_as_held_exclusively(holder_id, 1, wait_started_at), deadline=deadline)
+
+    def acquire_shared(self, blocking: bool = True, timeout: Optional[float] = None) -> None:
+        """
+        Acquire the lock in the shared mode.
+
+        :param blocking: If False, LockTimeoutException is raised if the lock cannot be acquired immediately.
+        :param timeout: The maximum number of seconds to wait for the lock (None = wait indefinitely), after which
+                        LockTimeoutException is raised. Cannot be specified for a non-blocking acquisition.
+        """
+
+        wait_started_at = time.monotonic()
+        self._acquire_shared(threading.get_ident(), self._get_deadline(blocking, timeout), wait_started_at)
+
+    def _acquire_shared(self, holder_id: Hashable, deadline: Optional[float], wait_started_at: float) -> None:
+        with self._condition:
+            self._check_if_open()
+
+            # A holder which already holds the lock (in any mode) mustn't wait for the waiting writers - it might wait for itself
+            if holder_id in self._hold_counts:
+                self._hold_counts[holder_id] += 1
+                return
+
+            self._wait_for_condition(lambda: self._exclusive_holder is None and self._waiting_for_exclusive_count == 0 and not self._is_flock_in_progress, deadline)
+
+            self._check_if_open()
+            if self._hold_counts:  # The file descriptor is already locked in the shared mode by other threads
+                self._mark_as_held_shared(holder_id, 1, wait_started_at)
+                return
+
+            self._is_flock_in_progress = True
+
+        self._flock_outside_condition(fcntl.LOCK_SH, on_success=lambda: self._mark_as_held_shared(holder_id, 1, wait_started_at), deadline=deadline)
+
+    def upgrade_to_exclusive(self) -> None:
+        """
+        Upgrade the lock held by the calling thread in the shared mode to the exclusive mode. If the thread has acquired
+        the lock multiple times, all of its acquisitions are upgraded.
+
+        If other threads of this process hold the lock in the shared mode as well, the method waits until they release
+        it. Only one thread may wait for an upgrade at a time (LockStateException is raised otherwise, as two such
+        threads would wait for each other forever).
+
+        NOTE: The conversion isn't atomic - another process might acquire the lock in the exclusive mode between the
+        release of the shared lock and the acquisition of the exclusive one. Everything which was read while holding the
+        shared lock must therefore be considered outdated after the upgrade. For the same reason, the upgrade cannot time
+        out - a failed non-blocking flock() call might have already removed the shared lock.
+        """
+
+        wait_started_at = time.monotonic()
+        holder_id = threading.get_ident()
+
+        with self._condition:
+            self._check_if_open()
+            if (holder_id not in self._hold_counts) or (self._exclusive_holder is not None):
+                raise FlockBasedLock.LockStateException("The lock isn't held in the shared mode by this thread, so it cannot be upgraded!")
+            if self._is_upgrade_pending:
+                raise FlockBasedLock.LockStateException("Another thread is already waiting for the lock to be upgraded!")
+
+            self._is_upgrade_pending = True
+            self._waiting_for_exclusive_count += 1  # Prevents other threads from acquiring the lock in the shared mode
+            try:
+                self._condition.wait_for(lambda: len(self._hold_counts) == 1 and not self._is_flock_in_progress)
+            finally:
+                self._waiting_for_exclusive_count -= 1
+                self._is_upgrade_pending = False
+
+            hold_count = self._hold_counts[holder_id]
+            self._is_flock_in_progress = True
+
+        self._flock_outside_condition(fcntl.LOCK_EX, on_success=lambda: self._mark_as_held_exclusively(holder_id, hold_count, wait_started_at))
+
+    def downgrade_to_shared(self) -> None:
+        """
+        Downgrade the lock held by the calling thread in the exclusive mode to the shared mode. If the thread has
+        acquired the lock multiple times, all of its acquisitions are downgraded.
+
+        NOTE: The conversion isn't atomic - another process might acquire the lock in the exclusive mode between the
+        release of the exclusive lock and the acquisition of the shared one (in which case this method blocks until that
+        process releases it).
+        """
+
+        wait_started_at = time.monotonic()
+        holder_id = threading.get_ident()
+
+        with self._condition:
+            self._check_if_open()
+            if self._exclusive_holder != holder_id:
+                raise FlockBasedLock.LockStateException("The lock isn't held in the exclusive mode by this thread, so it cannot be downgraded!")
 
-        with self._threading_lock:
-            self._release()
+            hold_count = self._hold_counts[holder_id]
+            self._is_flock_in_progress = True
 
-    def _release(self) -> None:
+        self._flock_outside_condition(fcntl.LOCK_SH, on_success=lambda: self._mark_as_held_shared(holder_id, hold_count, wait_started_at))
+
+    @staticmethod
+    def _get_deadline(blocking: bool, timeout: Optional[float]) -> Optional[float]:
+        """
+        :return: The time.monotonic() value after which the acquisition should fail, or None if it shouldn't time out.
+        """
+
+        if not blocking:
+            if timeout is not None:
+                raise ValueError("A timeout cannot be specified for a non-blocking acquisition!")
+
+            return time.monotonic()
+
+        if timeout is None:
+            return None
+
+        if timeout < 0:
+            raise ValueError("The timeout must not be negative!")
+
+        return time.monotonic() + timeout
+
+    def _wait_for_condition(self, predicate: Callable[[], bool], deadline: Optional[float]) -> None:
+        timeout = (None if deadline is None else max(0.0, deadline - time.monotonic()))
+
+        if not self._condition.wait_for(predicate, timeout):
+            raise FlockBasedLock.LockTimeoutException()
+
+    def _flock_outside_condition(self, operation: int, on_success: Callable[[], None], deadline: Optional[float] = None) -> None:
+        """
+        The flock() call might block for a long time, so it's performed without holding the condition's lock (the other
+        threads of this process are kept waiting by the _is_flock_in_progress flag instead).
+        """
+
+        try:
+            if deadline is None and not self._poll_flock:
+                fcntl.flock(self._fd, operation)
+            else:
+                self._flock_with_backoff(operation, deadline)
+        except BaseException:
+            with self._condition:
+                self._is_flock_in_progress = False
+                self._condition.notify_all()
+
+            raise
+
+        with self._condition:
+            self._is_flock_in_progress = False
+            on_success()
+            self._condition.notify_all()
+
+    def _flock_with_backoff(self, operation: int, deadline: Optional[float]) -> None:
+        delay = self._FLOCK_RETRY_INITIAL_DELAY
+
+        while True:
+            try:
+                fcntl.flock(self._fd, operation | fcntl.LOCK_NB)
+                return
+            except BlockingIOError:  # The lock is held by another process (or another instance)
+                pass
+
+            time.sleep(self._get_retry_delay(delay, deadline))
+            delay = min(delay * 2, self._FLOCK_RETRY_MAX_DELAY)
+
+    @staticmethod
+    def _get_retry_delay(delay: float, deadline: Optional[float]) -> float:
+        """
+        :raises LockTimeoutException: If the deadline has passed.
+        """
+
+        if deadline is None:
+            return delay
+
+        remaining_time = deadline - time.monotonic()
+        if remaining_time <= 0:
+            raise FlockBasedLock.LockTimeoutException()
+
+        return min(delay, remaining_time)
+
+    def _mark_as_held_exclusively(self, holder_id: int, hold_count: int, wait_started_at: float) -> None:
+        self._exclusive_holder = holder_id
+        self._hold_counts[holder_id] = hold_count
+        self._record_wait(holder_id, wait_started_at, is_exclusive=True)
+
+    def _mark_as_held_shared(self, holder_id: int, hold_count: int, wait_started_at: float) -> None:
+        self._exclusive_holder = None  # The lock might have been downgraded
+        self._hold_counts[holder_id] = hold_count
+        self._record_wait(holder_id, wait_started_at, is_exclusive=False)
+
+    def _record_wait(self, holder_id: int, wait_started_at: float, is_exclusive: bool) -> None:
+        current_time = time.monotonic()
+
+        hold = self._holds.get(holder_id)
+        if hold is None:  # A new holding
+            self._holds[holder_id] = FlockBasedLock.HoldStatistics(is_exclusive, current_time - wait_started_at)
+            self._hold_start_times[holder_id] = current_time
+        else:  # The lock has been upgraded or downgraded
+            hold.wait_duration += current_time - wait_started_at
+            hold.was_held_exclusively = (hold.was_held_exclusively or is_exclusive)
+
+    def get_hold_count(self) -> int:
+        """
+        :return: How many times the calling thread currently holds the lock (0 if it doesn't hold it).
+        """
+
+        with self._condition:
+            return self._hold_counts.get(threading.get_ident(), 0)
+
+    def _check_if_open(self) -> None:
         if not self._is_open:
             raise FlockBasedLock.LockClosedException()
 
-        fcntl.flock(self._fd, fcntl.LOCK_UN)
+    def release(self) -> None:
+        """Release the lock previously acquired by the calling thread (in either mode)."""
 
-        if self._single_use:
-            self._close()
+        self._release(threading.get_ident())
+
+    def _release(self, holder_id: Hashable) -> None:
+        with self._condition:
+            finished_hold = self._release_while_condition_locked(holder_id)
+            self._condition.notify_all()
+            hold_listener = self._hold_listener
+
+        if (finished_hold is not None) and (hold_listener is not None):
+            hold_listener(finished_hold)
+
+    def _release_while_condition_locked(self, holder_id: Hashable) -> Optional[FlockBasedLock.HoldStatistics]:
+        """
+        :return: The statistics of the holder's holding, if it has ended (i.e. the holder doesn't hold the lock anymore).
+        """
+
+        self._check_if_open()
+
+        if holder_id not in self._hold_counts:
+            raise FlockBasedLock.LockStateException("The lock cannot be released, as it isn't held by this thread or task!")
+
+        self._hold_counts[holder_id] -= 1
+        if self._hold_counts[holder_id] > 0:
+            return None
+
+        del self._hold_counts[holder_id]
+        if self._exclusive_holder == holder_id:
+            self._exclusive_holder = None
+
+        finished_hold = self._holds.pop(holder_id)
+        finished_hold.hold_duration = time.monotonic() - self._hold_start_times.pop(holder_id)
+
+        if not self._hold_counts:  # Otherwise, other threads of this process still hold the lock in the shared mode
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+            if self._single_use:
+                self._close()
+
+        return finished_hold
+
+    @contextlib.contextmanager
+    def shared(self, blocking: bool = True, timeout: Optional[float] = None):
+        """Acquire the lock in the shared mode for the duration of the "with" block. See acquire_shared()."""
+
+        self.acquire_shared(blocking, timeout)
+        try:
+            yield self
+        finally:
+            self.release()
+
+    @contextlib.contextmanager
+    def exclusive(self, blocking: bool = True, timeout: Optional[float] = None):
+        """Acquire the lock in the exclusive mode for the duration of the "with" block. See acquire_exclusive()."""
+
+        self.acquire_exclusive(blocking, timeout)
+        try:
+            yield self
+        finally:
+            self.release()
+
+    async def acquire_exclusive_async(self, timeout: Optional[float] = None) -> None:
+        """
+        Acquire the lock in the exclusive mode on behalf of the current asyncio task, without blocking the event loop.
+
+        :param timeout: The maximum number of seconds to wait for the lock (None = wait indefinitely), after which
+                        LockTimeoutException is raised.
+        """
+
+        await self._acquire_asynchronously(self._acquire_exclusive, timeout)
+
+    async def acquire_shared_async(self, timeout: Optional[float] = None) -> None:
+        """
+        Acquire the lock in the shared mode on behalf of the current asyncio task, without blocking the event loop.
+
+        :param timeout: The maximum number of seconds to wait for the lock (None = wait indefinitely), after which
+                        LockTimeoutException is raised.
+        """
+
+        await self._acquire_asynchronously(self._acquire_shared, timeout)
+
+    async def _acquire_asynchronously(self, acquire_method: Callable[[Hashable, Optional[float], float], None], timeout: Optional[float]) -> None:
+        wait_started_at = time.monotonic()
+        deadline = self._get_deadline(True, timeout)
+        task = self._get_current_task()
+        delay = self._FLOCK_RETRY_INITIAL_DELAY
+
+        while True:
+            try:
+                acquire_method(task, time.monotonic(), wait_started_at)  # = a non-blocking acquisition
+                return
+            except FlockBasedLock.LockTimeoutException:
+                pass
+
+            await asyncio.sleep(self._get_retry_delay(delay, deadline))
+            delay = min(delay * 2, self._FLOCK_RETRY_MAX_DELAY)
+
+    async def release_async(self) -> None:
+        """Release the lock previously acquired by the current asyncio task (in either mode)."""
+
+        self._release(self._get_current_task())
+
+    @staticmethod
+    def _get_current_task() -> asyncio.Task:
+        task = asyncio.current_task()
+        if task is None:
+            raise RuntimeError("The asynchronous methods must be called from within an asyncio task!")
+
+        return task
+
+    @contextlib.asynccontextmanager
+    async def shared_async(self, timeout: Optional[float] = None):
+        """Acquire the lock in the shared mode for the duration of the "async with" block. See acquire_shared_async()."""
+
+        await self.acquire_shared_async(timeout)
+        try:
+            yield self
+        finally:
+            await self.release_async()
+
+    @contextlib.asynccontextmanager
+    async def exclusive_async(self, timeout: Optional[float] = None):
+        """Acquire the lock in the exclusive mode for the duration of the "async with" block. See acquire_exclusive_async()."""
+
+        await self.acquire_exclusive_async(timeout)
+        try:
+            yield self
+        finally:
+            await self.release_async()
 
     def close(self) -> None:
         """
@@ -95,8 +599,9 @@ class FlockBasedLock:
         The instance may not be used for locking after it has been closed.
         """
 
-        with self._threading_lock:
+        with self._condition:
             self._close()
+            self._condition.notify_all()
 
     def _close(self) -> None:
         if self._is_open:
@@ -104,9 +609,9 @@ class FlockBasedLock:
             self._is_open = False
 
     def __enter__(self):
-        """Acquire the lock."""
+        """Acquire the lock in the exclusive mode."""
 
-        self.acquire()
+        self.acquire_exclusive()
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         """Release the previously acquired lock."""
@@ -115,6 +620,11 @@ class FlockBasedLock:
 
     def __del__(self):
         try:
-            self.close()
-        except OSError:
+            if self._creator_pid != os.getpid():
+                # The condition variable of an instance inherited from the parent process mustn't be waited for
+                self._abandon_inherited_file_descriptor()
+            else:
+                self.close()
+        except (OSError, AttributeError):  # AttributeError - __init__() might have failed before the attributes were set
             pass
+
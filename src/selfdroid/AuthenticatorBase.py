@@ -35,10 +35,10 @@ class AuthenticatorBase(metaclass=abc.ABCMeta):
         will always return True (= the password is "correct").
         """
 
-        if self.is_user_login_passwordless():
+        password_bcrypt_hash = Settings.get_user_password_hash()
+        if password_bcrypt_hash is None:  # = Passwordless user login is enabled
             return True
 
-        password_bcrypt_hash = Settings.get_user_password_hash()  # can't be None at this point
         return self._safely_check_password_string(password, password_bcrypt_hash)
 
     def check_admin_password(self, password: str) -> bool:
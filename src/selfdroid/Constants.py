@@ -31,18 +31,51 @@ class Constants:
     SUPPORTED_API_VERSIONS: List[int] = [1]
 
     DATABASE_URI: str = "sqlite:///" + os.path.join(Settings.DATA_DIRECTORY, "database.sqlite")
+    JOBS_DATABASE_URI: str = "sqlite:///" + os.path.join(Settings.DATA_DIRECTORY, "jobs.sqlite")  # See AppStorageJobQueue
 
     TEMPORARY_DIRECTORY: str = os.path.join(Settings.DATA_DIRECTORY, "temp/")
     APKS_DIRECTORY: str = os.path.join(Settings.DATA_DIRECTORY, "apks/")
     ICONS_DIRECTORY: str = os.path.join(Settings.DATA_DIRECTORY, "icons/")
+    CATALOG_DIRECTORY: str = os.path.join(Settings.DATA_DIRECTORY, "catalog/")
     SECRET_KEY_FILE: str = os.path.join(Settings.DATA_DIRECTORY, "secret_key")
     APP_STORAGE_LOCK_FILE: str = os.path.join(Settings.DATA_DIRECTORY, "app_storage.lock")
+    APP_STORAGE_LOCKS_DIRECTORY: str = os.path.join(Settings.DATA_DIRECTORY, "locks/")
+    APP_STORAGE_CATALOG_LOCK_FILE: str = os.path.join(APP_STORAGE_LOCKS_DIRECTORY, "catalog.lock")
+    APP_STORAGE_CATALOG_REGENERATION_LOCK_FILE: str = os.path.join(APP_STORAGE_LOCKS_DIRECTORY, "catalog_regeneration.lock")
+    CATALOG_VERSION_FILE: str = os.path.join(Settings.DATA_DIRECTORY, "catalog_version")
+
+    # See EndpointBase.send_apk_with_retries_and_finish_request()
+    STORED_FILE_SENDING_ATTEMPTS: int = 5
+    STORED_FILE_SENDING_RETRY_DELAY: float = 0.05  # in seconds
+    STORED_FILE_SENDING_RETRY_AFTER: int = 5  # in seconds; sent in the Retry-After header once the attempts are exhausted
+
+    FILE_HASHING_CHUNK_SIZE: int = 1024 * 1024  # in bytes; uploaded files are also written to disk in chunks of this size
+
+    BULK_IMPORT_DEFAULT_BATCH_SIZE: int = 50  # The number of apps committed to the database at once; see AppBulkImporter
+
+    APP_STORAGE_JOB_QUEUE_POLL_INTERVAL: float = 5.0  # in seconds; see AppStorageJobWorker
+
+    # A running job whose heartbeat is older than the timeout is considered interrupted; see AppStorageJobHeartbeat
+    APP_STORAGE_JOB_HEARTBEAT_INTERVAL: float = 10.0  # in seconds
+    APP_STORAGE_JOB_HEARTBEAT_TIMEOUT: float = 60.0  # in seconds
+
+    # The size of the chunks in which large APK files are uploaded (except the last one); see ChunkedUploadSessionStore.
+    #  The maximum request body size of the front-end web server (e.g. nginx's client_max_body_size) must be greater.
+    CHUNKED_UPLOAD_CHUNK_SIZE: int = 4 * 1024 * 1024  # 4 MiB
 
     ICON_WIDTH_AND_HEIGHT: int = 192  # An app's icon is always a square PNG image
+    ICON_RENDITION_SIZES: List[int] = [48, 96, 192, 512]  # The smaller & larger copies of the icon; see AppIconRenditions
 
     DB_APP_NAME_MAX_LENGTH: int = 256
     DB_PACKAGE_NAME_MAX_LENGTH: int = 512
     DB_VERSION_NAME_MAX_LENGTH: int = 32
+    DB_SHA256_LENGTH: int = 64  # Lowercase hex
+    DB_MAX_INTEGER: int = 2 ** 63 - 1  # SQLite's integers are signed 64-bit; larger ones cannot even be used in a query
+    DB_BIND_KEY_JOBS: str = "jobs"
+    DB_JOB_TYPE_AND_STATE_MAX_LENGTH: int = 16
+    DB_STAGED_APK_FILENAME_MAX_LENGTH: int = 64
+    DB_UPLOADED_FILENAME_MAX_LENGTH: int = 256
+    DB_UPLOAD_SESSION_ID_LENGTH: int = 32
 
     FLASH_CATEGORY_SUCCESS: str = "success"
     FLASH_CATEGORY_ERROR: str = "error"
@@ -0,0 +1,64 @@
+# SPDX-License-Identifier: BSD-3-Clause
+#
+# Copyright (c) 2021 Vít Labuda. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+# following conditions are met:
+#  1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+#     disclaimer.
+#  2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the
+#     following disclaimer in the documentation and/or other materials provided with the distribution.
+#  3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote
+#     products derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+from typing import Tuple, List, Dict, Any
+
+
+class DurationHistogram:
+    """
+    A histogram of durations (in seconds) with fixed bucket bounds. It's not thread-safe - the caller has to synchronize
+    the access to it.
+    """
+
+    def __init__(self, bucket_upper_bounds: Tuple[float, ...]):
+        """
+        :param bucket_upper_bounds: The upper bounds (inclusive) of the buckets in ascending order; durations longer than the last bound fall into an extra overflow bucket.
+        """
+
+        self._bucket_upper_bounds: Tuple[float, ...] = bucket_upper_bounds
+        self._bucket_counts: List[int] = [0] * (len(bucket_upper_bounds) + 1)
+        self._count: int = 0
+        self._sum: float = 0.0
+        self._max: float = 0.0
+
+    def add(self, duration: float) -> None:
+        bucket_index = len(self._bucket_upper_bounds)
+        for index, upper_bound in enumerate(self._bucket_upper_bounds):
+            if duration <= upper_bound:
+                bucket_index = index
+                break
+
+        self._bucket_counts[bucket_index] += 1
+        self._count += 1
+        self._sum += duration
+        self._max = max(self._max, duration)
+
+    def to_dict(self) -> Dict[str, Any]:
+        # A list is used instead of a dictionary, so that the buckets' order is preserved when serialized into JSON with sorted keys
+        bucket_upper_bounds = list(self._bucket_upper_bounds) + [None]  # None = the overflow bucket
+
+        return {
+            "count": self._count,
+            "sum": self._sum,
+            "max": self._max,
+            "buckets": [{"upper_bound": upper_bound, "count": count} for upper_bound, count in zip(bucket_upper_bounds, self._bucket_counts)]
+        }
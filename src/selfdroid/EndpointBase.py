@@ -22,8 +22,17 @@
 
 from typing import Dict, Any
 import abc
+import os.path
+import datetime
+import time
 import flask
+import werkzeug.http
+import werkzeug.security
+from selfdroid.Constants import Constants
 from selfdroid.FinishRequestException import FinishRequestException
+from selfdroid.FileResponseBuilder import FileResponseBuilder
+from selfdroid.StoredFileChangedException import StoredFileChangedException
+from selfdroid.appstorage.crud.AppGetter import AppGetter
 
 
 class EndpointBase(metaclass=abc.ABCMeta):
@@ -43,3 +52,76 @@ class EndpointBase(metaclass=abc.ABCMeta):
         response = flask.make_response(flask_return_var)
 
         raise FinishRequestException(response)
+
+    def finish_request_if_not_modified(self, etag: str, last_modified: datetime.datetime) -> None:
+        """
+        Finishes the request with the "304 Not Modified" status code, if the client's cached representation of the
+        resource matches the supplied validators (If-None-Match takes precedence over If-Modified-Since).
+        If it doesn't, the method returns without doing anything.
+        """
+
+        if werkzeug.http.is_resource_modified(flask.request.environ, etag=etag, last_modified=last_modified):
+            return
+
+        not_modified_response = flask.make_response("", 304)
+        self.add_validators_to_response(not_modified_response, etag, last_modified)
+
+        self.finish_request(not_modified_response)
+
+    def add_validators_to_response(self, response: flask.Response, etag: str, last_modified: datetime.datetime) -> None:
+        response.set_etag(etag)  # A strong ETag
+        response.last_modified = last_modified
+
+    def send_file_and_finish_request(self, directory: str, filename: str, download_name: str, **send_file_kwargs) -> None:
+        sent_file = self.create_file_response(directory, filename, download_name, **send_file_kwargs)
+        self.finish_request(sent_file)
+
+    def create_file_response(self, directory: str, filename: str, download_name: str, **send_file_kwargs) -> flask.Response:
+        if FileResponseBuilder.is_offloading_enabled():
+            path = werkzeug.security.safe_join(directory, filename)
+            if path is None or not os.path.isfile(path):
+                flask.abort(404)
+
+            return FileResponseBuilder.create_offloaded_response(path, download_name, send_file_kwargs.get("as_attachment", False))
+
+        send_file_kwargs["download_name"] = download_name
+
+        return flask.send_from_directory(directory, filename, **send_file_kwargs)
+
+    def send_file_with_range_support_and_finish_request(self, path: str, file_size: int, etag: str, last_modified: datetime.datetime, download_name: str, as_attachment: bool) -> None:
+        """
+        Unlike flask.send_file(), this method supports multi-range requests and doesn't derive the validators from the
+        file's modification time. See the FileResponseBuilder class for details.
+
+        :raises StoredFileChangedException: If the file doesn't exist or doesn't match the expected size.
+        """
+
+        response = FileResponseBuilder(path, file_size, etag, last_modified, download_name, as_attachment).build_response()
+        self.finish_request(response)
+
+    def send_apk_with_retries_and_finish_request(self, app_id: int) -> None:
+        """
+        Sends the app's APK file with range support (see send_file_with_range_support_and_finish_request()).
+
+        The APK file might be deleted by a concurrent update or deletion of the app after the metadata have been fetched -
+        in such case, the metadata are fetched again (and if the app has been deleted, 404 is returned). If the file keeps
+        changing, 503 is returned once the attempts are exhausted.
+        """
+
+        app_getter = AppGetter()
+
+        for _ in range(Constants.STORED_FILE_SENDING_ATTEMPTS):
+            app_metadata = app_getter.get_metadata_or_404(app_id)
+
+            try:
+                self.send_file_with_range_support_and_finish_request(app_metadata.get_apk_path(),
+                                                                     app_metadata.apk_file_size,
+                                                                     app_metadata.get_apk_etag(),
+                                                                     app_metadata.last_updated_datetime,
+                                                                     app_metadata.get_apk_download_name(),
+                                                                     as_attachment=True)
+            except StoredFileChangedException:
+                app_getter.start_new_snapshot()
+                time.sleep(Constants.STORED_FILE_SENDING_RETRY_DELAY)
+
+        flask.abort(503, retry_after=Constants.STORED_FILE_SENDING_RETRY_AFTER)
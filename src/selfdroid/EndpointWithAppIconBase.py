@@ -0,0 +1,78 @@
+# SPDX-License-Identifier: BSD-3-Clause
+#
+# Copyright (c) 2021 Vít Labuda. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+# following conditions are met:
+#  1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+#     disclaimer.
+#  2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the
+#     following disclaimer in the documentation and/or other materials provided with the distribution.
+#  3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote
+#     products derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+from typing import List
+import abc
+import os.path
+import flask
+from selfdroid.Constants import Constants
+from selfdroid.EndpointBase import EndpointBase
+from selfdroid.appstorage.AppMetadata import AppMetadata
+from selfdroid.appstorage.AppIconRenditions import AppIconRenditions
+
+
+class EndpointWithAppIconBase(EndpointBase, metaclass=abc.ABCMeta):
+    _ICON_SIZE_ARG: str = "size"
+
+    def send_app_icon_and_finish_request(self, app_metadata: AppMetadata) -> None:
+        """
+        Sends the rendition of the app's icon (see AppIconRenditions) which best matches the size requested in the "size"
+        URL argument (in pixels) and the image formats accepted by the client. Only the formats listed explicitly in the
+        Accept header are taken into account, so the clients which ask for neither get the uniform PNG icon as before.
+        A "size" argument which isn't a positive integer is rejected with 400 Bad Request.
+        """
+
+        requested_size = self._get_requested_icon_size()
+
+        icon_filename, icon_format = app_metadata.get_icon_filename(), AppIconRenditions.FORMAT_PNG
+        for size, image_format in AppIconRenditions.get_rendition_candidates(requested_size, self._get_explicitly_accepted_icon_formats()):
+            rendition_filename = app_metadata.get_icon_rendition_filename(size, image_format)
+
+            # The renditions are optional (and the icon might be released concurrently - see BlobStore)
+            if os.path.isfile(os.path.join(Constants.ICONS_DIRECTORY, rendition_filename)):
+                icon_filename, icon_format = rendition_filename, image_format
+                break
+
+        sent_icon = self.create_file_response(Constants.ICONS_DIRECTORY, icon_filename, app_metadata.get_icon_download_name(icon_format))
+        sent_icon.vary.add("Accept")
+
+        self.finish_request(sent_icon)
+
+    def _get_requested_icon_size(self) -> int:
+        # Werkzeug's args.get() returns the default value if an argument can't be converted to the requested type
+        requested_size = flask.request.args.get(EndpointWithAppIconBase._ICON_SIZE_ARG, default=None, type=int)
+        if requested_size is None:
+            if EndpointWithAppIconBase._ICON_SIZE_ARG in flask.request.args:
+                flask.abort(400)
+
+            return Constants.ICON_WIDTH_AND_HEIGHT
+
+        if requested_size < 1:
+            flask.abort(400)
+
+        return requested_size
+
+    def _get_explicitly_accepted_icon_formats(self) -> List[str]:
+        # "*/*" and "image/*" would match every format, but clients sending them can't necessarily decode WebP or AVIF
+        explicitly_accepted_mimetypes = set(mimetype.lower() for mimetype, quality in flask.request.accept_mimetypes if quality > 0)
+
+        return [image_format for image_format, mimetype in AppIconRenditions.MIMETYPES.items() if mimetype in explicitly_accepted_mimetypes]
@@ -0,0 +1,321 @@
+# SPDX-License-Identifier: BSD-3-Clause
+#
+# Copyright (c) 2021 Vít Labuda. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+# following conditions are met:
+#  1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+#     disclaimer.
+#  2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the
+#     following disclaimer in the documentation and/or other materials provided with the distribution.
+#  3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote
+#     products derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+from typing import List, Tuple, Optional, Iterator, Callable, BinaryIO
+import datetime
+import os
+import os.path
+import mimetypes
+import re
+import secrets
+import unicodedata
+import flask
+import werkzeug.http
+import werkzeug.urls
+from selfdroid.Settings import Settings
+from selfdroid.SelfdroidRuntimeError import SelfdroidRuntimeError
+from selfdroid.StoredFileChangedException import StoredFileChangedException
+
+
+class FileResponseBuilder:
+    """
+    Builds responses to GET & HEAD requests for a stored file, including conditional requests, and single & multi-range
+    requests (RFC 7232 & RFC 7233).
+
+    The file's size and validators are supplied by the caller (they're derived from the app's metadata), so the file is
+    opened only when its contents are actually sent - HEAD requests and the 304 & 416 responses don't touch it at all.
+
+    As files are read without holding the app storage lock, the file might be deleted after the caller has fetched the
+    metadata (the stored files are never modified in place - see BlobStore). In such case, or if the opened file's size
+    doesn't match the expected one, StoredFileChangedException is raised (the caller should then fetch the metadata again).
+
+    If file offloading is enabled (see Settings.FILE_OFFLOAD_MODE), the contents are sent by the front-end web server
+    instead, which also takes care of the range requests; authentication, the metadata lookup, HEAD requests and the
+    "304 Not Modified" responses are still handled here.
+    """
+
+    OFFLOAD_MODE_X_ACCEL_REDIRECT: str = "x-accel-redirect"  # nginx
+    OFFLOAD_MODE_X_SENDFILE: str = "x-sendfile"  # Apache with mod_xsendfile, lighttpd, ...
+
+    _READ_CHUNK_SIZE: int = 256 * 1024
+
+    # A request with more ranges (after coalescing the overlapping ones) is served as if it contained no Range header
+    _MAX_RANGES_PER_REQUEST: int = 32
+
+    _RANGE_SPEC_REGEX: re.Pattern = re.compile(r"^([0-9]*)-([0-9]*)$")
+
+    def __init__(self, path: str, file_size: int, etag: str, last_modified: datetime.datetime, download_name: str, as_attachment: bool):
+        self._path: str = path
+        self._file_size: int = file_size
+        self._etag: str = etag
+        self._last_modified: datetime.datetime = last_modified
+        self._download_name: str = download_name
+        self._as_attachment: bool = as_attachment
+
+        self._mimetype: str = (mimetypes.guess_type(download_name)[0] or "application/octet-stream")
+        self._is_head_request: bool = (flask.request.method == "HEAD")
+
+    def build_response(self) -> flask.Response:
+        # If-Range is evaluated separately below
+        if not werkzeug.http.is_resource_modified(flask.request.environ, etag=self._etag, last_modified=self._last_modified):
+            return self._create_response(304)
+
+        if FileResponseBuilder.is_offloading_enabled() and not self._is_head_request:
+            response = FileResponseBuilder.create_offloaded_response(self._path, self._download_name, self._as_attachment)
+            response.set_etag(self._etag)
+            response.last_modified = self._last_modified
+
+            return response
+
+        byte_ranges = self._get_requested_byte_ranges()
+
+        if byte_ranges is None:
+            response = self._create_response(200, self._file_size)
+            if not self._is_head_request:
+                self._set_response_body(response, lambda file: self._generate_file_chunks(file, 0, self._file_size))
+
+        elif len(byte_ranges) == 0:
+            response = self._create_response(416)
+            response.headers["Content-Range"] = "bytes */{}".format(self._file_size)
+
+        elif len(byte_ranges) == 1:
+            start, stop = byte_ranges[0]
+
+            response = self._create_response(206, stop - start)
+            response.headers["Content-Range"] = self._generate_content_range_header_value(start, stop)
+            if not self._is_head_request:
+                self._set_response_body(response, lambda file: self._generate_file_chunks(file, start, stop))
+
+        else:
+            response = self._create_multipart_response(byte_ranges)
+
+        if response.status_code in (200, 206):
+            FileResponseBuilder._add_content_disposition_header_to_response(response, self._download_name, self._as_attachment)
+
+        return response
+
+    @staticmethod
+    def is_offloading_enabled() -> bool:
+        return Settings.FILE_OFFLOAD_MODE is not None
+
+    @staticmethod
+    def create_offloaded_response(path: str, download_name: str, as_attachment: bool) -> flask.Response:
+        """
+        Creates a response with an empty body and a header which instructs the front-end web server to send the file
+        (which must be located in the data directory) to the client.
+        """
+
+        real_path = os.path.realpath(path)
+        real_data_directory = os.path.realpath(Settings.DATA_DIRECTORY)
+        if os.path.commonpath([real_path, real_data_directory]) != real_data_directory:
+            raise SelfdroidRuntimeError("Only the files located in the data directory can be offloaded to the web server!")
+
+        response = flask.Response(status=200, mimetype=(mimetypes.guess_type(download_name)[0] or "application/octet-stream"))
+        response.cache_control.no_cache = True  # The same as with flask.send_file()
+        FileResponseBuilder._add_content_disposition_header_to_response(response, download_name, as_attachment)
+
+        if Settings.FILE_OFFLOAD_MODE == FileResponseBuilder.OFFLOAD_MODE_X_ACCEL_REDIRECT:
+            relative_path = os.path.relpath(real_path, real_data_directory).replace(os.sep, "/")
+            response.headers["X-Accel-Redirect"] = werkzeug.urls.url_quote(Settings.FILE_OFFLOAD_X_ACCEL_REDIRECT_LOCATION + relative_path)
+        elif Settings.FILE_OFFLOAD_MODE == FileResponseBuilder.OFFLOAD_MODE_X_SENDFILE:
+            response.headers["X-Sendfile"] = real_path
+        else:
+            raise SelfdroidRuntimeError("Invalid file offload mode: {}".format(repr(Settings.FILE_OFFLOAD_MODE)))
+
+        return response
+
+    def _create_response(self, status_code: int, content_length: Optional[int] = None) -> flask.Response:
+        response = flask.Response(status=status_code, mimetype=self._mimetype)
+
+        response.set_etag(self._etag)  # A strong ETag
+        response.last_modified = self._last_modified
+        response.accept_ranges = "bytes"
+        response.cache_control.no_cache = True  # The same as with flask.send_file()
+
+        if content_length is not None:
+            response.content_length = content_length
+
+        return response
+
+    def _create_multipart_response(self, byte_ranges: List[Tuple[int, int]]) -> flask.Response:
+        boundary = secrets.token_hex(16)
+
+        part_headers = [self._generate_multipart_part_header(boundary, start, stop) for start, stop in byte_ranges]
+        closing_delimiter = "\r\n--{}--\r\n".format(boundary).encode("ascii")
+        content_length = sum(len(part_header) for part_header in part_headers) + sum((stop - start) for start, stop in byte_ranges) + len(closing_delimiter)
+
+        response = self._create_response(206, content_length)
+        response.headers["Content-Type"] = "multipart/byteranges; boundary={}".format(boundary)
+
+        if not self._is_head_request:
+            self._set_response_body(response, lambda file: self._generate_multipart_body(file, part_headers, byte_ranges, closing_delimiter))
+
+        return response
+
+    def _generate_multipart_part_header(self, boundary: str, start: int, stop: int) -> bytes:
+        return "\r\n--{}\r\nContent-Type: {}\r\nContent-Range: {}\r\n\r\n".format(boundary, self._mimetype, self._generate_content_range_header_value(start, stop)).encode("ascii")
+
+    def _generate_multipart_body(self, file: BinaryIO, part_headers: List[bytes], byte_ranges: List[Tuple[int, int]], closing_delimiter: bytes) -> Iterator[bytes]:
+        for part_header, (start, stop) in zip(part_headers, byte_ranges):
+            yield part_header
+            yield from self._generate_file_chunks(file, start, stop)
+
+        yield closing_delimiter
+
+    def _generate_content_range_header_value(self, start: int, stop: int) -> str:
+        return "bytes {}-{}/{}".format(start, stop - 1, self._file_size)
+
+    def _set_response_body(self, response: flask.Response, body_generator_factory: Callable[[BinaryIO], Iterator[bytes]]) -> None:
+        file = self._open_file()
+
+        response.response = body_generator_factory(file)
+        response.call_on_close(file.close)
+
+    def _open_file(self) -> BinaryIO:
+        """
+        The file is opened before the response is returned, so that a concurrent modification of the app storage can still
+        be detected. Once the file is open, its contents are not affected by the file being replaced or deleted.
+        """
+
+        try:
+            file = open(self._path, "rb")
+        except FileNotFoundError:
+            raise StoredFileChangedException()
+
+        file_stat = os.fstat(file.fileno())
+        if file_stat.st_size != self._file_size:
+            file.close()
+            raise StoredFileChangedException()
+
+        return file
+
+    def _generate_file_chunks(self, file: BinaryIO, start: int, stop: int) -> Iterator[bytes]:
+        file.seek(start)
+
+        remaining_length = stop - start
+        while remaining_length > 0:
+            chunk = file.read(min(remaining_length, FileResponseBuilder._READ_CHUNK_SIZE))
+            if not chunk:  # Cannot happen unless the file is modified in place, which the app never does
+                return
+
+            remaining_length -= len(chunk)
+            yield chunk
+
+    def _get_requested_byte_ranges(self) -> Optional[List[Tuple[int, int]]]:
+        """
+        :return: None if the whole file should be sent; otherwise, a sorted list of non-overlapping (start, stop) byte
+                 ranges (stop is exclusive) which should be sent. The list is empty if none of the requested ranges can
+                 be satisfied.
+        """
+
+        range_header = flask.request.headers.get("Range", default=None, type=str)
+        if range_header is None:
+            return None
+
+        # werkzeug's parser (flask.request.range) rejects unordered and overlapping ranges, which are valid, so the
+        #  header is parsed here. Malformed headers and unknown range units are ignored, as RFC 7233 permits.
+        range_unit, _, range_specs = range_header.partition("=")
+        if range_unit.strip().lower() != "bytes":
+            return None
+
+        range_specs = [range_spec.strip() for range_spec in range_specs.split(",") if range_spec.strip()]
+        if not range_specs:
+            return None
+
+        byte_ranges = []
+        for range_spec in range_specs:
+
+            match = FileResponseBuilder._RANGE_SPEC_REGEX.fullmatch(range_spec)
+            if match is None:
+                return None
+
+            first_byte, last_byte = match.group(1), match.group(2)
+            if first_byte == "":
+                if last_byte == "":
+                    return None
+
+                # A suffix range (e.g. "-500" = the last 500 bytes)
+                start, stop = max(0, self._file_size - int(last_byte)), self._file_size
+            else:
+                if (last_byte != "") and (int(last_byte) < int(first_byte)):
+                    return None
+
+                start = int(first_byte)
+                stop = self._file_size if (last_byte == "") else min(int(last_byte) + 1, self._file_size)
+
+            if start < stop:
+                byte_ranges.append((start, stop))
+
+        if not self._is_if_range_condition_met():
+            return None
+
+        byte_ranges = self._coalesce_byte_ranges(byte_ranges)
+        if len(byte_ranges) > FileResponseBuilder._MAX_RANGES_PER_REQUEST:
+            return None
+
+        return byte_ranges
+
+    def _is_if_range_condition_met(self) -> bool:
+        if_range_header = flask.request.headers.get("If-Range", default=None, type=str)
+        if if_range_header is None:
+            return True
+
+        if_range = flask.request.if_range
+
+        if if_range.etag is not None:
+            # A weak entity tag never matches (werkzeug doesn't keep the information about the weakness)
+            return (not if_range_header.strip().startswith("W/")) and (if_range.etag == self._etag)
+
+        if if_range.date is not None:
+            # HTTP dates have a precision of one second
+            return int(if_range.date.timestamp()) == int(self._last_modified.timestamp())
+
+        return False
+
+    @staticmethod
+    def _coalesce_byte_ranges(byte_ranges: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+        """
+        Merges overlapping and adjacent ranges, so that a client cannot make the server send the same data many times.
+        """
+
+        coalesced_byte_ranges = []
+        for start, stop in sorted(byte_ranges):
+            if coalesced_byte_ranges and start <= coalesced_byte_ranges[-1][1]:
+                coalesced_byte_ranges[-1] = (coalesced_byte_ranges[-1][0], max(stop, coalesced_byte_ranges[-1][1]))
+            else:
+                coalesced_byte_ranges.append((start, stop))
+
+        return coalesced_byte_ranges
+
+    @staticmethod
+    def _add_content_disposition_header_to_response(response: flask.Response, download_name: str, as_attachment: bool) -> None:
+        # The same as with flask.send_file()
+        try:
+            download_name.encode("ascii")
+        except UnicodeEncodeError:
+            simple_download_name = unicodedata.normalize("NFKD", download_name).encode("ascii", "ignore").decode("ascii")
+            quoted_download_name = werkzeug.urls.url_quote(download_name, safe="")
+            download_names = {"filename": simple_download_name, "filename*": "UTF-8''{}".format(quoted_download_name)}
+        else:
+            download_names = {"filename": download_name}
+
+        response.headers.set("Content-Disposition", ("attachment" if as_attachment else "inline"), **download_names)
@@ -20,8 +20,11 @@
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
 
+import os
+import os.path
 import time
 import secrets
+import string
 
 
 class Helpers:
@@ -38,3 +41,23 @@ class Helpers:
     @staticmethod
     def get_current_unix_timestamp() -> int:
         return int(time.time())
+
+    @staticmethod
+    def write_file_atomically(path: str, data: bytes) -> None:
+        """
+        Writes the data into a temporary file in the same directory and then renames it to the destination path, so that
+        other processes reading the file can never see it in a partially written state.
+        """
+
+        random_string = Helpers.generate_secure_random_string(string.digits + string.ascii_lowercase, 16)
+        temporary_path = os.path.join(os.path.dirname(path), ".{}.{}.tmp".format(os.path.basename(path), random_string))
+
+        try:
+            with open(temporary_path, "wb") as file:
+                file.write(data)
+
+            os.replace(temporary_path, path)
+
+        finally:
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
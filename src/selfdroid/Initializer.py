@@ -25,6 +25,7 @@ import os.path
 import secrets
 from selfdroid.Constants import Constants
 from selfdroid.Settings import Settings
+from selfdroid.appstorage.CatalogVersion import CatalogVersion
 
 
 class Initializer:
@@ -44,12 +45,21 @@ class Initializer:
         if not os.path.isdir(Constants.ICONS_DIRECTORY):
             os.mkdir(Constants.ICONS_DIRECTORY)
 
+        if not os.path.isdir(Constants.CATALOG_DIRECTORY):
+            os.mkdir(Constants.CATALOG_DIRECTORY)
+
+        if not os.path.isdir(Constants.APP_STORAGE_LOCKS_DIRECTORY):
+            os.mkdir(Constants.APP_STORAGE_LOCKS_DIRECTORY)
+
         if not os.path.isfile(Constants.SECRET_KEY_FILE):
             new_secret_key = secrets.token_bytes(Initializer._SECRET_KEY_LENGTH)
             with open(Constants.SECRET_KEY_FILE, "wb") as file:
                 os.chmod(Constants.SECRET_KEY_FILE, 0o600)
                 file.write(new_secret_key)
 
+        if not os.path.isfile(Constants.CATALOG_VERSION_FILE):
+            CatalogVersion.create_initial()
+
     def get_secret_key(self) -> bytes:
         with open(Constants.SECRET_KEY_FILE, "rb") as file:
             return file.read()
@@ -0,0 +1,54 @@
+# SPDX-License-Identifier: BSD-3-Clause
+#
+# Copyright (c) 2021 Vít Labuda. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+# following conditions are met:
+#  1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+#     disclaimer.
+#  2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the
+#     following disclaimer in the documentation and/or other materials provided with the distribution.
+#  3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote
+#     products derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+from typing import Optional, List, BinaryIO
+import flask
+from selfdroid.Settings import Settings
+from selfdroid.StreamedUploadFile import StreamedUploadFile
+from selfdroid.appstorage.AppStorageHelpers import AppStorageHelpers
+
+
+class SelfdroidRequest(flask.Request):
+    """
+    By default, werkzeug spools uploaded files into its own temporary files, from which they would then have to be
+    copied into the app's temporary directory. This request class makes werkzeug stream them into the temporary
+    directory straight away instead - see StreamedUploadFile.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        self._streamed_upload_files: List[StreamedUploadFile] = []
+
+    def _get_file_stream(self, total_content_length: Optional[int], content_type: Optional[str], filename: Optional[str] = None, content_length: Optional[int] = None) -> BinaryIO:
+        streamed_upload_file = StreamedUploadFile(AppStorageHelpers.generate_temp_filepath_for_apk(), Settings.MAX_UPLOAD_SIZE)
+        self._streamed_upload_files.append(streamed_upload_file)
+
+        return streamed_upload_file
+
+    def close(self) -> None:
+        try:
+            super().close()
+        finally:
+            # If the parsing of the form data fails, werkzeug doesn't close the files it has created so far
+            for streamed_upload_file in self._streamed_upload_files:
+                streamed_upload_file.close()
@@ -21,12 +21,15 @@
 
 
 from typing import Optional
+import os
 import os.path
 from selfdroid.Helpers import Helpers
 
 
 class Settings:
-    DATA_DIRECTORY: str = os.path.join(os.path.dirname(os.path.realpath(__file__)), "../app_data/")
+    # Can be overridden using the SELFDROID_DATA_DIRECTORY environment variable (the tests and benchmarks run the app with
+    #  a temporary data directory this way).
+    DATA_DIRECTORY: str = os.environ.get("SELFDROID_DATA_DIRECTORY", os.path.join(os.path.dirname(os.path.realpath(__file__)), "../app_data/"))
 
     # This string will be displayed in the web app's title.
     INSTANCE_NAME: str = "Selfdroid Dev"
@@ -38,15 +41,72 @@ class Settings:
     #  server's timezone will be used, or a zoneinfo timezone name, e.g. "Europe/Prague" or "America/New_York".
     DISPLAY_TIMEZONE: Optional[str] = None
 
+    # The number of apps displayed on one page of the web app's app list.
+    WEB_INDEX_PAGE_SIZE: int = 50
+
     # If you're using a production web server (e.g. nginx), you'll also need to change the maximum upload size in its config file
     MAX_UPLOAD_SIZE: int = 64 * 1024 * 1024  # 64 MiB
 
+    # The APKs and icons can be sent to clients by the front-end web server instead of the (slow and limited number of)
+    #  Python workers; the app then only authenticates the client, looks the file up and instructs the web server to send
+    #  it. Can be either None (the files are sent by the app), "x-accel-redirect" (nginx - see the internal location in
+    #  selfdroid_nginx_vhost.conf) or "x-sendfile" (e.g. Apache with mod_xsendfile).
+    FILE_OFFLOAD_MODE: Optional[str] = None
+
+    # The internal nginx location mapped to the DATA_DIRECTORY's "apks/" and "icons/" subdirectories (used only when
+    #  FILE_OFFLOAD_MODE is "x-accel-redirect").
+    FILE_OFFLOAD_X_ACCEL_REDIRECT_LOCATION: str = "/selfdroid-internal-files/"
+
+    # The metadata of uploaded APKs are extracted by a fast reader which decodes only the needed parts of the APK, falling
+    #  back to pyaxmlparser for APKs it doesn't support. Set this to False to always use pyaxmlparser.
+    FAST_APK_METADATA_EXTRACTION: bool = True
+
+    # The results of parsing uploaded APKs (including the rejections of invalid ones) are cached (in each process
+    #  separately) by the APK files' SHA-256 hashes, so that re-uploads of the same file don't have to be parsed again.
+    #  This is the maximum number of cached results per process; the least recently used ones are evicted first. Set this
+    #  to 0 to disable the cache.
+    PARSED_APK_CACHE_MAX_ENTRIES: int = 32
+
+    # The uploaded APK files are processed (i.e. the apps are added or updated) asynchronously - the web app only stages
+    #  the uploaded file and enqueues a job, which is then processed by a background thread of one of the web app's
+    #  processes. Set this to False if the jobs should be processed only by separately run workers (see the
+    #  "process-jobs" command in the README). When running under uWSGI, its "enable-threads" option must be turned on.
+    IN_PROCESS_APP_STORAGE_JOB_WORKER: bool = True
+
+    # The finished jobs, along with their results displayed in the web app, are deleted after this many seconds.
+    FINISHED_APP_STORAGE_JOB_RETENTION: int = 86400  # in seconds; 1 day
+
+    # The web app uploads APK files in chunks, so that an interrupted upload can be resumed. An unfinished upload (along
+    #  with its already uploaded chunks) is deleted once no chunk has been uploaded for this many seconds.
+    CHUNKED_UPLOAD_SESSION_LIFETIME: int = 86400  # in seconds; 1 day
+
+    # The maximum number of seconds a request modifying the app storage (deleting an app) waits for
+    #  the app storage lock held by another modification, after which it gives up and an error message is displayed.
+    #  Reading the app storage doesn't require the lock, so read requests are never affected by this.
+    APP_STORAGE_LOCK_TIMEOUT: float = 15.0  # in seconds
+
+    # Apps are modified while holding one of this many lock files, chosen by the app's ID, so that different apps can be
+    #  modified concurrently (apps whose IDs share a lock file are modified one after another). All the processes using
+    #  the data directory must use the same value!
+    APP_STORAGE_LOCK_STRIPE_COUNT: int = 16
+
+    # Set this to True if the app runs in green threads (e.g. uWSGI's gevent loop with monkey-patching) - the app storage
+    #  lock is then polled in the non-blocking mode instead of blocking the whole process while it's waited for.
+    COOPERATIVE_APP_STORAGE_LOCKING: bool = False
+
     # The session cookie is discarded when a client's browsing session ends, so the login lifetime doesn't have to be long.
     WEB_LOGIN_LIFETIME: int = 10800  # in seconds; 3 hours
 
     # Set this to current date and time if you want to invalidate all past logged in sessions (which you should do when changing passwords).
     MINIMUM_WEB_LOGIN_TIMESTAMP: int = Helpers.sql_datetime_to_unix_timestamp("2021-07-22 12:00:00")
 
+    # Successfully verified API passwords are cached (in each process separately) for this many seconds, so that the slow
+    #  bcrypt check doesn't have to be performed on every API request. Set this to 0 to disable the cache.
+    API_CREDENTIAL_CACHE_TTL: int = 300  # in seconds; 5 minutes
+
+    # The maximum number of cached verified API credentials per process; the least recently used ones are evicted first.
+    API_CREDENTIAL_CACHE_MAX_ENTRIES: int = 64
+
     @staticmethod
     def get_user_password_hash() -> Optional[str]:
         """
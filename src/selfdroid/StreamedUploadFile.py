@@ -0,0 +1,126 @@
+# SPDX-License-Identifier: BSD-3-Clause
+#
+# Copyright (c) 2021 Vít Labuda. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+# following conditions are met:
+#  1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+#     disclaimer.
+#  2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the
+#     following disclaimer in the documentation and/or other materials provided with the distribution.
+#  3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote
+#     products derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+import os
+import hashlib
+import werkzeug.exceptions
+from selfdroid.Constants import Constants
+
+
+class StreamedUploadFile:
+    """
+    The file into which werkzeug's form data parser streams an uploaded file (see SelfdroidRequest). It's created directly
+    in the temporary directory and the contents' SHA-256 hash and size are computed while they're being written, so an
+    uploaded APK can be moved to its final location without being copied or read again (see move_to()).
+
+    The maximum upload size is enforced while the file is being written, so an oversized upload is rejected as soon as it
+    exceeds the limit, even if the request didn't declare its length upfront.
+
+    Unless it has been moved, the file is deleted once it's closed, which happens at the end of the request.
+    """
+
+    def __init__(self, path: str, max_size: int):
+        self._path: str = path
+        self._max_size: int = max_size
+
+        # The parser writes the file in small pieces, so the writes are coalesced into larger ones by the buffer
+        self._file = open(path, "xb+", buffering=Constants.FILE_HASHING_CHUNK_SIZE)
+        self._hash = hashlib.sha256()
+        self._size: int = 0
+        self._is_writing_finished: bool = False
+        self._has_been_moved: bool = False
+
+    def get_size(self) -> int:
+        return self._size
+
+    def write(self, data: bytes) -> int:
+        if self._is_writing_finished:
+            raise werkzeug.exceptions.InternalServerError("The uploaded file cannot be written to once it has been read!")
+
+        self._size += len(data)
+        if self._size > self._max_size:
+            self.close()
+            raise werkzeug.exceptions.RequestEntityTooLarge()
+
+        self._hash.update(data)
+        return self._file.write(data)
+
+    def read(self, size: int = -1) -> bytes:
+        self._is_writing_finished = True
+        return self._file.read(size)
+
+    def readline(self, size: int = -1) -> bytes:
+        self._is_writing_finished = True
+        return self._file.readline(size)
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        self._is_writing_finished = True
+        return self._file.seek(offset, whence)
+
+    def tell(self) -> int:
+        return self._file.tell()
+
+    def flush(self) -> None:
+        self._file.flush()
+
+    def readable(self) -> bool:
+        return True
+
+    def writable(self) -> bool:
+        return not self._is_writing_finished
+
+    def seekable(self) -> bool:
+        return True
+
+    @property
+    def closed(self) -> bool:
+        return self._file.closed
+
+    def move_to(self, destination_path: str) -> str:
+        """
+        Moves the file to the specified path, which must be on the same filesystem as the temporary directory. The moved
+        file isn't deleted when this object is closed.
+
+        :return: The SHA-256 hash of the file's contents (lowercase hex).
+        """
+
+        self._is_writing_finished = True
+        self._file.flush()
+
+        os.replace(self._path, destination_path)
+        self._has_been_moved = True
+
+        return self._hash.hexdigest()
+
+    def close(self) -> None:
+        if self._file.closed:
+            return
+
+        self._file.close()
+        if not self._has_been_moved:
+            self._remove_file()
+
+    def _remove_file(self) -> None:
+        try:
+            os.remove(self._path)
+        except FileNotFoundError:
+            pass
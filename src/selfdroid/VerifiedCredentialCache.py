@@ -0,0 +1,142 @@
+# SPDX-License-Identifier: BSD-3-Clause
+#
+# Copyright (c) 2021 Vít Labuda. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+# following conditions are met:
+#  1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+#     disclaimer.
+#  2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the
+#     following disclaimer in the documentation and/or other materials provided with the distribution.
+#  3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote
+#     products derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+from typing import Optional, Dict
+import collections
+import threading
+import time
+import hmac
+import hashlib
+import secrets
+
+
+class VerifiedCredentialCache:
+    """
+    A per-process cache of credentials that have already been successfully verified against a password hash, so that
+    the (deliberately slow) bcrypt check doesn't have to be performed on every request.
+
+    The credentials themselves are never stored - the entries are keyed by an HMAC of the credential and the password
+    hash it was verified against. The HMAC key is generated randomly when the cache is created, so the entries are
+    useless outside of the process. As the password hash is a part of the key, changing the password invalidates all
+    the entries; the cache is also cleared as soon as a password hash change is observed.
+    """
+
+    _HMAC_KEY_LENGTH: int = 32
+
+    def __init__(self, ttl: float, max_entries: int):
+        """
+        :param ttl: The number of seconds for which a verified credential is cached. If it's 0 (or less), the cache is disabled.
+        :param max_entries: The maximum number of entries; when exceeded, the least recently used entries are evicted.
+        """
+
+        self._ttl: float = ttl
+        self._max_entries: int = max_entries
+
+        self._hmac_key: bytes = secrets.token_bytes(VerifiedCredentialCache._HMAC_KEY_LENGTH)
+        self._entries: collections.OrderedDict = collections.OrderedDict()  # entry key (bytes) -> expiration time (float)
+        self._current_password_hash: Optional[str] = None
+        self._lock: threading.Lock = threading.Lock()
+
+        self._hits: int = 0
+        self._misses: int = 0
+        self._evictions: int = 0
+        self._invalidations: int = 0
+
+    def is_enabled(self) -> bool:
+        return self._ttl > 0 and self._max_entries > 0
+
+    def is_verified(self, credential: str, password_hash: str) -> bool:
+        if not self.is_enabled():
+            return False
+
+        entry_key = self._generate_entry_key(credential, password_hash)
+        current_time = time.monotonic()
+
+        with self._lock:
+            self._invalidate_if_password_hash_changed(password_hash)
+
+            expiration_time = self._entries.get(entry_key)
+            if expiration_time is None or expiration_time <= current_time:
+                if expiration_time is not None:
+                    del self._entries[entry_key]
+
+                self._misses += 1
+                return False
+
+            self._entries.move_to_end(entry_key)
+            self._hits += 1
+            return True
+
+    def mark_as_verified(self, credential: str, password_hash: str) -> None:
+        """
+        Must be called only after the credential has been successfully verified against the password hash!
+        """
+
+        if not self.is_enabled():
+            return
+
+        entry_key = self._generate_entry_key(credential, password_hash)
+        expiration_time = time.monotonic() + self._ttl
+
+        with self._lock:
+            self._invalidate_if_password_hash_changed(password_hash)
+
+            self._entries[entry_key] = expiration_time
+            self._entries.move_to_end(entry_key)
+
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._clear_entries()
+
+    def get_statistics(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self._max_entries,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "invalidations": self._invalidations
+            }
+
+    def _invalidate_if_password_hash_changed(self, password_hash: str) -> None:
+        # Must be called with self._lock held!
+        if self._current_password_hash != password_hash:
+            if self._entries:
+                self._clear_entries()
+
+            self._current_password_hash = password_hash
+
+    def _clear_entries(self) -> None:
+        # Must be called with self._lock held!
+        self._entries.clear()
+        self._invalidations += 1
+
+    def _generate_entry_key(self, credential: str, password_hash: str) -> bytes:
+        # The NUL byte separates the two values, so that different pairs of values cannot produce the same message
+        message = password_hash.encode("utf-8") + b"\x00" + credential.encode("utf-8")
+
+        return hmac.new(self._hmac_key, message, hashlib.sha256).digest()
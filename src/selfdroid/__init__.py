@@ -20,13 +20,16 @@
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
 
+import click
 import flask
 import flask_sqlalchemy
 import flask_talisman
+import sqlalchemy.event
 from selfdroid.Constants import Constants
 from selfdroid.Settings import Settings
 from selfdroid.Initializer import Initializer
 from selfdroid.TemplateFilters import TemplateFilters
+from selfdroid.SelfdroidRequest import SelfdroidRequest
 
 
 initializer = Initializer()
@@ -34,9 +37,11 @@ initializer.initialize_data_directory()
 
 
 app = flask.Flask(__name__)
+app.request_class = SelfdroidRequest
 app.secret_key = initializer.get_secret_key()
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 app.config["SQLALCHEMY_DATABASE_URI"] = Constants.DATABASE_URI
+app.config["SQLALCHEMY_BINDS"] = {Constants.DB_BIND_KEY_JOBS: Constants.JOBS_DATABASE_URI}
 app.config["MAX_CONTENT_LENGTH"] = Settings.MAX_UPLOAD_SIZE
 app.config["SESSION_COOKIE_SECURE"] = True
 app.config["SESSION_COOKIE_HTTPONLY"] = True
@@ -44,14 +49,72 @@ app.config["SESSION_COOKIE_SAMESITE"] = True
 
 
 db = flask_sqlalchemy.SQLAlchemy(app)
+
+# The job queue's database (see AppStorageJobQueue) is accessed using a separate session, so that committing or rolling
+#  back a transaction of the job queue doesn't end a transaction of the app storage's database (and vice versa).
+jobs_db_session = db.create_scoped_session(options={"bind": db.get_engine(bind=Constants.DB_BIND_KEY_JOBS)})
+
+
+@app.teardown_appcontext
+def flta_global_remove_jobs_db_session(_):
+    jobs_db_session.remove()
+
+
+# The app storage is read without holding the app storage lock (see the NOTES file in the appstorage package), which
+#  relies on these two SQLite settings:
+#  - In the WAL journal mode, readers aren't blocked by a writer (and vice versa) and they don't see its uncommitted changes.
+#  - The sqlite3 module doesn't begin a transaction before SELECT statements, so every query would read from a different
+#    snapshot of the database. Its transaction handling is therefore disabled and the transactions are begun explicitly.
+# The job queue's database (see AppStorageJobQueue) uses the same settings.
+@sqlalchemy.event.listens_for(db.get_engine(bind=Constants.DB_BIND_KEY_JOBS), "connect")
+@sqlalchemy.event.listens_for(db.engine, "connect")
+def flev_global_sqlite_connect(dbapi_connection, _):
+    dbapi_connection.isolation_level = None
+
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.close()
+
+
+@sqlalchemy.event.listens_for(db.get_engine(bind=Constants.DB_BIND_KEY_JOBS), "begin")
+@sqlalchemy.event.listens_for(db.engine, "begin")
+def flev_global_sqlite_begin(connection):
+    connection.exec_driver_sql("BEGIN")
+
+
 from selfdroid.appstorage.AppMetadataDBModel import AppMetadataDBModel
+from selfdroid.appstorage.AppChangeLogDBModel import AppChangeLogDBModel
+from selfdroid.appstorage.jobs.AppStorageJobDBModel import AppStorageJobDBModel
+from selfdroid.appstorage.jobs.ChunkedUploadSessionDBModel import ChunkedUploadSessionDBModel
+from selfdroid.appstorage.jobs.ChunkedUploadChunkDBModel import ChunkedUploadChunkDBModel
 
 db.create_all()
 db.session.commit()
 
 
+from selfdroid.appstorage.AppStorageHelpers import AppStorageHelpers
+from selfdroid.appstorage.AppStorageMigrator import AppStorageMigrator
+from selfdroid.appstorage.AppStorageConsistencyEnsurer import AppStorageConsistencyEnsurer
+from selfdroid.appstorage.MaterializedCatalog import MaterializedCatalog
+from selfdroid.appstorage.crud.AppBulkImporter import AppBulkImporter
+
+with AppStorageHelpers.lock_app_storage():
+    # The columns and indexes added to the already existing tables are created (and filled in) while holding the lock,
+    #  so that multiple starting worker processes don't try to create them at the same time.
+    AppStorageMigrator().migrate_while_locked()
+
+    # The apps whose hash-addressed files are missing (or whose APK file's size doesn't match their metadata) are
+    #  deleted, and so are the stored files no longer referenced by any app's hashes, e.g. those left behind by a crash
+    #  (see AppStorageConsistencyEnsurer and BlobStore.collect_garbage_while_locked()).
+    have_inconsistent_apps_been_deleted = AppStorageConsistencyEnsurer().ensure_consistency_while_locked()
+
+    if have_inconsistent_apps_been_deleted or not MaterializedCatalog.does_exist():
+        MaterializedCatalog().regenerate_while_locked()
+
+
 from selfdroid.api import api_blueprint
 from selfdroid.web import web_blueprint
+from selfdroid.appstorage.jobs.AppStorageJobWorker import AppStorageJobWorker
 app.register_blueprint(api_blueprint)
 app.register_blueprint(web_blueprint)
 
@@ -59,6 +122,13 @@ app.register_blueprint(web_blueprint)
 talisman = flask_talisman.Talisman(app, **Constants.TALISMAN_OPTIONS)
 
 
+# The worker thread is started in the process which handles the requests (which, e.g. in uWSGI's case, is forked from
+#  the process which has imported the app), so that the jobs left queued by an exited process are processed as well.
+@app.before_first_request
+def flbfr_global_start_in_process_job_worker():
+    AppStorageJobWorker.start_in_process_worker_if_enabled()
+
+
 # It seems that template filters cannot be registered for a blueprint.
 @app.template_filter("tf_format_datetime")
 def fltf_global_format_datetime(value):
@@ -75,6 +145,50 @@ def fltf_global_human_readable_file_size(value):
     return TemplateFilters.tf_human_readable_file_size(value)
 
 
+@app.cli.command("rebuild-catalog")
+def flcli_rebuild_catalog():
+    """Ensure the app storage's consistency and regenerate the materialized app catalog."""
+
+    with AppStorageHelpers.lock_app_storage():
+        AppStorageConsistencyEnsurer().ensure_consistency_while_locked()
+        catalog_version = MaterializedCatalog().regenerate_while_locked()
+
+    print("The app catalog has been rebuilt (catalog version: {}).".format(catalog_version.version))
+
+
+@app.cli.command("import-apks")
+@click.argument("directory", type=click.Path(exists=True, file_okay=False))
+@click.option("--workers", type=click.IntRange(min=1), default=None, help="The number of processes parsing the APK files (default: the number of CPUs).")
+@click.option("--batch-size", type=click.IntRange(min=1), default=Constants.BULK_IMPORT_DEFAULT_BATCH_SIZE, show_default=True, help="The number of apps committed to the database at once.")
+def flcli_import_apks(directory, workers, batch_size):
+    """Add or update the apps from all the APK files in a directory (and its subdirectories)."""
+
+    result = AppBulkImporter(directory, workers, batch_size).import_apps()
+
+    for label, apk_files in (("Added", result.added_apps), ("Updated", result.updated_apps), ("Skipped", result.skipped_apk_files), ("Failed", result.failed_apk_files)):
+        for apk_path, app_name_or_message in apk_files:
+            print("{}: {} ({})".format(label, apk_path, app_name_or_message))
+
+    total_size_in_megabytes = result.apk_files_total_size / (1024 * 1024)
+    print("{} APK files ({:.1f} MiB) have been processed in {:.2f} s: {} added, {} updated, {} skipped, {} failed.".format(result.apk_file_count, total_size_in_megabytes, result.total_duration, len(result.added_apps), len(result.updated_apps), len(result.skipped_apk_files), len(result.failed_apk_files)))
+
+    if result.apk_file_count > 0:
+        print("Parsing throughput: {:.1f} APKs/s, {:.1f} MiB/s".format(result.apk_file_count / result.parsing_duration, total_size_in_megabytes / result.parsing_duration))
+        print("Overall throughput: {:.1f} APKs/s, {:.1f} MiB/s".format(result.apk_file_count / result.total_duration, total_size_in_megabytes / result.total_duration))
+
+
+@app.cli.command("process-jobs")
+@click.option("--once", is_flag=True, help="Exit once there are no queued jobs, instead of waiting for new ones.")
+def flcli_process_jobs(once):
+    """Process the queued uploaded APK files (this can be done alongside the web app's in-process worker threads)."""
+
+    if once:
+        processed_job_count = AppStorageJobWorker().process_queued_jobs()
+        print("{} jobs have been processed.".format(processed_job_count))
+    else:
+        AppStorageJobWorker().process_queued_jobs_forever()
+
+
 @app.route("/robots.txt", methods=["GET"])
 def fl_global_robots_txt():
     return flask.send_from_directory(app.static_folder, "robots.txt")
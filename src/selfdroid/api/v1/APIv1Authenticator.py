@@ -20,24 +20,42 @@
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
 
+from typing import Dict
 import base64
 import flask
+from selfdroid.Settings import Settings
 from selfdroid.AuthenticatorBase import AuthenticatorBase
+from selfdroid.VerifiedCredentialCache import VerifiedCredentialCache
 from selfdroid.SelfdroidRuntimeError import SelfdroidRuntimeError
 
 
 class APIv1Authenticator(AuthenticatorBase):
     _HEADER_KEY_PASSWORD: str = "X-SelfdroidAPI-Password"
 
+    # Shared by all the instances within a process
+    _VERIFIED_CREDENTIAL_CACHE: VerifiedCredentialCache = VerifiedCredentialCache(Settings.API_CREDENTIAL_CACHE_TTL, Settings.API_CREDENTIAL_CACHE_MAX_ENTRIES)
+
     def check_user_password_from_headers(self) -> bool:
+        password_bcrypt_hash = Settings.get_user_password_hash()
+        if password_bcrypt_hash is None:  # = Passwordless user login is enabled
+            return True
+
         password_base64 = flask.request.headers.get(APIv1Authenticator._HEADER_KEY_PASSWORD, default="", type=str)
 
+        # The raw header value is cached, so that not even the base64 decoding needs to be done on a cache hit
+        if APIv1Authenticator._VERIFIED_CREDENTIAL_CACHE.is_verified(password_base64, password_bcrypt_hash):
+            return True
+
         try:
             password = base64.b64decode(password_base64, validate=True).decode("utf-8")
         except ValueError:
             return False
 
-        return self.check_user_password(password)
+        if not self._safely_check_password_string(password, password_bcrypt_hash):
+            return False
+
+        APIv1Authenticator._VERIFIED_CREDENTIAL_CACHE.mark_as_verified(password_base64, password_bcrypt_hash)
+        return True
 
     def check_admin_password(self, password: str) -> bool:
         """
@@ -45,3 +63,7 @@ class APIv1Authenticator(AuthenticatorBase):
         """
 
         raise SelfdroidRuntimeError("Admin access is forbidden via the API!")
+
+    @staticmethod
+    def get_credential_cache_statistics() -> Dict[str, int]:
+        return APIv1Authenticator._VERIFIED_CREDENTIAL_CACHE.get_statistics()
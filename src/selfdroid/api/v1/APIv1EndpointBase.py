@@ -20,8 +20,9 @@
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
 
-from typing import Union, List, Dict, Any
+from typing import Union, List, Dict, Any, Optional
 import abc
+import datetime
 import flask
 from selfdroid.EndpointBase import EndpointBase
 from selfdroid.api.v1.APIv1Authenticator import APIv1Authenticator
@@ -37,12 +38,23 @@ class APIv1EndpointBase(EndpointBase, metaclass=abc.ABCMeta):
         if not APIv1Authenticator().check_user_password_from_headers():
             flask.abort(401)
 
-    def jsonify_and_finish_request(self, jsonifiable_object: JSONType) -> None:
+    def jsonify_and_finish_request(self, jsonifiable_object: JSONType, etag: Optional[str] = None, last_modified: Optional[datetime.datetime] = None) -> None:
         jsonified_object = flask.jsonify(jsonifiable_object)
+
+        if etag is not None and last_modified is not None:
+            self.add_validators_to_response(jsonified_object, etag, last_modified)
+
         self.finish_request(jsonified_object)
 
-    def send_file_and_finish_request(self, directory: str, filename: str, download_name: str, **send_file_kwargs) -> None:
-        send_file_kwargs["download_name"] = download_name
+    def send_encoded_json_and_finish_request(self, json_bytes: bytes, content_encoding: str, etag: str, last_modified: datetime.datetime) -> None:
+        """
+        Sends already serialized (and possibly compressed) JSON data.
+        """
+
+        response = flask.Response(json_bytes, mimetype="application/json")
+        if content_encoding != "identity":
+            response.content_encoding = content_encoding
+        response.vary.add("Accept-Encoding")
 
-        sent_file = flask.send_from_directory(directory, filename, **send_file_kwargs)
-        self.finish_request(sent_file)
+        self.add_validators_to_response(response, etag, last_modified)
+        self.finish_request(response)
@@ -25,6 +25,9 @@ from selfdroid.EndpointExecutor import EndpointExecutor
 from selfdroid.api.v1.endpoints.APIv1InfoEndpoint import APIv1InfoEndpoint
 from selfdroid.api.v1.endpoints.APIv1AllAppDetailsEndpoint import APIv1AllAppDetailsEndpoint
 from selfdroid.api.v1.endpoints.APIv1AppDetailsEndpoint import APIv1AppDetailsEndpoint
+from selfdroid.api.v1.endpoints.APIv1AppDetailsBatchEndpoint import APIv1AppDetailsBatchEndpoint
+from selfdroid.api.v1.endpoints.APIv1AppDetailsByPackageNameEndpoint import APIv1AppDetailsByPackageNameEndpoint
+from selfdroid.api.v1.endpoints.APIv1CheckForUpdatesEndpoint import APIv1CheckForUpdatesEndpoint
 from selfdroid.api.v1.endpoints.APIv1AppIconEndpoint import APIv1AppIconEndpoint
 from selfdroid.api.v1.endpoints.APIv1DownloadAPKEndpoint import APIv1DownloadAPKEndpoint
 
@@ -49,6 +52,21 @@ def fl_api_v1_app_details(**url_params):
     return EndpointExecutor(APIv1AppDetailsEndpoint, url_params).execute()
 
 
+@api_v1_blueprint.route("/app-details/batch", methods=["POST"])
+def fl_api_v1_app_details_batch(**url_params):
+    return EndpointExecutor(APIv1AppDetailsBatchEndpoint, url_params).execute()
+
+
+@api_v1_blueprint.route("/app-details/by-package-name/<string:package_name>", methods=["GET"])
+def fl_api_v1_app_details_by_package_name(**url_params):
+    return EndpointExecutor(APIv1AppDetailsByPackageNameEndpoint, url_params).execute()
+
+
+@api_v1_blueprint.route("/check-for-updates", methods=["POST"])
+def fl_api_v1_check_for_updates(**url_params):
+    return EndpointExecutor(APIv1CheckForUpdatesEndpoint, url_params).execute()
+
+
 @api_v1_blueprint.route("/app-icon/<int:app_id>", methods=["GET"])
 def fl_api_v1_app_icon(**url_params):
     return EndpointExecutor(APIv1AppIconEndpoint, url_params).execute()
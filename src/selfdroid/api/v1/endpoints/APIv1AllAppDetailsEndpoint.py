@@ -1,12 +1,148 @@
+from typing import Optional, List
+import flask
 from selfdroid.api.v1.APIv1EndpointBase import APIv1EndpointBase
-from selfdroid.appstorage.AppStorageHelpers import AppStorageHelpers
+from selfdroid.appstorage.AppMetadata import AppMetadata
+from selfdroid.appstorage.CatalogVersion import CatalogVersion
+from selfdroid.appstorage.MaterializedCatalog import MaterializedCatalog
 from selfdroid.appstorage.crud.AppGetter import AppGetter
+from selfdroid.appstorage.crud.AppListingQuery import AppListingQuery
+from selfdroid.appstorage.crud.AppListingQueryException import AppListingQueryException
 
 
 class APIv1AllAppDetailsEndpoint(APIv1EndpointBase):
+    _DELTA_SYNC_CURSOR_ARG: str = "since"
+
+    _LISTING_PAGE_SIZE_ARG: str = "limit"
+    _LISTING_PAGE_CURSOR_ARG: str = "page_cursor"
+    _LISTING_SORT_BY_ARG: str = "sort_by"
+    _LISTING_SDK_ARG: str = "sdk"
+    _LISTING_PACKAGE_PREFIX_ARG: str = "package_prefix"
+    _LISTING_FIELDS_ARG: str = "fields"
+    _LISTING_ARGS: List[str] = [_LISTING_PAGE_SIZE_ARG, _LISTING_PAGE_CURSOR_ARG, _LISTING_SORT_BY_ARG, _LISTING_SDK_ARG, _LISTING_PACKAGE_PREFIX_ARG, _LISTING_FIELDS_ARG]
+
+    _LISTING_DEFAULT_PAGE_SIZE: int = 100
+
     def handle_request(self) -> None:
-        with AppStorageHelpers.get_app_storage_lock():
-            all_apps_metadata = AppGetter().get_all_metadata_while_locked()
+        if APIv1AllAppDetailsEndpoint._DELTA_SYNC_CURSOR_ARG in flask.request.args:
+            json_object = self._generate_delta_sync_json_object(flask.request.args[APIv1AllAppDetailsEndpoint._DELTA_SYNC_CURSOR_ARG])
+            self.jsonify_and_finish_request(json_object)
+
+        # Without any of the listing arguments, the whole catalog is returned (for backward compatibility)
+        if any(arg in flask.request.args for arg in APIv1AllAppDetailsEndpoint._LISTING_ARGS):
+            json_object = self._generate_listing_json_object()
+            self.jsonify_and_finish_request(json_object)
+
+        # The catalog version must be read before the materialized catalog - see the MaterializedCatalog class's docstring.
+        catalog_version = CatalogVersion.read()
+
+        supported_encodings = MaterializedCatalog.get_supported_encodings()
+        encoding = flask.request.accept_encodings.best_match(supported_encodings, default=MaterializedCatalog.ENCODING_IDENTITY)
+
+        # Each encoding is a different representation of the resource, so it must have a different (strong) ETag
+        etag = catalog_version.get_etag()
+        if encoding != MaterializedCatalog.ENCODING_IDENTITY:
+            etag += "-" + encoding
+
+        last_modified = catalog_version.get_last_modified_datetime()
+
+        self.finish_request_if_not_modified(etag, last_modified)
+
+        json_object = MaterializedCatalog().get_variant(catalog_version, encoding)
+        self.send_encoded_json_and_finish_request(json_object, encoding, etag, last_modified)
+
+    def _generate_listing_json_object(self) -> APIv1EndpointBase.JSONType:
+        args = flask.request.args
+
+        # Werkzeug's args.get() returns the default value if an argument can't be converted to the requested type
+        for int_arg in (APIv1AllAppDetailsEndpoint._LISTING_PAGE_SIZE_ARG, APIv1AllAppDetailsEndpoint._LISTING_SDK_ARG):
+            if int_arg in args and args.get(int_arg, default=None, type=int) is None:
+                flask.abort(400)
+
+        try:
+            listing_query = AppListingQuery(
+                page_size=args.get(APIv1AllAppDetailsEndpoint._LISTING_PAGE_SIZE_ARG, default=APIv1AllAppDetailsEndpoint._LISTING_DEFAULT_PAGE_SIZE, type=int),
+                sort_by=args.get(APIv1AllAppDetailsEndpoint._LISTING_SORT_BY_ARG, default=AppListingQuery.SORT_BY_NAME, type=str),
+                page_cursor=args.get(APIv1AllAppDetailsEndpoint._LISTING_PAGE_CURSOR_ARG, default=None, type=str),
+                sdk=args.get(APIv1AllAppDetailsEndpoint._LISTING_SDK_ARG, default=None, type=int),
+                package_prefix=args.get(APIv1AllAppDetailsEndpoint._LISTING_PACKAGE_PREFIX_ARG, default=None, type=str)
+            )
+        except AppListingQueryException:
+            flask.abort(400)
+
+        fields = self._parse_listing_fields(args.get(APIv1AllAppDetailsEndpoint._LISTING_FIELDS_ARG, default=None, type=str))
+
+        apps_metadata, next_page_cursor = AppGetter().get_page_of_metadata(listing_query)
+
+        api_dicts = [app_metadata.to_api_dict() for app_metadata in apps_metadata]
+        if fields is not None:
+            api_dicts = [{field: api_dict[field] for field in fields} for api_dict in api_dicts]
+
+        return {
+            "apps": api_dicts,
+            "next_page_cursor": next_page_cursor
+        }
+
+    def _parse_listing_fields(self, fields_arg: Optional[str]) -> Optional[List[str]]:
+        """
+        :return: The fields which should be included in the app details, or None if all of them should be included.
+        """
+
+        if not fields_arg:
+            return None
+
+        fields = [field.strip() for field in fields_arg.split(",") if field.strip()]
+        if any(field not in AppMetadata.API_DICT_FIELDS for field in fields):
+            flask.abort(400)
+
+        return fields
+
+    def _generate_delta_sync_json_object(self, cursor: str) -> APIv1EndpointBase.JSONType:
+        """
+        The cursor consists of the catalog generation (so that cursors issued before the data directory was recreated
+        are recognized) and the sequence number of the latest change log entry the client has already seen.
+        If the cursor is empty or it was issued for another catalog generation, the metadata of all the apps are returned
+        and the client should replace all of its data ("is_full_snapshot" is true in such case).
+        """
+
+        catalog_generation = CatalogVersion.read().generation
+        after_sequence_number = self._parse_delta_sync_cursor(cursor, catalog_generation)
+
+        app_getter = AppGetter()
+        # The upper bound must be determined first, so that no change can fall between the returned cursor and the returned data
+        up_to_sequence_number = app_getter.get_latest_change_sequence_number()
+
+        if after_sequence_number is None or after_sequence_number > up_to_sequence_number:
+            is_full_snapshot = True
+            changed_apps_metadata, deletions = app_getter.get_all_metadata(), []
+        else:
+            is_full_snapshot = False
+            changed_apps_metadata, deletions = app_getter.get_changes(after_sequence_number, up_to_sequence_number)
+
+        return {
+            "cursor": "{}-{}".format(catalog_generation, up_to_sequence_number),
+            "is_full_snapshot": is_full_snapshot,
+            "apps": [app_metadata.to_api_dict() for app_metadata in changed_apps_metadata],
+            "deleted_apps": [{"id": deletion.app_id, "package_name": deletion.package_name} for deletion in deletions]
+        }
+
+    def _parse_delta_sync_cursor(self, cursor: str, catalog_generation: str) -> Optional[int]:
+        """
+        :return: The sequence number contained in the cursor, or None if a full snapshot should be sent to the client.
+        """
+
+        if not cursor:
+            return None
+
+        try:
+            cursor_generation, sequence_number = cursor.split("-", 1)
+            sequence_number = int(sequence_number)
+        except ValueError:
+            flask.abort(400)
+
+        if sequence_number < 0:
+            flask.abort(400)
+
+        if cursor_generation != catalog_generation:
+            return None
 
-        json_object = [app_metadata.to_api_dict() for app_metadata in all_apps_metadata]
-        self.jsonify_and_finish_request(json_object)
+        return sequence_number
@@ -0,0 +1,101 @@
+# SPDX-License-Identifier: BSD-3-Clause
+#
+# Copyright (c) 2021 Vít Labuda. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+# following conditions are met:
+#  1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+#     disclaimer.
+#  2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the
+#     following disclaimer in the documentation and/or other materials provided with the distribution.
+#  3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote
+#     products derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+from typing import Dict, List, Any, Optional, Callable
+import flask
+from selfdroid.Constants import Constants
+from selfdroid.api.v1.APIv1EndpointBase import APIv1EndpointBase
+from selfdroid.appstorage.AppMetadata import AppMetadata
+from selfdroid.appstorage.crud.AppGetter import AppGetter
+
+
+class APIv1AppDetailsBatchEndpoint(APIv1EndpointBase):
+    """
+    Returns the details of multiple apps, which are looked up either by their IDs or by their package names.
+
+    The request body must be a JSON object containing either the "ids" key or the "package_names" key, whose value is a
+    list of the keys to look up. The response contains one result for each of the requested keys (in the same order as
+    in the request), e.g. {"results": [{"id": 1, "found": true, "app": {...}}, {"id": 2, "found": false, "app": null}]}.
+    """
+
+    _IDS_KEY: str = "ids"
+    _PACKAGE_NAMES_KEY: str = "package_names"
+
+    # The keys are looked up using a single SQL query - see AppGetter._MAX_KEYS_PER_IN_QUERY
+    _MAX_KEYS_PER_REQUEST: int = 500
+
+    def handle_request(self) -> None:
+        request_json = flask.request.get_json(silent=True)
+        if not isinstance(request_json, dict) or len(request_json) != 1:
+            flask.abort(400)
+
+        app_getter = AppGetter()
+
+        if APIv1AppDetailsBatchEndpoint._IDS_KEY in request_json:
+            json_object = self._generate_results_json_object(
+                "id",
+                self._get_list_of_keys_from_request_json(request_json, APIv1AppDetailsBatchEndpoint._IDS_KEY, int),
+                app_getter.get_metadata_by_ids
+            )
+
+        elif APIv1AppDetailsBatchEndpoint._PACKAGE_NAMES_KEY in request_json:
+            json_object = self._generate_results_json_object(
+                "package_name",
+                self._get_list_of_keys_from_request_json(request_json, APIv1AppDetailsBatchEndpoint._PACKAGE_NAMES_KEY, str),
+                app_getter.get_metadata_by_package_names
+            )
+
+        else:
+            flask.abort(400)
+
+        self.jsonify_and_finish_request(json_object)
+
+    def _get_list_of_keys_from_request_json(self, request_json: Dict[str, Any], json_key: str, key_type: type) -> List[Any]:
+        keys = request_json[json_key]
+
+        if not isinstance(keys, list) or len(keys) > APIv1AppDetailsBatchEndpoint._MAX_KEYS_PER_REQUEST:
+            flask.abort(400)
+
+        # bool is a subclass of int, but true & false are surely not valid app IDs
+        if any((not isinstance(key, key_type)) or isinstance(key, bool) for key in keys):
+            flask.abort(400)
+
+        # IDs which don't fit into an SQLite integer cannot even be used in a query
+        if key_type is int and any(key < 1 or key > Constants.DB_MAX_INTEGER for key in keys):
+            flask.abort(400)
+
+        return keys
+
+    def _generate_results_json_object(self, result_key_name: str, keys: List[Any], metadata_getter: Callable[[List[Any]], Dict[Any, AppMetadata]]) -> APIv1EndpointBase.JSONType:
+        found_apps_metadata = metadata_getter(keys)
+
+        results = []
+        for key in keys:
+            app_metadata: Optional[AppMetadata] = found_apps_metadata.get(key)
+
+            results.append({
+                result_key_name: key,
+                "found": (app_metadata is not None),
+                "app": (app_metadata.to_api_dict() if app_metadata is not None else None)
+            })
+
+        return {"results": results}
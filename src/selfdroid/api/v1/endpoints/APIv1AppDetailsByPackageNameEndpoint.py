@@ -0,0 +1,52 @@
+# SPDX-License-Identifier: BSD-3-Clause
+#
+# Copyright (c) 2021 Vít Labuda. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+# following conditions are met:
+#  1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+#     disclaimer.
+#  2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the
+#     following disclaimer in the documentation and/or other materials provided with the distribution.
+#  3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote
+#     products derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+from typing import Dict, Any
+import flask
+from selfdroid.api.v1.APIv1EndpointBase import APIv1EndpointBase
+from selfdroid.appstorage.AppMetadata import AppMetadata
+from selfdroid.appstorage.crud.AppGetter import AppGetter
+
+
+class APIv1AppDetailsByPackageNameEndpoint(APIv1EndpointBase):
+    def __init__(self, url_params: Dict[str, Any]):
+        super().__init__(url_params)
+
+        if ("package_name" not in url_params) or not isinstance(url_params["package_name"], str):
+            flask.abort(500)
+
+        self._package_name: str = url_params["package_name"]
+
+    def handle_request(self) -> None:
+        app_getter = AppGetter()
+
+        # See APIv1AppDetailsEndpoint.handle_request()
+        app_id = app_getter.get_id_by_package_name_or_404(self._package_name)
+        last_updated_datetime = app_getter.get_last_updated_datetime_or_404(app_id)
+
+        etag = AppMetadata.generate_api_dict_etag(app_id, last_updated_datetime)
+        self.finish_request_if_not_modified(etag, last_updated_datetime)
+
+        app_metadata = app_getter.get_metadata_or_404(app_id)
+
+        json_object = app_metadata.to_api_dict()
+        self.jsonify_and_finish_request(json_object, etag, last_updated_datetime)
@@ -23,7 +23,7 @@
 from typing import Dict, Any
 from selfdroid.EndpointWithAppIDBase import EndpointWithAppIDBase
 from selfdroid.api.v1.APIv1EndpointBase import APIv1EndpointBase
-from selfdroid.appstorage.AppStorageHelpers import AppStorageHelpers
+from selfdroid.appstorage.AppMetadata import AppMetadata
 from selfdroid.appstorage.crud.AppGetter import AppGetter
 
 
@@ -33,8 +33,16 @@ class APIv1AppDetailsEndpoint(APIv1EndpointBase, EndpointWithAppIDBase):
         EndpointWithAppIDBase.__init__(self, url_params)
 
     def handle_request(self) -> None:
-        with AppStorageHelpers.get_app_storage_lock():
-            app_metadata = AppGetter().get_metadata_or_404_while_locked(self.app_id_from_url_params)
+        app_getter = AppGetter()
+
+        # Only the app's last update date & time is fetched to check whether the client's cached metadata are still
+        #  valid; the full database row is loaded (and serialized) only if they aren't.
+        last_updated_datetime = app_getter.get_last_updated_datetime_or_404(self.app_id_from_url_params)
+
+        etag = AppMetadata.generate_api_dict_etag(self.app_id_from_url_params, last_updated_datetime)
+        self.finish_request_if_not_modified(etag, last_updated_datetime)
+
+        app_metadata = app_getter.get_metadata_or_404(self.app_id_from_url_params)
 
         json_object = app_metadata.to_api_dict()
-        self.jsonify_and_finish_request(json_object)
+        self.jsonify_and_finish_request(json_object, etag, last_updated_datetime)
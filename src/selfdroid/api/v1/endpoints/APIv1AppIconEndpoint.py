@@ -21,22 +21,18 @@
 
 
 from typing import Dict, Any
-from selfdroid.Constants import Constants
 from selfdroid.EndpointWithAppIDBase import EndpointWithAppIDBase
+from selfdroid.EndpointWithAppIconBase import EndpointWithAppIconBase
 from selfdroid.api.v1.APIv1EndpointBase import APIv1EndpointBase
-from selfdroid.appstorage.AppStorageHelpers import AppStorageHelpers
 from selfdroid.appstorage.crud.AppGetter import AppGetter
 
 
-class APIv1AppIconEndpoint(APIv1EndpointBase, EndpointWithAppIDBase):
+class APIv1AppIconEndpoint(APIv1EndpointBase, EndpointWithAppIconBase, EndpointWithAppIDBase):
     def __init__(self, url_params: Dict[str, Any]):
         APIv1EndpointBase.__init__(self, url_params)
         EndpointWithAppIDBase.__init__(self, url_params)
 
     def handle_request(self) -> None:
-        with AppStorageHelpers.get_app_storage_lock():
-            app_metadata = AppGetter().get_metadata_or_404_while_locked(self.app_id_from_url_params)
+        app_metadata = AppGetter().get_metadata_or_404(self.app_id_from_url_params)
 
-        self.send_file_and_finish_request(Constants.ICONS_DIRECTORY,
-                                          app_metadata.get_icon_filename(),
-                                          app_metadata.get_icon_download_name())
+        self.send_app_icon_and_finish_request(app_metadata)
@@ -0,0 +1,111 @@
+# SPDX-License-Identifier: BSD-3-Clause
+#
+# Copyright (c) 2021 Vít Labuda. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+# following conditions are met:
+#  1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+#     disclaimer.
+#  2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the
+#     following disclaimer in the documentation and/or other materials provided with the distribution.
+#  3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote
+#     products derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+from typing import Dict, Any, Optional
+import flask
+from selfdroid.Constants import Constants
+from selfdroid.api.v1.APIv1EndpointBase import APIv1EndpointBase
+from selfdroid.appstorage.crud.AppGetter import AppGetter
+
+
+class APIv1CheckForUpdatesEndpoint(APIv1EndpointBase):
+    """
+    Compares the versions of the apps installed on a device with the versions in the app storage.
+
+    The request body must be a JSON object in the following form:
+     {"installed_apps": [{"package_name": "com.example.app", "version_code": 12}, ...], "sdk": 30}
+    The "sdk" key (the device's API level) is optional; if it's present, the newer versions which cannot be installed
+    on the device (see the apps' minimum and maximum API levels) aren't offered.
+    The response contains only the apps whose version code in the app storage is greater than the installed one:
+     {"updates": [{"id": 1, "package_name": "com.example.app", "installed_version_code": 12, "version_code": 13, "version_name": "1.3", "apk_file_size": 12345, "download_url": "/api/v1/download-apk/1"}, ...]}
+    Apps which aren't present in the app storage are ignored. The installed apps are looked up in chunks of 500 (see
+    AppGetter.get_newer_versions()), so a request with the maximum of 5000 apps results in up to 10 database queries.
+    """
+
+    _INSTALLED_APPS_KEY: str = "installed_apps"
+    _SDK_KEY: str = "sdk"
+    _MAX_INSTALLED_APPS_PER_REQUEST: int = 5000
+
+    def handle_request(self) -> None:
+        installed_version_codes = self._get_installed_version_codes_from_request_json()
+        sdk = self._get_sdk_from_request_json()
+
+        newer_versions = AppGetter().get_newer_versions(installed_version_codes, sdk)
+
+        json_object = {
+            "updates": [{
+                "id": newer_version.id,
+                "package_name": newer_version.package_name,
+                "installed_version_code": installed_version_codes[newer_version.package_name],
+                "version_code": newer_version.version_code,
+                "version_name": newer_version.version_name,
+                "apk_file_size": newer_version.apk_file_size,
+                "download_url": flask.url_for(".fl_api_v1_download_apk", app_id=newer_version.id)
+            } for newer_version in newer_versions]
+        }
+
+        self.jsonify_and_finish_request(json_object)
+
+    def _get_installed_version_codes_from_request_json(self) -> Dict[str, int]:
+        """
+        :return: A dictionary mapping the package names of the installed apps to their version codes.
+        """
+
+        request_json = flask.request.get_json(silent=True)
+        if not isinstance(request_json, dict):
+            flask.abort(400)
+
+        installed_apps = request_json.get(APIv1CheckForUpdatesEndpoint._INSTALLED_APPS_KEY)
+        if not isinstance(installed_apps, list) or len(installed_apps) > APIv1CheckForUpdatesEndpoint._MAX_INSTALLED_APPS_PER_REQUEST:
+            flask.abort(400)
+
+        installed_version_codes = {}
+        for installed_app in installed_apps:
+            if not self._is_installed_app_valid(installed_app):
+                flask.abort(400)
+
+            # The same package cannot be installed multiple times on a single device
+            if installed_app["package_name"] in installed_version_codes:
+                flask.abort(400)
+
+            installed_version_codes[installed_app["package_name"]] = installed_app["version_code"]
+
+        return installed_version_codes
+
+    def _get_sdk_from_request_json(self) -> Optional[int]:
+        # The request JSON has already been validated by _get_installed_version_codes_from_request_json()
+        sdk = flask.request.get_json(silent=True).get(APIv1CheckForUpdatesEndpoint._SDK_KEY)
+        if sdk is None:
+            return None
+
+        if not isinstance(sdk, int) or isinstance(sdk, bool) or sdk < 1 or sdk > Constants.DB_MAX_INTEGER:
+            flask.abort(400)
+
+        return sdk
+
+    def _is_installed_app_valid(self, installed_app: Any) -> bool:
+        return (
+            isinstance(installed_app, dict) and
+            isinstance(installed_app.get("package_name"), str) and
+            isinstance(installed_app.get("version_code"), int) and
+            not isinstance(installed_app.get("version_code"), bool)
+        )
@@ -21,11 +21,8 @@
 
 
 from typing import Dict, Any
-from selfdroid.Constants import Constants
 from selfdroid.EndpointWithAppIDBase import EndpointWithAppIDBase
 from selfdroid.api.v1.APIv1EndpointBase import APIv1EndpointBase
-from selfdroid.appstorage.AppStorageHelpers import AppStorageHelpers
-from selfdroid.appstorage.crud.AppGetter import AppGetter
 
 
 class APIv1DownloadAPKEndpoint(APIv1EndpointBase, EndpointWithAppIDBase):
@@ -34,10 +31,4 @@ class APIv1DownloadAPKEndpoint(APIv1EndpointBase, EndpointWithAppIDBase):
         EndpointWithAppIDBase.__init__(self, url_params)
 
     def handle_request(self) -> None:
-        with AppStorageHelpers.get_app_storage_lock():
-            app_metadata = AppGetter().get_metadata_or_404_while_locked(self.app_id_from_url_params)
-
-        self.send_file_and_finish_request(Constants.APKS_DIRECTORY,
-                                          app_metadata.get_apk_filename(),
-                                          app_metadata.get_apk_download_name(),
-                                          as_attachment=True)
+        self.send_apk_with_retries_and_finish_request(self.app_id_from_url_params)
@@ -0,0 +1,53 @@
+# SPDX-License-Identifier: BSD-3-Clause
+#
+# Copyright (c) 2021 Vít Labuda. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+# following conditions are met:
+#  1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+#     disclaimer.
+#  2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the
+#     following disclaimer in the documentation and/or other materials provided with the distribution.
+#  3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote
+#     products derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+from __future__ import annotations
+import datetime
+from selfdroid.Constants import Constants
+from selfdroid.appstorage.AppMetadataDBModel import AppMetadataDBModel
+from selfdroid import db
+
+
+class AppChangeLogDBModel(db.Model):
+    """
+    Every addition, update and deletion of an app is recorded in this table (in the same transaction as the change of
+    the app's metadata), so that the API clients can fetch only the apps that changed since their last synchronization.
+    """
+
+    __tablename__ = "app_change_log"
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    # The sequence numbers are used as delta synchronization cursors, so they MUST NOT be reusable!
+    sequence_number = db.Column(db.Integer(), primary_key=True, nullable=False)
+
+    app_id = db.Column(db.Integer(), index=True, nullable=False)
+    package_name = db.Column(db.String(Constants.DB_PACKAGE_NAME_MAX_LENGTH), nullable=False)
+    is_deletion = db.Column(db.Boolean(), nullable=False)
+
+    changed_datetime = db.Column(db.DateTime(), default=datetime.datetime.utcnow, nullable=False)
+
+    @classmethod
+    def create_for_app(cls, db_model: AppMetadataDBModel, is_deletion: bool) -> AppChangeLogDBModel:
+        # The app's ID must already be assigned (= the app's model must have been flushed or committed)
+        assert isinstance(db_model.id, int)
+
+        return cls(app_id=db_model.id, package_name=db_model.package_name, is_deletion=is_deletion)
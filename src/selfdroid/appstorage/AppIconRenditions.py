@@ -0,0 +1,133 @@
+# SPDX-License-Identifier: BSD-3-Clause
+#
+# Copyright (c) 2021 Vít Labuda. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+# following conditions are met:
+#  1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+#     disclaimer.
+#  2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the
+#     following disclaimer in the documentation and/or other materials provided with the distribution.
+#  3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote
+#     products derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+from typing import List, Dict, Tuple, Optional
+import io
+import PIL.Image
+from selfdroid.Constants import Constants
+
+
+class AppIconRenditions:
+    """
+    Apart from the uniform PNG icon (Constants.ICON_WIDTH_AND_HEIGHT pixels wide), a copy of each app's icon is stored
+    in each of the Constants.ICON_RENDITION_SIZES and in each of the image formats supported by the installed Pillow
+    (PNG, and WebP and/or AVIF if Pillow has been built with them), so that the clients displaying many small icons
+    (e.g. the web app's index) don't have to download the full-size PNG icons. The renditions are stored alongside the
+    icon in the blob store and named by the icon's hash (see AppStorageHelpers.get_icon_rendition_filename_by_sha256()).
+
+    The renditions larger than the original icon extracted from the APK file are not generated, as they would contain
+    no more detail than the original, and the uniform PNG icon serves as the PNG rendition of its own size. An icon's
+    renditions are optional - the icons stored by the older versions have them generated by AppStorageMigrator, and
+    if a rendition is missing, the icon endpoints send the next best one (or the uniform PNG icon).
+    """
+
+    FORMAT_PNG: str = "png"
+    FORMAT_WEBP: str = "webp"
+    FORMAT_AVIF: str = "avif"
+
+    # The formats are listed in the order of preference - see get_rendition_candidates(). At the icons' sizes, the WebP
+    #  renditions are about as small as the AVIF ones (whose container has a larger overhead) and faster to decode.
+    MIMETYPES: Dict[str, str] = {
+        FORMAT_WEBP: "image/webp",
+        FORMAT_AVIF: "image/avif",
+        FORMAT_PNG: "image/png"
+    }
+
+    _PIL_FORMAT_NAMES: Dict[str, str] = {
+        FORMAT_WEBP: "WEBP",
+        FORMAT_AVIF: "AVIF",
+        FORMAT_PNG: "PNG"
+    }
+
+    _PIL_SAVE_OPTIONS: Dict[str, Dict[str, int]] = {
+        FORMAT_WEBP: {"quality": 90},
+        FORMAT_AVIF: {"quality": 75},
+        FORMAT_PNG: {"optimize": True}
+    }
+
+    _supported_formats: Optional[List[str]] = None
+
+    @classmethod
+    def get_supported_formats(cls) -> List[str]:
+        """
+        :return: The formats in which the renditions are generated - the ones the installed Pillow is able to save.
+        """
+
+        if cls._supported_formats is None:
+            PIL.Image.init()  # Registers all the image plugins available in the installed Pillow
+
+            cls._supported_formats = [image_format for image_format, pil_format_name in cls._PIL_FORMAT_NAMES.items() if pil_format_name in PIL.Image.SAVE]
+
+        return cls._supported_formats
+
+    @classmethod
+    def get_generated_renditions(cls, original_icon_size: int) -> List[Tuple[int, str]]:
+        """
+        :param original_icon_size: The larger of the original icon's dimensions (in pixels).
+        :return: The (size, format) pairs of the renditions generated for such an icon by generate_renditions().
+        """
+
+        max_size = max(original_icon_size, Constants.ICON_WIDTH_AND_HEIGHT)
+
+        return [(size, image_format) for size in Constants.ICON_RENDITION_SIZES if size <= max_size
+                for image_format in cls.get_supported_formats() if (size, image_format) != (Constants.ICON_WIDTH_AND_HEIGHT, cls.FORMAT_PNG)]
+
+    @classmethod
+    def generate_renditions(cls, original_icon: PIL.Image.Image) -> Dict[Tuple[int, str], bytes]:
+        """
+        :param original_icon: The icon extracted from the APK file, converted to RGBA.
+        :return: (size, format) -> the rendition's contents. The uniform PNG icon's size & format is never included.
+        """
+
+        renditions = {}
+        resized_icons = {}
+        for size, image_format in cls.get_generated_renditions(max(original_icon.width, original_icon.height)):
+            if size not in resized_icons:
+                resized_icons[size] = original_icon.resize((size, size), PIL.Image.LANCZOS)
+
+            with io.BytesIO() as rendition_bytes_io:
+                resized_icons[size].save(rendition_bytes_io, format=cls._PIL_FORMAT_NAMES[image_format], **cls._PIL_SAVE_OPTIONS[image_format])
+
+                renditions[(size, image_format)] = rendition_bytes_io.getvalue()
+
+        return renditions
+
+    @classmethod
+    def get_rendition_candidates(cls, requested_size: int, accepted_formats: List[str]) -> List[Tuple[int, str]]:
+        """
+        :param accepted_formats: The formats the client has explicitly asked for (PNG is always accepted).
+        :return: The (size, format) pairs of the renditions which should be sent, ordered from the best one: the accepted
+                 formats are preferred over PNG, then the smallest rendition not smaller than the requested size is
+                 preferred, then the largest one smaller than it. The uniform PNG icon is always among them.
+        """
+
+        larger_sizes = sorted(size for size in Constants.ICON_RENDITION_SIZES if size >= requested_size)
+        smaller_sizes = sorted((size for size in Constants.ICON_RENDITION_SIZES if size < requested_size), reverse=True)
+
+        image_formats = [image_format for image_format in cls.MIMETYPES if image_format in accepted_formats and image_format != cls.FORMAT_PNG]
+        image_formats.append(cls.FORMAT_PNG)
+
+        candidates = [(size, image_format) for image_format in image_formats for size in (larger_sizes + smaller_sizes)]
+        if (Constants.ICON_WIDTH_AND_HEIGHT, cls.FORMAT_PNG) not in candidates:
+            candidates.append((Constants.ICON_WIDTH_AND_HEIGHT, cls.FORMAT_PNG))
+
+        return candidates
@@ -21,11 +21,12 @@
 
 
 from __future__ import annotations
-from typing import Optional, Dict, Union
+from typing import Optional, Dict, Union, List
 import datetime
 import dateutil.tz
 from selfdroid.Settings import Settings
 from selfdroid.appstorage.AppStorageHelpers import AppStorageHelpers
+from selfdroid.appstorage.AppIconRenditions import AppIconRenditions
 from selfdroid.appstorage.AppMetadataDBModel import AppMetadataDBModel
 
 
@@ -36,6 +37,9 @@ class AppMetadata:
     AppMetadataDBModel should be used only when working with the database; in every other case, this class should be used instead.
     """
 
+    # The keys of the dictionary returned by to_api_dict()
+    API_DICT_FIELDS: List[str] = ["id", "app_name", "package_name", "version_code", "version_name", "min_api_level", "max_api_level", "apk_file_size", "added_timestamp", "last_updated_timestamp"]
+
     def __init__(self, db_model: AppMetadataDBModel):
         self.id: int = db_model.id
 
@@ -48,9 +52,11 @@ class AppMetadata:
         self.max_api_level: Optional[int] = db_model.max_api_level
 
         self.apk_file_size: int = db_model.apk_file_size
+        self.apk_sha256: str = db_model.apk_sha256
+        self.icon_sha256: str = db_model.icon_sha256
 
-        self.added_datetime: datetime.datetime = self._add_utc_timezone_to_naive_datetime_object(db_model.added_datetime)
-        self.last_updated_datetime: datetime.datetime = self._add_utc_timezone_to_naive_datetime_object(db_model.last_updated_datetime)
+        self.added_datetime: datetime.datetime = self.add_utc_timezone_to_naive_datetime_object(db_model.added_datetime)
+        self.last_updated_datetime: datetime.datetime = self.add_utc_timezone_to_naive_datetime_object(db_model.last_updated_datetime)
 
         self.added_datetime_timezoned: datetime.datetime = self._add_display_timezone_to_utc_datetime_object(self.added_datetime)
         self.last_updated_datetime_timezoned: datetime.datetime = self._add_display_timezone_to_utc_datetime_object(self.last_updated_datetime)
@@ -60,7 +66,8 @@ class AppMetadata:
         # Wrapper method future expansion
         return cls(db_model)
 
-    def _add_utc_timezone_to_naive_datetime_object(self, datetime_object: datetime.datetime) -> datetime.datetime:
+    @staticmethod
+    def add_utc_timezone_to_naive_datetime_object(datetime_object: datetime.datetime) -> datetime.datetime:
         return datetime_object.replace(tzinfo=dateutil.tz.tzutc())
 
     def _add_display_timezone_to_utc_datetime_object(self, datetime_object: datetime.datetime) -> datetime.datetime:
@@ -86,20 +93,32 @@ class AppMetadata:
             "last_updated_timestamp": int(self.last_updated_datetime.timestamp())
         }
 
+    @staticmethod
+    def generate_api_dict_etag(app_id: int, last_updated_datetime: datetime.datetime) -> str:
+        # The API dictionary's contents change only when the app is updated
+        return "app-{}-{}".format(app_id, int(last_updated_datetime.timestamp() * 1000000))
+
+    def get_apk_etag(self) -> str:
+        # The stored APK files are content-addressed (see BlobStore), so the same ETag always denotes the same contents
+        return "apk-{}".format(self.apk_sha256)
+
     def get_apk_path(self) -> str:
-        return AppStorageHelpers.get_apk_path_by_app_id(self.id)
+        return AppStorageHelpers.get_apk_path_by_sha256(self.apk_sha256)
 
     def get_apk_filename(self) -> str:
-        return AppStorageHelpers.get_apk_filename_by_app_id(self.id)
+        return AppStorageHelpers.get_apk_filename_by_sha256(self.apk_sha256)
 
     def get_icon_path(self) -> str:
-        return AppStorageHelpers.get_icon_path_by_app_id(self.id)
+        return AppStorageHelpers.get_icon_path_by_sha256(self.icon_sha256)
 
     def get_icon_filename(self) -> str:
-        return AppStorageHelpers.get_icon_filename_by_app_id(self.id)
+        return AppStorageHelpers.get_icon_filename_by_sha256(self.icon_sha256)
+
+    def get_icon_rendition_filename(self, size: int, image_format: str) -> str:
+        return AppStorageHelpers.get_icon_rendition_filename_by_sha256(self.icon_sha256, size, image_format)
 
     def get_apk_download_name(self) -> str:
         return "{}.apk".format(self.app_name)
 
-    def get_icon_download_name(self) -> str:
-        return "{}.png".format(self.app_name)
+    def get_icon_download_name(self, image_format: str = AppIconRenditions.FORMAT_PNG) -> str:
+        return "{}.{}".format(self.app_name, image_format)
@@ -27,7 +27,20 @@ from selfdroid import db
 
 class AppMetadataDBModel(db.Model):
     __tablename__ = "app_metadata"
-    __table_args__ = {"sqlite_autoincrement": True}
+    __table_args__ = (
+        # The indexes used by the paginated app listings (see AppGetter.get_page_of_metadata()); the package
+        #  name prefix filter uses the package name's unique index.
+        db.Index("ix_app_metadata_app_name_id", "app_name", "id"),
+        db.Index("ix_app_metadata_last_updated_datetime_id", "last_updated_datetime", "id"),
+        db.Index("ix_app_metadata_added_datetime_id", "added_datetime", "id"),
+
+        # Used to find apps whose APK file is identical to an uploaded one, and (along with the icon hash's index) to
+        #  count the references to the stored files - see BlobStore
+        db.Index("ix_app_metadata_apk_sha256", "apk_sha256"),
+        db.Index("ix_app_metadata_icon_sha256", "icon_sha256"),
+
+        {"sqlite_autoincrement": True}
+    )
 
     # The IDs ARE NOT reusable!
     id = db.Column(db.Integer(), primary_key=True, nullable=False)
@@ -40,6 +53,10 @@ class AppMetadataDBModel(db.Model):
     min_api_level = db.Column(db.Integer(), nullable=False)
     max_api_level = db.Column(db.Integer(), nullable=True)  # Most apps don't specify their max API level
     apk_file_size = db.Column(db.Integer(), nullable=False)
+    # The hashes identify the app's files in the content-addressed storage (see BlobStore). They're filled in by
+    #  AppStorageMigrator for the apps added before they were introduced.
+    apk_sha256 = db.Column(db.String(Constants.DB_SHA256_LENGTH), nullable=True)
+    icon_sha256 = db.Column(db.String(Constants.DB_SHA256_LENGTH), nullable=True)
 
     added_datetime = db.Column(db.DateTime(), default=datetime.datetime.utcnow, nullable=False)
     last_updated_datetime = db.Column(db.DateTime(), default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow, nullable=False)
@@ -22,11 +22,11 @@
 
 from typing import Set
 import os
-import re
 import sqlalchemy.exc
-from selfdroid.Constants import Constants
-from selfdroid.appstorage.AppStorageHelpers import AppStorageHelpers
+from selfdroid.appstorage.AppMetadata import AppMetadata
 from selfdroid.appstorage.AppMetadataDBModel import AppMetadataDBModel
+from selfdroid.appstorage.AppChangeLogDBModel import AppChangeLogDBModel
+from selfdroid.appstorage.BlobStore import BlobStore
 from selfdroid import db
 
 
@@ -39,58 +39,67 @@ class AppStorageConsistencyEnsurer:
     When an error occurs while updating an app, it should be deleted!
     """
 
-    class _NoSuchDBEntryException(Exception):
-        # For this class's internal use
-        pass
+    def ensure_consistency_while_locked(self) -> bool:
+        """
+        Must be called while holding the global lock in the exclusive mode (see AppStorageHelpers.lock_app_storage()).
+        Apart from the inconsistent apps, the stored files which aren't referenced by any app are deleted as well.
 
-    def ensure_consistency_while_locked(self) -> None:
-        db_app_ids = self._get_all_app_ids_from_database()
-        apks_directory_app_ids = self._get_all_app_ids_from_a_directory(Constants.APKS_DIRECTORY, "apk")
-        icons_directory_app_ids = self._get_all_app_ids_from_a_directory(Constants.ICONS_DIRECTORY, "png")
+        :return: True if any inconsistent apps have been deleted, False otherwise.
+        """
 
-        # This variable contains app IDs that aren't present in all of these 3 sets (= apps that aren't present in all of the app storage places).
-        # Such apps are considered inconsistent and thus deleted.
-        inconsistent_app_ids = (db_app_ids | apks_directory_app_ids | icons_directory_app_ids) - (db_app_ids & apks_directory_app_ids & icons_directory_app_ids)
+        db_app_ids = set(db_entry.id for db_entry in db.session.query(AppMetadataDBModel.id).all())
 
-        for app_id in inconsistent_app_ids:
-            self._delete_app_from_all_places(app_id)
+        have_inconsistent_apps_been_deleted = self._delete_inconsistent_apps(db_app_ids)
+        BlobStore().collect_garbage_while_locked()
 
-    def _delete_app_from_all_places(self, app_id: int) -> None:
-        try:
-            db_entry = AppMetadataDBModel.query.get(app_id)
-            if not db_entry:
-                raise AppStorageConsistencyEnsurer._NoSuchDBEntryException()
+        return have_inconsistent_apps_been_deleted
 
-            db.session.delete(db_entry)
-            db.session.commit()
+    def ensure_consistency_of_app_while_locked(self, app_id: int) -> bool:
+        """
+        Like ensure_consistency_while_locked(), but only the specified app is checked, as other apps might be in the
+        middle of being modified. Must be called while holding the app's stripe lock (unless it has just been added by
+        the caller) and the catalog lock (see AppStorageHelpers.lock_apps() and AppStorageHelpers.lock_catalog()).
 
-        except (sqlalchemy.exc.SQLAlchemyError, AppStorageConsistencyEnsurer._NoSuchDBEntryException):
-            db.session.rollback()
+        :return: True if the app was inconsistent and has been deleted, False otherwise.
+        """
 
-        apk_path = AppStorageHelpers.get_apk_path_by_app_id(app_id)
-        try:
-            os.remove(apk_path)
-        except OSError:
-            pass
+        return self._delete_inconsistent_apps({app_id})
+
+    def _delete_inconsistent_apps(self, app_ids: Set[int]) -> bool:
+        # An app is considered inconsistent if any of its files is missing (or its APK file's size doesn't match its
+        #  metadata). The files themselves are looked up by the hashes in the metadata, so they cannot be inconsistent
+        #  on their own - the files not referenced by any app are deleted by BlobStore instead.
+        inconsistent_db_entries = [db_entry for db_entry in AppMetadataDBModel.query.filter(AppMetadataDBModel.id.in_(app_ids)).all() if not self._are_app_files_stored(db_entry)]
+
+        for db_entry in inconsistent_db_entries:
+            self._delete_app_from_all_places(db_entry)
+
+        return len(inconsistent_db_entries) > 0
+
+    def _are_app_files_stored(self, db_entry: AppMetadataDBModel) -> bool:
+        if (db_entry.apk_sha256 is None) or (db_entry.icon_sha256 is None):
+            return False
+
+        app_metadata = AppMetadata.from_db_model(db_entry)
 
-        icon_path = AppStorageHelpers.get_icon_path_by_app_id(app_id)
         try:
-            os.remove(icon_path)
+            if os.stat(app_metadata.get_apk_path()).st_size != app_metadata.apk_file_size:
+                return False
         except OSError:
-            pass
+            return False
 
-    def _get_all_app_ids_from_database(self) -> Set[int]:
-        db_entries = AppMetadataDBModel.query.all()
-        app_ids_iter = map(lambda db_entry: db_entry.id, db_entries)
+        return os.path.isfile(app_metadata.get_icon_path())
 
-        return set(app_ids_iter)
+    def _delete_app_from_all_places(self, db_entry: AppMetadataDBModel) -> None:
+        apk_sha256, icon_sha256 = db_entry.apk_sha256, db_entry.icon_sha256
 
-    def _get_all_app_ids_from_a_directory(self, directory_path: str, filename_extension: str) -> Set[int]:
-        regex = r'^\d+\.{}$'.format(filename_extension)
-        slice_stop = -(len(filename_extension) + 1)  # Cuts the filename extension and the dot before it -> only the app ID (integer) gets extracted from the filename
+        try:
+            db.session.add(AppChangeLogDBModel.create_for_app(db_entry, is_deletion=True))  # Before the deletion - see AppDeleter
+            db.session.delete(db_entry)
+            db.session.commit()
 
-        directory_listing = os.listdir(directory_path)
-        matching_filenames_iter = filter(lambda directory_item: re.match(regex, directory_item), directory_listing)
-        app_ids_iter = map(lambda matching_filename: int(matching_filename[:slice_stop]), matching_filenames_iter)
+        except sqlalchemy.exc.SQLAlchemyError:
+            db.session.rollback()
 
-        return set(app_ids_iter)
+        # If the deletion failed, the files are still referenced and therefore aren't deleted
+        BlobStore().release_blobs_while_locked([apk_sha256], [icon_sha256])
@@ -20,42 +20,289 @@
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
 
+from typing import Optional, Iterable, List, BinaryIO
 import string
+import time
 import os.path
+import hashlib
+import contextlib
+import contextvars
+import werkzeug.datastructures
 from flockbasedlock.flockbasedlock import FlockBasedLock
+from selfdroid.Settings import Settings
 from selfdroid.Constants import Constants
 from selfdroid.Helpers import Helpers
+from selfdroid.StreamedUploadFile import StreamedUploadFile
+from selfdroid.appstorage.AppIconRenditions import AppIconRenditions
+from selfdroid.appstorage.AppStorageLockMonitor import AppStorageLockMonitor
+from selfdroid.appstorage.AppStorageLockTimeoutException import AppStorageLockTimeoutException
 
 
 class AppStorageHelpers:
     _TEMPORARY_FILENAME_CHARACTER_SET: str = string.digits + string.ascii_lowercase
     _TEMPORARY_FILENAME_LENGTH: int = 32
 
+    # The stored files are spread over 256 subdirectories named by the first 2 characters of their hash
+    _BLOB_SHARD_NAME_LENGTH: int = 2
+
+    # The app storage locks - see the ATOMICITY section of the NOTES file. To prevent deadlocks, they must always be
+    #  acquired in this order (and a lock must never be acquired while holding a lock which comes after it):
+    #   1. The app stripe locks, in the ascending order of their indices
+    #   2. The global lock
+    #   3. The catalog regeneration lock
+    #   4. The catalog lock
+    LOCK_NAME_APP_STRIPE: str = "app_stripe"
+    LOCK_NAME_GLOBAL: str = "global"
+    LOCK_NAME_CATALOG_REGENERATION: str = "catalog_regeneration"
+    LOCK_NAME_CATALOG: str = "catalog"
+
+    # The deadline of the innermost lock_apps() block being executed, which applies to the catalog lock as well
+    _lock_apps_deadline: contextvars.ContextVar = contextvars.ContextVar("lock_apps_deadline", default=None)
+
+    @staticmethod
+    def get_app_stripe_index(app_id: int) -> int:
+        return app_id % Settings.APP_STORAGE_LOCK_STRIPE_COUNT
+
     @staticmethod
-    def get_app_storage_lock() -> FlockBasedLock:
-        return FlockBasedLock(Constants.APP_STORAGE_LOCK_FILE, single_use=True)
+    def get_app_stripe_lock_path(stripe_index: int) -> str:
+        return os.path.join(Constants.APP_STORAGE_LOCKS_DIRECTORY, "app_stripe_{}.lock".format(stripe_index))
 
     @classmethod
-    def get_apk_path_by_app_id(cls, app_id: int) -> str:
-        return os.path.join(Constants.APKS_DIRECTORY, cls.get_apk_filename_by_app_id(app_id))
+    def get_all_lock_paths(cls) -> List[str]:
+        app_stripe_lock_paths = [cls.get_app_stripe_lock_path(stripe_index) for stripe_index in range(Settings.APP_STORAGE_LOCK_STRIPE_COUNT)]
 
-    @staticmethod
-    def get_apk_filename_by_app_id(app_id: int) -> str:
-        return "{}.apk".format(app_id)
+        return app_stripe_lock_paths + [Constants.APP_STORAGE_LOCK_FILE, Constants.APP_STORAGE_CATALOG_REGENERATION_LOCK_FILE, Constants.APP_STORAGE_CATALOG_LOCK_FILE]
+
+    @classmethod
+    @contextlib.contextmanager
+    def lock_app_storage(cls, timeout: Optional[float] = None):
+        """
+        Holds the global lock in the exclusive mode for the duration of the "with" block, which excludes all the other
+        modifications of the app storage. Meant for work concerning the whole app storage, e.g. ensuring its consistency.
+
+        :param timeout: See FlockBasedLock.acquire_exclusive().
+        :raises FlockBasedLock.LockTimeoutException: If the lock couldn't be acquired in time.
+        """
+
+        with cls._hold_lock(Constants.APP_STORAGE_LOCK_FILE, cls.LOCK_NAME_GLOBAL, True, cls._get_deadline(timeout)):
+            yield
+
+    @classmethod
+    @contextlib.contextmanager
+    def lock_apps(cls, app_ids: Iterable[int], timeout: Optional[float] = None):
+        """
+        Holds the stripe locks of the specified apps in the exclusive mode and the global lock in the shared mode for
+        the duration of the "with" block, so that the specified apps can be modified while other apps are being
+        modified concurrently. An app that is being added doesn't have an ID yet, so no app IDs are passed in such case.
+
+        While holding these locks, the database may only be modified (and the blobs released) while holding the catalog
+        lock as well - see lock_catalog(), which waits for it until the same deadline as this method.
+
+        :param timeout: The maximum number of seconds to wait for all the locks (None = wait indefinitely).
+        :raises FlockBasedLock.LockTimeoutException: If the locks couldn't be acquired in time.
+        """
+
+        deadline = cls._get_deadline(timeout)
+        stripe_indices = sorted(set(cls.get_app_stripe_index(app_id) for app_id in app_ids))
+
+        with contextlib.ExitStack() as exit_stack:
+            for stripe_index in stripe_indices:
+                exit_stack.enter_context(cls._hold_lock(cls.get_app_stripe_lock_path(stripe_index), cls.LOCK_NAME_APP_STRIPE, True, deadline))
+
+            exit_stack.enter_context(cls._hold_lock(Constants.APP_STORAGE_LOCK_FILE, cls.LOCK_NAME_GLOBAL, False, deadline))
+
+            deadline_token = cls._lock_apps_deadline.set(deadline)
+            try:
+                yield
+            finally:
+                cls._lock_apps_deadline.reset(deadline_token)
 
     @classmethod
-    def get_icon_path_by_app_id(cls, app_id: int) -> str:
-        return os.path.join(Constants.ICONS_DIRECTORY, cls.get_icon_filename_by_app_id(app_id))
+    @contextlib.contextmanager
+    def lock_apps_for_request(cls, app_ids: Iterable[int]):
+        """
+        Like lock_apps(), but gives up waiting for the locks (including the catalog lock acquired within the "with" block)
+        after Settings.APP_STORAGE_LOCK_TIMEOUT seconds, so that a worker processing a request isn't blocked
+        indefinitely by a stuck modification.
+
+        :raises AppStorageLockTimeoutException: If the locks couldn't be acquired in time.
+        """
+
+        with contextlib.ExitStack() as exit_stack:
+            try:
+                exit_stack.enter_context(cls.lock_apps(app_ids, timeout=Settings.APP_STORAGE_LOCK_TIMEOUT))
+            except FlockBasedLock.LockTimeoutException:
+                raise AppStorageLockTimeoutException()
+
+            yield
+
+    @classmethod
+    @contextlib.contextmanager
+    def try_lock_catalog_regeneration(cls):
+        """
+        Holds the catalog regeneration lock for the duration of the "with" block if it isn't held by anyone else, and
+        yields whether it has been acquired. It serializes the regenerations of the materialized catalog which follow
+        the modifications of apps (see MaterializedCatalog.regenerate_if_outdated_while_locked()). It may only be
+        acquired while holding the global lock in the shared mode (see lock_apps()).
+        """
+
+        with contextlib.ExitStack() as exit_stack:
+            try:
+                exit_stack.enter_context(cls._hold_lock(Constants.APP_STORAGE_CATALOG_REGENERATION_LOCK_FILE, cls.LOCK_NAME_CATALOG_REGENERATION, True, time.monotonic(), record_timeout=False))
+            except FlockBasedLock.LockTimeoutException:
+                yield False
+                return
+
+            yield True
+
+    @classmethod
+    @contextlib.contextmanager
+    def lock_catalog(cls):
+        """
+        Holds the catalog lock for the duration of the "with" block. It serializes the writes to the database (which
+        includes the allocation of a new app's ID) and the releases of the blobs (see BlobStore), which are shared by all
+        the apps. It may only be acquired while holding the global lock (in either mode - see lock_apps() and
+        lock_app_storage()), and it must be held only briefly - the apps' files are stored and the materialized catalog
+        is regenerated without holding it, so that the apps can be modified concurrently. Inside a lock_apps() block
+        with a timeout, it's waited for only until the block's deadline.
+
+        :raises AppStorageLockTimeoutException: If the lock couldn't be acquired in time.
+        """
+
+        with contextlib.ExitStack() as exit_stack:
+            try:
+                exit_stack.enter_context(cls._hold_lock(Constants.APP_STORAGE_CATALOG_LOCK_FILE, cls.LOCK_NAME_CATALOG, True, cls._lock_apps_deadline.get()))
+            except FlockBasedLock.LockTimeoutException:
+                raise AppStorageLockTimeoutException()
+
+            yield
+
+    @staticmethod
+    def _get_deadline(timeout: Optional[float]) -> Optional[float]:
+        return (None if timeout is None else time.monotonic() + timeout)
 
     @staticmethod
-    def get_icon_filename_by_app_id(app_id: int) -> str:
-        return "{}.png".format(app_id)
+    @contextlib.contextmanager
+    def _hold_lock(lock_path: str, lock_name: str, exclusive: bool, deadline: Optional[float], record_timeout: bool = True):
+        # The lock files are kept open for the lifetime of the (forked) worker process instead of being reopened every time
+        lock = FlockBasedLock.get_process_wide_instance(lock_path, poll_flock=Settings.COOPERATIVE_APP_STORAGE_LOCKING)
+        lock.set_hold_listener(AppStorageLockMonitor.get_hold_listener(lock_name))
+
+        wait_started_at = time.monotonic()
+        try:
+            if exclusive:
+                lock.acquire_exclusive(timeout=(None if deadline is None else max(0.0, deadline - wait_started_at)))
+            else:
+                lock.acquire_shared(timeout=(None if deadline is None else max(0.0, deadline - wait_started_at)))
+
+        except FlockBasedLock.LockTimeoutException:
+            if record_timeout:
+                AppStorageLockMonitor.record_timeout(lock_name, time.monotonic() - wait_started_at)
+
+            raise
+
+        # The lock is re-entrant - the holder file is maintained only by the outermost holding
+        is_outermost_exclusive_holding = (exclusive and lock.get_hold_count() == 1)
+
+        try:
+            if is_outermost_exclusive_holding:
+                AppStorageLockMonitor.write_holder_file_while_locked(lock_path)
+
+            yield
+
+        finally:
+            try:
+                if is_outermost_exclusive_holding:
+                    AppStorageLockMonitor.remove_holder_file_while_locked(lock_path)
+            finally:
+                lock.release()
+
+    @classmethod
+    def get_apk_path_by_sha256(cls, apk_sha256: str) -> str:
+        return os.path.join(Constants.APKS_DIRECTORY, cls.get_apk_filename_by_sha256(apk_sha256))
+
+    @classmethod
+    def get_apk_filename_by_sha256(cls, apk_sha256: str) -> str:
+        # Relative to the APKs directory - see BlobStore
+        return "{}/{}.apk".format(cls._get_blob_shard_name(apk_sha256), apk_sha256)
+
+    @classmethod
+    def get_icon_path_by_sha256(cls, icon_sha256: str) -> str:
+        return os.path.join(Constants.ICONS_DIRECTORY, cls.get_icon_filename_by_sha256(icon_sha256))
+
+    @classmethod
+    def get_icon_filename_by_sha256(cls, icon_sha256: str) -> str:
+        # Relative to the icons directory - see BlobStore
+        return "{}/{}.png".format(cls._get_blob_shard_name(icon_sha256), icon_sha256)
+
+    @classmethod
+    def get_icon_rendition_path_by_sha256(cls, icon_sha256: str, size: int, image_format: str) -> str:
+        return os.path.join(Constants.ICONS_DIRECTORY, cls.get_icon_rendition_filename_by_sha256(icon_sha256, size, image_format))
 
     @classmethod
-    def generate_temp_filepath_for_apk_while_locked(cls) -> str:
+    def get_icon_rendition_filename_by_sha256(cls, icon_sha256: str, size: int, image_format: str) -> str:
+        # Relative to the icons directory - see AppIconRenditions; the uniform PNG icon is the PNG rendition of its size
+        if (size == Constants.ICON_WIDTH_AND_HEIGHT) and (image_format == AppIconRenditions.FORMAT_PNG):
+            return cls.get_icon_filename_by_sha256(icon_sha256)
+
+        return "{}/{}.{}.{}".format(cls._get_blob_shard_name(icon_sha256), icon_sha256, size, image_format)
+
+    @classmethod
+    def _get_blob_shard_name(cls, blob_sha256: str) -> str:
+        return blob_sha256[:cls._BLOB_SHARD_NAME_LENGTH]
+
+    @classmethod
+    def generate_temp_filepath_for_apk(cls) -> str:
+        # The filename is random and long enough for the path to be generated without holding any lock
         while True:
             random_string = Helpers.generate_secure_random_string(cls._TEMPORARY_FILENAME_CHARACTER_SET, cls._TEMPORARY_FILENAME_LENGTH)
 
             path = os.path.join(Constants.TEMPORARY_DIRECTORY, "{}.apk".format(random_string))
             if not os.path.exists(path):
                 return path
+
+    @classmethod
+    def save_uploaded_apk(cls, uploaded_apk: werkzeug.datastructures.FileStorage, filepath: str) -> str:
+        """
+        Saves the uploaded APK file and computes its SHA-256 hash while doing so, so that the file doesn't have to be read
+        again just to be hashed. If the file has been streamed into the temporary directory (see StreamedUploadFile), it's
+        just moved to the specified path, which must be in the temporary directory as well.
+
+        :return: The SHA-256 hash of the APK file's contents (lowercase hex).
+        """
+
+        if isinstance(uploaded_apk.stream, StreamedUploadFile):
+            return uploaded_apk.stream.move_to(filepath)
+
+        with open(filepath, "wb") as file:
+            return cls._hash_stream(uploaded_apk.stream, file)
+
+    @classmethod
+    def copy_apk(cls, source_path: str, destination_path: str) -> str:
+        """
+        Like save_uploaded_apk(), but the APK file is copied from the specified path.
+
+        :return: The SHA-256 hash of the APK file's contents (lowercase hex).
+        """
+
+        with open(source_path, "rb") as source_file, open(destination_path, "wb") as destination_file:
+            return cls._hash_stream(source_file, destination_file)
+
+    @classmethod
+    def compute_file_sha256(cls, path: str) -> str:
+        with open(path, "rb") as file:
+            return cls._hash_stream(file, None)
+
+    @staticmethod
+    def _hash_stream(stream: BinaryIO, output_file: Optional[BinaryIO]) -> str:
+        stream_hash = hashlib.sha256()
+        while True:
+            chunk = stream.read(Constants.FILE_HASHING_CHUNK_SIZE)
+            if not chunk:
+                break
+
+            stream_hash.update(chunk)
+            if output_file is not None:
+                output_file.write(chunk)
+
+        return stream_hash.hexdigest()
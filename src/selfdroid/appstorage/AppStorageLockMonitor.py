@@ -0,0 +1,140 @@
+# SPDX-License-Identifier: BSD-3-Clause
+#
+# Copyright (c) 2021 Vít Labuda. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+# following conditions are met:
+#  1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+#     disclaimer.
+#  2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the
+#     following disclaimer in the documentation and/or other materials provided with the distribution.
+#  3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote
+#     products derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+from typing import Optional, Dict, Any, Callable
+import os
+import json
+import datetime
+import threading
+import functools
+import flask
+from flockbasedlock.flockbasedlock import FlockBasedLock
+from selfdroid.Helpers import Helpers
+from selfdroid.DurationHistogram import DurationHistogram
+
+
+class AppStorageLockMonitor:
+    """
+    Collects per-process statistics of how long the app storage locks (see AppStorageHelpers) are waited for and held,
+    broken down by the locks and the callers (Flask endpoints) which use them, and maintains the holder files which
+    identify the current exclusive holders of the locks, so that a stalled lock can be diagnosed from the outside.
+    """
+
+    _HISTOGRAM_BUCKET_UPPER_BOUNDS: tuple = (0.001, 0.01, 0.1, 0.5, 1.0, 5.0, 15.0, 60.0)  # in seconds
+
+    _lock: threading.Lock = threading.Lock()
+    _statistics: Dict[str, Dict[str, Dict[str, Any]]] = {}  # lock name -> caller name -> statistics
+    _hold_listeners: Dict[str, Callable[[FlockBasedLock.HoldStatistics], None]] = {}  # lock name -> hold listener
+
+    @classmethod
+    def get_hold_listener(cls, lock_name: str) -> Callable[[FlockBasedLock.HoldStatistics], None]:
+        """
+        :return: A function to be set as the hold listener of the specified lock (see FlockBasedLock.set_hold_listener()).
+        """
+
+        with cls._lock:
+            hold_listener = cls._hold_listeners.get(lock_name)
+            if hold_listener is None:
+                hold_listener = functools.partial(cls._record_hold, lock_name)
+                cls._hold_listeners[lock_name] = hold_listener
+
+            return hold_listener
+
+    @classmethod
+    def _record_hold(cls, lock_name: str, hold: FlockBasedLock.HoldStatistics) -> None:
+        with cls._lock:
+            statistics = cls._get_statistics_while_monitor_locked(lock_name, cls.get_current_caller_name())
+            statistics["wait_durations"].add(hold.wait_duration)
+            statistics["hold_durations"].add(hold.hold_duration)
+
+    @classmethod
+    def record_timeout(cls, lock_name: str, wait_duration: float) -> None:
+        with cls._lock:
+            statistics = cls._get_statistics_while_monitor_locked(lock_name, cls.get_current_caller_name())
+            statistics["timeouts"] += 1
+            statistics["timed_out_wait_durations"].add(wait_duration)
+
+    @classmethod
+    def get_statistics(cls) -> Dict[str, Any]:
+        with cls._lock:
+            return {lock_name: {caller_name: {key: (value.to_dict() if isinstance(value, DurationHistogram) else value) for key, value in statistics.items()}
+                                for caller_name, statistics in statistics_by_caller.items()}
+                    for lock_name, statistics_by_caller in cls._statistics.items()}
+
+    @classmethod
+    def _get_statistics_while_monitor_locked(cls, lock_name: str, caller_name: str) -> Dict[str, Any]:
+        statistics_by_caller = cls._statistics.setdefault(lock_name, {})
+
+        statistics = statistics_by_caller.get(caller_name)
+        if statistics is None:
+            statistics = {
+                "wait_durations": DurationHistogram(cls._HISTOGRAM_BUCKET_UPPER_BOUNDS),
+                "hold_durations": DurationHistogram(cls._HISTOGRAM_BUCKET_UPPER_BOUNDS),
+                "timeouts": 0,
+                "timed_out_wait_durations": DurationHistogram(cls._HISTOGRAM_BUCKET_UPPER_BOUNDS)
+            }
+            statistics_by_caller[caller_name] = statistics
+
+        return statistics
+
+    @staticmethod
+    def get_current_caller_name() -> str:
+        if flask.has_request_context():
+            return flask.request.endpoint or "(unknown endpoint)"
+
+        return "(outside of a request)"  # e.g. the app's initialization or a CLI command
+
+    @classmethod
+    def write_holder_file_while_locked(cls, lock_path: str) -> None:
+        holder_info = {
+            "pid": os.getpid(),
+            "caller": cls.get_current_caller_name(),
+            "request": ("{} {}".format(flask.request.method, flask.request.path) if flask.has_request_context() else None),
+            "held_since": datetime.datetime.now(datetime.timezone.utc).isoformat()
+        }
+
+        Helpers.write_file_atomically(cls._get_holder_file_path(lock_path), json.dumps(holder_info).encode("utf-8"))
+
+    @classmethod
+    def remove_holder_file_while_locked(cls, lock_path: str) -> None:
+        try:
+            os.remove(cls._get_holder_file_path(lock_path))
+        except FileNotFoundError:
+            pass
+
+    @classmethod
+    def read_holder_file(cls, lock_path: str) -> Optional[Dict[str, Any]]:
+        """
+        NOTE: If a process holding the lock was killed, the holder file might be stale - check whether its PID still exists.
+
+        :return: The contents of the lock's holder file, or None if the lock isn't held in the exclusive mode by anyone.
+        """
+
+        try:
+            with open(cls._get_holder_file_path(lock_path), "rb") as file:
+                return json.loads(file.read())
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def _get_holder_file_path(lock_path: str) -> str:
+        return lock_path + ".holder"
@@ -0,0 +1,147 @@
+# SPDX-License-Identifier: BSD-3-Clause
+#
+# Copyright (c) 2021 Vít Labuda. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+# following conditions are met:
+#  1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+#     disclaimer.
+#  2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the
+#     following disclaimer in the documentation and/or other materials provided with the distribution.
+#  3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote
+#     products derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+from typing import List, Tuple
+import os
+import os.path
+import re
+import sqlalchemy
+import PIL.Image
+from selfdroid.Constants import Constants
+from selfdroid.appstorage.AppStorageHelpers import AppStorageHelpers
+from selfdroid.appstorage.AppIconRenditions import AppIconRenditions
+from selfdroid.appstorage.BlobStore import BlobStore
+from selfdroid.appstorage.AppMetadataDBModel import AppMetadataDBModel
+from selfdroid.appstorage.AppChangeLogDBModel import AppChangeLogDBModel
+from selfdroid.appstorage.jobs.AppStorageJobDBModel import AppStorageJobDBModel
+from selfdroid import db
+
+
+class AppStorageMigrator:
+    """
+    Brings an app storage created by an older version of the app up to date. db.create_all() creates only the missing
+    tables, so the columns and indexes added to already existing tables are created here, and the data the older
+    versions didn't store are filled in.
+    """
+
+    def migrate_while_locked(self) -> None:
+        """
+        Must be called while holding the global lock in the exclusive mode (see AppStorageHelpers.lock_app_storage()),
+        before the app storage is accessed in any other way.
+        """
+
+        for table in (AppMetadataDBModel.__table__, AppChangeLogDBModel.__table__, AppStorageJobDBModel.__table__):
+            self._add_missing_columns(table)
+
+            for index in table.indexes:
+                index.create(bind=self._get_engine_of_table(table), checkfirst=True)
+
+        self._move_id_named_files_to_blob_store()
+        self._generate_missing_icon_renditions()
+
+    def _get_engine_of_table(self, table: sqlalchemy.Table) -> sqlalchemy.engine.Engine:
+        # The jobs are stored in a separate database - see AppStorageJobQueue
+        return db.get_engine(bind=table.info.get("bind_key"))
+
+    def _add_missing_columns(self, table: sqlalchemy.Table) -> None:
+        engine = self._get_engine_of_table(table)
+        existing_column_names = {column["name"] for column in sqlalchemy.inspect(engine).get_columns(table.name)}
+
+        with engine.begin() as connection:
+            for column in table.columns:
+                if column.name not in existing_column_names:
+                    # SQLite cannot add a NOT NULL column without a default value to a table with rows
+                    assert column.nullable
+
+                    column_type = column.type.compile(dialect=engine.dialect)
+                    connection.execute(sqlalchemy.text("ALTER TABLE {} ADD COLUMN {} {}".format(table.name, column.name, column_type)))
+
+    def _move_id_named_files_to_blob_store(self) -> None:
+        """
+        The older versions named the APK files and the icons by the app's ID ("<ID>.apk" and "<ID>.png") instead of
+        storing them content-addressed (see BlobStore). The files' hashes are committed before the files are moved, so if
+        the migration is interrupted, the files which haven't been moved yet are found and moved the next time.
+        """
+
+        files_to_move: List[Tuple[str, str]] = []  # (ID-named path, content-addressed path)
+
+        for db_model in AppMetadataDBModel.query.all():
+            try:
+                id_named_apk_path = os.path.join(Constants.APKS_DIRECTORY, "{}.apk".format(db_model.id))
+                if os.path.isfile(id_named_apk_path):
+                    if db_model.apk_sha256 is None:
+                        db_model.apk_sha256 = AppStorageHelpers.compute_file_sha256(id_named_apk_path)
+
+                    files_to_move.append((id_named_apk_path, AppStorageHelpers.get_apk_path_by_sha256(db_model.apk_sha256)))
+
+                id_named_icon_path = os.path.join(Constants.ICONS_DIRECTORY, "{}.png".format(db_model.id))
+                if os.path.isfile(id_named_icon_path):
+                    db_model.icon_sha256 = AppStorageHelpers.compute_file_sha256(id_named_icon_path)
+
+                    files_to_move.append((id_named_icon_path, AppStorageHelpers.get_icon_path_by_sha256(db_model.icon_sha256)))
+
+            except OSError:
+                pass  # If any of the app's files cannot be moved, the app is deleted by AppStorageConsistencyEnsurer
+
+        db.session.commit()
+
+        for id_named_path, content_addressed_path in files_to_move:
+            os.makedirs(os.path.dirname(content_addressed_path), exist_ok=True)
+            os.replace(id_named_path, content_addressed_path)
+
+        # The remaining ID-named files don't belong to any app
+        self._delete_id_named_files_in_directory(Constants.APKS_DIRECTORY, "apk")
+        self._delete_id_named_files_in_directory(Constants.ICONS_DIRECTORY, "png")
+
+    def _delete_id_named_files_in_directory(self, directory_path: str, filename_extension: str) -> None:
+        regex = r'^\d+\.{}$'.format(filename_extension)
+
+        for directory_entry in os.scandir(directory_path):
+            if directory_entry.is_file() and re.match(regex, directory_entry.name):
+                os.remove(directory_entry.path)
+
+    def _generate_missing_icon_renditions(self) -> None:
+        """
+        The older versions stored only the uniform PNG icons, and the installed Pillow might have started supporting
+        another image format since the icons were stored. The missing renditions are generated from the uniform icons
+        (see AppIconRenditions), so there are none larger than them.
+        """
+
+        expected_renditions = AppIconRenditions.get_generated_renditions(Constants.ICON_WIDTH_AND_HEIGHT)
+        blob_store = BlobStore()
+
+        for row in db.session.query(AppMetadataDBModel.icon_sha256).distinct().all():
+            icon_sha256 = row.icon_sha256
+            if icon_sha256 is None:
+                continue
+
+            if all(os.path.isfile(AppStorageHelpers.get_icon_rendition_path_by_sha256(icon_sha256, size, image_format)) for size, image_format in expected_renditions):
+                continue
+
+            try:
+                with PIL.Image.open(AppStorageHelpers.get_icon_path_by_sha256(icon_sha256)) as icon:
+                    icon_renditions = AppIconRenditions.generate_renditions(icon.convert("RGBA"))
+
+                blob_store.store_icon_renditions_while_locked(icon_sha256, icon_renditions)
+
+            except (OSError, ValueError):
+                pass  # A missing icon's app is deleted by AppStorageConsistencyEnsurer; the renditions are optional anyway
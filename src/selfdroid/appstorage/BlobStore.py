@@ -0,0 +1,156 @@
+# SPDX-License-Identifier: BSD-3-Clause
+#
+# Copyright (c) 2021 Vít Labuda. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+# following conditions are met:
+#  1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+#     disclaimer.
+#  2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the
+#     following disclaimer in the documentation and/or other materials provided with the distribution.
+#  3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote
+#     products derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+from typing import Iterable, Optional, Set, Dict, Tuple
+import os
+import os.path
+import re
+import hashlib
+from selfdroid.Constants import Constants
+from selfdroid.Helpers import Helpers
+from selfdroid.appstorage.AppStorageHelpers import AppStorageHelpers
+from selfdroid.appstorage.AppIconRenditions import AppIconRenditions
+from selfdroid.appstorage.AppMetadataDBModel import AppMetadataDBModel
+from selfdroid import db
+
+
+class BlobStore:
+    """
+    The APK files and the icons are stored content-addressed - each file (= blob) is named by the SHA-256 hash of its
+    contents and placed in a subdirectory named by the hash's first characters (see AppStorageHelpers), and the apps'
+    metadata contain the hashes of their current files. Identical files are therefore stored only once, and a stored
+    blob is never modified, so a path always refers to the same contents. An icon's renditions (see AppIconRenditions)
+    are a part of the icon's blob - they're named by its hash, and stored and deleted along with it.
+
+    A blob's reference count is the number of apps whose metadata refer to it. It isn't stored anywhere - it's counted
+    using the hash columns' indexes, so it can never get out of sync with the database. A blob is deleted once it's no
+    longer referenced, after the change of the metadata has been committed.
+
+    The blobs may be stored while holding just the global lock (in either mode), so that the apps' files can be stored
+    concurrently. The blobs are released (and garbage-collected) while holding the catalog lock (see
+    AppStorageHelpers.lock_catalog()) or the global lock in the exclusive mode, though, and a concurrent modification
+    might therefore release a blob which has just been stored for an app whose metadata haven't been committed yet
+    (e.g. an icon shared with the other app). The blobs must therefore be stored once more while holding the catalog
+    lock, right before the metadata referring to them are committed - in the usual case, that only checks that they are
+    still stored.
+    """
+
+    _APK_BLOB_FILENAME_REGEX: str = r'^[0-9a-f]{64}\.apk$'
+    _ICON_BLOB_FILENAME_REGEX: str = r'^[0-9a-f]{64}(\.[0-9]+\.[a-z]+|\.png)$'  # The icons and their renditions
+
+    def store_apk_while_locked(self, apk_path: str, apk_sha256: str) -> None:
+        """
+        Moves the APK file into the store. If an identical file is already stored, the APK file is left where it is (so
+        that it can be stored again if the stored one is released in the meantime - see the class's docstring), and
+        it's up to the caller to delete it.
+        """
+
+        blob_path = AppStorageHelpers.get_apk_path_by_sha256(apk_sha256)
+        if os.path.isfile(blob_path):
+            return
+
+        os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+        os.rename(apk_path, blob_path)
+
+    def store_icon_while_locked(self, icon_png: bytes, icon_renditions: Dict[Tuple[int, str], bytes]) -> str:
+        """
+        :param icon_renditions: See AppIconRenditions.generate_renditions().
+        :return: The SHA-256 hash of the icon (lowercase hex).
+        """
+
+        icon_sha256 = hashlib.sha256(icon_png).hexdigest()
+
+        blob_path = AppStorageHelpers.get_icon_path_by_sha256(icon_sha256)
+        if not os.path.isfile(blob_path):
+            os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+            Helpers.write_file_atomically(blob_path, icon_png)
+
+        self.store_icon_renditions_while_locked(icon_sha256, icon_renditions)
+
+        return icon_sha256
+
+    def store_icon_renditions_while_locked(self, icon_sha256: str, icon_renditions: Dict[Tuple[int, str], bytes]) -> None:
+        """
+        Stores those of the icon's renditions which aren't stored yet. The icon itself must already be stored.
+        """
+
+        for (size, image_format), rendition_data in icon_renditions.items():
+            rendition_path = AppStorageHelpers.get_icon_rendition_path_by_sha256(icon_sha256, size, image_format)
+            if not os.path.isfile(rendition_path):
+                Helpers.write_file_atomically(rendition_path, rendition_data)
+
+    def release_blobs_while_locked(self, apk_sha256s: Iterable[Optional[str]], icon_sha256s: Iterable[Optional[str]]) -> None:
+        """
+        Deletes those of the specified blobs which aren't referenced by any app. Must be called once the change of the
+        apps' metadata has been committed (or rolled back), from a database snapshot begun afterwards while holding the
+        catalog lock or the global lock in the exclusive mode; the Nones (= unknown hashes) are skipped.
+        """
+
+        for apk_sha256 in set(filter(None, apk_sha256s)):
+            if db.session.query(AppMetadataDBModel.id).filter_by(apk_sha256=apk_sha256).first() is None:
+                self._delete_blob(AppStorageHelpers.get_apk_path_by_sha256(apk_sha256))
+
+        for icon_sha256 in set(filter(None, icon_sha256s)):
+            if db.session.query(AppMetadataDBModel.id).filter_by(icon_sha256=icon_sha256).first() is None:
+                # The renditions are deleted first, so that a rendition is never left behind without its icon
+                for size in Constants.ICON_RENDITION_SIZES:
+                    for image_format in AppIconRenditions.MIMETYPES:
+                        self._delete_blob(AppStorageHelpers.get_icon_rendition_path_by_sha256(icon_sha256, size, image_format))
+
+                self._delete_blob(AppStorageHelpers.get_icon_path_by_sha256(icon_sha256))
+
+    def collect_garbage_while_locked(self) -> int:
+        """
+        Deletes all the unreferenced blobs, e.g. those left behind by a crash. Must be called while holding the global
+        lock in the exclusive mode (see AppStorageHelpers.lock_app_storage()).
+
+        :return: The number of deleted blobs.
+        """
+
+        referenced_apk_sha256s = set(row.apk_sha256 for row in db.session.query(AppMetadataDBModel.apk_sha256).all())
+        referenced_icon_sha256s = set(row.icon_sha256 for row in db.session.query(AppMetadataDBModel.icon_sha256).all())
+
+        deleted_blob_count = self._delete_unreferenced_blobs_in_directory(Constants.APKS_DIRECTORY, self._APK_BLOB_FILENAME_REGEX, referenced_apk_sha256s)
+        deleted_blob_count += self._delete_unreferenced_blobs_in_directory(Constants.ICONS_DIRECTORY, self._ICON_BLOB_FILENAME_REGEX, referenced_icon_sha256s)
+
+        return deleted_blob_count
+
+    def _delete_unreferenced_blobs_in_directory(self, directory_path: str, filename_regex: str, referenced_sha256s: Set[str]) -> int:
+        deleted_blob_count = 0
+        for shard_directory_entry in os.scandir(directory_path):
+            if not shard_directory_entry.is_dir():
+                continue
+
+            for blob_directory_entry in os.scandir(shard_directory_entry.path):
+                if re.match(filename_regex, blob_directory_entry.name) and (blob_directory_entry.name[:Constants.DB_SHA256_LENGTH] not in referenced_sha256s):
+                    self._delete_blob(blob_directory_entry.path)
+                    deleted_blob_count += 1
+
+        return deleted_blob_count
+
+    def _delete_blob(self, blob_path: str) -> None:
+        # The readers don't hold any lock - one which has fetched the metadata referring to the blob before it was
+        #  released won't find the file, and fetches the metadata again (see FileResponseBuilder).
+        try:
+            os.remove(blob_path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,104 @@
+# SPDX-License-Identifier: BSD-3-Clause
+#
+# Copyright (c) 2021 Vít Labuda. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+# following conditions are met:
+#  1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+#     disclaimer.
+#  2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the
+#     following disclaimer in the documentation and/or other materials provided with the distribution.
+#  3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote
+#     products derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+from __future__ import annotations
+import string
+import datetime
+import dateutil.tz
+from selfdroid.Constants import Constants
+from selfdroid.Helpers import Helpers
+from selfdroid.SelfdroidRuntimeError import SelfdroidRuntimeError
+
+
+class CatalogVersion:
+    """
+    The catalog version is a counter which is incremented every time the app storage is modified. It's stored in a small
+    file instead of the database, so that it can be read very cheaply - this allows conditional requests for the app
+    catalog to be answered without doing any database work.
+
+    The generation is a random string which is generated when the catalog version file is created. It's a part of the
+    ETag, so that the ETags are never reused, even if the data directory is deleted and the counter starts from zero again.
+
+    The change sequence number is the sequence number of the latest change recorded in the change log (see
+    AppChangeLogDBModel) which the materialized catalog contains, so that it can be told whether it's outdated.
+    """
+
+    _GENERATION_CHARACTER_SET: str = string.digits + string.ascii_lowercase
+    _GENERATION_LENGTH: int = 16
+
+    def __init__(self, generation: str, version: int, last_modified_timestamp: int, change_sequence_number: int):
+        self.generation: str = generation
+        self.version: int = version
+        self.last_modified_timestamp: int = last_modified_timestamp
+        self.change_sequence_number: int = change_sequence_number
+
+    @classmethod
+    def read(cls) -> CatalogVersion:
+        with open(Constants.CATALOG_VERSION_FILE, "r") as file:
+            file_contents = file.read()
+
+        try:
+            fields = file_contents.split()
+            if len(fields) == 3:
+                # A file written before the change sequence number was introduced - the catalog is considered outdated
+                fields.append("0")
+
+            generation, version, last_modified_timestamp, change_sequence_number = fields
+            return cls(generation, int(version), int(last_modified_timestamp), int(change_sequence_number))
+        except ValueError:
+            raise SelfdroidRuntimeError("The catalog version file is corrupted!")
+
+    @classmethod
+    def create_initial(cls) -> CatalogVersion:
+        generation = Helpers.generate_secure_random_string(cls._GENERATION_CHARACTER_SET, cls._GENERATION_LENGTH)
+
+        catalog_version = cls(generation, 0, Helpers.get_current_unix_timestamp(), 0)
+        catalog_version._write()
+
+        return catalog_version
+
+    @classmethod
+    def bump_while_locked(cls, change_sequence_number: int) -> CatalogVersion:
+        """
+        Must be called after every app storage modification has been committed and the materialized catalog has been
+        regenerated (and not before, so that a client can never receive outdated data labelled with the new version).
+
+        :param change_sequence_number: The sequence number of the latest change the regenerated catalog contains.
+        """
+
+        current_catalog_version = cls.read()
+
+        new_catalog_version = cls(current_catalog_version.generation, current_catalog_version.version + 1, Helpers.get_current_unix_timestamp(), change_sequence_number)
+        new_catalog_version._write()
+
+        return new_catalog_version
+
+    def _write(self) -> None:
+        file_contents = "{} {} {} {}\n".format(self.generation, self.version, self.last_modified_timestamp, self.change_sequence_number)
+
+        Helpers.write_file_atomically(Constants.CATALOG_VERSION_FILE, file_contents.encode("ascii"))
+
+    def get_etag(self) -> str:
+        return "catalog-{}-{}".format(self.generation, self.version)
+
+    def get_last_modified_datetime(self) -> datetime.datetime:
+        return datetime.datetime.fromtimestamp(self.last_modified_timestamp, tz=dateutil.tz.tzutc())
@@ -0,0 +1,169 @@
+# SPDX-License-Identifier: BSD-3-Clause
+#
+# Copyright (c) 2021 Vít Labuda. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+# following conditions are met:
+#  1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+#     disclaimer.
+#  2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the
+#     following disclaimer in the documentation and/or other materials provided with the distribution.
+#  3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote
+#     products derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+from typing import Optional, Dict, List
+import os
+import os.path
+import gzip
+import threading
+import flask
+from selfdroid.Constants import Constants
+from selfdroid.Helpers import Helpers
+from selfdroid.appstorage.AppStorageHelpers import AppStorageHelpers
+from selfdroid.appstorage.CatalogVersion import CatalogVersion
+from selfdroid.appstorage.crud.AppGetter import AppGetter
+from selfdroid import app
+
+try:
+    import brotli  # Optional - if the library isn't installed, the brotli-compressed variant is not generated
+except ImportError:
+    brotli = None
+
+
+class MaterializedCatalog:
+    """
+    The materialized catalog contains the exact bytes of the /api/v1/app-details response (along with their
+    precompressed variants). It's regenerated only when the app storage is modified, so the API endpoint doesn't have to
+    query the database and serialize the metadata of all the apps on every request.
+
+    The files are replaced atomically, and they are always regenerated before the catalog version is bumped. A client
+    might therefore receive newer data labelled with the previous version (which only causes an unnecessary refetch
+    later), but never the other way round.
+    """
+
+    ENCODING_IDENTITY: str = "identity"
+    ENCODING_GZIP: str = "gzip"
+    ENCODING_BROTLI: str = "br"
+
+    _FILENAMES: Dict[str, str] = {
+        ENCODING_IDENTITY: "app_details.json",
+        ENCODING_GZIP: "app_details.json.gz",
+        ENCODING_BROTLI: "app_details.json.br"
+    }
+
+    _GZIP_COMPRESS_LEVEL: int = 9
+    _BROTLI_QUALITY: int = 9  # The maximum (11) is considerably slower, and the catalog is regenerated after every modification
+
+    # The variants of the most recently read catalog version are cached in each process's memory
+    _memory_cache_lock: threading.Lock = threading.Lock()
+    _memory_cache_etag: Optional[str] = None
+    _memory_cache_variants: Dict[str, bytes] = {}
+
+    @classmethod
+    def get_supported_encodings(cls) -> List[str]:
+        """
+        :return: The supported content encodings, from the most to the least preferred one.
+        """
+
+        if brotli is None:
+            return [cls.ENCODING_GZIP, cls.ENCODING_IDENTITY]
+
+        return [cls.ENCODING_BROTLI, cls.ENCODING_GZIP, cls.ENCODING_IDENTITY]
+
+    @staticmethod
+    def does_exist() -> bool:
+        return os.path.isfile(MaterializedCatalog._get_path(MaterializedCatalog.ENCODING_IDENTITY))
+
+    def regenerate_if_outdated_while_locked(self) -> None:
+        """
+        Must be called after every modification of an app has been committed (or has failed), while holding the global
+        lock in the shared mode (see AppStorageHelpers.lock_apps()), but not the catalog lock - the regeneration takes
+        time proportional to the number of apps, and the other apps can be modified meanwhile.
+
+        The regenerations are coalesced: if another one is in progress, this method returns immediately, as the one in
+        progress checks whether the catalog is outdated again after it has finished, and regenerates it once more with
+        all the changes committed in the meantime if so.
+        """
+
+        while self._is_outdated():
+            with AppStorageHelpers.try_lock_catalog_regeneration() as has_been_locked:
+                if not has_been_locked:
+                    return
+
+                if self._is_outdated():  # The catalog might have been regenerated before the lock was acquired
+                    self.regenerate_while_locked()
+
+    def regenerate_while_locked(self) -> CatalogVersion:
+        """
+        Regenerates the catalog unconditionally. Must be called while holding the global lock in the exclusive mode (see
+        AppStorageHelpers.lock_app_storage()) or the catalog regeneration lock - the modifications of apps call
+        regenerate_if_outdated_while_locked() instead.
+
+        :return: The new (bumped) catalog version.
+        """
+
+        # The apps' metadata and the latest change's sequence number are read from the same (new) snapshot
+        app_getter = AppGetter()
+        app_getter.start_new_snapshot()
+
+        change_sequence_number = app_getter.get_latest_change_sequence_number()
+        json_object = [app_metadata.to_api_dict() for app_metadata in app_getter.get_all_metadata()]
+
+        # jsonify() is used, so that the bytes are exactly the same as if the response was generated on the fly
+        with app.app_context():
+            json_bytes = flask.jsonify(json_object).get_data()
+
+        Helpers.write_file_atomically(self._get_path(MaterializedCatalog.ENCODING_IDENTITY), json_bytes)
+        Helpers.write_file_atomically(self._get_path(MaterializedCatalog.ENCODING_GZIP), gzip.compress(json_bytes, compresslevel=MaterializedCatalog._GZIP_COMPRESS_LEVEL, mtime=0))
+
+        brotli_path = self._get_path(MaterializedCatalog.ENCODING_BROTLI)
+        if brotli is not None:
+            Helpers.write_file_atomically(brotli_path, brotli.compress(json_bytes, quality=MaterializedCatalog._BROTLI_QUALITY))
+        elif os.path.exists(brotli_path):
+            # If the brotli library was uninstalled, an outdated variant must not be left behind
+            os.remove(brotli_path)
+
+        return CatalogVersion.bump_while_locked(change_sequence_number)
+
+    def get_variant(self, catalog_version: CatalogVersion, encoding: str) -> bytes:
+        """
+        Can be called without holding the app storage lock.
+
+        :param catalog_version: The catalog version which was read before calling this method.
+        :param encoding: One of the encodings returned by get_supported_encodings().
+        """
+
+        etag = catalog_version.get_etag()
+
+        with MaterializedCatalog._memory_cache_lock:
+            if MaterializedCatalog._memory_cache_etag != etag:
+                MaterializedCatalog._memory_cache_etag = etag
+                MaterializedCatalog._memory_cache_variants = {}
+
+            variant = MaterializedCatalog._memory_cache_variants.get(encoding)
+            if variant is None:
+                with open(self._get_path(encoding), "rb") as file:
+                    variant = file.read()
+
+                MaterializedCatalog._memory_cache_variants[encoding] = variant
+
+        return variant
+
+    def _is_outdated(self) -> bool:
+        app_getter = AppGetter()
+        app_getter.start_new_snapshot()
+
+        return app_getter.get_latest_change_sequence_number() > CatalogVersion.read().change_sequence_number
+
+    @staticmethod
+    def _get_path(encoding: str) -> str:
+        return os.path.join(Constants.CATALOG_DIRECTORY, MaterializedCatalog._FILENAMES[encoding])
@@ -20,14 +20,18 @@
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
 
-from typing import Optional
+from typing import Optional, Union, Dict, Tuple
 import os.path
 import io
 import re
 import PIL.Image
 import pyaxmlparser
 from selfdroid.Constants import Constants
+from selfdroid.Settings import Settings
+from selfdroid.appstorage.AppIconRenditions import AppIconRenditions
+from selfdroid.appstorage.apk.FastAPKReader import FastAPKReader
 from selfdroid.appstorage.apk.ParsedAPK import ParsedAPK
+from selfdroid.appstorage.apk.ParsedAPKCache import ParsedAPKCache
 from selfdroid.appstorage.apk.APKParserException import APKParserException
 
 
@@ -36,9 +40,29 @@ class APKParser:
         # For this class's internal use
         pass
 
-    def __init__(self, apk_path: str):
+    _PARSED_APK_CACHE: ParsedAPKCache = ParsedAPKCache(Settings.PARSED_APK_CACHE_MAX_ENTRIES)
+
+    @staticmethod
+    def parse_with_cache(apk_path: str, apk_sha256: str) -> ParsedAPK:
+        """
+        Parses the APK file, unless an APK file with the same SHA-256 hash has been parsed (or rejected) recently.
+
+        :raises APKParserException: If the APK file is invalid.
+        """
+
+        return APKParser._PARSED_APK_CACHE.get_or_parse(apk_sha256, lambda: APKParser(apk_path, apk_sha256).parsed_apk)
+
+    @staticmethod
+    def get_parsed_apk_cache_statistics() -> Dict[str, int]:
+        return APKParser._PARSED_APK_CACHE.get_statistics()
+
+    def __init__(self, apk_path: str, apk_sha256: str):
+        """
+        :param apk_sha256: The SHA-256 hash of the APK file's contents (computed while the file was being saved).
+        """
+
         try:
-            self._apk: pyaxmlparser.APK = pyaxmlparser.APK(apk_path)
+            self._apk: Union[FastAPKReader, pyaxmlparser.APK] = self._open_apk(apk_path)
             is_valid_apk = self._apk.is_valid_APK()
         except Exception:
             raise APKParserException("Failed to parse the supplied APK file!")
@@ -65,11 +89,23 @@ class APKParser:
             raise APKParserException("Failed to get the supplied APK's size!")
 
         try:
-            uniform_png_app_icon: bytes = self._get_and_convert_app_icon_to_uniform_png()
+            uniform_png_app_icon, app_icon_renditions = self._get_and_convert_app_icon_to_uniform_png_and_renditions()
         except Exception:
             raise APKParserException("Failed to extract the app's icon from the supplied APK file!")
 
-        self.parsed_apk: ParsedAPK = ParsedAPK(app_name, package_name, version_code, version_name, min_api_level, max_api_level, apk_file_size, uniform_png_app_icon)
+        self.parsed_apk: ParsedAPK = ParsedAPK(app_name, package_name, version_code, version_name, min_api_level, max_api_level, apk_file_size, apk_sha256, uniform_png_app_icon, app_icon_renditions)
+
+    @staticmethod
+    def _open_apk(apk_path: str) -> Union[FastAPKReader, pyaxmlparser.APK]:
+        if Settings.FAST_APK_METADATA_EXTRACTION:
+            try:
+                return FastAPKReader(apk_path)
+            except Exception:
+                # The fast reader gives up on anything it doesn't handle exactly like pyaxmlparser (including broken APKs,
+                #  which pyaxmlparser then rejects)
+                pass
+
+        return pyaxmlparser.APK(apk_path)
 
     def _get_and_validate_app_name(self) -> str:
         app_name = self._apk.get_app_name()
@@ -148,7 +184,7 @@ class APKParser:
 
         return max_api_level
 
-    def _get_and_convert_app_icon_to_uniform_png(self) -> bytes:
+    def _get_and_convert_app_icon_to_uniform_png_and_renditions(self) -> Tuple[bytes, Dict[Tuple[int, str], bytes]]:
         original_app_icon_data = self._apk.get_file(self._apk.get_app_icon(640))
 
         # If the DPI is not specified, an "anydpi" vector icon (in XML format) is usually returned which cannot be parsed
@@ -157,9 +193,12 @@ class APKParser:
 
             image = image.convert("RGBA")
 
+        # The renditions are resized from the original icon, not from the uniform one
+        app_icon_renditions = AppIconRenditions.generate_renditions(image)
+
         image = image.resize((Constants.ICON_WIDTH_AND_HEIGHT, Constants.ICON_WIDTH_AND_HEIGHT))
 
         with io.BytesIO() as uniform_png_icon_bytes_io:
             image.save(uniform_png_icon_bytes_io, format="PNG")
 
-            return uniform_png_icon_bytes_io.getvalue()
+            return uniform_png_icon_bytes_io.getvalue(), app_icon_renditions
@@ -0,0 +1,580 @@
+# SPDX-License-Identifier: BSD-3-Clause
+#
+# Copyright (c) 2021 Vít Labuda. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+# following conditions are met:
+#  1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+#     disclaimer.
+#  2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the
+#     following disclaimer in the documentation and/or other materials provided with the distribution.
+#  3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote
+#     products derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+from typing import Optional, Union, Dict, List, Tuple
+import mmap
+import re
+import struct
+import zipfile
+
+
+class FastAPKReader:
+    """
+    A lightweight replacement for pyaxmlparser.APK, providing only the part of its interface APKParser uses.
+
+    pyaxmlparser decodes the whole AndroidManifest.xml into an XML tree and every single entry of resources.arsc, which
+     is slow and memory-hungry for large apps. This class walks the binary manifest's chunks once and then looks up only
+     the resource table entries the app's label and icon refer to; resources.arsc, which is normally stored
+     uncompressed, is memory-mapped instead of being read into memory.
+
+    The returned values are the same pyaxmlparser would return. If the APK contains anything whose handling might
+     differ (a packed or unusual manifest, a sparse resource table, a label or icon which pyaxmlparser would look up in
+     some other way, ...), UnsupportedAPKException is raised and the caller is expected to fall back to pyaxmlparser.
+    """
+
+    class UnsupportedAPKException(Exception):
+        pass
+
+    class _Buffer:
+        # A bounds-checked view of a part of a bytes object or a memory-mapped file
+        def __init__(self, data: Union[bytes, mmap.mmap], start: int = 0, end: Optional[int] = None):
+            self._data: Union[bytes, mmap.mmap] = data
+            self._start: int = start
+            self._length: int = (len(data) if end is None else end) - start
+
+        def __len__(self) -> int:
+            return self._length
+
+        def unpack(self, format_: str, position: int) -> tuple:
+            if position < 0 or position + struct.calcsize(format_) > self._length:
+                raise FastAPKReader.UnsupportedAPKException()
+
+            return struct.unpack_from(format_, self._data, self._start + position)
+
+        def read(self, start: int, end: int) -> bytes:
+            if start < 0 or start > end or end > self._length:
+                raise FastAPKReader.UnsupportedAPKException()
+
+            return bytes(self._data[self._start + start:self._start + end])
+
+    class _StringPool:
+        # A ResStringPool chunk whose strings are decoded lazily, as pyaxmlparser's StringBlock would decode them
+        def __init__(self, buffer: "FastAPKReader._Buffer", chunk_start: int):
+            chunk_type, header_size, chunk_size = buffer.unpack("<HHI", chunk_start)
+            string_count, style_count, flags, strings_start, styles_start = buffer.unpack("<5I", chunk_start + 8)
+            if chunk_type != FastAPKReader._RES_STRING_POOL_TYPE or header_size != 28 or strings_start != 28 + 4 * (string_count + style_count):
+                raise FastAPKReader.UnsupportedAPKException()
+
+            self._buffer: FastAPKReader._Buffer = buffer
+            self._string_count: int = string_count
+            self._is_utf8: bool = (flags & FastAPKReader._UTF8_FLAG) != 0
+            self._offsets_start: int = chunk_start + 28
+            self._strings_start: int = chunk_start + strings_start
+            self._strings_end: int = chunk_start + (styles_start if (styles_start != 0 and style_count != 0) else chunk_size)
+            if not (self._strings_start <= self._strings_end <= len(buffer)):
+                raise FastAPKReader.UnsupportedAPKException()
+
+            self._cache: Dict[int, str] = {}
+
+        def get_string(self, index: int) -> str:
+            if index >= self._string_count:
+                raise FastAPKReader.UnsupportedAPKException()
+
+            string = self._cache.get(index)
+            if string is None:
+                string = self._cache[index] = self._decode_string(index)
+
+            return string
+
+        def _decode_string(self, index: int) -> str:
+            position = self._strings_start + self._buffer.unpack("<I", self._offsets_start + 4 * index)[0]
+
+            if self._is_utf8:
+                position = self._decode_length(position, 1)[1]  # The string's length in characters is not needed
+                byte_count, position = self._decode_length(position, 1)
+                if byte_count > 0x7FFF or self._read_string_bytes(position + byte_count, position + byte_count + 1) != b"\x00":
+                    raise FastAPKReader.UnsupportedAPKException()
+
+                return self._read_string_bytes(position, position + byte_count).decode("utf-8", "replace")
+
+            character_count, position = self._decode_length(position, 2)
+            end = position + (2 * character_count)
+            if self._read_string_bytes(end, end + 2) != b"\x00\x00":
+                raise FastAPKReader.UnsupportedAPKException()
+
+            return self._read_string_bytes(position, end).decode("utf-16", "replace")
+
+        def _decode_length(self, position: int, character_size: int) -> Tuple[int, int]:
+            first, second = self._buffer.unpack("<2B" if character_size == 1 else "<2H", position)
+            if position + (2 * character_size) > self._strings_end:
+                raise FastAPKReader.UnsupportedAPKException()
+
+            high_bit = 0x80 << (8 * (character_size - 1))
+            if first & high_bit:
+                return ((first & ~high_bit) << (8 * character_size)) | second, position + (2 * character_size)
+
+            return first, position + character_size
+
+        def _read_string_bytes(self, start: int, end: int) -> bytes:
+            if end > self._strings_end:
+                raise FastAPKReader.UnsupportedAPKException()
+
+            return self._buffer.read(start, end)
+
+    class _ResourceTable:
+        # Indexes the chunks of resources.arsc, so that single resources can be looked up without decoding the rest
+        _DEFAULT_CONFIG: Tuple[int, ...] = (0, 0, 0, 0, 0, 0, 0, 0, 0)
+        _MAX_REFERENCE_DEPTH: int = 16
+
+        def __init__(self, buffer: "FastAPKReader._Buffer"):
+            self._buffer: FastAPKReader._Buffer = buffer
+            self._global_string_pool: Optional[FastAPKReader._StringPool] = None
+            # Package name -> (package ID, list of (type ID, chunk start) of its type chunks)
+            self._packages: Dict[str, Tuple[int, List[Tuple[int, int]]]] = {}
+            self._type_chunk_layouts: Dict[int, Tuple[Tuple[int, ...], int, Tuple[int, ...]]] = {}
+
+            chunk_type, header_size, table_size = self._read_chunk_header(0)
+            if chunk_type != FastAPKReader._RES_TABLE_TYPE or table_size > len(buffer):
+                raise FastAPKReader.UnsupportedAPKException()
+
+            for chunk_start, chunk_type, _ in self._iterate_chunks(header_size, table_size):
+                if chunk_type == FastAPKReader._RES_STRING_POOL_TYPE and self._global_string_pool is None:
+                    self._global_string_pool = FastAPKReader._StringPool(buffer, chunk_start)
+                elif chunk_type == FastAPKReader._RES_TABLE_PACKAGE_TYPE:
+                    self._index_package(chunk_start)
+
+        def resolve(self, resource_id: int, default_config_only: bool, depth: int = 0) -> List[Tuple[Tuple[int, ...], int, int]]:
+            # Returns (config, value type, value data) tuples, following references the same way pyaxmlparser's
+            #  ARSCParser.get_resolved_res_configs() does
+            if depth > FastAPKReader._ResourceTable._MAX_REFERENCE_DEPTH:
+                raise FastAPKReader.UnsupportedAPKException()
+
+            values_by_config = self._get_values_by_config(resource_id)
+            values = list(values_by_config.items())
+            if default_config_only and len(values) > 1:
+                default_config = FastAPKReader._ResourceTable._DEFAULT_CONFIG
+                values = [(default_config, values_by_config[default_config])] if default_config in values_by_config else values[:1]
+
+            resolved_values = []
+            for config, (value_type, value_data) in values:
+                if value_type == FastAPKReader._TYPE_REFERENCE:
+                    if value_data != 0:
+                        resolved_values += self.resolve(value_data, default_config_only, depth + 1)
+                else:
+                    resolved_values.append((config, value_type, value_data))
+
+            return resolved_values
+
+        def get_string(self, value_type: int, value_data: int) -> str:
+            if value_type != FastAPKReader._TYPE_STRING or self._global_string_pool is None:
+                raise FastAPKReader.UnsupportedAPKException()
+
+            return self._global_string_pool.get_string(value_data)
+
+        @staticmethod
+        def get_config_density(config: Tuple[int, ...]) -> int:
+            return (config[2] >> 16) & 0xFFFF
+
+        def _read_chunk_header(self, chunk_start: int) -> Tuple[int, int, int]:
+            chunk_type, header_size, chunk_size = self._buffer.unpack("<HHI", chunk_start)
+            if header_size < 8 or chunk_size < header_size:
+                raise FastAPKReader.UnsupportedAPKException()
+
+            return chunk_type, header_size, chunk_size
+
+        def _iterate_chunks(self, start: int, end: int):
+            # Chunks are walked exactly like pyaxmlparser walks them, so that both see the same ones
+            chunk_start = start
+            while chunk_start <= end - 8:
+                chunk_type, header_size, chunk_size = self._read_chunk_header(chunk_start)
+                if chunk_start + chunk_size > end:
+                    break
+
+                yield chunk_start, chunk_type, header_size
+                chunk_start += chunk_size
+
+        def _index_package(self, package_start: int) -> None:
+            _, header_size, package_size = self._read_chunk_header(package_start)
+            package_id = self._buffer.unpack("<I", package_start + 8)[0]
+            package_name = self._buffer.read(package_start + 12, package_start + 268).decode("utf-16", "replace")
+            package_name = package_name[:package_name.find("\x00")]
+            type_strings_start, _, key_strings_start = self._buffer.unpack("<3I", package_start + 268)
+
+            type_strings_size = self._read_chunk_header(package_start + type_strings_start)[2]
+            key_strings_size = self._read_chunk_header(package_start + key_strings_start)[2]
+
+            type_chunks = []
+            first_chunk_start = package_start + header_size + type_strings_size + key_strings_size
+            for chunk_start, chunk_type, _ in self._iterate_chunks(first_chunk_start, package_start + package_size):
+                if chunk_type == FastAPKReader._RES_TABLE_TYPE_TYPE:
+                    type_id, _, reserved = self._buffer.unpack("<BBH", chunk_start + 8)
+                    if reserved != 0:
+                        raise FastAPKReader.UnsupportedAPKException()
+
+                    type_chunks.append((type_id, chunk_start))
+
+            self._packages[package_name] = (package_id, type_chunks)
+
+        def _get_values_by_config(self, resource_id: int) -> Dict[Tuple[int, ...], Tuple[int, int]]:
+            package_id, type_id, entry_index = (resource_id >> 24), ((resource_id >> 16) & 0xFF), (resource_id & 0xFFFF)
+
+            values_by_config = {}
+            for current_package_id, type_chunks in self._packages.values():
+                if current_package_id != package_id:
+                    continue
+
+                for current_type_id, chunk_start in type_chunks:
+                    if current_type_id != type_id:
+                        continue
+
+                    config, entries_start, entry_offsets = self._get_type_chunk_layout(chunk_start)
+                    if entry_index >= len(entry_offsets) or entry_offsets[entry_index] == 0xFFFFFFFF:
+                        continue
+
+                    values_by_config[config] = self._read_simple_entry_value(entries_start + entry_offsets[entry_index])
+
+            return values_by_config
+
+        def _get_type_chunk_layout(self, chunk_start: int) -> Tuple[Tuple[int, ...], int, Tuple[int, ...]]:
+            layout = self._type_chunk_layouts.get(chunk_start)
+            if layout is None:
+                layout = self._type_chunk_layouts[chunk_start] = self._read_type_chunk_layout(chunk_start)
+
+            return layout
+
+        def _read_type_chunk_layout(self, chunk_start: int) -> Tuple[Tuple[int, ...], int, Tuple[int, ...]]:
+            _, header_size, _ = self._read_chunk_header(chunk_start)
+            _, flags, _, entry_count, entries_start = self._buffer.unpack("<BBHII", chunk_start + 8)
+
+            config_size = self._buffer.unpack("<I", chunk_start + 20)[0]
+            if config_size < 28:
+                raise FastAPKReader.UnsupportedAPKException()
+
+            config_fields = self._buffer.unpack("<6I", chunk_start + 24)
+            for minimum_config_size, field_position in ((32, 52), (36, 56), (40, 60)):
+                config_fields += (self._buffer.unpack("<I", chunk_start + field_position) if config_size >= minimum_config_size else (0,))
+
+            # pyaxmlparser doesn't support sparse and 16-bit offset entry encodings and reads the entries one after
+            #  another, regardless of their offsets
+            offsets_start = 20 + config_size
+            if flags != 0 or header_size != offsets_start or entries_start != offsets_start + (4 * entry_count):
+                raise FastAPKReader.UnsupportedAPKException()
+
+            entry_offsets = self._buffer.unpack("<{}I".format(entry_count), chunk_start + offsets_start)
+            previous_offset = -1
+            for offset in entry_offsets:
+                if offset != 0xFFFFFFFF:
+                    if offset <= previous_offset or (previous_offset == -1 and offset != 0):
+                        raise FastAPKReader.UnsupportedAPKException()
+                    previous_offset = offset
+
+            return config_fields, chunk_start + entries_start, entry_offsets
+
+        def _read_simple_entry_value(self, entry_start: int) -> Tuple[int, int]:
+            entry_size, entry_flags, _ = self._buffer.unpack("<HHI", entry_start)
+            if entry_size != 8 or (entry_flags & (FastAPKReader._ENTRY_FLAG_COMPLEX | FastAPKReader._ENTRY_FLAG_WEAK | FastAPKReader._ENTRY_FLAG_COMPACT)):
+                raise FastAPKReader.UnsupportedAPKException()
+
+            _, reserved, value_type, value_data = self._buffer.unpack("<HBBI", entry_start + 8)
+            if reserved != 0:
+                raise FastAPKReader.UnsupportedAPKException()
+
+            return value_type, value_data
+
+    _RES_STRING_POOL_TYPE: int = 0x0001
+    _RES_TABLE_TYPE: int = 0x0002
+    _RES_XML_TYPE: int = 0x0003
+    _RES_XML_START_NAMESPACE_TYPE: int = 0x0100
+    _RES_XML_END_NAMESPACE_TYPE: int = 0x0101
+    _RES_XML_START_ELEMENT_TYPE: int = 0x0102
+    _RES_XML_END_ELEMENT_TYPE: int = 0x0103
+    _RES_XML_CDATA_TYPE: int = 0x0104
+    _RES_XML_RESOURCE_MAP_TYPE: int = 0x0180
+    _RES_TABLE_PACKAGE_TYPE: int = 0x0200
+    _RES_TABLE_TYPE_TYPE: int = 0x0201
+
+    _UTF8_FLAG: int = 0x100
+    _ENTRY_FLAG_COMPLEX: int = 0x1
+    _ENTRY_FLAG_WEAK: int = 0x4
+    _ENTRY_FLAG_COMPACT: int = 0x8
+
+    _TYPE_REFERENCE: int = 0x01
+    _TYPE_ATTRIBUTE: int = 0x02
+    _TYPE_STRING: int = 0x03
+    _TYPE_FIRST_INT: int = 0x10
+    _TYPE_INT_HEX: int = 0x11
+    _TYPE_INT_BOOLEAN: int = 0x12
+    _TYPE_FIRST_COLOR_INT: int = 0x1C
+    _TYPE_LAST_INT: int = 0x1F
+
+    _ANDROID_NAMESPACE: str = "http://schemas.android.com/apk/res/android"
+    _ANDROID_PACKAGE_ID: int = 0x01
+
+    # Names and values pyaxmlparser would have to "fix" up when building its XML tree (usually a sign of a packer)
+    _VALID_NAME_REGEX = re.compile(r'^[A-Za-z_][A-Za-z0-9._-]*$')
+    _INVALID_VALUE_CHARACTER_REGEX = re.compile('[^\u0020-\uD7FF\u0009\u000A\u000D\uE000-\uFFFD\U00010000-\U0010FFFF]')
+
+    def __init__(self, apk_path: str):
+        self._zip_file: zipfile.ZipFile = zipfile.ZipFile(apk_path)
+
+        try:
+            self._read_manifest(FastAPKReader._Buffer(self._zip_file.read("AndroidManifest.xml")))
+
+            try:
+                resource_table_info = self._zip_file.getinfo("resources.arsc")
+            except KeyError:
+                self._resolve_app_name_and_icon(None)
+            else:
+                if resource_table_info.compress_type == zipfile.ZIP_STORED:
+                    with open(apk_path, "rb") as apk_file, mmap.mmap(apk_file.fileno(), 0, access=mmap.ACCESS_READ) as apk_mmap:
+                        self._resolve_app_name_and_icon(self._get_stored_file_buffer(apk_mmap, resource_table_info))
+                else:
+                    self._resolve_app_name_and_icon(FastAPKReader._Buffer(self._zip_file.read(resource_table_info)))
+
+        except BaseException:
+            self._zip_file.close()
+            raise
+
+    def is_valid_APK(self) -> bool:
+        return True  # Invalid APKs are never accepted by the constructor
+
+    @property
+    def packagename(self) -> Optional[str]:
+        return self._package_name
+
+    @property
+    def version_code(self) -> Optional[str]:
+        return self._version_code
+
+    @property
+    def version_name(self) -> Optional[str]:
+        return self._version_name
+
+    def get_app_name(self) -> str:
+        return self._app_name
+
+    def get_min_sdk_version(self) -> Optional[str]:
+        return self._min_sdk_version
+
+    def get_max_sdk_version(self) -> Optional[str]:
+        return self._max_sdk_version
+
+    def get_app_icon(self, max_dpi: int = 65536) -> Optional[str]:
+        # The same selection as in pyaxmlparser: the densest raster icon whose density is not greater than max_dpi
+        app_icon = None
+        current_dpi = -1
+        for dpi, file_name in self._app_icon_candidates:
+            if current_dpi < dpi <= max_dpi and not file_name.endswith(".xml"):
+                app_icon = file_name
+                current_dpi = dpi
+
+        return app_icon
+
+    def get_file(self, filename: str) -> bytes:
+        return self._zip_file.read(filename)
+
+    def _get_stored_file_buffer(self, apk_mmap: mmap.mmap, file_info: zipfile.ZipInfo) -> "FastAPKReader._Buffer":
+        if file_info.flag_bits & 0x1:  # Encrypted
+            raise FastAPKReader.UnsupportedAPKException()
+
+        apk_buffer = FastAPKReader._Buffer(apk_mmap)
+        if apk_buffer.read(file_info.header_offset, file_info.header_offset + 4) != b"PK\x03\x04":
+            raise FastAPKReader.UnsupportedAPKException()
+
+        file_name_length, extra_field_length = apk_buffer.unpack("<HH", file_info.header_offset + 26)
+        file_start = file_info.header_offset + 30 + file_name_length + extra_field_length
+        file_end = file_start + file_info.file_size
+        if file_end > len(apk_buffer):
+            raise FastAPKReader.UnsupportedAPKException()
+
+        return FastAPKReader._Buffer(apk_mmap, file_start, file_end)
+
+    def _read_manifest(self, manifest: "FastAPKReader._Buffer") -> None:
+        chunk_type, header_size, manifest_size = manifest.unpack("<HHI", 0)
+        if chunk_type != FastAPKReader._RES_XML_TYPE or header_size != 8 or manifest_size != len(manifest):
+            raise FastAPKReader.UnsupportedAPKException()
+
+        self._manifest_strings: FastAPKReader._StringPool = FastAPKReader._StringPool(manifest, 8)
+
+        # Each element is represented by its (qualified) tag name and a dictionary mapping its attributes' (qualified)
+        #  names to (value type, value data, raw value string index)
+        root_element: Optional[Tuple[str, Dict[str, Tuple[int, int, int]]]] = None
+        descendant_elements: List[Tuple[str, Dict[str, Tuple[int, int, int]]]] = []
+        depth = 0
+
+        chunk_start = 8 + manifest.unpack("<I", 12)[0]
+        while chunk_start < manifest_size:
+            chunk_type, header_size, chunk_size = manifest.unpack("<HHI", chunk_start)
+
+            if chunk_type == FastAPKReader._RES_XML_RESOURCE_MAP_TYPE:
+                expected_header_size, expected_chunk_size = 8, chunk_size
+            elif chunk_type in (FastAPKReader._RES_XML_START_NAMESPACE_TYPE, FastAPKReader._RES_XML_END_NAMESPACE_TYPE, FastAPKReader._RES_XML_END_ELEMENT_TYPE):
+                expected_header_size, expected_chunk_size = 16, 24
+            elif chunk_type == FastAPKReader._RES_XML_CDATA_TYPE:
+                expected_header_size, expected_chunk_size = 16, 28
+            elif chunk_type == FastAPKReader._RES_XML_START_ELEMENT_TYPE:
+                expected_header_size, expected_chunk_size = 16, 36 + 20 * manifest.unpack("<H", chunk_start + 28)[0]
+            else:
+                raise FastAPKReader.UnsupportedAPKException()
+
+            # pyaxmlparser doesn't skip any padding at the end of chunks
+            if header_size != expected_header_size or chunk_size != expected_chunk_size or chunk_size % 4 != 0 or chunk_start + chunk_size > manifest_size:
+                raise FastAPKReader.UnsupportedAPKException()
+
+            if chunk_type == FastAPKReader._RES_XML_START_ELEMENT_TYPE:
+                if root_element is not None and depth == 0:
+                    break  # pyaxmlparser ignores everything after the root element
+
+                element = self._read_manifest_element(manifest, chunk_start)
+                if root_element is None:
+                    root_element = element
+                else:
+                    descendant_elements.append(element)
+                depth += 1
+
+            elif chunk_type == FastAPKReader._RES_XML_END_ELEMENT_TYPE:
+                if depth == 0:
+                    raise FastAPKReader.UnsupportedAPKException()
+                depth -= 1
+
+            chunk_start += chunk_size
+
+        if root_element is None or root_element[0] != "manifest":
+            raise FastAPKReader.UnsupportedAPKException()
+
+        self._manifest_root_element: Tuple[str, Dict[str, Tuple[int, int, int]]] = root_element
+        self._manifest_descendant_elements: List[Tuple[str, Dict[str, Tuple[int, int, int]]]] = descendant_elements
+
+        self._package_name: Optional[str] = self._get_formatted_manifest_attribute_value("manifest", "package")
+        self._version_code: Optional[str] = self._get_formatted_manifest_attribute_value("manifest", "versionCode")
+        self._version_name: Optional[str] = self._get_formatted_manifest_attribute_value("manifest", "versionName")
+        self._min_sdk_version: Optional[str] = self._get_formatted_manifest_attribute_value("uses-sdk", "minSdkVersion")
+        self._max_sdk_version: Optional[str] = self._get_formatted_manifest_attribute_value("uses-sdk", "maxSdkVersion")
+
+    def _read_manifest_element(self, manifest: "FastAPKReader._Buffer", chunk_start: int) -> Tuple[str, Dict[str, Tuple[int, int, int]]]:
+        namespace_index, name_index, attribute_start, attribute_size, attribute_count = manifest.unpack("<IIHHH", chunk_start + 16)
+        if attribute_start != 20 or attribute_size != 20:
+            raise FastAPKReader.UnsupportedAPKException()
+
+        attributes = {}
+        for attribute_position in range(chunk_start + 36, chunk_start + 36 + (20 * attribute_count), 20):
+            attribute_namespace_index, attribute_name_index, raw_value_index, value_header, value_data = manifest.unpack("<5I", attribute_position)
+            attribute_name = self._get_qualified_manifest_name(attribute_namespace_index, attribute_name_index)
+            attributes[attribute_name] = (value_header >> 24, value_data, raw_value_index)
+
+        return self._get_qualified_manifest_name(namespace_index, name_index), attributes
+
+    def _get_qualified_manifest_name(self, namespace_index: int, name_index: int) -> str:
+        name = self._manifest_strings.get_string(name_index)
+        if not FastAPKReader._VALID_NAME_REGEX.match(name):
+            raise FastAPKReader.UnsupportedAPKException()
+
+        if namespace_index == 0xFFFFFFFF:
+            return name
+
+        namespace = self._manifest_strings.get_string(namespace_index)
+        return "{{{}}}{}".format(namespace, name) if namespace else name
+
+    def _get_manifest_attribute_value(self, tag_name: str, attribute_name: str) -> Optional[Tuple[int, int, int]]:
+        # Mirrors pyaxmlparser.APK.get_attribute_value(): the root element is the only candidate if it has the wanted
+        #  name, otherwise all the descendants with the name are, and an attribute without a namespace takes precedence
+        #  unless its value is empty
+        if self._manifest_root_element[0] == tag_name:
+            elements = [self._manifest_root_element]
+        else:
+            elements = [element for element in self._manifest_descendant_elements if element[0] == tag_name]
+
+        for _, attributes in elements:
+            value = attributes.get(attribute_name)
+            if value is None or self._format_manifest_attribute_value(value) == "":
+                value = attributes.get("{{{}}}{}".format(FastAPKReader._ANDROID_NAMESPACE, attribute_name))
+
+            if value is not None:
+                return value
+
+        return None
+
+    def _get_formatted_manifest_attribute_value(self, tag_name: str, attribute_name: str) -> Optional[str]:
+        value = self._get_manifest_attribute_value(tag_name, attribute_name)
+        if value is None:
+            return None
+
+        return self._format_manifest_attribute_value(value)
+
+    def _format_manifest_attribute_value(self, value: Tuple[int, int, int]) -> str:
+        # Mirrors pyaxmlparser.utils.format_value() for the value types which can be formatted exactly
+        value_type, value_data, raw_value_index = value
+
+        if value_type == FastAPKReader._TYPE_STRING:
+            string = self._manifest_strings.get_string(raw_value_index)
+            if FastAPKReader._INVALID_VALUE_CHARACTER_REGEX.search(string):
+                raise FastAPKReader.UnsupportedAPKException()
+            return string
+
+        if value_type in (FastAPKReader._TYPE_REFERENCE, FastAPKReader._TYPE_ATTRIBUTE):
+            return "{}{}{:08X}".format(
+                "@" if value_type == FastAPKReader._TYPE_REFERENCE else "?",
+                "android:" if (value_data >> 24) == FastAPKReader._ANDROID_PACKAGE_ID else "",
+                value_data
+            )
+
+        if value_type == FastAPKReader._TYPE_INT_HEX:
+            return "0x{:08X}".format(value_data)
+
+        if value_type == FastAPKReader._TYPE_INT_BOOLEAN:
+            return "false" if value_data == 0 else "true"
+
+        if FastAPKReader._TYPE_FIRST_COLOR_INT <= value_type <= FastAPKReader._TYPE_LAST_INT:
+            return "#{:08X}".format(value_data)
+
+        if FastAPKReader._TYPE_FIRST_INT <= value_type <= FastAPKReader._TYPE_LAST_INT:
+            return str(value_data - 0x100000000 if value_data > 0x7FFFFFFF else value_data)
+
+        raise FastAPKReader.UnsupportedAPKException()
+
+    def _resolve_app_name_and_icon(self, resource_table_buffer: Optional["FastAPKReader._Buffer"]) -> None:
+        # pyaxmlparser falls back to the main activity's label if the application doesn't have one, and prefers the
+        #  main activity's icon to the application's; finding the main activity is left to it.
+        label = self._get_manifest_attribute_value("application", "label")
+        icon = self._get_manifest_attribute_value("application", "icon")
+        if label is None or icon is None or self._get_manifest_attribute_value("activity", "icon") is not None:
+            raise FastAPKReader.UnsupportedAPKException()
+
+        if label[0] == FastAPKReader._TYPE_STRING:
+            self._app_name: str = self._format_manifest_attribute_value(label)
+            if self._app_name.startswith("@"):
+                raise FastAPKReader.UnsupportedAPKException()
+
+        if resource_table_buffer is None or not self._is_app_resource_reference(icon):
+            raise FastAPKReader.UnsupportedAPKException()
+
+        resource_table = FastAPKReader._ResourceTable(resource_table_buffer)
+
+        if label[0] != FastAPKReader._TYPE_STRING:
+            if not self._is_app_resource_reference(label):
+                raise FastAPKReader.UnsupportedAPKException()
+
+            resolved_labels = resource_table.resolve(label[1], default_config_only=True)
+            if not resolved_labels:
+                raise FastAPKReader.UnsupportedAPKException()
+
+            self._app_name = resource_table.get_string(resolved_labels[0][1], resolved_labels[0][2])
+
+        self._app_icon_candidates: List[Tuple[int, str]] = [
+            (resource_table.get_config_density(config), resource_table.get_string(value_type, value_data))
+            for config, value_type, value_data in resource_table.resolve(icon[1], default_config_only=False)
+        ]
+
+    @staticmethod
+    def _is_app_resource_reference(value: Tuple[int, int, int]) -> bool:
+        # References to the framework's resources can't be resolved without framework-res.apk
+        return value[0] == FastAPKReader._TYPE_REFERENCE and (value[1] >> 24) != FastAPKReader._ANDROID_PACKAGE_ID
@@ -20,7 +20,7 @@
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
 
-from typing import Optional
+from typing import Optional, Dict, Tuple
 from selfdroid.appstorage.AppMetadataDBModel import AppMetadataDBModel
 
 
@@ -28,7 +28,7 @@ class ParsedAPK:
     def __init__(self,
                  app_name: str, package_name: str, version_code: int, version_name: str,
                  min_api_level: int, max_api_level: Optional[int],
-                 apk_file_size: int, uniform_png_app_icon: bytes):
+                 apk_file_size: int, apk_sha256: str, uniform_png_app_icon: bytes, app_icon_renditions: Dict[Tuple[int, str], bytes]):
 
         self.app_name: str = app_name
         self.package_name: str = package_name
@@ -39,7 +39,9 @@ class ParsedAPK:
         self.max_api_level: Optional[int] = max_api_level
 
         self.apk_file_size: int = apk_file_size
+        self.apk_sha256: str = apk_sha256
         self.uniform_png_app_icon: bytes = uniform_png_app_icon
+        self.app_icon_renditions: Dict[Tuple[int, str], bytes] = app_icon_renditions  # See AppIconRenditions.generate_renditions()
 
     def create_new_db_model_with_metadata(self) -> AppMetadataDBModel:
         return AppMetadataDBModel(
@@ -51,7 +53,8 @@ class ParsedAPK:
             min_api_level=self.min_api_level,
             max_api_level=self.max_api_level,
 
-            apk_file_size=self.apk_file_size
+            apk_file_size=self.apk_file_size,
+            apk_sha256=self.apk_sha256
         )
 
     def fill_existing_db_model_with_metadata(self, db_model: AppMetadataDBModel) -> None:
@@ -64,3 +67,4 @@ class ParsedAPK:
         db_model.max_api_level = self.max_api_level
 
         db_model.apk_file_size = self.apk_file_size
+        db_model.apk_sha256 = self.apk_sha256
@@ -0,0 +1,113 @@
+# SPDX-License-Identifier: BSD-3-Clause
+#
+# Copyright (c) 2021 Vít Labuda. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+# following conditions are met:
+#  1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+#     disclaimer.
+#  2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the
+#     following disclaimer in the documentation and/or other materials provided with the distribution.
+#  3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote
+#     products derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+from typing import Optional, Union, Callable, Dict
+import collections
+import threading
+from selfdroid.appstorage.apk.ParsedAPK import ParsedAPK
+from selfdroid.appstorage.apk.APKParserException import APKParserException
+
+
+class ParsedAPKCache:
+    """
+    A per-process cache of APK parsing results (including the converted icons), keyed by the SHA-256 hash of the APK
+    files' contents, so that re-uploads of the same APK file (e.g. retries after network failures) don't have to be
+    parsed again. The rejections of invalid APK files are cached too.
+    """
+
+    def __init__(self, max_entries: int):
+        """
+        :param max_entries: The maximum number of entries; when exceeded, the least recently used entries are evicted. If it's 0 (or less), the cache is disabled.
+        """
+
+        self._max_entries: int = max_entries
+
+        # APK SHA-256 hash (str) -> the parsed APK, or the user-readable message of the APKParserException it was rejected with
+        self._entries: collections.OrderedDict = collections.OrderedDict()
+        self._lock: threading.Lock = threading.Lock()
+
+        self._hits: int = 0
+        self._misses: int = 0
+        self._evictions: int = 0
+
+    def is_enabled(self) -> bool:
+        return self._max_entries > 0
+
+    def get_or_parse(self, apk_sha256: str, parse_function: Callable[[], ParsedAPK]) -> ParsedAPK:
+        """
+        Returns the cached parsing result of the APK file with the hash, or calls the parse function and caches its result.
+        The parse function is called without holding the cache's lock, so the same APK might be parsed concurrently.
+
+        :raises APKParserException: If the APK file has been (or is) rejected by the parse function.
+        """
+
+        cached_result = self._get_entry(apk_sha256)
+        if cached_result is None:
+            try:
+                parsed_apk = parse_function()
+            except APKParserException as e:
+                self._put_entry(apk_sha256, e.user_readable_message)
+                raise e
+
+            self._put_entry(apk_sha256, parsed_apk)
+            return parsed_apk
+
+        if isinstance(cached_result, ParsedAPK):
+            return cached_result
+
+        raise APKParserException(cached_result)
+
+    def get_statistics(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self._max_entries,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions
+            }
+
+    def _get_entry(self, apk_sha256: str) -> Optional[Union[ParsedAPK, str]]:
+        if not self.is_enabled():
+            return None
+
+        with self._lock:
+            cached_result = self._entries.get(apk_sha256)
+            if cached_result is None:
+                self._misses += 1
+                return None
+
+            self._entries.move_to_end(apk_sha256)
+            self._hits += 1
+            return cached_result
+
+    def _put_entry(self, apk_sha256: str, result: Union[ParsedAPK, str]) -> None:
+        if not self.is_enabled():
+            return
+
+        with self._lock:
+            self._entries[apk_sha256] = result
+            self._entries.move_to_end(apk_sha256)
+
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
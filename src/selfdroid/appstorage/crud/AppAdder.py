@@ -20,12 +20,16 @@
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
 
-import os
+from typing import Optional
+import datetime
 import sqlalchemy.exc
 from selfdroid.appstorage.AppMetadata import AppMetadata
+from selfdroid.appstorage.AppStorageHelpers import AppStorageHelpers
 from selfdroid.appstorage.AppMetadataDBModel import AppMetadataDBModel
+from selfdroid.appstorage.AppChangeLogDBModel import AppChangeLogDBModel
 from selfdroid.appstorage.AppStorageConsistencyEnsurer import AppStorageConsistencyEnsurer
-from selfdroid.appstorage.apk.APKParser import APKParser
+from selfdroid.appstorage.MaterializedCatalog import MaterializedCatalog
+from selfdroid.appstorage.BlobStore import BlobStore
 from selfdroid.appstorage.apk.ParsedAPK import ParsedAPK
 from selfdroid.appstorage.crud.AppAdderException import AppAdderException
 from selfdroid.web.WebStatusMessageCollector import WebStatusMessageCollector
@@ -34,21 +38,29 @@ from selfdroid import db
 
 class AppAdder:
     """
-    This class must be instantiated and have its public methods called in a locked context!
+    The uploaded APK must be parsed (see APKParser) before this class is instantiated - as that can take a long time,
+    it should be done without holding any lock. This class's public methods must be called in a locked context!
     """
 
-    def __init__(self, uploaded_apk_path: str):
+    def __init__(self, uploaded_apk_path: str, parsed_apk: ParsedAPK):
         self._uploaded_apk_path: str = uploaded_apk_path
+        self._parsed_apk: ParsedAPK = parsed_apk
 
-        self._parsed_apk: ParsedAPK = APKParser(self._uploaded_apk_path).parsed_apk
+        self._added_app_id: Optional[int] = None  # Set once the app's ID has been allocated
+        self._stored_icon_sha256: Optional[str] = None  # Set once the app's icon has been stored
 
     def add_app_while_locked(self) -> AppMetadata:
         """
+        Must be called while holding the global lock (see AppStorageHelpers.lock_apps() - the app doesn't have an ID,
+        and therefore a stripe lock, yet; no one else can modify it before its metadata are committed anyway). The
+        catalog lock is held only while the app's ID is allocated and its metadata committed, so that the other apps can
+        be modified while the app's files are being stored.
+
         :return: The metadata of the added app.
         """
 
         try:
-            app_metadata =  self._add_app_while_locked_with_exceptions_handled()
+            return self._add_app_while_locked_with_exceptions_handled()
 
         except (sqlalchemy.exc.SQLAlchemyError, OSError):
             db.session.rollback()
@@ -56,42 +68,90 @@ class AppAdder:
             raise AppAdderException("An error occurred while adding the app!")
 
         finally:
-            AppStorageConsistencyEnsurer().ensure_consistency_while_locked()
-
-        return app_metadata
+            # The catalog is regenerated even if the modification failed, as the app storage might have been partially
+            #  modified before the failure (and then cleaned up by the consistency ensurer).
+            MaterializedCatalog().regenerate_if_outdated_while_locked()
 
     def _add_app_while_locked_with_exceptions_handled(self) -> AppMetadata:
+        # The app is checked (in a new snapshot) before its files are stored, so that they aren't stored in vain, and
+        #  once again when its metadata are about to be committed, as an app with the same APK file or package name might
+        #  have been added in the meantime.
+        db.session.rollback()
         self._check_if_app_can_be_added()
 
-        return self._perform_app_addition()
+        try:
+            self._store_app_files()
+
+        except Exception:
+            with AppStorageHelpers.lock_catalog():
+                db.session.rollback()
+                self._release_stored_files_while_catalog_locked()
+
+            raise
+
+        with AppStorageHelpers.lock_catalog():
+            # Other apps might have been modified since the current database transaction began, and SQLite refuses to
+            #  write in a transaction whose snapshot is outdated, so a new one is begun.
+            db.session.rollback()
+
+            try:
+                self._check_if_app_can_be_added()
+
+                return self._perform_app_addition_while_catalog_locked()
+
+            finally:
+                # Ends the transaction if it has failed, and begins a new snapshot, in which the stored files' references
+                #  are counted
+                db.session.rollback()
+
+                if self._added_app_id is not None:
+                    AppStorageConsistencyEnsurer().ensure_consistency_of_app_while_locked(self._added_app_id)
+
+                # If the addition failed, the stored files might not be referenced by any app
+                self._release_stored_files_while_catalog_locked()
 
     def _check_if_app_can_be_added(self) -> None:
+        an_app_with_the_same_apk = AppMetadataDBModel.query.filter_by(apk_sha256=self._parsed_apk.apk_sha256).first()
+        if an_app_with_the_same_apk is not None:
+            html_message = WebStatusMessageCollector.format_html_message("The supplied APK file is already present on the server as the app <b>{}</b>!", an_app_with_the_same_apk.app_name)
+            raise AppAdderException(html_message)
+
         an_app_with_the_same_package_name = AppMetadataDBModel.query.filter_by(package_name=self._parsed_apk.package_name).first()
         if an_app_with_the_same_package_name is not None:
             html_message = WebStatusMessageCollector.format_html_message("An app with the same package name <i>({})</i> is already present on the server! You should update the app instead of adding it!", self._parsed_apk.package_name)
             raise AppAdderException(html_message)
 
-    def _perform_app_addition(self) -> AppMetadata:
+    def _store_app_files(self) -> None:
+        # The app's files are stored before its metadata are committed to the database, so that the app becomes visible
+        #  to the readers (which don't hold the app storage lock) only once it's complete - see the NOTES file.
+        blob_store = BlobStore()
+
+        # 1. Icon
+        self._stored_icon_sha256 = blob_store.store_icon_while_locked(self._parsed_apk.uniform_png_app_icon, self._parsed_apk.app_icon_renditions)
+
+        # 2. APK
+        blob_store.store_apk_while_locked(self._uploaded_apk_path, self._parsed_apk.apk_sha256)
+
+    def _perform_app_addition_while_catalog_locked(self) -> AppMetadata:
         # An UserReadableException mustn't be raised in this method!
 
-        # 1. Database
+        # 1. Icon & APK (they might have been released by a concurrent modification since they were stored - see BlobStore)
+        self._store_app_files()
+
+        # 2. Database
         db_model = self._parsed_apk.create_new_db_model_with_metadata()
+        db_model.icon_sha256 = self._stored_icon_sha256
+        db_model.added_datetime = db_model.last_updated_datetime = datetime.datetime.utcnow()
         db.session.add(db_model)
-        db.session.commit()
+        db.session.flush()  # Assigns the app's ID
 
         assert isinstance(db_model.id, int)
+        self._added_app_id = db_model.id
 
-        app_metadata = AppMetadata.from_db_model(db_model)
-
-        # 2. APK
-        apk_path = app_metadata.get_apk_path()
-
-        os.rename(self._uploaded_apk_path, apk_path)
-
-        # 3. Icon
-        icon_path = app_metadata.get_icon_path()
+        db.session.add(AppChangeLogDBModel.create_for_app(db_model, is_deletion=False))
+        db.session.commit()
 
-        with open(icon_path, "wb") as icon_file:
-            icon_file.write(self._parsed_apk.uniform_png_app_icon)
+        return AppMetadata.from_db_model(db_model)
 
-        return app_metadata
+    def _release_stored_files_while_catalog_locked(self) -> None:
+        BlobStore().release_blobs_while_locked([self._parsed_apk.apk_sha256], [self._stored_icon_sha256])
@@ -0,0 +1,260 @@
+# SPDX-License-Identifier: BSD-3-Clause
+#
+# Copyright (c) 2021 Vít Labuda. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+# following conditions are met:
+#  1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+#     disclaimer.
+#  2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the
+#     following disclaimer in the documentation and/or other materials provided with the distribution.
+#  3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote
+#     products derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+from __future__ import annotations
+from typing import Optional, List, Tuple, Dict
+import os
+import os.path
+import time
+import datetime
+import concurrent.futures
+import sqlalchemy.exc
+from selfdroid.appstorage.AppStorageHelpers import AppStorageHelpers
+from selfdroid.appstorage.AppMetadataDBModel import AppMetadataDBModel
+from selfdroid.appstorage.AppChangeLogDBModel import AppChangeLogDBModel
+from selfdroid.appstorage.AppStorageConsistencyEnsurer import AppStorageConsistencyEnsurer
+from selfdroid.appstorage.MaterializedCatalog import MaterializedCatalog
+from selfdroid.appstorage.BlobStore import BlobStore
+from selfdroid.appstorage.apk.APKParser import APKParser
+from selfdroid.appstorage.apk.APKParserException import APKParserException
+from selfdroid.appstorage.apk.ParsedAPK import ParsedAPK
+from selfdroid import db
+
+
+class AppBulkImporter:
+    """
+    Adds or updates the apps from all the APK files in a directory (including its subdirectories) at once.
+
+    First, the APK files are copied into the temporary directory, hashed and parsed by a pool of processes, without
+    holding any lock. Then, only the highest version of each package is considered - it's added if the package isn't
+    present on the server yet, updates the app if its version code is greater than the app's, and is skipped otherwise.
+
+    The app storage is then modified while holding the global lock in the exclusive mode, which excludes all the other
+    modifications (but not the lock-free readers). The apps are committed to the database in batches, and the app
+    storage's consistency is ensured and the catalog is regenerated only once at the end, instead of after every
+    modified app as AppAdder and AppUpdater do.
+    """
+
+    class Result:
+        def __init__(self):
+            self.apk_file_count: int = 0
+            self.apk_files_total_size: int = 0  # in bytes
+
+            # Lists of (APK file path, app name or a message) 2-tuples
+            self.added_apps: List[Tuple[str, str]] = []
+            self.updated_apps: List[Tuple[str, str]] = []
+            self.skipped_apk_files: List[Tuple[str, str]] = []
+            self.failed_apk_files: List[Tuple[str, str]] = []
+
+            self.parsing_duration: float = 0.0  # in seconds
+            self.total_duration: float = 0.0  # in seconds
+
+    class _PreparedAPK:
+        # An APK file copied into the temporary directory and parsed by _prepare_apk()
+        def __init__(self, apk_path: str, temporary_apk_path: str, parsed_apk: Optional[ParsedAPK], error_message: Optional[str]):
+            self.apk_path: str = apk_path
+            self.temporary_apk_path: str = temporary_apk_path
+            self.parsed_apk: Optional[ParsedAPK] = parsed_apk
+            self.error_message: Optional[str] = error_message
+
+    def __init__(self, directory_path: str, worker_count: Optional[int], batch_size: int):
+        """
+        :param worker_count: The number of processes parsing the APK files (None = the number of CPUs).
+        """
+
+        self._directory_path: str = directory_path
+        self._worker_count: Optional[int] = worker_count
+        self._batch_size: int = batch_size
+
+        self._result: AppBulkImporter.Result = AppBulkImporter.Result()
+
+    def import_apps(self) -> AppBulkImporter.Result:
+        started_at = time.monotonic()
+
+        apk_paths = self._find_apk_files()
+        self._result.apk_file_count = len(apk_paths)
+
+        # The temporary paths are generated here, so that the copies can be deleted even if a worker process fails
+        temporary_apk_paths = [AppStorageHelpers.generate_temp_filepath_for_apk() for _ in apk_paths]
+
+        try:
+            prepared_apks = self._prepare_apks(apk_paths, temporary_apk_paths)
+            self._result.parsing_duration = time.monotonic() - started_at
+
+            with AppStorageHelpers.lock_app_storage():
+                self._import_apps_while_locked(prepared_apks)
+
+        finally:
+            # The APK files which have been imported have been moved away from the temporary directory
+            for temporary_apk_path in temporary_apk_paths:
+                if os.path.exists(temporary_apk_path):
+                    os.remove(temporary_apk_path)
+
+        self._result.total_duration = time.monotonic() - started_at
+
+        return self._result
+
+    def _find_apk_files(self) -> List[str]:
+        apk_paths = []
+
+        for directory_path, _, filenames in os.walk(self._directory_path):
+            for filename in filenames:
+                if filename.lower().endswith(".apk"):
+                    apk_path = os.path.join(directory_path, filename)
+
+                    apk_paths.append(apk_path)
+                    self._result.apk_files_total_size += os.path.getsize(apk_path)
+
+        return sorted(apk_paths)
+
+    def _prepare_apks(self, apk_paths: List[str], temporary_apk_paths: List[str]) -> List[AppBulkImporter._PreparedAPK]:
+        if not apk_paths:
+            return []
+
+        with concurrent.futures.ProcessPoolExecutor(max_workers=self._worker_count) as executor:
+            return list(executor.map(AppBulkImporter._prepare_apk, apk_paths, temporary_apk_paths))
+
+    @staticmethod
+    def _prepare_apk(apk_path: str, temporary_apk_path: str) -> AppBulkImporter._PreparedAPK:
+        # Runs in a worker process - the parsed APK is sent back to the main process
+        try:
+            apk_sha256 = AppStorageHelpers.copy_apk(apk_path, temporary_apk_path)
+            parsed_apk = APKParser(temporary_apk_path, apk_sha256).parsed_apk
+
+        except OSError:
+            return AppBulkImporter._PreparedAPK(apk_path, temporary_apk_path, None, "Failed to copy the APK file!")
+
+        except APKParserException as e:
+            return AppBulkImporter._PreparedAPK(apk_path, temporary_apk_path, None, str(e.user_readable_message))
+
+        except Exception:
+            # An unexpected error must not abort the processing of the other APK files (see executor.map())
+            return AppBulkImporter._PreparedAPK(apk_path, temporary_apk_path, None, "An unexpected error occurred while processing the APK file!")
+
+        return AppBulkImporter._PreparedAPK(apk_path, temporary_apk_path, parsed_apk, None)
+
+    def _import_apps_while_locked(self, prepared_apks: List[AppBulkImporter._PreparedAPK]) -> None:
+        # Other apps might have been modified since the current database transaction began
+        db.session.rollback()
+
+        apks_to_import = self._choose_apks_to_import(prepared_apks)
+
+        for batch_start in range(0, len(apks_to_import), self._batch_size):
+            self._import_batch_while_locked(apks_to_import[batch_start:(batch_start + self._batch_size)])
+
+        # The apps whose files were stored but whose metadata failed to be committed leave unreferenced files behind,
+        #  which are deleted by the full check
+        AppStorageConsistencyEnsurer().ensure_consistency_while_locked()
+        MaterializedCatalog().regenerate_while_locked()
+
+    def _choose_apks_to_import(self, prepared_apks: List[AppBulkImporter._PreparedAPK]) -> List[Tuple[AppBulkImporter._PreparedAPK, Optional[AppMetadataDBModel]]]:
+        """
+        :return: A list of (prepared APK, the database model of the app it updates or None if it's a new app) 2-tuples.
+        """
+
+        highest_versions: Dict[str, AppBulkImporter._PreparedAPK] = {}
+
+        for prepared_apk in prepared_apks:
+            if prepared_apk.parsed_apk is None:
+                self._result.failed_apk_files.append((prepared_apk.apk_path, prepared_apk.error_message))
+                continue
+
+            package_name = prepared_apk.parsed_apk.package_name
+            highest_version = highest_versions.get(package_name)
+            if highest_version is not None:
+                if highest_version.parsed_apk.version_code >= prepared_apk.parsed_apk.version_code:
+                    self._skip_apk_superseded_by_another(prepared_apk, highest_version)
+                    continue
+
+                self._skip_apk_superseded_by_another(highest_version, prepared_apk)
+
+            highest_versions[package_name] = prepared_apk
+
+        existing_db_models = {db_model.package_name: db_model for db_model in AppMetadataDBModel.query.filter(AppMetadataDBModel.package_name.in_(highest_versions.keys())).all()}
+
+        apks_to_import = []
+        for package_name, prepared_apk in sorted(highest_versions.items()):
+            db_model = existing_db_models.get(package_name)
+            if db_model is not None and db_model.version_code >= prepared_apk.parsed_apk.version_code:
+                self._result.skipped_apk_files.append((prepared_apk.apk_path, "The version present on the server ({}) is not lower.".format(db_model.version_code)))
+                continue
+
+            apks_to_import.append((prepared_apk, db_model))
+
+        return apks_to_import
+
+    def _skip_apk_superseded_by_another(self, skipped_apk: AppBulkImporter._PreparedAPK, superseding_apk: AppBulkImporter._PreparedAPK) -> None:
+        self._result.skipped_apk_files.append((skipped_apk.apk_path, "The same or a higher version of the package is being imported from {}.".format(superseding_apk.apk_path)))
+
+    def _import_batch_while_locked(self, batch: List[Tuple[AppBulkImporter._PreparedAPK, Optional[AppMetadataDBModel]]]) -> None:
+        blob_store = BlobStore()
+        stored_apps = []  # (APK file path, app name, whether the app is being updated) 3-tuples
+        replaced_apk_sha256s, replaced_icon_sha256s = [], []
+
+        try:
+            for prepared_apk, db_model in batch:
+                parsed_apk = prepared_apk.parsed_apk
+
+                try:
+                    icon_sha256 = blob_store.store_icon_while_locked(parsed_apk.uniform_png_app_icon, parsed_apk.app_icon_renditions)
+                    blob_store.store_apk_while_locked(prepared_apk.temporary_apk_path, parsed_apk.apk_sha256)
+                except OSError:
+                    self._result.failed_apk_files.append((prepared_apk.apk_path, "Failed to store the app's files!"))
+                    continue
+
+                stored_apps.append((prepared_apk.apk_path, parsed_apk.app_name, db_model is not None))
+
+                if db_model is None:
+                    db_model = parsed_apk.create_new_db_model_with_metadata()
+                    db_model.added_datetime = db_model.last_updated_datetime = datetime.datetime.utcnow()
+                    db.session.add(db_model)
+                    db.session.flush()  # Assigns the app's ID
+                else:
+                    replaced_apk_sha256s.append(db_model.apk_sha256)
+                    replaced_icon_sha256s.append(db_model.icon_sha256)
+
+                    parsed_apk.fill_existing_db_model_with_metadata(db_model)
+                    db_model.last_updated_datetime = datetime.datetime.utcnow()
+
+                db_model.icon_sha256 = icon_sha256
+                db.session.add(AppChangeLogDBModel.create_for_app(db_model, is_deletion=False))
+
+            db.session.commit()
+
+        except sqlalchemy.exc.SQLAlchemyError:
+            db.session.rollback()
+
+            # The whole batch has been rolled back
+            failed_apk_paths = set(apk_path for apk_path, _ in self._result.failed_apk_files)
+            for prepared_apk, _ in batch:
+                if prepared_apk.apk_path not in failed_apk_paths:
+                    self._result.failed_apk_files.append((prepared_apk.apk_path, "Failed to save the app's metadata to the database!"))
+
+            return
+
+        for apk_path, app_name, is_update in stored_apps:
+            if is_update:
+                self._result.updated_apps.append((apk_path, app_name))
+            else:
+                self._result.added_apps.append((apk_path, app_name))
+
+        blob_store.release_blobs_while_locked(replaced_apk_sha256s, replaced_icon_sha256s)
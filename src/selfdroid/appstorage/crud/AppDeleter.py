@@ -20,11 +20,14 @@
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
 
-import os
 import sqlalchemy.exc
 from selfdroid.appstorage.AppMetadata import AppMetadata
 from selfdroid.appstorage.AppMetadataDBModel import AppMetadataDBModel
+from selfdroid.appstorage.AppChangeLogDBModel import AppChangeLogDBModel
 from selfdroid.appstorage.AppStorageConsistencyEnsurer import AppStorageConsistencyEnsurer
+from selfdroid.appstorage.MaterializedCatalog import MaterializedCatalog
+from selfdroid.appstorage.AppStorageHelpers import AppStorageHelpers
+from selfdroid.appstorage.BlobStore import BlobStore
 from selfdroid.appstorage.crud.AppDeleterException import AppDeleterException
 from selfdroid import db
 
@@ -40,19 +43,33 @@ class AppDeleter:
 
     def delete_app_while_locked(self) -> AppMetadata:
         """
+        Must be called while holding the app's stripe lock and the global lock (see AppStorageHelpers.lock_apps()). The
+        catalog lock is held only while the app's metadata are deleted and its files released - the materialized catalog
+        is regenerated without holding it.
+
         :return: The metadata of the deleted app.
         """
 
         try:
-            self._delete_app_while_locked_with_exceptions_handled()
+            with AppStorageHelpers.lock_catalog():
+                # Other apps might have been modified since the current database transaction began, and SQLite refuses
+                #  to write in a transaction whose snapshot is outdated, so a new one is begun.
+                db.session.rollback()
+
+                try:
+                    self._delete_app_while_locked_with_exceptions_handled()
+
+                except (sqlalchemy.exc.SQLAlchemyError, OSError):
+                    db.session.rollback()
 
-        except (sqlalchemy.exc.SQLAlchemyError, OSError):
-            db.session.rollback()
+                    raise AppDeleterException("An error occurred while deleting the app!")
 
-            raise AppDeleterException("An error occurred while deleting the app!")
+                finally:
+                    AppStorageConsistencyEnsurer().ensure_consistency_of_app_while_locked(self._app_metadata.id)
 
         finally:
-            AppStorageConsistencyEnsurer().ensure_consistency_while_locked()
+            # Even if the modification failed - see AppAdder.add_app_while_locked()
+            MaterializedCatalog().regenerate_if_outdated_while_locked()
 
         return self._app_metadata
 
@@ -64,14 +81,14 @@ class AppDeleter:
     def _perform_app_deletion(self) -> None:
         # An UserReadableException mustn't be raised in this method!
 
-        # 1. Database
+        # The app's metadata are deleted from the database first, so that the readers (which don't hold the app storage
+        #  lock) stop finding the app before its files disappear - see the NOTES file.
+
+        # 1. Database (the change log entry is created first, as the model's attributes might have been expired by a
+        #  rollback, and reloading them after the model has been marked as deleted would flush the deletion)
+        db.session.add(AppChangeLogDBModel.create_for_app(self._db_model, is_deletion=True))
         db.session.delete(self._db_model)
         db.session.commit()
 
-        # 2. APK
-        apk_path = self._app_metadata.get_apk_path()
-        os.remove(apk_path)
-
-        # 3. Icon
-        icon_path = self._app_metadata.get_icon_path()
-        os.remove(icon_path)
+        # 2. APK & icon (unless they're identical to another app's)
+        BlobStore().release_blobs_while_locked([self._app_metadata.apk_sha256], [self._app_metadata.icon_sha256])
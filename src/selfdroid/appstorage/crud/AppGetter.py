@@ -20,32 +20,218 @@
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
 
-from typing import List, Optional
+from typing import List, Optional, Tuple, Dict, Iterable
+import datetime
+import flask
+import sqlalchemy
 from selfdroid.appstorage.AppMetadata import AppMetadata
 from selfdroid.appstorage.AppMetadataDBModel import AppMetadataDBModel
+from selfdroid.appstorage.AppChangeLogDBModel import AppChangeLogDBModel
+from selfdroid.appstorage.crud.AppListingQuery import AppListingQuery
+from selfdroid import db
 
 
 class AppGetter:
-    def get_all_db_models_while_locked(self) -> List[AppMetadataDBModel]:
+    """
+    The methods of this class don't require the app storage lock to be held, as each request reads from a consistent
+    snapshot of the database - see the "LOCK-FREE READS" section in the NOTES file.
+    """
+
+    # Keeps the number of parameters of a query below the default limit of older SQLite versions (999)
+    _MAX_KEYS_PER_IN_QUERY: int = 500
+
+    def get_all_db_models(self) -> List[AppMetadataDBModel]:
         return AppMetadataDBModel.query.order_by(AppMetadataDBModel.app_name).all()
 
-    def get_all_metadata_while_locked(self) -> List[AppMetadata]:
-        return [self._convert_db_model_to_metadata(db_model) for db_model in self.get_all_db_models_while_locked()]
+    def get_all_metadata(self) -> List[AppMetadata]:
+        return [self._convert_db_model_to_metadata(db_model) for db_model in self.get_all_db_models()]
+
+    def get_page_of_metadata(self, listing_query: AppListingQuery) -> Tuple[List[AppMetadata], Optional[str]]:
+        """
+        :return: A 2-tuple containing the metadata of the apps on the page, and the cursor of the next page (or None if
+                 this is the last page).
+        """
+
+        sort_column = {
+            AppListingQuery.SORT_BY_NAME: AppMetadataDBModel.app_name,
+            AppListingQuery.SORT_BY_LAST_UPDATED: AppMetadataDBModel.last_updated_datetime,
+            AppListingQuery.SORT_BY_ADDED: AppMetadataDBModel.added_datetime
+        }[listing_query.sort_by]
+
+        query = AppMetadataDBModel.query
+
+        if listing_query.sdk is not None:
+            query = query.filter(AppMetadataDBModel.min_api_level <= listing_query.sdk)
+            query = query.filter(sqlalchemy.or_(AppMetadataDBModel.max_api_level.is_(None), AppMetadataDBModel.max_api_level >= listing_query.sdk))
+
+        if listing_query.package_prefix is not None:
+            # A range condition (unlike LIKE) can be satisfied using the package name's unique index
+            query = query.filter(AppMetadataDBModel.package_name >= listing_query.package_prefix)
+            query = query.filter(AppMetadataDBModel.package_name < listing_query.package_prefix + "\U0010ffff")
+
+        # The ID is used as a tie-breaker, as the sort key values don't have to be unique
+        if listing_query.is_sorted_in_descending_order():
+            if listing_query.after is not None:
+                after_value, after_id = listing_query.after
+                query = query.filter(sqlalchemy.or_(sort_column < after_value, sqlalchemy.and_(sort_column == after_value, AppMetadataDBModel.id < after_id)))
+
+            query = query.order_by(sort_column.desc(), AppMetadataDBModel.id.desc())
+
+        else:
+            if listing_query.after is not None:
+                after_value, after_id = listing_query.after
+                query = query.filter(sqlalchemy.or_(sort_column > after_value, sqlalchemy.and_(sort_column == after_value, AppMetadataDBModel.id > after_id)))
+
+            query = query.order_by(sort_column.asc(), AppMetadataDBModel.id.asc())
+
+        # One more row is fetched to find out whether there's a next page
+        db_models = query.limit(listing_query.page_size + 1).all()
+
+        next_page_cursor = None
+        if len(db_models) > listing_query.page_size:
+            db_models = db_models[:listing_query.page_size]
 
-    def get_db_model_while_locked(self, app_id: int) -> Optional[AppMetadataDBModel]:
+            last_db_model = db_models[-1]
+            last_sort_key_value = {
+                AppListingQuery.SORT_BY_NAME: last_db_model.app_name,
+                AppListingQuery.SORT_BY_LAST_UPDATED: last_db_model.last_updated_datetime,
+                AppListingQuery.SORT_BY_ADDED: last_db_model.added_datetime
+            }[listing_query.sort_by]
+
+            next_page_cursor = listing_query.encode_page_cursor(last_sort_key_value, last_db_model.id)
+
+        return [self._convert_db_model_to_metadata(db_model) for db_model in db_models], next_page_cursor
+
+    def get_db_model(self, app_id: int) -> Optional[AppMetadataDBModel]:
         return AppMetadataDBModel.query.get(app_id)
 
-    def get_metadata_while_locked(self, app_id: int) -> Optional[AppMetadata]:
-        return self._convert_db_model_to_metadata(self.get_db_model_while_locked(app_id))
+    def get_metadata(self, app_id: int) -> Optional[AppMetadata]:
+        return self._convert_db_model_to_metadata(self.get_db_model(app_id))
 
-    def get_db_model_or_404_while_locked(self, app_id: int) -> AppMetadataDBModel:
+    def get_db_model_or_404(self, app_id: int) -> AppMetadataDBModel:
         return AppMetadataDBModel.query.get_or_404(app_id)
 
-    def get_metadata_or_404_while_locked(self, app_id: int) -> AppMetadata:
-        return self._convert_db_model_to_metadata(self.get_db_model_or_404_while_locked(app_id))
+    def get_metadata_or_404(self, app_id: int) -> AppMetadata:
+        return self._convert_db_model_to_metadata(self.get_db_model_or_404(app_id))
+
+    def get_metadata_by_ids(self, app_ids: Iterable[int]) -> Dict[int, AppMetadata]:
+        """
+        Fetches the metadata of all the specified apps using a single query.
+
+        :return: A dictionary mapping the IDs of the apps which exist to their metadata.
+        """
+
+        db_models = AppMetadataDBModel.query.filter(AppMetadataDBModel.id.in_(set(app_ids))).all()
+
+        return {db_model.id: self._convert_db_model_to_metadata(db_model) for db_model in db_models}
+
+    def get_metadata_by_package_names(self, package_names: Iterable[str]) -> Dict[str, AppMetadata]:
+        """
+        Fetches the metadata of all the specified apps using a single query.
+
+        :return: A dictionary mapping the package names of the apps which exist to their metadata.
+        """
+
+        db_models = AppMetadataDBModel.query.filter(AppMetadataDBModel.package_name.in_(set(package_names))).all()
+
+        return {db_model.package_name: self._convert_db_model_to_metadata(db_model) for db_model in db_models}
+
+    def get_newer_versions(self, installed_version_codes: Dict[str, int], sdk: Optional[int] = None) -> List[sqlalchemy.engine.Row]:
+        """
+        Finds out which of the installed apps have a newer version in the app storage. Only the columns needed to
+        describe the update are fetched, and no AppMetadata objects are constructed. The package names are looked up in
+        chunks of _MAX_KEYS_PER_IN_QUERY, i.e. using one query per chunk.
+
+        :param installed_version_codes: A dictionary mapping the package names of the installed apps to their version codes.
+        :param sdk: If specified, only newer versions which can be installed on a device with this API level are returned.
+        :return: A list of rows with the id, package_name, version_code, version_name and apk_file_size attributes.
+        """
+
+        package_names = list(installed_version_codes.keys())
+        newer_versions = []
+
+        # The package names are looked up in chunks, so that the number of the query's parameters stays reasonable
+        for chunk_start in range(0, len(package_names), AppGetter._MAX_KEYS_PER_IN_QUERY):
+            package_names_chunk = package_names[chunk_start:(chunk_start + AppGetter._MAX_KEYS_PER_IN_QUERY)]
+
+            query = db.session.query(AppMetadataDBModel.id, AppMetadataDBModel.package_name, AppMetadataDBModel.version_code, AppMetadataDBModel.version_name, AppMetadataDBModel.apk_file_size) \
+                .filter(AppMetadataDBModel.package_name.in_(package_names_chunk))
+
+            if sdk is not None:
+                query = query.filter(AppMetadataDBModel.min_api_level <= sdk)
+                query = query.filter(sqlalchemy.or_(AppMetadataDBModel.max_api_level.is_(None), AppMetadataDBModel.max_api_level >= sdk))
+
+            rows = query.all()
+
+            newer_versions += [row for row in rows if row.version_code > installed_version_codes[row.package_name]]
+
+        return sorted(newer_versions, key=lambda row: row.package_name)
+
+    def get_id_by_package_name_or_404(self, package_name: str) -> int:
+        app_id = db.session.query(AppMetadataDBModel.id).filter_by(package_name=package_name).scalar()
+        if app_id is None:
+            flask.abort(404)
+
+        return app_id
+
+    def get_last_updated_datetime_or_404(self, app_id: int) -> datetime.datetime:
+        """
+        Fetches only the app's last update date & time (as an UTC timezone-aware datetime object), without loading the
+        whole database row.
+        """
+
+        last_updated_datetime = db.session.query(AppMetadataDBModel.last_updated_datetime).filter_by(id=app_id).scalar()
+        if last_updated_datetime is None:
+            flask.abort(404)
+
+        return AppMetadata.add_utc_timezone_to_naive_datetime_object(last_updated_datetime)
+
+    def get_latest_change_sequence_number(self) -> int:
+        """
+        :return: The sequence number of the latest change recorded in the change log, or 0 if it's empty.
+        """
+
+        latest_sequence_number = db.session.query(sqlalchemy.func.max(AppChangeLogDBModel.sequence_number)).scalar()
+
+        return latest_sequence_number or 0
+
+    def get_changes(self, after_sequence_number: int, up_to_sequence_number: int) -> Tuple[List[AppMetadata], List[AppChangeLogDBModel]]:
+        """
+        :return: A 2-tuple containing the metadata of the apps which were added or updated, and the change log entries
+                 of the apps which were deleted, within the specified range of sequence numbers.
+        """
+
+        # Only the latest change of each app within the range matters
+        latest_changes_subquery = db.session.query(AppChangeLogDBModel.app_id, sqlalchemy.func.max(AppChangeLogDBModel.sequence_number).label("latest_sequence_number")) \
+            .filter(AppChangeLogDBModel.sequence_number > after_sequence_number, AppChangeLogDBModel.sequence_number <= up_to_sequence_number) \
+            .group_by(AppChangeLogDBModel.app_id) \
+            .subquery()
+
+        latest_changes = AppChangeLogDBModel.query \
+            .join(latest_changes_subquery, AppChangeLogDBModel.sequence_number == latest_changes_subquery.c.latest_sequence_number) \
+            .all()
+
+        changed_db_models = AppMetadataDBModel.query \
+            .join(latest_changes_subquery, AppMetadataDBModel.id == latest_changes_subquery.c.app_id) \
+            .order_by(AppMetadataDBModel.app_name) \
+            .all()
+
+        # An app which has been deleted after the end of the range (= it was changed within the range, but it's no longer
+        #  present in the database) is reported as deleted as well - its deletion will just be reported again next time.
+        changed_app_ids = {db_model.id for db_model in changed_db_models}
+        deletions = [change for change in latest_changes if change.app_id not in changed_app_ids]
+
+        return [self._convert_db_model_to_metadata(db_model) for db_model in changed_db_models], deletions
+
+    def start_new_snapshot(self) -> None:
+        """
+        Ends the current read transaction, so that the subsequent queries see the changes committed in the meantime.
+        """
+
+        db.session.rollback()
 
     def does_app_exist_in_database(self, app_id: int) -> bool:
-        return self.get_db_model_while_locked(app_id) is not None
+        return self.get_db_model(app_id) is not None
 
     def _convert_db_model_to_metadata(self, db_model: AppMetadataDBModel) -> AppMetadata:
         return AppMetadata.from_db_model(db_model)
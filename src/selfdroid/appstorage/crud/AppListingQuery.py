@@ -0,0 +1,100 @@
+# SPDX-License-Identifier: BSD-3-Clause
+#
+# Copyright (c) 2021 Vít Labuda. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+# following conditions are met:
+#  1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+#     disclaimer.
+#  2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the
+#     following disclaimer in the documentation and/or other materials provided with the distribution.
+#  3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote
+#     products derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+from __future__ import annotations
+from typing import Optional, Union, List, Tuple
+import base64
+import binascii
+import json
+import datetime
+from selfdroid.Constants import Constants
+from selfdroid.appstorage.crud.AppListingQueryException import AppListingQueryException
+
+
+class AppListingQuery:
+    """
+    The parameters of a paginated, sorted and filtered app listing.
+
+    The pages are delimited using keyset pagination - a page cursor contains the sort key value and ID of the last app
+    on the previous page, so fetching any page costs the same (unlike when using offsets), and apps added or deleted
+    in the meantime don't cause any apps to be skipped or repeated.
+    """
+
+    SORT_BY_NAME: str = "name"  # ascending
+    SORT_BY_LAST_UPDATED: str = "last_updated"  # descending (= the most recently updated apps first)
+    SORT_BY_ADDED: str = "added"  # descending (= the most recently added apps first)
+    SORT_KEYS: List[str] = [SORT_BY_NAME, SORT_BY_LAST_UPDATED, SORT_BY_ADDED]
+
+    MAX_PAGE_SIZE: int = 1000
+
+    def __init__(self, page_size: int, sort_by: str = SORT_BY_NAME, page_cursor: Optional[str] = None,
+                 sdk: Optional[int] = None, package_prefix: Optional[str] = None):
+        """
+        :param sdk: If specified, only apps which can be installed on a device with this API level are listed.
+        :param package_prefix: If specified, only apps whose package name starts with this string are listed.
+        :raises AppListingQueryException: If any of the parameters is invalid.
+        """
+
+        if page_size < 1 or page_size > AppListingQuery.MAX_PAGE_SIZE:
+            raise AppListingQueryException("The page size must be between 1 and {}!".format(AppListingQuery.MAX_PAGE_SIZE))
+
+        if sort_by not in AppListingQuery.SORT_KEYS:
+            raise AppListingQueryException("The apps can only be sorted by one of the following keys: {}".format(", ".join(AppListingQuery.SORT_KEYS)))
+
+        if sdk is not None and (sdk < 1 or sdk > Constants.DB_MAX_INTEGER):
+            raise AppListingQueryException("The SDK version (API level) must be a positive integer not greater than {}!".format(Constants.DB_MAX_INTEGER))
+
+        self.page_size: int = page_size
+        self.sort_by: str = sort_by
+        self.sdk: Optional[int] = sdk
+        self.package_prefix: Optional[str] = (package_prefix or None)
+
+        # Tuple: sort key value, app ID
+        self.after: Optional[Tuple[Union[str, datetime.datetime], int]] = (None if not page_cursor else self._decode_page_cursor(page_cursor))
+
+    def is_sorted_in_descending_order(self) -> bool:
+        return self.sort_by != AppListingQuery.SORT_BY_NAME
+
+    def encode_page_cursor(self, sort_key_value: Union[str, datetime.datetime], app_id: int) -> str:
+        if isinstance(sort_key_value, datetime.datetime):
+            sort_key_value = sort_key_value.isoformat()
+
+        serialized_cursor = json.dumps([self.sort_by, sort_key_value, app_id], separators=(",", ":"))
+
+        return base64.urlsafe_b64encode(serialized_cursor.encode("utf-8")).decode("ascii").rstrip("=")
+
+    def _decode_page_cursor(self, page_cursor: str) -> Tuple[Union[str, datetime.datetime], int]:
+        try:
+            padded_page_cursor = page_cursor + ("=" * (-len(page_cursor) % 4))
+            sort_by, sort_key_value, app_id = json.loads(base64.urlsafe_b64decode(padded_page_cursor.encode("ascii")).decode("utf-8"))
+
+            if sort_by != self.sort_by or not isinstance(sort_key_value, str) or not isinstance(app_id, int) or not (0 < app_id <= Constants.DB_MAX_INTEGER):
+                raise ValueError()
+
+            if sort_by != AppListingQuery.SORT_BY_NAME:
+                sort_key_value = datetime.datetime.fromisoformat(sort_key_value)
+
+        except (ValueError, TypeError, UnicodeError, binascii.Error):
+            # json.JSONDecodeError is a subclass of ValueError
+            raise AppListingQueryException("The page cursor is invalid!")
+
+        return sort_key_value, app_id
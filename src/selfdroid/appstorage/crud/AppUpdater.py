@@ -20,14 +20,17 @@
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
 
-from typing import Tuple
-import os
+from typing import Tuple, Optional
+import datetime
 import sqlalchemy.exc
 from selfdroid.UserReadableException import UserReadableException
 from selfdroid.appstorage.AppMetadata import AppMetadata
 from selfdroid.appstorage.AppMetadataDBModel import AppMetadataDBModel
+from selfdroid.appstorage.AppChangeLogDBModel import AppChangeLogDBModel
 from selfdroid.appstorage.AppStorageConsistencyEnsurer import AppStorageConsistencyEnsurer
-from selfdroid.appstorage.apk.APKParser import APKParser
+from selfdroid.appstorage.MaterializedCatalog import MaterializedCatalog
+from selfdroid.appstorage.AppStorageHelpers import AppStorageHelpers
+from selfdroid.appstorage.BlobStore import BlobStore
 from selfdroid.appstorage.apk.ParsedAPK import ParsedAPK
 from selfdroid.appstorage.crud.AppDeleter import AppDeleter
 from selfdroid.appstorage.crud.AppUpdaterException import AppUpdaterException
@@ -37,18 +40,29 @@ from selfdroid import db
 
 class AppUpdater:
     """
-    This class must be instantiated and have its public methods called in a locked context!
+    The uploaded APK must be parsed (see APKParser) before this class is instantiated - as that can take a long time,
+    it should be done without holding any lock. This class's public methods must be called in a locked context!
     """
 
-    def __init__(self, db_model: AppMetadataDBModel, uploaded_apk_path: str):
+    def __init__(self, db_model: AppMetadataDBModel, uploaded_apk_path: str, parsed_apk: ParsedAPK):
+        """
+        Must be instantiated in a locked context, as the app's current metadata are read from the database model.
+        """
+
         self._db_model: AppMetadataDBModel = db_model
         self._app_metadata: AppMetadata =  AppMetadata.from_db_model(db_model)
 
         self._uploaded_apk_path: str = uploaded_apk_path
-        self._parsed_apk: ParsedAPK = APKParser(self._uploaded_apk_path).parsed_apk
+        self._parsed_apk: ParsedAPK = parsed_apk
+
+        self._stored_icon_sha256: Optional[str] = None  # Set once the app's new icon has been stored
 
     def update_app_while_locked(self) -> Tuple[AppMetadata, AppMetadata]:
         """
+        Must be called while holding the app's stripe lock and the global lock (see AppStorageHelpers.lock_apps()). The
+        catalog lock is held only while the app's metadata are committed, so that the other apps can be modified while
+        the app's new files are being stored.
+
         :return: A 2-tuple containing the old (before the update) and new (after the update) app's metadata.
         """
 
@@ -66,12 +80,15 @@ class AppUpdater:
             # From the AppStorageConsistencyEnsurer class's docstring:
             #  It should be noted that this class does not recognize "partially updated apps" (e.g. apps where the metadata in
             #  the database were updated but the app icon wasn't due to an error).
-            #  When an error occurs while updating an app, it should be deleted!
-            try:
-                AppDeleter(self._db_model).delete_app_while_locked()
-            except UserReadableException:
-                # An exception is going to be raised anyway, so it's safely possible to ignore this one, if it is raised.
-                pass
+            #  When an error occurs while updating an app, it should be deleted (unless the consistency ensurer has
+            #  already done so)!
+            db_model = AppMetadataDBModel.query.get(self._app_metadata.id)
+            if db_model is not None:
+                try:
+                    AppDeleter(db_model).delete_app_while_locked()
+                except UserReadableException:
+                    # An exception is going to be raised anyway, so it's safely possible to ignore this one, if it is raised.
+                    pass
 
             if isinstance(e, (sqlalchemy.exc.SQLAlchemyError, OSError)):  # These exceptions can happen, so an alternative user-readable exception is raised
                 raise AppUpdaterException("An error occurred while updating the app!")
@@ -79,16 +96,48 @@ class AppUpdater:
             raise e  # All other exceptions are unexpected, so they are reraised (which will usually result in a 500 Internal Server Error HTTP response)
 
         finally:
-            AppStorageConsistencyEnsurer().ensure_consistency_while_locked()
+            # Even if the modification failed - see AppAdder.add_app_while_locked()
+            MaterializedCatalog().regenerate_if_outdated_while_locked()
 
         return self._app_metadata, updated_app_metadata
 
     def _update_app_while_locked_with_exceptions_handled(self) -> AppMetadata:
+        # The app itself cannot be modified by anyone else in the meantime, as its stripe lock is held.
         self._check_if_app_can_be_updated()
 
-        return self._perform_app_update()
+        try:
+            self._store_app_files()
+
+        except Exception:
+            with AppStorageHelpers.lock_catalog():
+                db.session.rollback()
+                self._release_files_while_catalog_locked()
+
+            raise
+
+        with AppStorageHelpers.lock_catalog():
+            # Other apps might have been modified since the current database transaction began, and SQLite refuses to
+            #  write in a transaction whose snapshot is outdated, so a new one is begun.
+            db.session.rollback()
+
+            try:
+                return self._perform_app_update_while_catalog_locked()
+
+            finally:
+                # Ends the transaction if it has failed, and begins a new snapshot, in which the files' references are
+                #  counted
+                db.session.rollback()
+
+                AppStorageConsistencyEnsurer().ensure_consistency_of_app_while_locked(self._app_metadata.id)
+
+                # If the update succeeded, the app's old files might not be referenced by any app anymore; if it failed,
+                #  the same applies to the new ones
+                self._release_files_while_catalog_locked()
 
     def _check_if_app_can_be_updated(self) -> None:
+        if self._db_model.apk_sha256 == self._parsed_apk.apk_sha256:
+            raise AppUpdaterException("The supplied APK file is the same as the one already present on the server!")
+
         if self._app_metadata.package_name != self._parsed_apk.package_name:
             html_message = WebStatusMessageCollector.format_html_message("The package name of the supplied APK file <i>({})</i> is not the same as the updated app's <i>({})</i>! You should add the app instead of updating it!", self._parsed_apk.package_name, self._app_metadata.package_name)
             raise AppUpdaterException(html_message)
@@ -97,28 +146,33 @@ class AppUpdater:
             html_message = WebStatusMessageCollector.format_html_message("The version of the supplied APK file <i>({})</i> is not greater than the version of the APK already present on the server <i>({})</i>! Make sure you're uploading a newer version of the app!", self._parsed_apk.version_code, self._app_metadata.version_code)
             raise AppUpdaterException(html_message)
 
-    def _perform_app_update(self) -> AppMetadata:
-        # An UserReadableException mustn't be raised in this method!
+    def _store_app_files(self) -> None:
+        # The app's new files are stored alongside the old ones before its metadata are committed to the database, and
+        #  the old ones are deleted only afterwards. A reader which has fetched the old metadata might find its old APK
+        #  file deleted - it then fetches the metadata again; see the NOTES file.
+        blob_store = BlobStore()
 
-        # 1. Database
-        self._parsed_apk.fill_existing_db_model_with_metadata(self._db_model)
-        db.session.commit()
+        # 1. Icon
+        self._stored_icon_sha256 = blob_store.store_icon_while_locked(self._parsed_apk.uniform_png_app_icon, self._parsed_apk.app_icon_renditions)
 
-        assert isinstance(self._db_model.id, int)
+        # 2. APK
+        blob_store.store_apk_while_locked(self._uploaded_apk_path, self._parsed_apk.apk_sha256)
 
-        updated_app_metadata = AppMetadata.from_db_model(self._db_model)
+    def _perform_app_update_while_catalog_locked(self) -> AppMetadata:
+        # An UserReadableException mustn't be raised in this method!
 
-        # 2. APK
-        apk_path = updated_app_metadata.get_apk_path()
+        # 1. Icon & APK (they might have been released by a concurrent modification since they were stored - see BlobStore)
+        self._store_app_files()
 
-        os.remove(apk_path)
-        os.rename(self._uploaded_apk_path, apk_path)
+        # 2. Database
+        self._parsed_apk.fill_existing_db_model_with_metadata(self._db_model)
+        self._db_model.icon_sha256 = self._stored_icon_sha256
+        self._db_model.last_updated_datetime = datetime.datetime.utcnow()
 
-        # 3. Icon
-        icon_path = updated_app_metadata.get_icon_path()
+        db.session.add(AppChangeLogDBModel.create_for_app(self._db_model, is_deletion=False))
+        db.session.commit()
 
-        os.remove(icon_path)
-        with open(icon_path, "wb") as icon_file:
-            icon_file.write(self._parsed_apk.uniform_png_app_icon)
+        return AppMetadata.from_db_model(self._db_model)
 
-        return updated_app_metadata
+    def _release_files_while_catalog_locked(self) -> None:
+        BlobStore().release_blobs_while_locked([self._app_metadata.apk_sha256, self._parsed_apk.apk_sha256], [self._app_metadata.icon_sha256, self._stored_icon_sha256])
@@ -0,0 +1,108 @@
+# SPDX-License-Identifier: BSD-3-Clause
+#
+# Copyright (c) 2021 Vít Labuda. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+# following conditions are met:
+#  1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+#     disclaimer.
+#  2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the
+#     following disclaimer in the documentation and/or other materials provided with the distribution.
+#  3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote
+#     products derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+from __future__ import annotations
+from typing import Optional, Dict, Union
+import os.path
+import datetime
+import dateutil.tz
+from selfdroid.Settings import Settings
+from selfdroid.Constants import Constants
+from selfdroid.appstorage.jobs.AppStorageJobDBModel import AppStorageJobDBModel
+
+
+class AppStorageJob:
+    """
+    A class containing a job's data fetched from the database - see AppMetadata.
+    """
+
+    def __init__(self, db_model: AppStorageJobDBModel):
+        self.id: int = db_model.id
+
+        self.job_type: str = db_model.job_type
+        self.app_id: Optional[int] = db_model.app_id
+
+        self.staged_apk_filename: str = db_model.staged_apk_filename
+        self.apk_sha256: str = db_model.apk_sha256
+        self.uploaded_filename: Optional[str] = db_model.uploaded_filename
+
+        self.state: str = db_model.state
+        self.progress_message: Optional[str] = db_model.progress_message
+        self.result_html_message: Optional[str] = db_model.result_html_message
+
+        self.created_datetime: datetime.datetime = self._add_utc_timezone_to_naive_datetime_object(db_model.created_datetime)
+        self.started_datetime: Optional[datetime.datetime] = self._add_utc_timezone_to_naive_datetime_object(db_model.started_datetime)
+        self.finished_datetime: Optional[datetime.datetime] = self._add_utc_timezone_to_naive_datetime_object(db_model.finished_datetime)
+
+        self.created_datetime_timezoned: datetime.datetime = self._add_display_timezone_to_utc_datetime_object(self.created_datetime)
+
+    @classmethod
+    def from_db_model(cls, db_model: AppStorageJobDBModel) -> AppStorageJob:
+        return cls(db_model)
+
+    @staticmethod
+    def _add_utc_timezone_to_naive_datetime_object(datetime_object: Optional[datetime.datetime]) -> Optional[datetime.datetime]:
+        return (None if datetime_object is None else datetime_object.replace(tzinfo=dateutil.tz.tzutc()))
+
+    @staticmethod
+    def _add_display_timezone_to_utc_datetime_object(datetime_object: datetime.datetime) -> datetime.datetime:
+        display_timezone = dateutil.tz.tzlocal() if (Settings.DISPLAY_TIMEZONE is None) else dateutil.tz.gettz(Settings.DISPLAY_TIMEZONE)
+
+        return datetime_object.astimezone(tz=display_timezone)
+
+    def get_staged_apk_path(self) -> str:
+        return os.path.join(Constants.TEMPORARY_DIRECTORY, self.staged_apk_filename)
+
+    def is_update(self) -> bool:
+        return self.job_type == AppStorageJobDBModel.TYPE_UPDATE_APP
+
+    def is_finished(self) -> bool:
+        return self.state in (AppStorageJobDBModel.STATE_SUCCEEDED, AppStorageJobDBModel.STATE_FAILED)
+
+    def has_succeeded(self) -> bool:
+        return self.state == AppStorageJobDBModel.STATE_SUCCEEDED
+
+    def get_status_text(self) -> str:
+        if self.state == AppStorageJobDBModel.STATE_QUEUED:
+            return "Waiting in the queue..."
+
+        if self.state == AppStorageJobDBModel.STATE_RUNNING:
+            return self.progress_message or "Processing..."
+
+        return ("Finished" if self.has_succeeded() else "Failed")
+
+    def to_status_dict(self) -> Dict[str, Union[str, int, bool, None]]:
+        return {
+            "id": self.id,
+            "job_type": self.job_type,
+            "app_id": self.app_id,
+
+            "state": self.state,
+            "is_finished": self.is_finished(),
+            "progress_message": self.progress_message,
+            "status_text": self.get_status_text(),
+            "result_html_message": self.result_html_message,
+
+            "created_timestamp": int(self.created_datetime.timestamp()),
+            "started_timestamp": (None if self.started_datetime is None else int(self.started_datetime.timestamp())),
+            "finished_timestamp": (None if self.finished_datetime is None else int(self.finished_datetime.timestamp()))
+        }
@@ -0,0 +1,71 @@
+# SPDX-License-Identifier: BSD-3-Clause
+#
+# Copyright (c) 2021 Vít Labuda. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+# following conditions are met:
+#  1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+#     disclaimer.
+#  2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the
+#     following disclaimer in the documentation and/or other materials provided with the distribution.
+#  3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote
+#     products derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+import datetime
+from selfdroid.Constants import Constants
+from selfdroid import db
+
+
+class AppStorageJobDBModel(db.Model):
+    """
+    The uploaded APK files are processed asynchronously - the web app only stages the uploaded file and enqueues a job,
+    which is then claimed and processed by a worker (see AppStorageJobWorker). The jobs are not a part of the app
+    storage, so they're stored in a separate database and modified without holding the app storage locks - see
+    AppStorageJobQueue.
+    """
+
+    __bind_key__ = Constants.DB_BIND_KEY_JOBS
+    __tablename__ = "app_storage_job"
+    __table_args__ = (
+        db.Index("ix_app_storage_job_state_id", "state", "id"),  # Used to claim the oldest queued job
+
+        {"sqlite_autoincrement": True}
+    )
+
+    TYPE_ADD_APP: str = "add_app"
+    TYPE_UPDATE_APP: str = "update_app"
+
+    STATE_QUEUED: str = "queued"
+    STATE_RUNNING: str = "running"
+    STATE_SUCCEEDED: str = "succeeded"
+    STATE_FAILED: str = "failed"
+
+    # The IDs ARE NOT reusable, so that a job's page never displays another job's results!
+    id = db.Column(db.Integer(), primary_key=True, nullable=False)
+
+    job_type = db.Column(db.String(Constants.DB_JOB_TYPE_AND_STATE_MAX_LENGTH), nullable=False)
+    app_id = db.Column(db.Integer(), nullable=True)  # The updated app, or the added app once the job has succeeded
+
+    # The staged APK file is located in the temporary directory and it's owned by the job - it's deleted once the job finishes
+    staged_apk_filename = db.Column(db.String(Constants.DB_STAGED_APK_FILENAME_MAX_LENGTH), nullable=False)
+    apk_sha256 = db.Column(db.String(Constants.DB_SHA256_LENGTH), nullable=False)
+    uploaded_filename = db.Column(db.String(Constants.DB_UPLOADED_FILENAME_MAX_LENGTH), nullable=True)  # As sent by the client
+
+    state = db.Column(db.String(Constants.DB_JOB_TYPE_AND_STATE_MAX_LENGTH), nullable=False)
+    progress_message = db.Column(db.Text(), nullable=True)  # Set while the job is running
+    result_html_message = db.Column(db.Text(), nullable=True)  # Set once the job has finished; HTML-safe
+    worker_pid = db.Column(db.Integer(), nullable=True)  # The process which has claimed the job (for diagnostic purposes only)
+    heartbeat_datetime = db.Column(db.DateTime(), nullable=True)  # Updated periodically while the job is running - see AppStorageJobHeartbeat
+
+    created_datetime = db.Column(db.DateTime(), default=datetime.datetime.utcnow, nullable=False)
+    started_datetime = db.Column(db.DateTime(), nullable=True)
+    finished_datetime = db.Column(db.DateTime(), nullable=True)
@@ -0,0 +1,66 @@
+# SPDX-License-Identifier: BSD-3-Clause
+#
+# Copyright (c) 2021 Vít Labuda. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+# following conditions are met:
+#  1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+#     disclaimer.
+#  2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the
+#     following disclaimer in the documentation and/or other materials provided with the distribution.
+#  3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote
+#     products derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+from typing import Optional
+import threading
+import traceback
+from selfdroid.Constants import Constants
+from selfdroid.appstorage.jobs.AppStorageJobQueue import AppStorageJobQueue
+from selfdroid import app
+
+
+class AppStorageJobHeartbeat:
+    """
+    While a job is being processed, its heartbeat is periodically recorded in the database by a daemon thread (a job may
+    legitimately wait for the app storage locks for a long time). A running job whose heartbeat has become stale is
+    considered interrupted and marked as failed by the next worker which claims a job - see AppStorageJobQueue.
+
+    The heartbeat stops once the thread processing the job exits, even if the "with" block hasn't been left, so that
+    a job whose worker thread has died doesn't stay running forever.
+    """
+
+    def __init__(self, job_id: int):
+        self._job_id: int = job_id
+        self._stop_event: threading.Event = threading.Event()
+        self._heartbeat_thread: Optional[threading.Thread] = None
+
+    def __enter__(self):
+        self._heartbeat_thread = threading.Thread(target=self._beat_until_stopped, args=(threading.current_thread(),), name="selfdroid-app-storage-job-heartbeat", daemon=True)
+        self._heartbeat_thread.start()
+
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._stop_event.set()
+        self._heartbeat_thread.join()
+
+    def _beat_until_stopped(self, processing_thread: threading.Thread) -> None:
+        while not self._stop_event.wait(timeout=Constants.APP_STORAGE_JOB_HEARTBEAT_INTERVAL):
+            if not processing_thread.is_alive():
+                return
+
+            try:
+                with app.app_context():
+                    AppStorageJobQueue().record_job_heartbeat(self._job_id)
+            except Exception:
+                # A missed heartbeat is not fatal, as long as the next one succeeds before the job is considered interrupted
+                traceback.print_exc()
@@ -0,0 +1,134 @@
+# SPDX-License-Identifier: BSD-3-Clause
+#
+# Copyright (c) 2021 Vít Labuda. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+# following conditions are met:
+#  1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+#     disclaimer.
+#  2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the
+#     following disclaimer in the documentation and/or other materials provided with the distribution.
+#  3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote
+#     products derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+from typing import Tuple, Optional
+import os
+import os.path
+import flask
+from selfdroid.UserReadableException import UserReadableException
+from selfdroid.appstorage.AppStorageHelpers import AppStorageHelpers
+from selfdroid.appstorage.apk.APKParser import APKParser
+from selfdroid.appstorage.apk.ParsedAPK import ParsedAPK
+from selfdroid.appstorage.crud.AppAdder import AppAdder
+from selfdroid.appstorage.crud.AppGetter import AppGetter
+from selfdroid.appstorage.crud.AppUpdater import AppUpdater
+from selfdroid.appstorage.crud.AppUpdaterException import AppUpdaterException
+from selfdroid.appstorage.jobs.AppStorageJob import AppStorageJob
+from selfdroid.appstorage.jobs.AppStorageJobHeartbeat import AppStorageJobHeartbeat
+from selfdroid.appstorage.jobs.AppStorageJobQueue import AppStorageJobQueue
+from selfdroid.web.WebStatusMessageCollector import WebStatusMessageCollector
+
+
+class AppStorageJobProcessor:
+    """
+    Adds or updates an app from a claimed job's staged APK file (see AppStorageJobQueue.claim_next_job()). The job is
+    processed outside of any request, so the app storage locks are waited for without a timeout.
+    """
+
+    def __init__(self, job: AppStorageJob):
+        self._job: AppStorageJob = job
+        self._job_queue: AppStorageJobQueue = AppStorageJobQueue()
+
+    def process_job(self) -> None:
+        """
+        The job is always finished by this method - if an unexpected exception is raised, the job is marked as failed
+        before the exception is reraised.
+        """
+
+        try:
+            with AppStorageJobHeartbeat(self._job.id):
+                result_html_message, app_id = self._process_job_with_exceptions_handled()
+
+        except UserReadableException as e:  # AppStorageModificationException and its children, APKParserException
+            self._finish_failed_job(e.user_readable_message)
+
+        except Exception as e:
+            self._finish_failed_job("An unexpected error occurred while processing the uploaded APK file!")
+
+            raise e
+
+        else:
+            self._job_queue.finish_job(self._job.id, True, result_html_message, app_id)
+
+    def _process_job_with_exceptions_handled(self) -> Tuple[str, int]:
+        staged_apk_path = self._job.get_staged_apk_path()
+        try:
+            # The uploaded APK is parsed (including the conversion of its icon) before the app storage is locked - only
+            #  the checks and the modification itself need the lock.
+            self._job_queue.set_job_progress_message(self._job.id, "Parsing the APK file...")
+            parsed_apk = APKParser.parse_with_cache(staged_apk_path, self._job.apk_sha256)
+
+            self._job_queue.set_job_progress_message(self._job.id, "Waiting for other modifications of the app storage to finish...")
+            if self._job.is_update():
+                return self._update_app(staged_apk_path, parsed_apk)
+
+            return self._add_app(staged_apk_path, parsed_apk)
+
+        finally:
+            if os.path.exists(staged_apk_path):  # The file might have been moved
+                os.remove(staged_apk_path)
+
+    def _add_app(self, staged_apk_path: str, parsed_apk: ParsedAPK) -> Tuple[str, int]:
+        with AppStorageHelpers.lock_apps([]):  # The app doesn't have an ID yet
+            self._job_queue.set_job_progress_message(self._job.id, "Adding the app...")
+            app_metadata = AppAdder(staged_apk_path, parsed_apk).add_app_while_locked()
+
+        html_message = WebStatusMessageCollector.format_html_message("The app <b>{}</b> was successfully added!", app_metadata.app_name)
+
+        return html_message, app_metadata.id
+
+    def _update_app(self, staged_apk_path: str, parsed_apk: ParsedAPK) -> Tuple[str, int]:
+        with AppStorageHelpers.lock_apps([self._job.app_id]):
+            self._job_queue.set_job_progress_message(self._job.id, "Updating the app...")
+
+            # The app might have been modified or deleted since the job was enqueued
+            app_getter = AppGetter()
+            app_getter.start_new_snapshot()
+            db_model = app_getter.get_db_model(self._job.app_id)
+            if db_model is None:
+                raise AppUpdaterException("The app has been deleted before it could be updated!")
+
+            old_app_metadata, new_app_metadata = AppUpdater(db_model, staged_apk_path, parsed_apk).update_app_while_locked()
+
+        if old_app_metadata.app_name == new_app_metadata.app_name:
+            html_message = WebStatusMessageCollector.format_html_message("The app <b>{}</b> was successfully updated!", new_app_metadata.app_name)
+        else:
+            html_message = WebStatusMessageCollector.format_html_message("The app <b>{}</b> (previously named <b>{}</b>) was successfully updated!", new_app_metadata.app_name, old_app_metadata.app_name)
+
+        return html_message, new_app_metadata.id
+
+    def _finish_failed_job(self, message: str) -> None:
+        # Even if the update failed, the app is, in most cases (unless it was deleted due to a fatal error), still present
+        #  in the app storage
+        app_id = self._get_updated_app_id_if_it_exists()
+
+        # The messages of user-readable exceptions are either plain text or HTML-safe Markup objects, which are left intact
+        self._job_queue.finish_job(self._job.id, False, str(flask.escape(message)), app_id)
+
+    def _get_updated_app_id_if_it_exists(self) -> Optional[int]:
+        if not self._job.is_update():
+            return None
+
+        app_getter = AppGetter()
+        app_getter.start_new_snapshot()
+
+        return (self._job.app_id if app_getter.does_app_exist_in_database(self._job.app_id) else None)
@@ -0,0 +1,201 @@
+# SPDX-License-Identifier: BSD-3-Clause
+#
+# Copyright (c) 2021 Vít Labuda. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+# following conditions are met:
+#  1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+#     disclaimer.
+#  2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the
+#     following disclaimer in the documentation and/or other materials provided with the distribution.
+#  3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote
+#     products derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+from typing import Optional, Dict
+import os
+import os.path
+import datetime
+import flask
+import sqlalchemy
+from selfdroid.Settings import Settings
+from selfdroid.Constants import Constants
+from selfdroid.appstorage.jobs.AppStorageJob import AppStorageJob
+from selfdroid.appstorage.jobs.AppStorageJobDBModel import AppStorageJobDBModel
+from selfdroid import jobs_db_session
+
+
+class AppStorageJobQueue:
+    """
+    The app storage jobs are queued in a database, so that the queue can be drained by any local process. It's a separate
+    database file, as the writers of the app storage's database rely on being serialized by the catalog lock (SQLite
+    refuses to write in a transaction whose snapshot is outdated - see AppAdder.add_app_while_locked()), whereas the
+    jobs are modified without holding any app storage lock. It's also accessed using a separate session (jobs_db_session),
+    as a job is modified e.g. while its processing is in the middle of a transaction of the app storage's database.
+
+    Every transaction modifying the jobs begins with a write statement. SQLite then holds its write lock (with an
+    up-to-date snapshot of the database) for the whole transaction, so the rows it has read cannot be changed by anyone
+    else (e.g. by another worker claiming the same job) before it's committed.
+    """
+
+    _INTERRUPTED_JOB_MESSAGE: str = "The processing of the uploaded APK file has been interrupted, as the worker performing it has stopped! Please try uploading the file again."
+
+    def enqueue_app_addition(self, staged_apk_path: str, apk_sha256: str, uploaded_filename: Optional[str]) -> int:
+        """
+        The staged APK file (which must be located in the temporary directory) is owned by the job from now on.
+
+        :return: The job's ID.
+        """
+
+        return self._enqueue_job(AppStorageJobDBModel.TYPE_ADD_APP, None, staged_apk_path, apk_sha256, uploaded_filename)
+
+    def enqueue_app_update(self, app_id: int, staged_apk_path: str, apk_sha256: str, uploaded_filename: Optional[str]) -> int:
+        """
+        See enqueue_app_addition().
+        """
+
+        return self._enqueue_job(AppStorageJobDBModel.TYPE_UPDATE_APP, app_id, staged_apk_path, apk_sha256, uploaded_filename)
+
+    def _enqueue_job(self, job_type: str, app_id: Optional[int], staged_apk_path: str, apk_sha256: str, uploaded_filename: Optional[str]) -> int:
+        assert os.path.dirname(os.path.abspath(staged_apk_path)) == os.path.abspath(Constants.TEMPORARY_DIRECTORY)
+
+        if uploaded_filename is not None:
+            uploaded_filename = uploaded_filename[:Constants.DB_UPLOADED_FILENAME_MAX_LENGTH]
+
+        jobs_db_session.rollback()  # The INSERT statement is the first one in the transaction
+
+        db_model = AppStorageJobDBModel(job_type=job_type, app_id=app_id, staged_apk_filename=os.path.basename(staged_apk_path), apk_sha256=apk_sha256, uploaded_filename=uploaded_filename, state=AppStorageJobDBModel.STATE_QUEUED)
+        jobs_db_session.add(db_model)
+        jobs_db_session.flush()
+
+        job_id = db_model.id
+        jobs_db_session.commit()
+
+        return job_id
+
+    def claim_next_job(self) -> Optional[AppStorageJob]:
+        """
+        Marks the oldest queued job as running in the current process, which must then process it (see
+        AppStorageJobProcessor) - nobody else is going to do it.
+
+        :return: The claimed job, or None if there are no queued jobs.
+        """
+
+        jobs_db_session.rollback()
+
+        # The first statement of the transaction must be a write - see the class's docstring
+        self._fail_interrupted_jobs()
+        self._delete_expired_jobs()
+
+        db_model = jobs_db_session.query(AppStorageJobDBModel).filter_by(state=AppStorageJobDBModel.STATE_QUEUED).order_by(AppStorageJobDBModel.id).first()
+        if db_model is None:
+            jobs_db_session.commit()
+            return None
+
+        db_model.state = AppStorageJobDBModel.STATE_RUNNING
+        db_model.worker_pid = os.getpid()
+        db_model.started_datetime = db_model.heartbeat_datetime = datetime.datetime.utcnow()
+        jobs_db_session.flush()
+
+        job = AppStorageJob.from_db_model(db_model)
+        jobs_db_session.commit()
+
+        return job
+
+    def _fail_interrupted_jobs(self) -> None:
+        # The running jobs whose worker has stopped (e.g. its process has been killed or restarted, or its thread has
+        #  died) would never be finished. Whether the worker's process still exists cannot be relied upon, as its PID
+        #  might have been reused by another process, and the process might outlive the worker thread.
+        # A stale heartbeat doesn't prove that the worker has stopped, though (e.g. its heartbeats might have failed to
+        #  be recorded), so the job's staged APK file is left alone - the worker might still be processing it. If the
+        #  worker has stopped, the file is deleted once the job expires (see _delete_expired_jobs()).
+        stale_heartbeat_datetime = datetime.datetime.utcnow() - datetime.timedelta(seconds=Constants.APP_STORAGE_JOB_HEARTBEAT_TIMEOUT)
+
+        jobs_db_session.query(AppStorageJobDBModel).filter(
+            AppStorageJobDBModel.state == AppStorageJobDBModel.STATE_RUNNING,
+            sqlalchemy.or_(AppStorageJobDBModel.heartbeat_datetime.is_(None), AppStorageJobDBModel.heartbeat_datetime < stale_heartbeat_datetime)
+        ).update({
+            "state": AppStorageJobDBModel.STATE_FAILED,
+            "progress_message": None,
+            "result_html_message": str(flask.escape(AppStorageJobQueue._INTERRUPTED_JOB_MESSAGE)),
+            "finished_datetime": datetime.datetime.utcnow()
+        }, synchronize_session=False)
+
+    def _delete_expired_jobs(self) -> None:
+        expiration_datetime = datetime.datetime.utcnow() - datetime.timedelta(seconds=Settings.FINISHED_APP_STORAGE_JOB_RETENTION)
+
+        expired_db_models = jobs_db_session.query(AppStorageJobDBModel).filter(
+            AppStorageJobDBModel.state.in_([AppStorageJobDBModel.STATE_SUCCEEDED, AppStorageJobDBModel.STATE_FAILED]),
+            AppStorageJobDBModel.finished_datetime < expiration_datetime
+        ).all()
+
+        for db_model in expired_db_models:
+            # The staged APK file of a finished job has already been deleted (or moved), unless the job was considered
+            #  interrupted and its worker has really stopped - see _fail_interrupted_jobs()
+            staged_apk_path = AppStorageJob.from_db_model(db_model).get_staged_apk_path()
+            if os.path.exists(staged_apk_path):
+                os.remove(staged_apk_path)
+
+            jobs_db_session.delete(db_model)
+
+    def record_job_heartbeat(self, job_id: int) -> None:
+        """
+        See AppStorageJobHeartbeat. The heartbeat of a job which is no longer running (e.g. because it has been
+        considered interrupted) is not recorded.
+        """
+
+        jobs_db_session.rollback()
+
+        jobs_db_session.query(AppStorageJobDBModel).filter_by(id=job_id, state=AppStorageJobDBModel.STATE_RUNNING).update({"heartbeat_datetime": datetime.datetime.utcnow()}, synchronize_session=False)
+        jobs_db_session.commit()
+
+    def set_job_progress_message(self, job_id: int, progress_message: str) -> None:
+        jobs_db_session.rollback()
+
+        jobs_db_session.query(AppStorageJobDBModel).filter_by(id=job_id).update({"progress_message": progress_message}, synchronize_session=False)
+        jobs_db_session.commit()
+
+    def finish_job(self, job_id: int, has_succeeded: bool, result_html_message: str, app_id: Optional[int]) -> None:
+        """
+        The job's staged APK file must have been deleted (or moved) before the job is finished. A job which is no
+        longer running (i.e. which has been considered interrupted - see _fail_interrupted_jobs()) is left as it is.
+
+        :param result_html_message: The message must be HTML-safe (see WebStatusMessageCollector.format_html_message()).
+        :param app_id: The added or updated app's ID, or None if the app doesn't exist (anymore).
+        """
+
+        jobs_db_session.rollback()
+
+        jobs_db_session.query(AppStorageJobDBModel).filter_by(id=job_id, state=AppStorageJobDBModel.STATE_RUNNING).update({
+            "state": (AppStorageJobDBModel.STATE_SUCCEEDED if has_succeeded else AppStorageJobDBModel.STATE_FAILED),
+            "app_id": app_id,
+            "progress_message": None,
+            "result_html_message": result_html_message,
+            "finished_datetime": datetime.datetime.utcnow()
+        }, synchronize_session=False)
+        jobs_db_session.commit()
+
+    def get_job(self, job_id: int) -> Optional[AppStorageJob]:
+        db_model = jobs_db_session.query(AppStorageJobDBModel).get(job_id)
+
+        return (None if db_model is None else AppStorageJob.from_db_model(db_model))
+
+    def get_job_or_404(self, job_id: int) -> AppStorageJob:
+        job = self.get_job(job_id)
+        if job is None:
+            flask.abort(404)
+
+        return job
+
+    def get_job_counts_by_state(self) -> Dict[str, int]:
+        rows = jobs_db_session.query(AppStorageJobDBModel.state, sqlalchemy.func.count(AppStorageJobDBModel.id)).group_by(AppStorageJobDBModel.state).all()
+
+        return {state: count for state, count in rows}
@@ -0,0 +1,116 @@
+# SPDX-License-Identifier: BSD-3-Clause
+#
+# Copyright (c) 2021 Vít Labuda. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+# following conditions are met:
+#  1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+#     disclaimer.
+#  2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the
+#     following disclaimer in the documentation and/or other materials provided with the distribution.
+#  3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote
+#     products derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+from typing import Optional
+import time
+import threading
+import traceback
+from selfdroid.Settings import Settings
+from selfdroid.Constants import Constants
+from selfdroid.appstorage.jobs.AppStorageJobQueue import AppStorageJobQueue
+from selfdroid.appstorage.jobs.AppStorageJobProcessor import AppStorageJobProcessor
+from selfdroid.appstorage.jobs.ChunkedUploadSessionStore import ChunkedUploadSessionStore
+from selfdroid import app
+
+
+class AppStorageJobWorker:
+    """
+    Drains the app storage job queue. The jobs are processed either by a daemon thread running in the background of
+    each of the web app's processes (see Settings.IN_PROCESS_APP_STORAGE_JOB_WORKER), or by separately run processes
+    (the "process-jobs" command), or both - every job is claimed by exactly one of them.
+    """
+
+    _in_process_worker_thread: Optional[threading.Thread] = None
+    _in_process_worker_thread_lock: threading.Lock = threading.Lock()
+    _in_process_worker_wake_up_event: threading.Event = threading.Event()
+
+    def process_queued_jobs(self) -> int:
+        """
+        Must be called within the Flask app's context.
+
+        :return: The number of processed jobs.
+        """
+
+        # The workers run periodically, so they also take care of the abandoned uploads
+        ChunkedUploadSessionStore().delete_expired_sessions()
+
+        job_queue = AppStorageJobQueue()
+
+        processed_job_count = 0
+        while True:
+            job = job_queue.claim_next_job()
+            if job is None:
+                return processed_job_count
+
+            try:
+                AppStorageJobProcessor(job).process_job()
+            except Exception:
+                # The job has been marked as failed - the other jobs are processed nevertheless
+                traceback.print_exc()
+
+            processed_job_count += 1
+
+    def process_queued_jobs_forever(self) -> None:
+        """
+        Must be called within the Flask app's context. The queue is polled, as it might be filled by other processes.
+        """
+
+        while True:
+            self.process_queued_jobs()
+
+            time.sleep(Constants.APP_STORAGE_JOB_QUEUE_POLL_INTERVAL)
+
+    @classmethod
+    def start_in_process_worker_if_enabled(cls) -> None:
+        """
+        Should be called in each of the web app's processes - the thread is not inherited by the forked processes.
+        """
+
+        if not Settings.IN_PROCESS_APP_STORAGE_JOB_WORKER:
+            return
+
+        with cls._in_process_worker_thread_lock:
+            if (cls._in_process_worker_thread is None) or not cls._in_process_worker_thread.is_alive():
+                cls._in_process_worker_thread = threading.Thread(target=cls._run_in_process_worker, name="selfdroid-app-storage-job-worker", daemon=True)
+                cls._in_process_worker_thread.start()
+
+    @classmethod
+    def wake_up_in_process_worker(cls) -> None:
+        """
+        Makes the current process's worker thread (if it's enabled) process the queued jobs without waiting for the next poll.
+        """
+
+        cls.start_in_process_worker_if_enabled()
+        cls._in_process_worker_wake_up_event.set()
+
+    @classmethod
+    def _run_in_process_worker(cls) -> None:
+        while True:
+            cls._in_process_worker_wake_up_event.wait(timeout=Constants.APP_STORAGE_JOB_QUEUE_POLL_INTERVAL)
+            cls._in_process_worker_wake_up_event.clear()
+
+            try:
+                with app.app_context():
+                    cls().process_queued_jobs()
+            except Exception:
+                # The thread must keep running, as the jobs enqueued in this process would otherwise wait for a poll of another worker
+                traceback.print_exc()
@@ -0,0 +1,90 @@
+# SPDX-License-Identifier: BSD-3-Clause
+#
+# Copyright (c) 2021 Vít Labuda. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+# following conditions are met:
+#  1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+#     disclaimer.
+#  2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the
+#     following disclaimer in the documentation and/or other materials provided with the distribution.
+#  3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote
+#     products derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+from __future__ import annotations
+from typing import Optional, Dict, List, Union
+import os.path
+import datetime
+import dateutil.tz
+from selfdroid.Settings import Settings
+from selfdroid.Constants import Constants
+from selfdroid.appstorage.jobs.ChunkedUploadSessionDBModel import ChunkedUploadSessionDBModel
+
+
+class ChunkedUploadSession:
+    """
+    A class containing an upload session's data fetched from the database, including the offsets of its chunks which
+    have already been uploaded - see AppMetadata.
+    """
+
+    def __init__(self, db_model: ChunkedUploadSessionDBModel, received_chunk_offsets: List[int]):
+        self.id: str = db_model.id
+
+        self.app_id: Optional[int] = db_model.app_id
+        self.uploaded_filename: Optional[str] = db_model.uploaded_filename
+
+        self.total_size: int = db_model.total_size
+        self.chunk_size: int = db_model.chunk_size
+        self.received_chunk_offsets: List[int] = sorted(received_chunk_offsets)
+
+        self.last_activity_datetime: datetime.datetime = db_model.last_activity_datetime.replace(tzinfo=dateutil.tz.tzutc())
+
+    @classmethod
+    def from_db_model(cls, db_model: ChunkedUploadSessionDBModel, received_chunk_offsets: List[int]) -> ChunkedUploadSession:
+        return cls(db_model, received_chunk_offsets)
+
+    @staticmethod
+    def get_file_path_by_id(session_id: str) -> str:
+        return os.path.join(Constants.TEMPORARY_DIRECTORY, "{}.upload".format(session_id))
+
+    def get_file_path(self) -> str:
+        return self.get_file_path_by_id(self.id)
+
+    def get_all_chunk_offsets(self) -> List[int]:
+        return list(range(0, self.total_size, self.chunk_size))
+
+    def get_missing_chunk_offsets(self) -> List[int]:
+        received_chunk_offsets = set(self.received_chunk_offsets)
+
+        return [offset for offset in self.get_all_chunk_offsets() if offset not in received_chunk_offsets]
+
+    def is_valid_chunk_offset(self, offset: int) -> bool:
+        return (0 <= offset < self.total_size) and (offset % self.chunk_size == 0)
+
+    def get_chunk_length(self, offset: int) -> int:
+        return min(self.chunk_size, self.total_size - offset)
+
+    def to_status_dict(self) -> Dict[str, Union[str, int, List[int], None]]:
+        expiration_datetime = self.last_activity_datetime + datetime.timedelta(seconds=Settings.CHUNKED_UPLOAD_SESSION_LIFETIME)
+
+        return {
+            "session_id": self.id,
+            "app_id": self.app_id,
+
+            "total_size": self.total_size,
+            "chunk_size": self.chunk_size,
+            "received_size": sum(self.get_chunk_length(offset) for offset in self.received_chunk_offsets),
+            "received_chunk_offsets": self.received_chunk_offsets,
+            "missing_chunk_offsets": self.get_missing_chunk_offsets(),
+
+            "expiration_timestamp": int(expiration_datetime.timestamp())
+        }
@@ -0,0 +1,47 @@
+# SPDX-License-Identifier: BSD-3-Clause
+#
+# Copyright (c) 2021 Vít Labuda. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+# following conditions are met:
+#  1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+#     disclaimer.
+#  2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the
+#     following disclaimer in the documentation and/or other materials provided with the distribution.
+#  3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote
+#     products derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+import datetime
+from selfdroid.Constants import Constants
+from selfdroid import db
+
+
+class ChunkedUploadSessionDBModel(db.Model):
+    """
+    An upload of an APK file in chunks, which is turned into a job once all the chunks have been uploaded - see
+    ChunkedUploadSessionStore. The uploaded chunks are recorded in ChunkedUploadChunkDBModel.
+    """
+
+    __bind_key__ = Constants.DB_BIND_KEY_JOBS
+    __tablename__ = "chunked_upload_session"
+
+    # Random and secret, so that the session cannot be guessed
+    id = db.Column(db.String(Constants.DB_UPLOAD_SESSION_ID_LENGTH), primary_key=True, nullable=False)
+
+    app_id = db.Column(db.Integer(), nullable=True)  # The updated app, or None if an app is being added
+    uploaded_filename = db.Column(db.String(Constants.DB_UPLOADED_FILENAME_MAX_LENGTH), nullable=True)  # As sent by the client
+
+    total_size = db.Column(db.Integer(), nullable=False)
+    chunk_size = db.Column(db.Integer(), nullable=False)
+
+    created_datetime = db.Column(db.DateTime(), default=datetime.datetime.utcnow, nullable=False)
+    last_activity_datetime = db.Column(db.DateTime(), default=datetime.datetime.utcnow, index=True, nullable=False)  # Used to expire the session
@@ -0,0 +1,307 @@
+# SPDX-License-Identifier: BSD-3-Clause
+#
+# Copyright (c) 2021 Vít Labuda. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+# following conditions are met:
+#  1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+#     disclaimer.
+#  2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the
+#     following disclaimer in the documentation and/or other materials provided with the distribution.
+#  3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote
+#     products derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+from typing import Optional, Tuple, List, BinaryIO
+import os
+import os.path
+import re
+import time
+import fcntl
+import string
+import hashlib
+import datetime
+import contextlib
+import flask
+import sqlalchemy
+from selfdroid.Settings import Settings
+from selfdroid.Constants import Constants
+from selfdroid.Helpers import Helpers
+from selfdroid.appstorage.AppStorageHelpers import AppStorageHelpers
+from selfdroid.appstorage.jobs.AppStorageJobQueue import AppStorageJobQueue
+from selfdroid.appstorage.jobs.ChunkedUploadSession import ChunkedUploadSession
+from selfdroid.appstorage.jobs.ChunkedUploadSessionDBModel import ChunkedUploadSessionDBModel
+from selfdroid.appstorage.jobs.ChunkedUploadChunkDBModel import ChunkedUploadChunkDBModel
+from selfdroid import jobs_db_session
+
+
+class ChunkedUploadSessionStore:
+    """
+    Large APK files are uploaded in chunks, so that an interrupted upload can be resumed and no request's body has to
+    contain the whole file. Each chunk is written directly to its place in the session's file, which is preallocated
+    in the temporary directory; once all the chunks have been uploaded, the file is handed over to a job (see
+    AppStorageJobQueue) without being copied.
+
+    The sessions are stored in the job queue's database and modified the same way (see AppStorageJobQueue). The writes
+    of a session's file are serialized by an exclusive flock() of the file, which is held while a chunk is being written
+    and while the upload is being finalized.
+    """
+
+    _SESSION_ID_CHARACTER_SET: str = string.digits + string.ascii_lowercase
+    _SHA256_REGEX: re.Pattern = re.compile(r'^[0-9a-f]{64}\Z')
+    _COOPERATIVE_FLOCK_POLL_INTERVAL: float = 0.01  # in seconds
+
+    def create_session(self, total_size: int, uploaded_filename: Optional[str], app_id: Optional[int]) -> ChunkedUploadSession:
+        """
+        :param app_id: The ID of the app which is going to be updated, or None if the uploaded APK should be added as a new app.
+        """
+
+        if total_size <= 0:
+            flask.abort(400)
+
+        if total_size > Settings.MAX_UPLOAD_SIZE:
+            flask.abort(413)
+
+        if uploaded_filename is not None:
+            uploaded_filename = uploaded_filename[:Constants.DB_UPLOADED_FILENAME_MAX_LENGTH]
+
+        session_id = Helpers.generate_secure_random_string(ChunkedUploadSessionStore._SESSION_ID_CHARACTER_SET, Constants.DB_UPLOAD_SESSION_ID_LENGTH)
+        file_path = ChunkedUploadSession.get_file_path_by_id(session_id)
+
+        # The file is preallocated (sparsely), so that the chunks can be written to it in any order
+        with open(file_path, "xb") as file:
+            file.truncate(total_size)
+
+        try:
+            jobs_db_session.rollback()  # The INSERT statement is the first one in the transaction
+
+            db_model = ChunkedUploadSessionDBModel(id=session_id, app_id=app_id, uploaded_filename=uploaded_filename, total_size=total_size, chunk_size=Constants.CHUNKED_UPLOAD_CHUNK_SIZE)
+            jobs_db_session.add(db_model)
+            jobs_db_session.flush()
+
+            session = ChunkedUploadSession.from_db_model(db_model, [])
+            jobs_db_session.commit()
+
+        except BaseException as e:
+            os.remove(file_path)
+            raise e
+
+        return session
+
+    def get_session_or_404(self, session_id: str) -> ChunkedUploadSession:
+        db_model = jobs_db_session.query(ChunkedUploadSessionDBModel).get(session_id)
+        if db_model is None:
+            flask.abort(404)
+
+        received_chunk_offsets = [row.offset for row in jobs_db_session.query(ChunkedUploadChunkDBModel.offset).filter_by(session_id=session_id).all()]
+
+        return ChunkedUploadSession.from_db_model(db_model, received_chunk_offsets)
+
+    def write_chunk(self, session_id: str, offset: int, chunk_sha256: str, chunk_stream: BinaryIO, chunk_length: int) -> ChunkedUploadSession:
+        """
+        :param chunk_sha256: The SHA-256 hash of the chunk's contents (lowercase hex), as computed by the client.
+        :return: The session, including the written chunk.
+        """
+
+        session = self.get_session_or_404(session_id)
+        if not session.is_valid_chunk_offset(offset) or chunk_length != session.get_chunk_length(offset) or not ChunkedUploadSessionStore._SHA256_REGEX.match(chunk_sha256):
+            flask.abort(400)
+
+        with self._open_and_lock_session_file_or_404(session_id) as file:
+            # The chunk mustn't be considered uploaded while it's being (re)written
+            self._touch_session_or_404(session_id)
+            jobs_db_session.query(ChunkedUploadChunkDBModel).filter_by(session_id=session_id, offset=offset).delete(synchronize_session=False)
+            jobs_db_session.commit()
+
+            if self._write_chunk_to_file(file, offset, chunk_stream, chunk_length) != chunk_sha256:
+                flask.abort(400, description="The chunk's contents don't match its checksum!")
+
+            self._touch_session_or_404(session_id)
+            jobs_db_session.add(ChunkedUploadChunkDBModel(session_id=session_id, offset=offset, chunk_sha256=chunk_sha256))
+            jobs_db_session.commit()
+
+        return self.get_session_or_404(session_id)
+
+    @staticmethod
+    def _write_chunk_to_file(file: BinaryIO, offset: int, chunk_stream: BinaryIO, chunk_length: int) -> str:
+        """
+        :return: The SHA-256 hash of the written data (lowercase hex).
+        """
+
+        file.seek(offset)
+
+        chunk_hash = hashlib.sha256()
+        remaining_length = chunk_length
+        while remaining_length > 0:
+            data = chunk_stream.read(min(remaining_length, Constants.FILE_HASHING_CHUNK_SIZE))
+            if not data:  # The client has sent less data than it has declared
+                flask.abort(400)
+
+            chunk_hash.update(data)
+            file.write(data)
+            remaining_length -= len(data)
+
+        file.flush()
+
+        return chunk_hash.hexdigest()
+
+    def finalize_session(self, session_id: str) -> int:
+        """
+        Hands the uploaded file over to a new job which adds or updates the app, and deletes the session.
+
+        :return: The job's ID.
+        """
+
+        with self._open_and_lock_session_file_or_404(session_id) as file:
+            self._touch_session_or_404(session_id)
+            session = self.get_session_or_404(session_id)
+            jobs_db_session.commit()
+
+            if session.get_missing_chunk_offsets():
+                flask.abort(409, description="Some of the chunks haven't been uploaded yet!")
+
+            # The whole file has to be read anyway to compute its hash, so the chunks' checksums are verified again - a
+            #  failed rewrite of an already uploaded chunk might have corrupted it
+            apk_sha256, corrupted_chunk_offsets = self._hash_session_file(file, session)
+            if corrupted_chunk_offsets:
+                self._touch_session_or_404(session_id)
+                jobs_db_session.query(ChunkedUploadChunkDBModel).filter(ChunkedUploadChunkDBModel.session_id == session_id, ChunkedUploadChunkDBModel.offset.in_(corrupted_chunk_offsets)).delete(synchronize_session=False)
+                jobs_db_session.commit()
+
+                flask.abort(409, description="Some of the chunks have been corrupted and they must be uploaded again!")
+
+            # Both the files are located in the temporary directory, so the file isn't copied
+            staged_apk_path = AppStorageHelpers.generate_temp_filepath_for_apk()
+            os.rename(session.get_file_path(), staged_apk_path)
+            try:
+                if session.app_id is None:
+                    job_id = AppStorageJobQueue().enqueue_app_addition(staged_apk_path, apk_sha256, session.uploaded_filename)
+                else:
+                    job_id = AppStorageJobQueue().enqueue_app_update(session.app_id, staged_apk_path, apk_sha256, session.uploaded_filename)
+
+            except BaseException as e:
+                os.rename(staged_apk_path, session.get_file_path())
+                raise e
+
+            self._delete_sessions_from_database([session_id])
+
+        return job_id
+
+    @staticmethod
+    def _hash_session_file(file: BinaryIO, session: ChunkedUploadSession) -> Tuple[str, List[int]]:
+        """
+        :return: A 2-tuple containing the SHA-256 hash of the whole file (lowercase hex) and the offsets of the chunks whose contents don't match their checksums.
+        """
+
+        received_chunk_sha256s = {row.offset: row.chunk_sha256 for row in jobs_db_session.query(ChunkedUploadChunkDBModel).filter_by(session_id=session.id).all()}
+
+        file.seek(0)
+
+        file_hash = hashlib.sha256()
+        corrupted_chunk_offsets = []
+        for offset in session.get_all_chunk_offsets():
+            chunk_hash = hashlib.sha256()
+            remaining_length = session.get_chunk_length(offset)
+            while remaining_length > 0:
+                data = file.read(min(remaining_length, Constants.FILE_HASHING_CHUNK_SIZE))
+                if not data:  # The file has been truncated
+                    break
+
+                file_hash.update(data)
+                chunk_hash.update(data)
+                remaining_length -= len(data)
+
+            if remaining_length > 0 or chunk_hash.hexdigest() != received_chunk_sha256s.get(offset):
+                corrupted_chunk_offsets.append(offset)
+
+        return file_hash.hexdigest(), corrupted_chunk_offsets
+
+    def delete_session(self, session_id: str) -> None:
+        # No chunk can be being written to the file while it's being deleted
+        with self._open_and_lock_session_file_or_404(session_id):
+            # The session might have been finalized (its file moved) or deleted while the lock was being waited for
+            self._touch_session_or_404(session_id)
+            self._delete_sessions_from_database([session_id])
+            os.remove(ChunkedUploadSession.get_file_path_by_id(session_id))
+
+    def delete_expired_sessions(self) -> int:
+        """
+        :return: The number of deleted sessions.
+        """
+
+        expiration_datetime = datetime.datetime.utcnow() - datetime.timedelta(seconds=Settings.CHUNKED_UPLOAD_SESSION_LIFETIME)
+
+        jobs_db_session.rollback()
+
+        # The first statement of the transaction must be a write - see AppStorageJobQueue
+        expired_session_ids_select = sqlalchemy.select(ChunkedUploadSessionDBModel.id).where(ChunkedUploadSessionDBModel.last_activity_datetime < expiration_datetime)
+        jobs_db_session.query(ChunkedUploadChunkDBModel).filter(ChunkedUploadChunkDBModel.session_id.in_(expired_session_ids_select)).delete(synchronize_session=False)
+
+        expired_session_ids = [row.id for row in jobs_db_session.execute(expired_session_ids_select).all()]
+        jobs_db_session.query(ChunkedUploadSessionDBModel).filter(ChunkedUploadSessionDBModel.id.in_(expired_session_ids)).delete(synchronize_session=False)
+        jobs_db_session.commit()
+
+        # A chunk which is being written to a deleted session's file is written to the unlinked file, and the session is
+        #  not found afterwards
+        for session_id in expired_session_ids:
+            file_path = ChunkedUploadSession.get_file_path_by_id(session_id)
+            if os.path.exists(file_path):
+                os.remove(file_path)
+
+        return len(expired_session_ids)
+
+    def _touch_session_or_404(self, session_id: str) -> None:
+        """
+        Begins a new transaction with a write (see AppStorageJobQueue) which renews the session's expiration - and
+        checks whether the session still exists.
+        """
+
+        jobs_db_session.rollback()
+
+        updated_row_count = jobs_db_session.query(ChunkedUploadSessionDBModel).filter_by(id=session_id).update({"last_activity_datetime": datetime.datetime.utcnow()}, synchronize_session=False)
+        if updated_row_count == 0:
+            jobs_db_session.rollback()
+            flask.abort(404)
+
+    def _delete_sessions_from_database(self, session_ids: List[str]) -> None:
+        jobs_db_session.rollback()
+
+        jobs_db_session.query(ChunkedUploadChunkDBModel).filter(ChunkedUploadChunkDBModel.session_id.in_(session_ids)).delete(synchronize_session=False)
+        jobs_db_session.query(ChunkedUploadSessionDBModel).filter(ChunkedUploadSessionDBModel.id.in_(session_ids)).delete(synchronize_session=False)
+        jobs_db_session.commit()
+
+    @contextlib.contextmanager
+    def _open_and_lock_session_file_or_404(self, session_id: str):
+        # The file is never created here - a deleted session's file mustn't be recreated
+        try:
+            file = open(ChunkedUploadSession.get_file_path_by_id(session_id), "r+b")
+        except FileNotFoundError:
+            flask.abort(404)
+
+        with file:
+            self._flock_exclusively(file.fileno())
+
+            # The lock is released when the file is closed
+            yield file
+
+    @staticmethod
+    def _flock_exclusively(fd: int) -> None:
+        if not Settings.COOPERATIVE_APP_STORAGE_LOCKING:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            return
+
+        # See Settings.COOPERATIVE_APP_STORAGE_LOCKING
+        while True:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return
+            except BlockingIOError:
+                time.sleep(ChunkedUploadSessionStore._COOPERATIVE_FLOCK_POLL_INTERVAL)
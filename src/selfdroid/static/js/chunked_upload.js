@@ -0,0 +1,177 @@
+/*
+SPDX-License-Identifier: BSD-3-Clause
+
+Copyright (c) 2021 Vít Labuda. All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+following conditions are met:
+ 1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+    disclaimer.
+ 2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the
+    following disclaimer in the documentation and/or other materials provided with the distribution.
+ 3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote
+    products derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+*/
+
+
+// Large APK files are uploaded in chunks (see ChunkedUploadSessionStore), so that an interrupted upload can be resumed -
+//  even after the page is reloaded, as the upload session's URL is remembered in the local storage. If the browser
+//  doesn't support the needed APIs, the form is submitted as usual.
+const CHUNKED_UPLOAD_MAX_ATTEMPTS = 5;
+const CHUNKED_UPLOAD_RETRY_DELAY = 2000;  // in milliseconds
+const CHUNKED_UPLOAD_MAX_FINALIZATION_ROUNDS = 3;
+
+
+class ChunkedUploadError extends Error {
+    constructor(message, http_status) {
+        super(message);
+
+        this.http_status = http_status;  // Undefined if the request hasn't been answered
+    }
+}
+
+function sleep(milliseconds) {
+    return new Promise(function(resolve) {
+        setTimeout(resolve, milliseconds);
+    });
+}
+
+async function fetch_json(url, options) {
+    const response = await fetch(url, Object.assign({credentials: "same-origin", cache: "no-store"}, options));
+    if(!response.ok)
+        throw new ChunkedUploadError("The server has responded with HTTP status " + response.status + ".", response.status);
+
+    return response.json();
+}
+
+async function compute_sha256_hex(array_buffer) {
+    const hash = new Uint8Array(await crypto.subtle.digest("SHA-256", array_buffer));
+
+    return Array.from(hash, function(byte) { return byte.toString(16).padStart(2, "0"); }).join("");
+}
+
+async function get_or_create_upload_session(form, file, csrf_token) {
+    const local_storage_key = get_upload_session_local_storage_key(form, file);
+
+    const remembered_session_url = window.localStorage.getItem(local_storage_key);
+    if(remembered_session_url !== null) {
+        try {
+            return await fetch_json(remembered_session_url, {method: "GET"});
+        } catch(error) {
+            window.localStorage.removeItem(local_storage_key);  // E.g. the session has expired
+        }
+    }
+
+    const app_id = form.dataset.selfdroidAppId;
+    const session = await fetch_json(form.dataset.selfdroidUploadSessionsUrl, {
+        method: "POST",
+        headers: {"Content-Type": "application/json", "X-CSRFToken": csrf_token},
+        body: JSON.stringify({"total_size": file.size, "filename": file.name, "app_id": (app_id ? parseInt(app_id) : null)})
+    });
+
+    window.localStorage.setItem(local_storage_key, session.url);
+
+    return session;
+}
+
+function get_upload_session_local_storage_key(form, file) {
+    return ["selfdroid-upload-session", (form.dataset.selfdroidAppId || "new"), file.name, file.size, file.lastModified].join(":");
+}
+
+async function upload_chunk(session, file, offset, csrf_token) {
+    const chunk = await file.slice(offset, offset + session.chunk_size).arrayBuffer();
+    const chunk_sha256 = await compute_sha256_hex(chunk);
+
+    for(let attempt = 1; ; attempt++) {
+        try {
+            return await fetch_json(session.url + "/chunks/" + offset, {
+                method: "PUT",
+                headers: {"X-CSRFToken": csrf_token, "X-Chunk-SHA256": chunk_sha256},
+                body: chunk
+            });
+        } catch(error) {
+            // 404 = the session doesn't exist anymore - retrying wouldn't help
+            if(attempt >= CHUNKED_UPLOAD_MAX_ATTEMPTS || error.http_status === 404)
+                throw error;
+
+            await sleep(CHUNKED_UPLOAD_RETRY_DELAY);
+        }
+    }
+}
+
+async function upload_file_in_chunks(form, file, csrf_token, report_progress) {
+    let session = await get_or_create_upload_session(form, file, csrf_token);
+
+    for(let round = 1; round <= CHUNKED_UPLOAD_MAX_FINALIZATION_ROUNDS; round++) {
+        report_progress(session.received_size, session.total_size);
+
+        for(const offset of session.missing_chunk_offsets) {
+            session = await upload_chunk(session, file, offset, csrf_token);
+            report_progress(session.received_size, session.total_size);
+        }
+
+        try {
+            const finalization_result = await fetch_json(session.url + "/finalize", {method: "POST", headers: {"X-CSRFToken": csrf_token}});
+            window.localStorage.removeItem(get_upload_session_local_storage_key(form, file));
+
+            return finalization_result;
+        } catch(error) {
+            // 409 = some of the chunks have to be uploaded (again)
+            if(error.http_status !== 409)
+                throw error;
+
+            session = await fetch_json(session.url, {method: "GET"});
+        }
+    }
+
+    throw new ChunkedUploadError("The uploaded file keeps getting corrupted.");
+}
+
+function set_up_chunked_upload_form(form) {
+    form.addEventListener("submit", function(event) {
+        const file_input = form.querySelector('input[type="file"]');
+        const file = (file_input.files.length > 0 ? file_input.files[0] : null);
+        if(file === null || file.size === 0 || !window.crypto || !window.crypto.subtle || !window.localStorage)
+            return;  // The form is submitted (and validated) as usual
+
+        event.preventDefault();
+
+        const csrf_token = form.querySelector('input[name="csrf_token"]').value;
+        const submit_button = form.querySelector('input[type="submit"]');
+        const progress_wrapper = form.querySelector(".selfdroid-upload-progress");
+        const progress_bar = progress_wrapper.querySelector(".progress-bar");
+        const progress_text = progress_wrapper.querySelector(".selfdroid-upload-progress-text");
+
+        submit_button.disabled = true;
+        progress_wrapper.classList.remove("d-none");
+        progress_text.textContent = "Uploading...";
+
+        upload_file_in_chunks(form, file, csrf_token, function(received_size, total_size) {
+            const percentage = Math.floor((received_size / total_size) * 100);
+
+            progress_bar.style.width = percentage + "%";
+            progress_bar.setAttribute("aria-valuenow", percentage);
+            progress_text.textContent = "Uploading... " + percentage + " %";
+        }).then(function(finalization_result) {
+            progress_text.textContent = "The file has been uploaded, redirecting...";
+            window.location.href = finalization_result.job_url;
+        }).catch(function(error) {
+            progress_text.textContent = "The upload has failed: " + error.message + " Submit the form again to resume it.";
+            submit_button.disabled = false;
+        });
+    });
+}
+
+window.addEventListener("load", function() {
+    const forms = document.querySelectorAll("form[data-selfdroid-upload-sessions-url]");
+    for(let i = 0; i < forms.length; i++)
+        set_up_chunked_upload_form(forms[i]);
+});
@@ -0,0 +1,55 @@
+/*
+SPDX-License-Identifier: BSD-3-Clause
+
+Copyright (c) 2021 Vít Labuda. All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+following conditions are met:
+ 1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+    disclaimer.
+ 2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the
+    following disclaimer in the documentation and/or other materials provided with the distribution.
+ 3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote
+    products derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+*/
+
+
+const JOB_STATUS_POLL_INTERVAL = 1000;  // in milliseconds
+
+
+function poll_job_status() {
+    // The JOB_STATUS_URL constant is declared dynamically using Jinja2 in the template
+    fetch(JOB_STATUS_URL, {credentials: "same-origin", cache: "no-store"})
+        .then(function(response) {
+            if(!response.ok)
+                throw new Error("The job's status couldn't be fetched (HTTP status " + response.status + ")!");
+
+            return response.json();
+        })
+        .then(function(job_status) {
+            // The page is reloaded once the job has finished, so that its result is rendered by the server
+            if(job_status.is_finished) {
+                window.location.reload();
+                return;
+            }
+
+            document.querySelector("#job-status-text").textContent = job_status.status_text;
+            setTimeout(poll_job_status, JOB_STATUS_POLL_INTERVAL);
+        })
+        .catch(function() {
+            // E.g. a temporary network failure - the polling continues
+            setTimeout(poll_job_status, JOB_STATUS_POLL_INTERVAL);
+        });
+}
+
+window.onload = function() {
+    setTimeout(poll_job_status, JOB_STATUS_POLL_INTERVAL);
+}
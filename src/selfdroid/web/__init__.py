@@ -32,6 +32,13 @@ from selfdroid.web.endpoints.WebDownloadAPKEndpoint import WebDownloadAPKEndpoin
 from selfdroid.web.endpoints.WebAddAppEndpoint import WebAddAppEndpoint
 from selfdroid.web.endpoints.WebUpdateAppEndpoint import WebUpdateAppEndpoint
 from selfdroid.web.endpoints.WebDeleteAppEndpoint import WebDeleteAppEndpoint
+from selfdroid.web.endpoints.WebJobEndpoint import WebJobEndpoint
+from selfdroid.web.endpoints.WebJobStatusEndpoint import WebJobStatusEndpoint
+from selfdroid.web.endpoints.WebCreateUploadSessionEndpoint import WebCreateUploadSessionEndpoint
+from selfdroid.web.endpoints.WebUploadSessionEndpoint import WebUploadSessionEndpoint
+from selfdroid.web.endpoints.WebUploadSessionChunkEndpoint import WebUploadSessionChunkEndpoint
+from selfdroid.web.endpoints.WebFinalizeUploadSessionEndpoint import WebFinalizeUploadSessionEndpoint
+from selfdroid.web.endpoints.WebDiagnosticsEndpoint import WebDiagnosticsEndpoint
 
 
 URL_PREFIX = "/web"
@@ -87,3 +94,38 @@ def fl_web_update_app(**url_params):
 @web_blueprint.route("/delete-app/<int:app_id>", methods=["POST"])
 def fl_web_delete_app(**url_params):
     return EndpointExecutor(WebDeleteAppEndpoint, url_params).execute()
+
+
+@web_blueprint.route("/job/<int:job_id>", methods=["GET"])
+def fl_web_job(**url_params):
+    return EndpointExecutor(WebJobEndpoint, url_params).execute()
+
+
+@web_blueprint.route("/job-status/<int:job_id>", methods=["GET"])
+def fl_web_job_status(**url_params):
+    return EndpointExecutor(WebJobStatusEndpoint, url_params).execute()
+
+
+@web_blueprint.route("/upload-sessions", methods=["POST"])
+def fl_web_create_upload_session(**url_params):
+    return EndpointExecutor(WebCreateUploadSessionEndpoint, url_params).execute()
+
+
+@web_blueprint.route("/upload-sessions/<string:session_id>", methods=["GET", "DELETE"])
+def fl_web_upload_session(**url_params):
+    return EndpointExecutor(WebUploadSessionEndpoint, url_params).execute()
+
+
+@web_blueprint.route("/upload-sessions/<string:session_id>/chunks/<int:offset>", methods=["PUT"])
+def fl_web_upload_session_chunk(**url_params):
+    return EndpointExecutor(WebUploadSessionChunkEndpoint, url_params).execute()
+
+
+@web_blueprint.route("/upload-sessions/<string:session_id>/finalize", methods=["POST"])
+def fl_web_finalize_upload_session(**url_params):
+    return EndpointExecutor(WebFinalizeUploadSessionEndpoint, url_params).execute()
+
+
+@web_blueprint.route("/diagnostics", methods=["GET"])
+def fl_web_diagnostics(**url_params):
+    return EndpointExecutor(WebDiagnosticsEndpoint, url_params).execute()
@@ -0,0 +1,61 @@
+# SPDX-License-Identifier: BSD-3-Clause
+#
+# Copyright (c) 2021 Vít Labuda. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+# following conditions are met:
+#  1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+#     disclaimer.
+#  2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the
+#     following disclaimer in the documentation and/or other materials provided with the distribution.
+#  3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote
+#     products derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+from typing import Dict, Any
+import abc
+import flask
+import flask_wtf.csrf
+import wtforms
+from selfdroid.appstorage.jobs.ChunkedUploadSession import ChunkedUploadSession
+from selfdroid.web.endpointbases.WebAdminEndpointBase import WebAdminEndpointBase
+
+
+class WebChunkedUploadEndpointBase(WebAdminEndpointBase, metaclass=abc.ABCMeta):
+    """
+    The base class of the endpoints of the chunked upload protocol (see ChunkedUploadSessionStore), which is used by the
+    web app's JavaScript code. The requests which modify anything must contain the CSRF token in a header, as they
+    don't submit a form.
+    """
+
+    CSRF_TOKEN_HEADER: str = "X-CSRFToken"
+
+    def __init__(self, url_params: Dict[str, Any]):
+        super().__init__(url_params)
+
+        if flask.request.method != "GET":
+            try:
+                flask_wtf.csrf.validate_csrf(flask.request.headers.get(WebChunkedUploadEndpointBase.CSRF_TOKEN_HEADER))
+            except wtforms.ValidationError:
+                flask.abort(400)
+
+    def jsonify_and_finish_request(self, jsonifiable_object: Dict[str, Any], status_code: int = 200) -> None:
+        response = flask.jsonify(jsonifiable_object)
+        response.status_code = status_code
+        response.cache_control.no_store = True
+
+        self.finish_request(response)
+
+    def generate_session_status_dict(self, session: ChunkedUploadSession) -> Dict[str, Any]:
+        status_dict = session.to_status_dict()
+        status_dict["url"] = flask.url_for("web_blueprint.fl_web_upload_session", session_id=session.id)
+
+        return status_dict
@@ -62,9 +62,3 @@ class WebEndpointBase(EndpointBase, metaclass=abc.ABCMeta):
 
         rendered_template = flask.render_template(template_name, **params)
         self.finish_request(rendered_template)
-
-    def send_file_and_finish_request(self, directory: str, filename: str, download_name: str, **send_file_kwargs) -> None:
-        send_file_kwargs["download_name"] = download_name
-
-        sent_file = flask.send_from_directory(directory, filename, **send_file_kwargs)
-        self.finish_request(sent_file)
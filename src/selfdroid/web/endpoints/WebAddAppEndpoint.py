@@ -20,14 +20,11 @@
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
 
-from typing import Optional
 import os
 import os.path
-from selfdroid.UserReadableException import UserReadableException
 from selfdroid.appstorage.AppStorageHelpers import AppStorageHelpers
-from selfdroid.appstorage.AppMetadata import AppMetadata
-from selfdroid.appstorage.crud.AppAdder import AppAdder
-from selfdroid.web.WebStatusMessageCollector import WebStatusMessageCollector
+from selfdroid.appstorage.jobs.AppStorageJobQueue import AppStorageJobQueue
+from selfdroid.appstorage.jobs.AppStorageJobWorker import AppStorageJobWorker
 from selfdroid.web.endpointbases.WebAdminEndpointBase import WebAdminEndpointBase
 from selfdroid.web.forms.WebAddAppForm import WebAddAppForm
 
@@ -38,35 +35,29 @@ class WebAddAppEndpoint(WebAdminEndpointBase):
         self.message_collector.register_form("add_app", add_app_form)
 
         if add_app_form.validate_on_submit():
-            app_metadata = self._lock_and_perform_app_addition(add_app_form)
-            if app_metadata is not None:  # = If the app was successfully added to the database
-                self.redirect_and_finish_request("web_blueprint.fl_web_app_details", app_id=app_metadata.id)
+            job_id = self._enqueue_app_addition(add_app_form)
+            self.redirect_and_finish_request("web_blueprint.fl_web_job", job_id=job_id)
 
         self.redirect_and_finish_request("web_blueprint.fl_web_index")
 
-    def _lock_and_perform_app_addition(self, add_app_form: WebAddAppForm) -> Optional[AppMetadata]:
-        with AppStorageHelpers.get_app_storage_lock():
-            return self._perform_app_addition_while_locked(add_app_form)
-
-    def _perform_app_addition_while_locked(self, add_app_form: WebAddAppForm) -> Optional[AppMetadata]:
+    def _enqueue_app_addition(self, add_app_form: WebAddAppForm) -> int:
         apk_file = add_app_form.apk_file.data
 
-        temporary_filepath = AppStorageHelpers.generate_temp_filepath_for_apk_while_locked()
+        # Parsing the uploaded APK (including the conversion of its icon) and waiting for the app storage lock might take
+        #  a long time, so the app is added asynchronously by a worker (see AppStorageJobWorker) - the request only
+        #  stages the uploaded file and enqueues a job, whose progress is then displayed on its page.
+        staged_apk_path = AppStorageHelpers.generate_temp_filepath_for_apk()
         try:
-            apk_file.save(temporary_filepath)
-            app_metadata = AppAdder(temporary_filepath).add_app_while_locked()
-
-        except UserReadableException as e:  # AppStorageModificationException and its children, APKParserException
-            self.message_collector.add_error_message_from_user_readable_exception(e)
+            apk_sha256 = AppStorageHelpers.save_uploaded_apk(apk_file, staged_apk_path)
+            job_id = AppStorageJobQueue().enqueue_app_addition(staged_apk_path, apk_sha256, apk_file.filename)
 
-            return None
+        except BaseException as e:
+            # The staged file is owned by the job only once it has been enqueued
+            if os.path.exists(staged_apk_path):
+                os.remove(staged_apk_path)
 
-        else:
-            html_message = WebStatusMessageCollector.format_html_message("The app <b>{}</b> was successfully added!", app_metadata.app_name)
-            self.message_collector.add_success_message(html_message)
+            raise e
 
-            return app_metadata
+        AppStorageJobWorker.wake_up_in_process_worker()
 
-        finally:
-            if os.path.exists(temporary_filepath):  # The file might have been moved
-                os.remove(temporary_filepath)
+        return job_id
@@ -22,7 +22,6 @@
 
 from typing import Dict, Any
 from selfdroid.EndpointWithAppIDBase import EndpointWithAppIDBase
-from selfdroid.appstorage.AppStorageHelpers import AppStorageHelpers
 from selfdroid.appstorage.crud.AppGetter import AppGetter
 from selfdroid.web.endpointbases.WebAtLeastUserEndpointBase import WebAtLeastUserEndpointBase
 from selfdroid.web.forms.WebUpdateAppForm import WebUpdateAppForm
@@ -35,8 +34,7 @@ class WebAppDetailsEndpoint(WebAtLeastUserEndpointBase, EndpointWithAppIDBase):
         EndpointWithAppIDBase.__init__(self, url_params)
 
     def handle_request(self) -> None:
-        with AppStorageHelpers.get_app_storage_lock():
-            app_metadata = AppGetter().get_metadata_or_404_while_locked(self.app_id_from_url_params)
+        app_metadata = AppGetter().get_metadata_or_404(self.app_id_from_url_params)
 
         template_context = {"app_metadata": app_metadata}
         if self.authenticator.has_admin_privileges():
@@ -21,22 +21,18 @@
 
 
 from typing import Dict, Any
-from selfdroid.Constants import Constants
 from selfdroid.EndpointWithAppIDBase import EndpointWithAppIDBase
-from selfdroid.appstorage.AppStorageHelpers import AppStorageHelpers
+from selfdroid.EndpointWithAppIconBase import EndpointWithAppIconBase
 from selfdroid.appstorage.crud.AppGetter import AppGetter
 from selfdroid.web.endpointbases.WebAtLeastUserEndpointBase import WebAtLeastUserEndpointBase
 
 
-class WebAppIconEndpoint(WebAtLeastUserEndpointBase, EndpointWithAppIDBase):
+class WebAppIconEndpoint(WebAtLeastUserEndpointBase, EndpointWithAppIconBase, EndpointWithAppIDBase):
     def __init__(self, url_params: Dict[str, Any]):
         WebAtLeastUserEndpointBase.__init__(self, url_params)
         EndpointWithAppIDBase.__init__(self, url_params)
 
     def handle_request(self) -> None:
-        with AppStorageHelpers.get_app_storage_lock():
-            app_metadata = AppGetter().get_metadata_or_404_while_locked(self.app_id_from_url_params)
+        app_metadata = AppGetter().get_metadata_or_404(self.app_id_from_url_params)
 
-        self.send_file_and_finish_request(Constants.ICONS_DIRECTORY,
-                                          app_metadata.get_icon_filename(),
-                                          app_metadata.get_icon_download_name())
+        self.send_app_icon_and_finish_request(app_metadata)
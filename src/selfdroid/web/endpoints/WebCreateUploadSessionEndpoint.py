@@ -0,0 +1,57 @@
+# SPDX-License-Identifier: BSD-3-Clause
+#
+# Copyright (c) 2021 Vít Labuda. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+# following conditions are met:
+#  1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+#     disclaimer.
+#  2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the
+#     following disclaimer in the documentation and/or other materials provided with the distribution.
+#  3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote
+#     products derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+import flask
+from selfdroid.appstorage.crud.AppGetter import AppGetter
+from selfdroid.appstorage.jobs.ChunkedUploadSessionStore import ChunkedUploadSessionStore
+from selfdroid.web.endpointbases.WebChunkedUploadEndpointBase import WebChunkedUploadEndpointBase
+
+
+class WebCreateUploadSessionEndpoint(WebChunkedUploadEndpointBase):
+    """
+    Expects a JSON object with the "total_size" (int), "filename" (string or null) and "app_id" (int, or null if a new
+    app is being added) keys. Returns the created session's status (see ChunkedUploadSession.to_status_dict()).
+    """
+
+    def handle_request(self) -> None:
+        request_json = flask.request.get_json(silent=True)
+        if not isinstance(request_json, dict):
+            flask.abort(400)
+
+        total_size = request_json.get("total_size")
+        filename = request_json.get("filename")
+        app_id = request_json.get("app_id")
+        if not self._is_int(total_size) or not (filename is None or isinstance(filename, str)) or not (app_id is None or self._is_int(app_id)):
+            flask.abort(400)
+
+        if app_id is not None:
+            # Checked before the upload begins, so that the file isn't uploaded in vain
+            AppGetter().get_metadata_or_404(app_id)
+
+        session = ChunkedUploadSessionStore().create_session(total_size, filename, app_id)
+
+        self.jsonify_and_finish_request(self.generate_session_status_dict(session), 201)
+
+    @staticmethod
+    def _is_int(value) -> bool:
+        # bool is a subclass of int
+        return isinstance(value, int) and not isinstance(value, bool)
@@ -24,6 +24,7 @@ from typing import Dict, Any
 from selfdroid.EndpointWithAppIDBase import EndpointWithAppIDBase
 from selfdroid.UserReadableException import UserReadableException
 from selfdroid.appstorage.AppStorageHelpers import AppStorageHelpers
+from selfdroid.appstorage.AppStorageLockTimeoutException import AppStorageLockTimeoutException
 from selfdroid.appstorage.crud.AppGetter import AppGetter
 from selfdroid.appstorage.crud.AppDeleter import AppDeleter
 from selfdroid.web.WebStatusMessageCollector import WebStatusMessageCollector
@@ -50,11 +51,15 @@ class WebDeleteAppEndpoint(WebAdminEndpointBase, EndpointWithAppIDBase):
         self.redirect_and_finish_request("web_blueprint.fl_web_index")
 
     def _lock_and_perform_app_deletion(self) -> None:
-        with AppStorageHelpers.get_app_storage_lock():
-            self._perform_app_deletion_while_locked()
+        try:
+            with AppStorageHelpers.lock_apps_for_request([self.app_id_from_url_params]):
+                self._perform_app_deletion_while_locked()
+
+        except AppStorageLockTimeoutException as e:
+            self.message_collector.add_error_message_from_user_readable_exception(e)
 
     def _perform_app_deletion_while_locked(self) -> None:
-        db_model = self._app_getter.get_db_model_or_404_while_locked(self.app_id_from_url_params)
+        db_model = self._app_getter.get_db_model_or_404(self.app_id_from_url_params)
 
         try:
             app_metadata = AppDeleter(db_model).delete_app_while_locked()
@@ -0,0 +1,55 @@
+# SPDX-License-Identifier: BSD-3-Clause
+#
+# Copyright (c) 2021 Vít Labuda. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+# following conditions are met:
+#  1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+#     disclaimer.
+#  2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the
+#     following disclaimer in the documentation and/or other materials provided with the distribution.
+#  3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote
+#     products derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+import os
+import flask
+from selfdroid.api.v1.APIv1Authenticator import APIv1Authenticator
+from selfdroid.appstorage.AppStorageHelpers import AppStorageHelpers
+from selfdroid.appstorage.AppStorageLockMonitor import AppStorageLockMonitor
+from selfdroid.appstorage.apk.APKParser import APKParser
+from selfdroid.appstorage.jobs.AppStorageJobQueue import AppStorageJobQueue
+from selfdroid.web.endpointbases.WebAdminEndpointBase import WebAdminEndpointBase
+
+
+class WebDiagnosticsEndpoint(WebAdminEndpointBase):
+    """
+    Returns diagnostic information in the JSON format. Apart from the app storage locks' holders and the job counts, the
+    statistics are collected by each worker process separately, so the "pid" field tells which process has handled the
+    request.
+    """
+
+    def handle_request(self) -> None:
+        diagnostics = {
+            "pid": os.getpid(),
+            "app_storage_locks": {
+                "holders": {os.path.basename(lock_path): AppStorageLockMonitor.read_holder_file(lock_path) for lock_path in AppStorageHelpers.get_all_lock_paths()},
+                "statistics": AppStorageLockMonitor.get_statistics()
+            },
+            "api_credential_cache": APIv1Authenticator.get_credential_cache_statistics(),
+            "parsed_apk_cache": APKParser.get_parsed_apk_cache_statistics(),
+            "app_storage_jobs_by_state": AppStorageJobQueue().get_job_counts_by_state()
+        }
+
+        response = flask.jsonify(diagnostics)
+        response.cache_control.no_store = True
+
+        self.finish_request(response)
@@ -0,0 +1,51 @@
+# SPDX-License-Identifier: BSD-3-Clause
+#
+# Copyright (c) 2021 Vít Labuda. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+# following conditions are met:
+#  1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+#     disclaimer.
+#  2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the
+#     following disclaimer in the documentation and/or other materials provided with the distribution.
+#  3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote
+#     products derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+from typing import Dict, Any
+import flask
+from selfdroid.appstorage.jobs.AppStorageJobWorker import AppStorageJobWorker
+from selfdroid.appstorage.jobs.ChunkedUploadSessionStore import ChunkedUploadSessionStore
+from selfdroid.web.endpointbases.WebChunkedUploadEndpointBase import WebChunkedUploadEndpointBase
+
+
+class WebFinalizeUploadSessionEndpoint(WebChunkedUploadEndpointBase):
+    """
+    Enqueues a job which adds or updates the app from the uploaded file (see WebAddAppEndpoint) and returns the URLs of
+    its page and status. If some of the chunks are missing, 409 Conflict is returned - the session's status then tells
+    which chunks have to be uploaded (again).
+    """
+
+    def __init__(self, url_params: Dict[str, Any]):
+        super().__init__(url_params)
+
+        self._session_id: str = url_params["session_id"]
+
+    def handle_request(self) -> None:
+        job_id = ChunkedUploadSessionStore().finalize_session(self._session_id)
+
+        AppStorageJobWorker.wake_up_in_process_worker()
+
+        self.jsonify_and_finish_request({
+            "job_id": job_id,
+            "job_url": flask.url_for("web_blueprint.fl_web_job", job_id=job_id),
+            "job_status_url": flask.url_for("web_blueprint.fl_web_job_status", job_id=job_id)
+        })
@@ -20,18 +20,44 @@
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
 
-from selfdroid.appstorage.AppStorageHelpers import AppStorageHelpers
+import flask
+from selfdroid.Settings import Settings
+from selfdroid.UserReadableException import UserReadableException
 from selfdroid.appstorage.crud.AppGetter import AppGetter
+from selfdroid.appstorage.crud.AppListingQuery import AppListingQuery
 from selfdroid.web.endpointbases.WebAtLeastUserEndpointBase import WebAtLeastUserEndpointBase
 from selfdroid.web.forms.WebAddAppForm import WebAddAppForm
 
 
 class WebIndexEndpoint(WebAtLeastUserEndpointBase):
+    _PAGE_CURSOR_ARG: str = "page"
+    _FIRST_APP_NUMBER_ARG: str = "from"  # Used only to number the apps in the list
+
     def handle_request(self) -> None:
-        with AppStorageHelpers.get_app_storage_lock():
-            all_apps_metadata = AppGetter().get_all_metadata_while_locked()
+        page_cursor = flask.request.args.get(WebIndexEndpoint._PAGE_CURSOR_ARG, default=None, type=str)
+        first_app_number = max(1, flask.request.args.get(WebIndexEndpoint._FIRST_APP_NUMBER_ARG, default=1, type=int))
+
+        try:
+            listing_query = AppListingQuery(page_size=Settings.WEB_INDEX_PAGE_SIZE, page_cursor=page_cursor)
+        except UserReadableException as e:  # AppListingQueryException
+            self.message_collector.add_error_message_from_user_readable_exception(e)
+            self.redirect_and_finish_request("web_blueprint.fl_web_index")
+
+        apps_metadata, next_page_cursor = AppGetter().get_page_of_metadata(listing_query)
+
+        template_context = {
+            "apps_metadata": apps_metadata,
+            "first_app_number": first_app_number,
+            "is_first_page": (page_cursor is None),
+            "next_page_url_params": None
+        }
+
+        if next_page_cursor is not None:
+            template_context["next_page_url_params"] = {
+                WebIndexEndpoint._PAGE_CURSOR_ARG: next_page_cursor,
+                WebIndexEndpoint._FIRST_APP_NUMBER_ARG: (first_app_number + len(apps_metadata))
+            }
 
-        template_context = {"all_apps_metadata": all_apps_metadata}
         if self.authenticator.has_admin_privileges():
             template_context["add_app_form"] = WebAddAppForm()
 
@@ -0,0 +1,46 @@
+# SPDX-License-Identifier: BSD-3-Clause
+#
+# Copyright (c) 2021 Vít Labuda. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+# following conditions are met:
+#  1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+#     disclaimer.
+#  2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the
+#     following disclaimer in the documentation and/or other materials provided with the distribution.
+#  3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote
+#     products derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+from typing import Dict, Any
+from selfdroid.EndpointWithJobIDBase import EndpointWithJobIDBase
+from selfdroid.appstorage.crud.AppGetter import AppGetter
+from selfdroid.appstorage.jobs.AppStorageJobQueue import AppStorageJobQueue
+from selfdroid.web.endpointbases.WebAdminEndpointBase import WebAdminEndpointBase
+
+
+class WebJobEndpoint(WebAdminEndpointBase, EndpointWithJobIDBase):
+    """
+    Displays the progress of an enqueued upload (see WebAddAppEndpoint) - the page polls the job's status (see
+    WebJobStatusEndpoint) and reloads itself once the job has finished, so that its result is displayed.
+    """
+
+    def __init__(self, url_params: Dict[str, Any]):
+        WebAdminEndpointBase.__init__(self, url_params)
+        EndpointWithJobIDBase.__init__(self, url_params)
+
+    def handle_request(self) -> None:
+        job = AppStorageJobQueue().get_job_or_404(self.job_id_from_url_params)
+
+        # The updated app might have been deleted in the meantime
+        does_app_exist = (job.app_id is not None) and AppGetter().does_app_exist_in_database(job.app_id)
+
+        self.render_template_and_finish_request("web_job.html", job=job, does_app_exist=does_app_exist)
@@ -24,11 +24,10 @@ from typing import Dict, Any
 import os
 import os.path
 from selfdroid.EndpointWithAppIDBase import EndpointWithAppIDBase
-from selfdroid.UserReadableException import UserReadableException
 from selfdroid.appstorage.AppStorageHelpers import AppStorageHelpers
 from selfdroid.appstorage.crud.AppGetter import AppGetter
-from selfdroid.appstorage.crud.AppUpdater import AppUpdater
-from selfdroid.web.WebStatusMessageCollector import WebStatusMessageCollector
+from selfdroid.appstorage.jobs.AppStorageJobQueue import AppStorageJobQueue
+from selfdroid.appstorage.jobs.AppStorageJobWorker import AppStorageJobWorker
 from selfdroid.web.endpointbases.WebAdminEndpointBase import WebAdminEndpointBase
 from selfdroid.web.forms.WebUpdateAppForm import WebUpdateAppForm
 
@@ -45,50 +44,33 @@ class WebUpdateAppEndpoint(WebAdminEndpointBase, EndpointWithAppIDBase):
         self.message_collector.register_form("update_app", update_app_form)
 
         if update_app_form.validate_on_submit():
-            should_request_be_redirected_to_app_details_page = self._lock_and_perform_app_update(update_app_form)
-            if should_request_be_redirected_to_app_details_page:
-                self.redirect_and_finish_request("web_blueprint.fl_web_app_details", app_id=self.app_id_from_url_params)
+            job_id = self._enqueue_app_update(update_app_form)
+            self.redirect_and_finish_request("web_blueprint.fl_web_job", job_id=job_id)
 
-        self.redirect_and_finish_request("web_blueprint.fl_web_index")
-
-    def _lock_and_perform_app_update(self, update_app_form: WebUpdateAppForm) -> bool:
-        """
-        :return: Whether the request should be redirected to the app details page.
-        """
+        if self._app_getter.does_app_exist_in_database(self.app_id_from_url_params):
+            self.redirect_and_finish_request("web_blueprint.fl_web_app_details", app_id=self.app_id_from_url_params)
 
-        with AppStorageHelpers.get_app_storage_lock():
-            self._perform_app_update_while_locked(update_app_form)
+        self.redirect_and_finish_request("web_blueprint.fl_web_index")
 
-            # The check needs to be performed in this fairly unexpected place due to the locked context requirement.
-            return self._should_request_be_redirected_to_app_details_page_while_locked()
+    def _enqueue_app_update(self, update_app_form: WebUpdateAppForm) -> int:
+        # Checked before the upload is enqueued, so that it isn't processed in vain
+        self._app_getter.get_metadata_or_404(self.app_id_from_url_params)
 
-    def _perform_app_update_while_locked(self, update_app_form: WebUpdateAppForm) -> None:
-        db_model = self._app_getter.get_db_model_or_404_while_locked(self.app_id_from_url_params)
         apk_file = update_app_form.apk_file.data
 
-        temporary_filepath = AppStorageHelpers.generate_temp_filepath_for_apk_while_locked()
+        # The app is updated asynchronously by a worker - see WebAddAppEndpoint._enqueue_app_addition()
+        staged_apk_path = AppStorageHelpers.generate_temp_filepath_for_apk()
         try:
-            apk_file.save(temporary_filepath)
-            old_app_metadata, new_app_metadata = AppUpdater(db_model, temporary_filepath).update_app_while_locked()
-
-        except UserReadableException as e:  # AppStorageModificationException and its children, APKParserException
-            self.message_collector.add_error_message_from_user_readable_exception(e)
-
-        else:
-            if old_app_metadata.app_name == new_app_metadata.app_name:
-                html_message = WebStatusMessageCollector.format_html_message("The app <b>{}</b> was successfully updated!", new_app_metadata.app_name)
-            else:
-                html_message = WebStatusMessageCollector.format_html_message("The app <b>{}</b> (previously named <b>{}</b>) was successfully updated!", new_app_metadata.app_name, old_app_metadata.app_name)
+            apk_sha256 = AppStorageHelpers.save_uploaded_apk(apk_file, staged_apk_path)
+            job_id = AppStorageJobQueue().enqueue_app_update(self.app_id_from_url_params, staged_apk_path, apk_sha256, apk_file.filename)
 
-            self.message_collector.add_success_message(html_message)
+        except BaseException as e:
+            # The staged file is owned by the job only once it has been enqueued
+            if os.path.exists(staged_apk_path):
+                os.remove(staged_apk_path)
 
-        finally:
-            if os.path.exists(temporary_filepath):
-                os.remove(temporary_filepath)
+            raise e
 
-    def _should_request_be_redirected_to_app_details_page_while_locked(self) -> bool:
-        # The decision whether to redirect the request or not is not based on the update operation's result,
-        # because even if the app failed to update, it is, in most cases (unless it was deleted due to a fatal error),
-        # still present in the app storage.
+        AppStorageJobWorker.wake_up_in_process_worker()
 
-        return self._app_getter.does_app_exist_in_database(self.app_id_from_url_params)
+        return job_id
@@ -0,0 +1,47 @@
+# SPDX-License-Identifier: BSD-3-Clause
+#
+# Copyright (c) 2021 Vít Labuda. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+# following conditions are met:
+#  1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+#     disclaimer.
+#  2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the
+#     following disclaimer in the documentation and/or other materials provided with the distribution.
+#  3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote
+#     products derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+from typing import Dict, Any
+import flask
+from selfdroid.appstorage.jobs.ChunkedUploadSessionStore import ChunkedUploadSessionStore
+from selfdroid.web.endpointbases.WebChunkedUploadEndpointBase import WebChunkedUploadEndpointBase
+
+
+class WebUploadSessionEndpoint(WebChunkedUploadEndpointBase):
+    """
+    GET returns the session's status (including the chunks which have already been received), DELETE cancels the upload.
+    """
+
+    def __init__(self, url_params: Dict[str, Any]):
+        super().__init__(url_params)
+
+        self._session_id: str = url_params["session_id"]
+        self._session_store: ChunkedUploadSessionStore = ChunkedUploadSessionStore()
+
+    def handle_request(self) -> None:
+        if flask.request.method == "DELETE":
+            self._session_store.delete_session(self._session_id)
+            self.finish_request(("", 204))
+
+        session = self._session_store.get_session_or_404(self._session_id)
+
+        self.jsonify_and_finish_request(self.generate_session_status_dict(session))
@@ -0,0 +1,293 @@
+# SPDX-License-Identifier: BSD-3-Clause
+#
+# Copyright (c) 2021 Vít Labuda. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+# following conditions are met:
+#  1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+#     disclaimer.
+#  2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the
+#     following disclaimer in the documentation and/or other materials provided with the distribution.
+#  3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote
+#     products derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+from typing import List, Tuple, Dict, Optional
+import io
+import os
+import struct
+import zipfile
+import PIL.Image
+
+
+class _StringPool:
+    # A UTF-8 or UTF-16 string pool chunk
+    def __init__(self, is_utf16: bool = False):
+        self._is_utf16: bool = is_utf16
+        self._strings: List[str] = []
+        self._indices: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._strings)
+
+    def get_index(self, string: str) -> int:
+        if string not in self._indices:
+            self._indices[string] = len(self._strings)
+            self._strings.append(string)
+
+        return self._indices[string]
+
+    def build(self) -> bytes:
+        offsets, encoded_strings, data_length = [], [], 0
+        for string in self._strings:
+            if self._is_utf16:
+                encoded_string = string.encode("utf-16-le")
+                encoded_string = self._encode_length(len(encoded_string) // 2, 2) + encoded_string + b"\0\0"
+            else:
+                encoded_string = string.encode("utf-8")
+                encoded_string = self._encode_length(len(string), 1) + self._encode_length(len(encoded_string), 1) + encoded_string + b"\0"
+
+            offsets.append(data_length)
+            encoded_strings.append(encoded_string)
+            data_length += len(encoded_string)
+
+        data = b"".join(encoded_strings)
+        data = data.ljust((len(data) + 3) // 4 * 4, b"\0")
+
+        strings_start = 28 + 4 * len(self._strings)
+        header = struct.pack("<IIIII", len(self._strings), 0, (0 if self._is_utf16 else 0x100), strings_start, 0)
+
+        return struct.pack("<HHI", 0x0001, 28, strings_start + len(data)) + header + b"".join(struct.pack("<I", offset) for offset in offsets) + data
+
+    @staticmethod
+    def _encode_length(length: int, character_size: int) -> bytes:
+        # Lengths which don't fit into 7 (UTF-8) or 15 (UTF-16) bits are split into two units, the first one flagged
+        if character_size == 1:
+            assert length < 0x8000
+            return (bytes([0x80 | (length >> 8), length & 0xFF]) if length >= 0x80 else bytes([length]))
+
+        return (struct.pack("<HH", 0x8000 | (length >> 16), length & 0xFFFF) if length >= 0x8000 else struct.pack("<H", length))
+
+
+class APKBuilder:
+    """
+    Builds minimal, but valid APK files for the tests - a binary AndroidManifest.xml and a resources.arsc file with the
+    app's name and icon, which is all the APK parsers (see APKParser) need. The files aren't installable on Android.
+    """
+
+    _ANDROID_NAMESPACE: str = "http://schemas.android.com/apk/res/android"
+
+    _VALUE_TYPE_REFERENCE: int = 0x01
+    _VALUE_TYPE_STRING: int = 0x03
+    _VALUE_TYPE_INT: int = 0x10
+
+    _MIPMAP_TYPE_ID: int = 1
+    _STRING_TYPE_ID: int = 2
+    _ANYDPI_DENSITY: int = 0xFFFE
+
+    def __init__(self, package_name: str = "com.example.app", version_code: int = 1, version_name: str = "1.0",
+                 app_name: str = "Example App", icon_color: Tuple[int, int, int] = (0, 0, 255), padding_size: int = 0,
+                 extra_string_count: int = 0, min_sdk_version: int = 21, max_sdk_version: Optional[int] = None,
+                 utf16_string_pools: bool = False, localized_app_names: Optional[Dict[str, str]] = None,
+                 icon_densities: Tuple[int, ...] = (640,), reference_chain_length: int = 0):
+        """
+        :param padding_size: The size of a file with random contents which is stored (uncompressed) in the APK, so that
+                             the APK file's size can be controlled.
+        :param extra_string_count: The number of string resources added to resources.arsc besides the app's name, so
+                                   that the resource table's size can be controlled.
+        :param utf16_string_pools: Whether the string pools are encoded in UTF-16 instead of UTF-8.
+        :param localized_app_names: The app's name in other languages (2-letter language code -> name), each of which
+                                    is stored in a separate configuration.
+        :param icon_densities: The densities of the icon's variants, each of which is stored in a separate configuration
+                               (an "anydpi" one - 0xFFFE - is an XML file, like the adaptive icons).
+        :param reference_chain_length: The number of references the manifest's label and icon go through before
+                                       reaching the resources.
+        """
+
+        self._package_name: str = package_name
+        self._version_code: int = version_code
+        self._version_name: str = version_name
+        self._app_name: str = app_name
+        self._icon_color: Tuple[int, int, int] = icon_color
+        self._padding_size: int = padding_size
+        self._extra_string_count: int = extra_string_count
+        self._min_sdk_version: int = min_sdk_version
+        self._max_sdk_version: Optional[int] = max_sdk_version
+        self._utf16_string_pools: bool = utf16_string_pools
+        self._localized_app_names: Dict[str, str] = (localized_app_names or {})
+        self._icon_densities: Tuple[int, ...] = icon_densities
+        self._reference_chain_length: int = reference_chain_length
+
+    def build(self, apk_path: str) -> str:
+        with zipfile.ZipFile(apk_path, "w", zipfile.ZIP_DEFLATED) as apk_file:
+            apk_file.writestr("AndroidManifest.xml", self._build_manifest())
+            apk_file.writestr(zipfile.ZipInfo("resources.arsc"), self._build_resource_table(), compress_type=zipfile.ZIP_STORED)
+
+            for density in self._icon_densities:
+                apk_file.writestr(self._get_icon_path(density), self._build_icon(density))
+
+            if self._padding_size > 0:
+                apk_file.writestr(zipfile.ZipInfo("assets/padding.bin"), os.urandom(self._padding_size), compress_type=zipfile.ZIP_STORED)
+
+        return apk_path
+
+    @staticmethod
+    def _get_icon_path(density: int) -> str:
+        if density == APKBuilder._ANYDPI_DENSITY:
+            return "res/mipmap-anydpi/icon.xml"
+
+        return "res/mipmap-{}dpi/icon.png".format(density)
+
+    def _build_icon(self, density: int) -> bytes:
+        if density == APKBuilder._ANYDPI_DENSITY:
+            return b"<adaptive-icon />"
+
+        icon_size = max(1, 48 * density // 160)
+        with io.BytesIO() as icon_bytes_io:
+            PIL.Image.new("RGB", (icon_size, icon_size), self._icon_color).save(icon_bytes_io, format="PNG")
+
+            return icon_bytes_io.getvalue()
+
+    def _get_referenced_resource_id(self, type_id: int, type_entry_count: int) -> int:
+        # The first entry of the type is the resource itself; the references of the chain follow the type's other entries
+        entry_index = (type_entry_count if self._reference_chain_length > 0 else 0)
+
+        return self._get_resource_id(type_id, entry_index)
+
+    @staticmethod
+    def _get_resource_id(type_id: int, entry_index: int) -> int:
+        return 0x7f000000 | (type_id << 16) | entry_index
+
+    def _build_manifest(self) -> bytes:
+        ns, ref, string, integer = True, APKBuilder._VALUE_TYPE_REFERENCE, APKBuilder._VALUE_TYPE_STRING, APKBuilder._VALUE_TYPE_INT
+
+        main_activity = ("activity", [(ns, "name", string, ".MainActivity")], [
+            ("intent-filter", [], [
+                ("action", [(ns, "name", string, "android.intent.action.MAIN")], []),
+                ("category", [(ns, "name", string, "android.intent.category.LAUNCHER")], [])
+            ])
+        ])
+
+        sdk_attributes = [(ns, "minSdkVersion", integer, self._min_sdk_version)]
+        if self._max_sdk_version is not None:
+            sdk_attributes.append((ns, "maxSdkVersion", integer, self._max_sdk_version))
+
+        root_element = ("manifest", [(ns, "versionCode", integer, self._version_code), (ns, "versionName", string, self._version_name), (False, "package", string, self._package_name)], [
+            ("uses-sdk", sdk_attributes, []),
+            ("application", [(ns, "label", ref, self._get_referenced_resource_id(APKBuilder._STRING_TYPE_ID, 1 + self._extra_string_count)), (ns, "icon", ref, self._get_referenced_resource_id(APKBuilder._MIPMAP_TYPE_ID, 1))], [main_activity])
+        ])
+
+        strings = _StringPool(self._utf16_string_pools)
+        strings.get_index("android")
+        strings.get_index(APKBuilder._ANDROID_NAMESPACE)
+
+        element_chunks = []
+        self._append_element_chunks(root_element, strings, element_chunks)
+
+        namespace_body = struct.pack("<IIII", 1, 0xFFFFFFFF, strings.get_index("android"), strings.get_index(APKBuilder._ANDROID_NAMESPACE))
+        body = strings.build() + self._build_chunk(0x0100, 16, namespace_body) + b"".join(element_chunks) + self._build_chunk(0x0101, 16, namespace_body)
+
+        return self._build_chunk(0x0003, 8, body)
+
+    def _append_element_chunks(self, element: Tuple, strings: _StringPool, element_chunks: List[bytes]) -> None:
+        tag, attributes, children = element
+
+        attribute_data = b""
+        for has_namespace, name, value_type, value in attributes:
+            namespace_index = (strings.get_index(APKBuilder._ANDROID_NAMESPACE) if has_namespace else 0xFFFFFFFF)
+
+            if value_type == APKBuilder._VALUE_TYPE_STRING:
+                raw_value_index = value = strings.get_index(value)
+            else:
+                raw_value_index = 0xFFFFFFFF
+
+            attribute_data += struct.pack("<IIIHBBI", namespace_index, strings.get_index(name), raw_value_index, 8, 0, value_type, value)
+
+        start_body = struct.pack("<IIIIHHHHHH", 1, 0xFFFFFFFF, 0xFFFFFFFF, strings.get_index(tag), 20, 20, len(attributes), 0, 0, 0) + attribute_data
+        element_chunks.append(self._build_chunk(0x0102, 16, start_body))
+
+        for child in children:
+            self._append_element_chunks(child, strings, element_chunks)
+
+        element_chunks.append(self._build_chunk(0x0103, 16, struct.pack("<IIII", 1, 0xFFFFFFFF, 0xFFFFFFFF, strings.get_index(tag))))
+
+    def _build_resource_table(self) -> bytes:
+        # Type 1 = mipmap (the icon), type 2 = string (the app's name, followed by the extra strings); each density of the
+        #  icon and each language of the app's name is stored in a separate configuration, and the references of the
+        #  chains follow the types' other entries in the default configuration
+        value_strings, key_strings = _StringPool(self._utf16_string_pools), _StringPool(self._utf16_string_pools)
+        string_value, reference_value = APKBuilder._VALUE_TYPE_STRING, APKBuilder._VALUE_TYPE_REFERENCE
+
+        icon_configurations = [(self._build_configuration("", density), {0: ("icon", string_value, value_strings.get_index(self._get_icon_path(density)))}) for density in self._icon_densities]
+
+        default_strings = {0: ("app_name", string_value, value_strings.get_index(self._app_name))}
+        for index in range(self._extra_string_count):
+            default_strings[1 + index] = ("extra_string_{}".format(index), string_value, value_strings.get_index("Extra string {}".format(index)))
+
+        string_configurations = [(self._build_configuration("", 0), default_strings)]
+        for language, localized_app_name in sorted(self._localized_app_names.items()):
+            string_configurations.append((self._build_configuration(language, 0), {0: ("app_name", string_value, value_strings.get_index(localized_app_name))}))
+
+        package_chunks = b""
+        for type_id, base_entry_count, configurations in ((APKBuilder._MIPMAP_TYPE_ID, 1, icon_configurations), (APKBuilder._STRING_TYPE_ID, 1 + self._extra_string_count, string_configurations)):
+            if self._reference_chain_length > 0:
+                chain_entries = {}
+                for link_index in range(self._reference_chain_length):
+                    target_index = (base_entry_count + link_index + 1 if link_index + 1 < self._reference_chain_length else 0)
+                    chain_entries[base_entry_count + link_index] = ("reference_{}".format(link_index), reference_value, self._get_resource_id(type_id, target_index))
+
+                if type_id == APKBuilder._STRING_TYPE_ID:
+                    configurations[0][1].update(chain_entries)
+                else:
+                    configurations = configurations + [(self._build_configuration("", 0), chain_entries)]
+
+            entry_count = base_entry_count + self._reference_chain_length
+            package_chunks += self._build_chunk(0x0202, 16, struct.pack("<BBHI", type_id, 0, 0, entry_count) + bytes(4 * entry_count))
+
+            for configuration, entries in configurations:
+                package_chunks += self._build_type_chunk(type_id, entry_count, configuration, entries, key_strings)
+
+        type_strings = _StringPool(self._utf16_string_pools)
+        type_strings.get_index("mipmap")
+        type_strings.get_index("string")
+        type_string_pool, key_string_pool = type_strings.build(), key_strings.build()
+
+        package_header_size = 288
+        package_body = struct.pack("<I", 0x7f) + self._package_name.encode("utf-16-le").ljust(256, b"\0")
+        package_body += struct.pack("<IIIII", package_header_size, 2, package_header_size + len(type_string_pool), len(key_strings), 0)
+        package_chunk = self._build_chunk(0x0200, package_header_size, package_body + type_string_pool + key_string_pool + package_chunks)
+
+        return self._build_chunk(0x0002, 12, struct.pack("<I", 1) + value_strings.build() + package_chunk)
+
+    @staticmethod
+    def _build_configuration(language: str, density: int) -> bytes:
+        # size, IMSI, locale (language + country), screen type (orientation, touchscreen, density), the rest is zeroed
+        return struct.pack("<II2s2sI", 64, 0, language.encode("ascii"), b"", density << 16).ljust(64, b"\0")
+
+    def _build_type_chunk(self, type_id: int, entry_count: int, configuration: bytes, entries: Dict[int, Tuple[str, int, int]], key_strings: _StringPool) -> bytes:
+        entry_offsets, entry_data = [], []
+        for entry_index in range(entry_count):
+            if entry_index not in entries:
+                entry_offsets.append(struct.pack("<I", 0xFFFFFFFF))
+                continue
+
+            key, value_type, value_data = entries[entry_index]
+            entry_offsets.append(struct.pack("<I", 16 * len(entry_data)))  # Each entry is 16 bytes long
+            entry_data.append(struct.pack("<HHIHBBI", 8, 0, key_strings.get_index(key), 8, 0, value_type, value_data))
+
+        header_size = 20 + len(configuration)
+        type_body = struct.pack("<BBHII", type_id, 0, 0, entry_count, header_size + 4 * entry_count) + configuration + b"".join(entry_offsets) + b"".join(entry_data)
+
+        return self._build_chunk(0x0201, header_size, type_body)
+
+    @staticmethod
+    def _build_chunk(chunk_type: int, header_size: int, body: bytes) -> bytes:
+        return struct.pack("<HHI", chunk_type, header_size, 8 + len(body)) + body
@@ -0,0 +1,78 @@
+# SPDX-License-Identifier: BSD-3-Clause
+#
+# Copyright (c) 2021 Vít Labuda. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+# following conditions are met:
+#  1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+#     disclaimer.
+#  2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the
+#     following disclaimer in the documentation and/or other materials provided with the distribution.
+#  3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote
+#     products derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+import os
+from selfdroid.appstorage.AppMetadata import AppMetadata
+from selfdroid.appstorage.AppStorageHelpers import AppStorageHelpers
+from selfdroid.appstorage.apk.APKParser import APKParser
+from selfdroid.appstorage.crud.AppAdder import AppAdder
+from selfdroid.appstorage.crud.AppDeleter import AppDeleter
+from selfdroid.appstorage.crud.AppGetter import AppGetter
+from selfdroid.appstorage.crud.AppUpdater import AppUpdater
+from APKBuilder import APKBuilder
+
+
+class AppStorageModifier:
+    """
+    Modifies the app storage the same way the job processor does (see AppStorageJobProcessor), but synchronously.
+    """
+
+    def __init__(self, staging_directory: str):
+        self._staging_directory: str = staging_directory
+        self._staged_apk_counter: int = 0
+
+    def build_apk(self, **apk_builder_kwargs) -> str:
+        self._staged_apk_counter += 1
+
+        return APKBuilder(**apk_builder_kwargs).build(os.path.join(self._staging_directory, "staged{}.apk".format(self._staged_apk_counter)))
+
+    def add_app(self, **apk_builder_kwargs) -> AppMetadata:
+        apk_path = self.build_apk(**apk_builder_kwargs)
+        parsed_apk = APKParser.parse_with_cache(apk_path, AppStorageHelpers.compute_file_sha256(apk_path))
+
+        with AppStorageHelpers.lock_apps([]):
+            return AppAdder(apk_path, parsed_apk).add_app_while_locked()
+
+    def update_app(self, app_id: int, **apk_builder_kwargs) -> AppMetadata:
+        apk_path = self.build_apk(**apk_builder_kwargs)
+        parsed_apk = APKParser.parse_with_cache(apk_path, AppStorageHelpers.compute_file_sha256(apk_path))
+
+        with AppStorageHelpers.lock_apps([app_id]):
+            app_getter = AppGetter()
+            app_getter.start_new_snapshot()
+
+            return AppUpdater(app_getter.get_db_model(app_id), apk_path, parsed_apk).update_app_while_locked()[1]
+
+    def delete_app(self, app_id: int) -> None:
+        with AppStorageHelpers.lock_apps([app_id]):
+            app_getter = AppGetter()
+            app_getter.start_new_snapshot()
+
+            AppDeleter(app_getter.get_db_model(app_id)).delete_app_while_locked()
+
+    def delete_all_apps(self) -> None:
+        app_getter = AppGetter()
+        app_getter.start_new_snapshot()
+        app_ids = [db_model.id for db_model in app_getter.get_all_db_models()]
+
+        for app_id in app_ids:
+            self.delete_app(app_id)
@@ -0,0 +1,89 @@
+# SPDX-License-Identifier: BSD-3-Clause
+#
+# Copyright (c) 2021 Vít Labuda. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+# following conditions are met:
+#  1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+#     disclaimer.
+#  2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the
+#     following disclaimer in the documentation and/or other materials provided with the distribution.
+#  3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote
+#     products derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+from typing import Dict, Iterator
+import base64
+import os
+import shutil
+import sys
+import tempfile
+import bcrypt
+import flask.testing
+import pytest
+
+# The app is created when the selfdroid package is imported, so its data directory has to be set beforehand
+_TEST_DATA_DIRECTORY: str = tempfile.mkdtemp(prefix="selfdroid-tests-")
+os.environ["SELFDROID_DATA_DIRECTORY"] = _TEST_DATA_DIRECTORY
+
+sys.path.insert(0, os.path.dirname(os.path.realpath(__file__)))
+
+from selfdroid.Settings import Settings
+from selfdroid import app, db
+from AppStorageModifier import AppStorageModifier
+
+
+USER_PASSWORD: str = "test-user-password"
+ADMIN_PASSWORD: str = "test-admin-password"
+
+_USER_PASSWORD_HASH: str = bcrypt.hashpw(USER_PASSWORD.encode("utf-8"), bcrypt.gensalt(4)).decode("utf-8")
+_ADMIN_PASSWORD_HASH: str = bcrypt.hashpw(ADMIN_PASSWORD.encode("utf-8"), bcrypt.gensalt(4)).decode("utf-8")
+
+Settings.get_user_password_hash = staticmethod(lambda: _USER_PASSWORD_HASH)
+Settings.get_admin_password_hash = staticmethod(lambda: _ADMIN_PASSWORD_HASH)
+Settings.IN_PROCESS_APP_STORAGE_JOB_WORKER = False
+
+app.config["TESTING"] = True
+
+
+class _HTTPSTestClient(flask.testing.FlaskClient):
+    # Talisman redirects plain HTTP requests to HTTPS
+    def open(self, *args, **kwargs):
+        kwargs.setdefault("base_url", "https://localhost")
+
+        return super().open(*args, **kwargs)
+
+
+app.test_client_class = _HTTPSTestClient
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(_TEST_DATA_DIRECTORY, ignore_errors=True)
+
+
+@pytest.fixture
+def app_storage(tmp_path) -> Iterator[AppStorageModifier]:
+    app_storage_modifier = AppStorageModifier(str(tmp_path))
+    yield app_storage_modifier
+
+    db.session.rollback()
+    app_storage_modifier.delete_all_apps()
+    db.session.rollback()
+
+
+@pytest.fixture
+def client():
+    return app.test_client()
+
+
+@pytest.fixture
+def api_headers() -> Dict[str, str]:
+    return {"X-SelfdroidAPI-Password": base64.b64encode(USER_PASSWORD.encode("utf-8")).decode("utf-8")}
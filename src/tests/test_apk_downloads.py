@@ -0,0 +1,212 @@
+# SPDX-License-Identifier: BSD-3-Clause
+#
+# Copyright (c) 2021 Vít Labuda. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+# following conditions are met:
+#  1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+#     disclaimer.
+#  2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the
+#     following disclaimer in the documentation and/or other materials provided with the distribution.
+#  3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote
+#     products derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+import re
+import werkzeug.http
+import pytest
+
+
+# Larger than FileResponseBuilder._READ_CHUNK_SIZE, so that the responses are sent in multiple chunks
+_APK_PADDING_SIZE: int = 600 * 1024
+
+
+@pytest.fixture
+def stored_app(app_storage):
+    app_metadata = app_storage.add_app(package_name="com.example.download", padding_size=_APK_PADDING_SIZE)
+
+    with open(app_metadata.get_apk_path(), "rb") as apk_file:
+        apk_bytes = apk_file.read()
+
+    return app_metadata, apk_bytes
+
+
+def _download_url(app_id: int) -> str:
+    return "/api/v1/download-apk/{}".format(app_id)
+
+
+def _parse_multipart_byteranges(response) -> list:
+    boundary = re.fullmatch(r"multipart/byteranges; boundary=(\S+)", response.headers["Content-Type"]).group(1).encode("ascii")
+    body = response.get_data()
+
+    assert body.endswith(b"\r\n--" + boundary + b"--\r\n")
+
+    parts = []
+    for raw_part in body[:-len(b"\r\n--" + boundary + b"--\r\n")].split(b"\r\n--" + boundary + b"\r\n")[1:]:
+        raw_headers, _, part_body = raw_part.partition(b"\r\n\r\n")
+        headers = dict(line.split(": ", 1) for line in raw_headers.decode("ascii").split("\r\n"))
+        parts.append((headers["Content-Range"], part_body))
+
+    return parts
+
+
+def test_full_download(client, api_headers, stored_app):
+    app_metadata, apk_bytes = stored_app
+
+    response = client.get(_download_url(app_metadata.id), headers=api_headers)
+
+    assert response.status_code == 200
+    assert response.get_data() == apk_bytes
+    assert response.headers["Accept-Ranges"] == "bytes"
+    assert response.headers["Content-Length"] == str(len(apk_bytes))
+    assert response.headers["ETag"] == '"{}"'.format(app_metadata.get_apk_etag())
+    assert response.headers["Content-Disposition"].startswith("attachment;")
+
+
+def test_head_request_has_no_body(client, api_headers, stored_app):
+    app_metadata, apk_bytes = stored_app
+
+    response = client.head(_download_url(app_metadata.id), headers=api_headers)
+
+    assert response.status_code == 200
+    assert response.headers["Content-Length"] == str(len(apk_bytes))
+    assert response.get_data() == b""
+
+
+@pytest.mark.parametrize("range_spec, expected_slice", [
+    ("0-99", slice(0, 100)),
+    ("100-100", slice(100, 101)),
+    ("1000-", slice(1000, None)),
+    ("-500", slice(-500, None)),
+    ("0-999999999", slice(0, None)),  # The last byte position is clamped to the file's size
+])
+def test_single_range(client, api_headers, stored_app, range_spec, expected_slice):
+    app_metadata, apk_bytes = stored_app
+    expected_bytes = apk_bytes[expected_slice]
+    expected_start = expected_slice.indices(len(apk_bytes))[0]
+
+    response = client.get(_download_url(app_metadata.id), headers={**api_headers, "Range": "bytes=" + range_spec})
+
+    assert response.status_code == 206
+    assert response.get_data() == expected_bytes
+    assert response.headers["Content-Length"] == str(len(expected_bytes))
+    assert response.headers["Content-Range"] == "bytes {}-{}/{}".format(expected_start, expected_start + len(expected_bytes) - 1, len(apk_bytes))
+
+
+def test_multiple_ranges_are_sent_as_multipart(client, api_headers, stored_app):
+    app_metadata, apk_bytes = stored_app
+    file_size = len(apk_bytes)
+
+    # The ranges are unordered and two of them overlap, so they are sorted and coalesced
+    response = client.get(_download_url(app_metadata.id), headers={**api_headers, "Range": "bytes=-10, 0-9, 5-19, 300000-300099"})
+
+    assert response.status_code == 206
+    assert response.headers["Content-Length"] == str(len(response.get_data()))
+    assert _parse_multipart_byteranges(response) == [
+        ("bytes 0-19/{}".format(file_size), apk_bytes[0:20]),
+        ("bytes 300000-300099/{}".format(file_size), apk_bytes[300000:300100]),
+        ("bytes {}-{}/{}".format(file_size - 10, file_size - 1, file_size), apk_bytes[-10:]),
+    ]
+
+
+def test_unsatisfiable_range(client, api_headers, stored_app):
+    app_metadata, apk_bytes = stored_app
+
+    response = client.get(_download_url(app_metadata.id), headers={**api_headers, "Range": "bytes={}-".format(len(apk_bytes))})
+
+    assert response.status_code == 416
+    assert response.headers["Content-Range"] == "bytes */{}".format(len(apk_bytes))
+    assert response.get_data() == b""
+
+
+@pytest.mark.parametrize("range_header", ["bytes=abc", "bytes=10-5", "bytes=-", "items=0-10", "bytes="])
+def test_malformed_range_is_ignored(client, api_headers, stored_app, range_header):
+    app_metadata, apk_bytes = stored_app
+
+    response = client.get(_download_url(app_metadata.id), headers={**api_headers, "Range": range_header})
+
+    assert response.status_code == 200
+    assert response.get_data() == apk_bytes
+
+
+def test_if_range_with_matching_validators(client, api_headers, stored_app):
+    app_metadata, apk_bytes = stored_app
+    full_response = client.head(_download_url(app_metadata.id), headers=api_headers)
+
+    for if_range in (full_response.headers["ETag"], full_response.headers["Last-Modified"]):
+        response = client.get(_download_url(app_metadata.id), headers={**api_headers, "Range": "bytes=10-19", "If-Range": if_range})
+
+        assert response.status_code == 206
+        assert response.get_data() == apk_bytes[10:20]
+
+
+def test_if_range_with_mismatching_validators(client, api_headers, stored_app):
+    app_metadata, apk_bytes = stored_app
+    full_response = client.head(_download_url(app_metadata.id), headers=api_headers)
+
+    old_date = werkzeug.http.http_date(app_metadata.last_updated_datetime.replace(year=2000))
+    for if_range in ('"not-the-etag"', "W/" + full_response.headers["ETag"], old_date):
+        response = client.get(_download_url(app_metadata.id), headers={**api_headers, "Range": "bytes=10-19", "If-Range": if_range})
+
+        assert response.status_code == 200
+        assert response.get_data() == apk_bytes
+
+
+def test_if_none_match(client, api_headers, stored_app):
+    app_metadata, _ = stored_app
+    etag = client.head(_download_url(app_metadata.id), headers=api_headers).headers["ETag"]
+
+    response = client.get(_download_url(app_metadata.id), headers={**api_headers, "If-None-Match": etag, "Range": "bytes=0-9"})
+
+    assert response.status_code == 304
+    assert response.get_data() == b""
+
+
+def test_interrupted_download_is_resumed(client, api_headers, stored_app):
+    app_metadata, apk_bytes = stored_app
+
+    # The client reads only the first chunk and then drops the connection
+    response = client.get(_download_url(app_metadata.id), headers=api_headers, buffered=False)
+    etag = response.headers["ETag"]
+    received_bytes = next(iter(response.response))
+    response.close()
+    assert 0 < len(received_bytes) < len(apk_bytes)
+
+    resumed_response = client.get(_download_url(app_metadata.id), headers={**api_headers, "Range": "bytes={}-".format(len(received_bytes)), "If-Range": etag})
+
+    assert resumed_response.status_code == 206
+    assert received_bytes + resumed_response.get_data() == apk_bytes
+
+
+def test_download_resumed_after_update_restarts(client, api_headers, app_storage, stored_app):
+    app_metadata, apk_bytes = stored_app
+
+    response = client.get(_download_url(app_metadata.id), headers=api_headers, buffered=False)
+    etag = response.headers["ETag"]
+    received_bytes = next(iter(response.response))
+    response.close()
+
+    updated_app_metadata = app_storage.update_app(app_metadata.id, package_name="com.example.download", version_code=2, padding_size=_APK_PADDING_SIZE)
+    with open(updated_app_metadata.get_apk_path(), "rb") as apk_file:
+        updated_apk_bytes = apk_file.read()
+
+    # The stale partial download mustn't be combined with the new APK file's contents
+    resumed_response = client.get(_download_url(app_metadata.id), headers={**api_headers, "Range": "bytes={}-".format(len(received_bytes)), "If-Range": etag})
+
+    assert resumed_response.status_code == 200
+    assert resumed_response.get_data() == updated_apk_bytes
+    assert resumed_response.headers["ETag"] != etag
+
+
+def test_nonexistent_app(client, api_headers):
+    response = client.get(_download_url(987654321), headers={**api_headers, "Range": "bytes=0-9"})
+
+    assert response.status_code == 404
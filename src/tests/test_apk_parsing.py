@@ -0,0 +1,137 @@
+# SPDX-License-Identifier: BSD-3-Clause
+#
+# Copyright (c) 2021 Vít Labuda. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+# following conditions are met:
+#  1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+#     disclaimer.
+#  2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the
+#     following disclaimer in the documentation and/or other materials provided with the distribution.
+#  3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote
+#     products derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+from typing import Dict, Any
+import pyaxmlparser
+import pytest
+from selfdroid.Settings import Settings
+from selfdroid.appstorage.AppStorageHelpers import AppStorageHelpers
+from selfdroid.appstorage.apk.APKParser import APKParser
+from selfdroid.appstorage.apk.APKParserException import APKParserException
+from selfdroid.appstorage.apk.FastAPKReader import FastAPKReader
+from APKBuilder import APKBuilder
+
+
+_APK_VARIANTS: Dict[str, Dict[str, Any]] = {
+    "utf8": {},
+    "utf16": {"utf16_string_pools": True},
+    "long_strings_utf8": {"app_name": "Dlouhý název aplikace " * 10, "version_name": "1.0-" + "ž" * 200},
+    "long_strings_utf16": {"app_name": "Dlouhý název aplikace " * 10, "version_name": "1.0-" + "ž" * 200, "utf16_string_pools": True},
+    "locales": {"localized_app_names": {"cs": "Ukázková aplikace", "de": "Beispiel-App"}},
+    "densities": {"icon_densities": (160, 240, 320, 480, 640, 0xFFFE)},
+    "densities_above_maximum": {"icon_densities": (120, 800)},
+    "reference_chains": {"reference_chain_length": 3, "icon_densities": (160, 640), "localized_app_names": {"cs": "Ukázková aplikace"}},
+    "max_sdk_version": {"min_sdk_version": 26, "max_sdk_version": 33},
+    "version_code_above_31_bits": {"version_code": 2 ** 31 + 5},
+    "largest_version_code": {"version_code": 2 ** 32 - 1},
+}
+
+
+def _get_reader_fields(apk: Any) -> Dict[str, Any]:
+    # All the APK readers' methods and properties APKParser uses
+    return {
+        "is_valid_APK": apk.is_valid_APK(),
+        "packagename": apk.packagename,
+        "version_code": apk.version_code,
+        "version_name": apk.version_name,
+        "app_name": apk.get_app_name(),
+        "min_sdk_version": apk.get_min_sdk_version(),
+        "max_sdk_version": apk.get_max_sdk_version(),
+        "app_icon": apk.get_app_icon(),
+        "app_icon_640": apk.get_app_icon(640),
+        "app_icon_file": apk.get_file(apk.get_app_icon(640)) if apk.get_app_icon(640) is not None else None
+    }
+
+
+@pytest.mark.parametrize("apk_builder_kwargs", _APK_VARIANTS.values(), ids=_APK_VARIANTS.keys())
+def test_fast_apk_reader_returns_same_fields_as_pyaxmlparser(apk_builder_kwargs, tmp_path):
+    apk_path = APKBuilder(**apk_builder_kwargs).build(str(tmp_path / "test.apk"))
+
+    assert _get_reader_fields(FastAPKReader(apk_path)) == _get_reader_fields(pyaxmlparser.APK(apk_path))
+
+
+def test_fast_apk_reader_picks_densest_raster_icon(tmp_path):
+    apk_path = APKBuilder(icon_densities=(160, 480, 640, 0xFFFE)).build(str(tmp_path / "test.apk"))
+
+    fast_apk_reader = FastAPKReader(apk_path)
+
+    assert fast_apk_reader.get_app_icon(640) == "res/mipmap-640dpi/icon.png"
+    assert fast_apk_reader.get_app_icon(480) == "res/mipmap-480dpi/icon.png"
+    assert fast_apk_reader.get_app_icon() == "res/mipmap-640dpi/icon.png"  # The "anydpi" one is an XML file
+
+
+def test_fast_apk_reader_resolves_reference_chains_and_default_locale(tmp_path):
+    apk_path = APKBuilder(app_name="Example App", localized_app_names={"cs": "Ukázková aplikace"}, reference_chain_length=3).build(str(tmp_path / "test.apk"))
+
+    assert FastAPKReader(apk_path).get_app_name() == "Example App"
+
+
+def _parse_apk(apk_path: str) -> APKParser:
+    return APKParser(apk_path, AppStorageHelpers.compute_file_sha256(apk_path))
+
+
+def _get_parsed_apk_fields(apk_parser: APKParser) -> Dict[str, Any]:
+    return vars(apk_parser.parsed_apk)
+
+
+def test_apk_parser_uses_fast_apk_reader(tmp_path, monkeypatch):
+    monkeypatch.setattr(Settings, "FAST_APK_METADATA_EXTRACTION", True)
+    apk_path = APKBuilder().build(str(tmp_path / "test.apk"))
+
+    assert isinstance(_parse_apk(apk_path)._apk, FastAPKReader)
+
+
+def test_apk_parser_falls_back_to_pyaxmlparser_on_unsupported_apk(tmp_path, monkeypatch):
+    monkeypatch.setattr(Settings, "FAST_APK_METADATA_EXTRACTION", True)
+    apk_path = APKBuilder(icon_densities=(160, 640), reference_chain_length=2).build(str(tmp_path / "test.apk"))
+    fast_apk_parser = _parse_apk(apk_path)
+
+    def raise_unsupported_apk_exception(*args, **kwargs):
+        raise FastAPKReader.UnsupportedAPKException()
+
+    monkeypatch.setattr(FastAPKReader, "__init__", raise_unsupported_apk_exception)
+    fallback_apk_parser = _parse_apk(apk_path)
+
+    assert isinstance(fallback_apk_parser._apk, pyaxmlparser.APK)
+    assert _get_parsed_apk_fields(fallback_apk_parser) == _get_parsed_apk_fields(fast_apk_parser)
+
+
+def test_apk_parser_uses_pyaxmlparser_if_fast_extraction_is_disabled(tmp_path, monkeypatch):
+    monkeypatch.setattr(Settings, "FAST_APK_METADATA_EXTRACTION", False)
+    apk_path = APKBuilder().build(str(tmp_path / "test.apk"))
+
+    def fail(*args, **kwargs):
+        pytest.fail("FastAPKReader must not be used!")
+
+    monkeypatch.setattr(FastAPKReader, "__init__", fail)
+
+    assert isinstance(_parse_apk(apk_path)._apk, pyaxmlparser.APK)
+
+
+@pytest.mark.parametrize("fast_apk_metadata_extraction", [True, False])
+def test_apk_parser_rejects_version_code_above_31_bits(fast_apk_metadata_extraction, tmp_path, monkeypatch):
+    # Both the readers return such version codes as negative numbers, like Android does
+    monkeypatch.setattr(Settings, "FAST_APK_METADATA_EXTRACTION", fast_apk_metadata_extraction)
+    apk_path = APKBuilder(version_code=2 ** 31).build(str(tmp_path / "test.apk"))
+
+    with pytest.raises(APKParserException):
+        _parse_apk(apk_path)
@@ -0,0 +1,117 @@
+# SPDX-License-Identifier: BSD-3-Clause
+#
+# Copyright (c) 2021 Vít Labuda. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+# following conditions are met:
+#  1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+#     disclaimer.
+#  2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the
+#     following disclaimer in the documentation and/or other materials provided with the distribution.
+#  3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote
+#     products derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+import os
+import pytest
+from selfdroid.Constants import Constants
+from selfdroid.appstorage.apk.APKParser import APKParser
+from selfdroid.appstorage.crud.AppBulkImporter import AppBulkImporter
+from selfdroid.appstorage.crud.AppGetter import AppGetter
+from APKBuilder import APKBuilder
+
+
+@pytest.fixture
+def import_directory(tmp_path) -> str:
+    directory_path = tmp_path / "import"
+    (directory_path / "subdirectory").mkdir(parents=True)
+
+    return str(directory_path)
+
+
+def _import_apps(import_directory: str) -> AppBulkImporter.Result:
+    return AppBulkImporter(import_directory, 1, 2).import_apps()
+
+
+def _get_version_codes_by_package_name():
+    app_getter = AppGetter()
+    app_getter.start_new_snapshot()
+
+    return {app_metadata.package_name: app_metadata.version_code for app_metadata in app_getter.get_all_metadata()}
+
+
+def _get_apk_filenames(result_list):
+    return sorted(os.path.basename(apk_path) for apk_path, _ in result_list)
+
+
+def test_import_adds_and_updates_apps(app_storage, import_directory):
+    app_storage.add_app(package_name="com.example.updated", version_code=1)
+    app_storage.add_app(package_name="com.example.current", version_code=5)
+
+    APKBuilder(package_name="com.example.added", version_code=1).build(os.path.join(import_directory, "added.apk"))
+    APKBuilder(package_name="com.example.updated", version_code=2).build(os.path.join(import_directory, "subdirectory", "updated.APK"))
+    APKBuilder(package_name="com.example.current", version_code=5).build(os.path.join(import_directory, "current.apk"))
+    with open(os.path.join(import_directory, "ignored.txt"), "w") as file:
+        file.write("Not an APK file")
+
+    result = _import_apps(import_directory)
+
+    assert result.apk_file_count == 3
+    assert _get_apk_filenames(result.added_apps) == ["added.apk"]
+    assert _get_apk_filenames(result.updated_apps) == ["updated.APK"]
+    assert _get_apk_filenames(result.skipped_apk_files) == ["current.apk"]
+    assert result.failed_apk_files == []
+
+    assert _get_version_codes_by_package_name() == {"com.example.added": 1, "com.example.updated": 2, "com.example.current": 5}
+
+
+def test_import_chooses_highest_version_of_package(app_storage, import_directory):
+    for version_code in (3, 7, 5):
+        APKBuilder(package_name="com.example.app", version_code=version_code).build(os.path.join(import_directory, "version{}.apk".format(version_code)))
+
+    result = _import_apps(import_directory)
+
+    assert _get_apk_filenames(result.added_apps) == ["version7.apk"]
+    assert _get_apk_filenames(result.skipped_apk_files) == ["version3.apk", "version5.apk"]
+    assert _get_version_codes_by_package_name() == {"com.example.app": 7}
+
+
+def test_import_reports_invalid_apk_files(app_storage, import_directory):
+    APKBuilder(package_name="com.example.valid").build(os.path.join(import_directory, "valid.apk"))
+    with open(os.path.join(import_directory, "invalid.apk"), "wb") as file:
+        file.write(b"Not a ZIP file")
+
+    result = _import_apps(import_directory)
+
+    assert _get_apk_filenames(result.added_apps) == ["valid.apk"]
+    assert _get_apk_filenames(result.failed_apk_files) == ["invalid.apk"]
+    assert os.listdir(Constants.TEMPORARY_DIRECTORY) == []
+
+
+def test_import_survives_unexpected_error_in_worker(app_storage, import_directory, monkeypatch):
+    APKBuilder(package_name="com.example.valid").build(os.path.join(import_directory, "valid.apk"))
+    APKBuilder(package_name="com.example.crashing").build(os.path.join(import_directory, "crashing.apk"))
+
+    # The worker processes are forked, so they inherit the patched method
+    original_init = APKParser.__init__
+
+    def crash_on_some_apk_files(self, apk_path, apk_sha256):
+        original_init(self, apk_path, apk_sha256)
+        if self.parsed_apk.package_name == "com.example.crashing":
+            raise RuntimeError("Unexpected error")
+
+    monkeypatch.setattr(APKParser, "__init__", crash_on_some_apk_files)
+
+    result = _import_apps(import_directory)
+
+    assert _get_apk_filenames(result.added_apps) == ["valid.apk"]
+    assert _get_apk_filenames(result.failed_apk_files) == ["crashing.apk"]
+    assert os.listdir(Constants.TEMPORARY_DIRECTORY) == []
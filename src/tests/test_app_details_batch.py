@@ -0,0 +1,58 @@
+# SPDX-License-Identifier: BSD-3-Clause
+#
+# Copyright (c) 2021 Vít Labuda. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+# following conditions are met:
+#  1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+#     disclaimer.
+#  2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the
+#     following disclaimer in the documentation and/or other materials provided with the distribution.
+#  3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote
+#     products derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+import pytest
+
+
+def test_batch_lookup_by_ids(client, api_headers, app_storage):
+    app_metadata = app_storage.add_app()
+
+    response = client.post("/api/v1/app-details/batch", json={"ids": [app_metadata.id, app_metadata.id + 1]}, headers=api_headers)
+
+    assert response.status_code == 200
+    assert [(result["id"], result["found"]) for result in response.get_json()["results"]] == [(app_metadata.id, True), (app_metadata.id + 1, False)]
+
+
+def test_batch_lookup_by_package_names(client, api_headers, app_storage):
+    app_storage.add_app(package_name="com.example.found")
+
+    response = client.post("/api/v1/app-details/batch", json={"package_names": ["com.example.found", "com.example.missing"]}, headers=api_headers)
+
+    assert response.status_code == 200
+    assert [(result["package_name"], result["found"]) for result in response.get_json()["results"]] == [("com.example.found", True), ("com.example.missing", False)]
+
+
+@pytest.mark.parametrize("request_json", [
+    {"ids": [0]},
+    {"ids": [-1]},
+    {"ids": [2 ** 63]},
+    {"ids": [2 ** 70]},
+    {"ids": [True]},
+    {"ids": ["1"]},
+    {"package_names": [1]},
+    {"ids": [1], "package_names": ["com.example.app"]},
+    {"ids": list(range(1, 502))}
+])
+def test_batch_lookup_with_invalid_keys(client, api_headers, request_json):
+    response = client.post("/api/v1/app-details/batch", json=request_json, headers=api_headers)
+
+    assert response.status_code == 400
@@ -0,0 +1,102 @@
+# SPDX-License-Identifier: BSD-3-Clause
+#
+# Copyright (c) 2021 Vít Labuda. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+# following conditions are met:
+#  1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+#     disclaimer.
+#  2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the
+#     following disclaimer in the documentation and/or other materials provided with the distribution.
+#  3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote
+#     products derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+import io
+import os
+import PIL.Image
+import pytest
+from selfdroid.Constants import Constants
+from selfdroid.appstorage.AppIconRenditions import AppIconRenditions
+
+
+def _get_icon(client, api_headers, app_id, query_string="", accept=None):
+    headers = dict(api_headers)
+    if accept is not None:
+        headers["Accept"] = accept
+
+    return client.get("/api/v1/app-icon/{}{}".format(app_id, query_string), headers=headers)
+
+
+def _get_icon_format_and_size(response):
+    assert response.status_code == 200
+
+    with PIL.Image.open(io.BytesIO(response.get_data())) as image:
+        assert image.width == image.height
+
+        return image.format.lower(), image.width
+
+
+def test_icon_without_size_and_accept(client, api_headers, app_storage):
+    app_metadata = app_storage.add_app()
+
+    response = _get_icon(client, api_headers, app_metadata.id)
+
+    assert _get_icon_format_and_size(response) == ("png", 192)
+    assert "Accept" in response.headers["Vary"]
+
+
+@pytest.mark.parametrize("requested_size, expected_size", [(1, 48), (48, 48), (49, 96), (96, 96), (192, 192), (500, 192), (100000, 192)])
+def test_icon_size_selection(client, api_headers, app_storage, requested_size, expected_size):
+    # The test icon is 192 px wide, so the 512 px renditions aren't generated
+    app_metadata = app_storage.add_app()
+
+    response = _get_icon(client, api_headers, app_metadata.id, "?size={}".format(requested_size))
+
+    assert _get_icon_format_and_size(response) == ("png", expected_size)
+
+
+@pytest.mark.parametrize("accept, expected_format", [
+    ("image/webp", AppIconRenditions.FORMAT_WEBP),
+    ("image/avif", AppIconRenditions.FORMAT_AVIF),
+    ("image/avif,image/webp", AppIconRenditions.FORMAT_WEBP),
+    ("image/webp;q=0,image/png", AppIconRenditions.FORMAT_PNG),
+    ("image/*", AppIconRenditions.FORMAT_PNG),
+    ("*/*", AppIconRenditions.FORMAT_PNG)
+])
+def test_icon_format_negotiation(client, api_headers, app_storage, accept, expected_format):
+    if expected_format not in AppIconRenditions.get_supported_formats():
+        pytest.skip("The installed Pillow cannot save {} images.".format(expected_format))
+
+    app_metadata = app_storage.add_app()
+
+    response = _get_icon(client, api_headers, app_metadata.id, "?size=96", accept)
+
+    assert _get_icon_format_and_size(response) == (expected_format, 96)
+    assert response.mimetype == AppIconRenditions.MIMETYPES[expected_format]
+
+
+def test_icon_falls_back_when_rendition_is_missing(client, api_headers, app_storage):
+    app_metadata = app_storage.add_app()
+    os.remove(os.path.join(Constants.ICONS_DIRECTORY, app_metadata.get_icon_rendition_filename(48, AppIconRenditions.FORMAT_PNG)))
+
+    response = _get_icon(client, api_headers, app_metadata.id, "?size=48")
+
+    assert _get_icon_format_and_size(response) == ("png", 96)
+
+
+@pytest.mark.parametrize("size", ["", "abc", "1.5", "0", "-5"])
+def test_icon_with_invalid_size(client, api_headers, app_storage, size):
+    app_metadata = app_storage.add_app()
+
+    response = _get_icon(client, api_headers, app_metadata.id, "?size={}".format(size))
+
+    assert response.status_code == 400
@@ -0,0 +1,50 @@
+# SPDX-License-Identifier: BSD-3-Clause
+#
+# Copyright (c) 2021 Vít Labuda. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+# following conditions are met:
+#  1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+#     disclaimer.
+#  2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the
+#     following disclaimer in the documentation and/or other materials provided with the distribution.
+#  3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote
+#     products derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+import base64
+import json
+import pytest
+
+
+def test_listing_with_sdk_filter(client, api_headers, app_storage):
+    app_storage.add_app(package_name="com.example.listed")
+
+    response = client.get("/api/v1/app-details?limit=10&sdk=30", headers=api_headers)
+
+    assert response.status_code == 200
+    assert [app["package_name"] for app in response.get_json()["apps"]] == ["com.example.listed"]
+
+
+@pytest.mark.parametrize("sdk", ["0", "-1", "abc", str(2 ** 63), "99999999999999999999999"])
+def test_listing_with_invalid_sdk(client, api_headers, sdk):
+    response = client.get("/api/v1/app-details?limit=10&sdk={}".format(sdk), headers=api_headers)
+
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("app_id", [0, -1, 2 ** 63, 2 ** 70])
+def test_listing_with_out_of_range_page_cursor(client, api_headers, app_id):
+    page_cursor = base64.urlsafe_b64encode(json.dumps(["name", "Example App", app_id]).encode("utf-8")).decode("ascii")
+
+    response = client.get("/api/v1/app-details?limit=10&page_cursor={}".format(page_cursor), headers=api_headers)
+
+    assert response.status_code == 400
@@ -0,0 +1,156 @@
+# SPDX-License-Identifier: BSD-3-Clause
+#
+# Copyright (c) 2021 Vít Labuda. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+# following conditions are met:
+#  1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+#     disclaimer.
+#  2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the
+#     following disclaimer in the documentation and/or other materials provided with the distribution.
+#  3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote
+#     products derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+import datetime
+import os
+import time
+import threading
+import pytest
+import sqlalchemy
+from selfdroid.Settings import Settings
+from selfdroid.Constants import Constants
+from selfdroid.appstorage.AppStorageHelpers import AppStorageHelpers
+from selfdroid.appstorage.jobs.AppStorageJobDBModel import AppStorageJobDBModel
+from selfdroid.appstorage.jobs.AppStorageJobHeartbeat import AppStorageJobHeartbeat
+from selfdroid.appstorage.jobs.AppStorageJobQueue import AppStorageJobQueue
+from selfdroid import db, jobs_db_session
+
+
+@pytest.fixture
+def job_queue() -> AppStorageJobQueue:
+    return AppStorageJobQueue()
+
+
+@pytest.fixture
+def claimed_job(job_queue):
+    staged_apk_path = AppStorageHelpers.generate_temp_filepath_for_apk()
+    with open(staged_apk_path, "wb") as staged_apk_file:
+        staged_apk_file.write(b"not an APK file")
+
+    job_id = job_queue.enqueue_app_addition(staged_apk_path, "0" * 64, "test.apk")
+    job = job_queue.claim_next_job()
+    assert job.id == job_id
+
+    yield job
+
+    if os.path.exists(staged_apk_path):
+        os.remove(staged_apk_path)
+
+    job_queue.finish_job(job_id, False, "", None)
+
+
+def _get_heartbeat_datetime(job_id: int) -> datetime.datetime:
+    jobs_db_session.rollback()
+
+    return jobs_db_session.query(AppStorageJobDBModel).get(job_id).heartbeat_datetime
+
+
+def _set_heartbeat_datetime(job_id: int, heartbeat_datetime: datetime.datetime) -> None:
+    jobs_db_session.rollback()
+
+    jobs_db_session.query(AppStorageJobDBModel).filter_by(id=job_id).update({"heartbeat_datetime": heartbeat_datetime}, synchronize_session=False)
+    jobs_db_session.commit()
+
+
+def _make_heartbeat_stale(job_id: int) -> None:
+    _set_heartbeat_datetime(job_id, datetime.datetime.utcnow() - datetime.timedelta(seconds=Constants.APP_STORAGE_JOB_HEARTBEAT_TIMEOUT + 1))
+
+
+def test_job_with_recent_heartbeat_is_kept_running(job_queue, claimed_job):
+    assert job_queue.claim_next_job() is None
+
+    assert job_queue.get_job(claimed_job.id).state == AppStorageJobDBModel.STATE_RUNNING
+
+
+def test_job_with_stale_heartbeat_is_failed(job_queue, claimed_job):
+    # The job has been claimed by this process, which is still running - the heartbeat is what matters
+    _make_heartbeat_stale(claimed_job.id)
+
+    assert job_queue.claim_next_job() is None
+
+    interrupted_job = job_queue.get_job(claimed_job.id)
+    assert interrupted_job.state == AppStorageJobDBModel.STATE_FAILED
+
+    # The worker might still be processing the staged APK file
+    assert os.path.exists(claimed_job.get_staged_apk_path())
+
+
+def test_interrupted_job_is_not_finished_by_its_worker(job_queue, claimed_job):
+    _make_heartbeat_stale(claimed_job.id)
+    assert job_queue.claim_next_job() is None
+
+    job_queue.finish_job(claimed_job.id, True, "The app was successfully added!", 1)
+
+    interrupted_job = job_queue.get_job(claimed_job.id)
+    assert interrupted_job.state == AppStorageJobDBModel.STATE_FAILED
+    assert interrupted_job.app_id is None
+
+
+def test_staged_apk_file_of_expired_interrupted_job_is_deleted(job_queue, claimed_job, monkeypatch):
+    _make_heartbeat_stale(claimed_job.id)
+    assert job_queue.claim_next_job() is None
+
+    monkeypatch.setattr(Settings, "FINISHED_APP_STORAGE_JOB_RETENTION", -1)
+    assert job_queue.claim_next_job() is None
+
+    assert job_queue.get_job(claimed_job.id) is None
+    assert not os.path.exists(claimed_job.get_staged_apk_path())
+
+
+def test_heartbeat_is_recorded_while_processing(job_queue, claimed_job, monkeypatch):
+    monkeypatch.setattr(Constants, "APP_STORAGE_JOB_HEARTBEAT_INTERVAL", 0.05)
+    _set_heartbeat_datetime(claimed_job.id, None)
+
+    with AppStorageJobHeartbeat(claimed_job.id):
+        deadline = time.monotonic() + 10
+        while _get_heartbeat_datetime(claimed_job.id) is None and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+    assert _get_heartbeat_datetime(claimed_job.id) is not None
+
+
+def test_heartbeat_stops_when_processing_thread_dies(job_queue, claimed_job, monkeypatch):
+    monkeypatch.setattr(Constants, "APP_STORAGE_JOB_HEARTBEAT_INTERVAL", 0.05)
+    heartbeat = AppStorageJobHeartbeat(claimed_job.id)
+
+    # The processing thread exits without leaving the "with" block (as if it had been killed)
+    processing_thread = threading.Thread(target=heartbeat.__enter__)
+    processing_thread.start()
+    processing_thread.join()
+    time.sleep(0.2)  # A heartbeat might have been in progress while the thread was exiting
+
+    _set_heartbeat_datetime(claimed_job.id, None)
+    time.sleep(0.3)
+
+    assert _get_heartbeat_datetime(claimed_job.id) is None
+    heartbeat.__exit__(None, None, None)
+
+
+def test_job_queue_does_not_end_app_storage_transaction(job_queue, claimed_job):
+    db.session.rollback()
+    db.session.execute(sqlalchemy.text("SELECT 1"))
+
+    job_queue.set_job_progress_message(claimed_job.id, "Testing...")
+    job_queue.record_job_heartbeat(claimed_job.id)
+
+    assert db.session().in_transaction()
+    db.session.rollback()
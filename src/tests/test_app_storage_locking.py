@@ -0,0 +1,239 @@
+# SPDX-License-Identifier: BSD-3-Clause
+#
+# Copyright (c) 2021 Vít Labuda. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+# following conditions are met:
+#  1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+#     disclaimer.
+#  2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the
+#     following disclaimer in the documentation and/or other materials provided with the distribution.
+#  3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote
+#     products derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+from typing import List
+import os
+import signal
+import threading
+import time
+import pytest
+from selfdroid.Settings import Settings
+from selfdroid.appstorage.AppStorageHelpers import AppStorageHelpers
+from selfdroid.appstorage.AppStorageLockTimeoutException import AppStorageLockTimeoutException
+from selfdroid.appstorage.CatalogVersion import CatalogVersion
+from selfdroid.appstorage.MaterializedCatalog import MaterializedCatalog
+from selfdroid.appstorage.crud.AppDeleter import AppDeleter
+from selfdroid.appstorage.crud.AppGetter import AppGetter
+from selfdroid.appstorage.crud.AppUpdater import AppUpdater
+
+
+_ITERATIONS_PER_THREAD: int = 100
+_THREADS_PER_PROCESS: int = 3
+_DEADLOCK_TIMEOUT: float = 60.0  # in seconds
+
+
+def _take_locks_repeatedly(app_ids: List[int]) -> None:
+    for iteration in range(_ITERATIONS_PER_THREAD):
+        # lock_apps() must acquire the stripe locks in the ascending order regardless of the order of the app IDs
+        with AppStorageHelpers.lock_apps(app_ids):
+            with AppStorageHelpers.try_lock_catalog_regeneration():
+                with AppStorageHelpers.lock_catalog():
+                    pass
+
+            with AppStorageHelpers.lock_catalog():
+                pass
+
+        with AppStorageHelpers.lock_apps(app_ids[iteration % len(app_ids):] + app_ids[:iteration % len(app_ids)]):
+            pass
+
+        if iteration % 10 == 0:
+            with AppStorageHelpers.lock_app_storage():
+                with AppStorageHelpers.lock_catalog():
+                    pass
+
+
+def _run_lock_taking_process(app_ids: List[int]) -> int:
+    errors = []
+
+    def run_thread(thread_app_ids: List[int]) -> None:
+        try:
+            _take_locks_repeatedly(thread_app_ids)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=run_thread, args=(app_ids[thread_index:] + app_ids[:thread_index],)) for thread_index in range(_THREADS_PER_PROCESS)]
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    return (1 if errors else 0)
+
+
+def _fork_lock_taking_process(app_ids: List[int]) -> int:
+    pid = os.fork()
+    if pid == 0:
+        exit_code = 255
+        try:
+            exit_code = _run_lock_taking_process(app_ids)
+        finally:
+            os._exit(exit_code)
+
+    return pid
+
+
+def test_lock_ordering_prevents_deadlocks():
+    # The apps span all the stripes (and each stripe is locked because of two apps), and the two processes pass them in
+    #  opposite orders
+    app_ids = list(range(2 * Settings.APP_STORAGE_LOCK_STRIPE_COUNT))
+    pids = [_fork_lock_taking_process(app_ids), _fork_lock_taking_process(app_ids[::-1])]
+
+    exit_codes = {}
+    deadline = time.monotonic() + _DEADLOCK_TIMEOUT
+    while len(exit_codes) < len(pids) and time.monotonic() < deadline:
+        for pid in pids:
+            if pid not in exit_codes:
+                waited_pid, status = os.waitpid(pid, os.WNOHANG)
+                if waited_pid == pid:
+                    exit_codes[pid] = os.waitstatus_to_exitcode(status)
+
+        time.sleep(0.05)
+
+    for pid in pids:
+        if pid not in exit_codes:
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+
+    assert len(exit_codes) == len(pids), "The lock-taking processes have deadlocked!"
+    assert list(exit_codes.values()) == [0, 0]
+
+
+def test_updates_of_different_apps_overlap(app_storage, monkeypatch):
+    app_ids = [app_storage.add_app(package_name="com.example.app{}".format(index)).id for index in range(2)]
+    assert AppStorageHelpers.get_app_stripe_index(app_ids[0]) != AppStorageHelpers.get_app_stripe_index(app_ids[1])
+
+    # Each update waits while storing its files until the other one is storing its files too - the barrier is broken
+    #  after the timeout if the updates are serialized
+    storing_barrier = threading.Barrier(2, timeout=10.0)
+    original_store_app_files = AppUpdater._store_app_files
+
+    def store_app_files_concurrently(updater: AppUpdater) -> None:
+        if updater._stored_icon_sha256 is None:  # The files are stored for the first time (i.e. without the catalog lock)
+            storing_barrier.wait()
+
+        original_store_app_files(updater)
+
+    monkeypatch.setattr(AppUpdater, "_store_app_files", store_app_files_concurrently)
+
+    errors = []
+
+    def update_app(app_index: int) -> None:
+        try:
+            app_storage.update_app(app_ids[app_index], package_name="com.example.app{}".format(app_index), version_code=2, icon_color=(app_index, 255, 0))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=update_app, args=(app_index,)) for app_index in range(2)]
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert not storing_barrier.broken
+
+    app_getter = AppGetter()
+    app_getter.start_new_snapshot()
+    assert [app_getter.get_metadata(app_id).version_code for app_id in app_ids] == [2, 2]
+
+    # Both the updates are in the materialized catalog, regardless of which of them has regenerated it
+    assert CatalogVersion.read().change_sequence_number == app_getter.get_latest_change_sequence_number()
+
+
+def test_concurrent_catalog_regenerations_are_coalesced(app_storage, monkeypatch):
+    app_storage.add_app(package_name="com.example.app0")
+
+    regeneration_started, regeneration_can_finish = threading.Event(), threading.Event()
+    original_regenerate_while_locked = MaterializedCatalog.regenerate_while_locked
+    regeneration_count = 0
+
+    def regenerate_while_locked_slowly(materialized_catalog: MaterializedCatalog) -> CatalogVersion:
+        nonlocal regeneration_count
+        regeneration_count += 1
+
+        # The catalog is regenerated from a snapshot which doesn't contain the change committed below
+        catalog_version = original_regenerate_while_locked(materialized_catalog)
+
+        regeneration_started.set()
+        assert regeneration_can_finish.wait(10.0)
+
+        return catalog_version
+
+    monkeypatch.setattr(MaterializedCatalog, "regenerate_while_locked", regenerate_while_locked_slowly)
+
+    regenerating_thread = threading.Thread(target=app_storage.add_app, kwargs={"package_name": "com.example.app1"})
+    regenerating_thread.start()
+    try:
+        assert regeneration_started.wait(10.0)
+
+        # The regeneration is in progress, so the modification leaves its changes to it instead of waiting for it
+        started_at = time.monotonic()
+        app_storage.add_app(package_name="com.example.app2")
+        assert time.monotonic() - started_at < 5.0
+
+    finally:
+        regeneration_can_finish.set()
+        regenerating_thread.join()
+
+    # The regenerating thread has noticed that the catalog is outdated again after regenerating it
+    assert regeneration_count == 2
+
+    app_getter = AppGetter()
+    app_getter.start_new_snapshot()
+    assert CatalogVersion.read().change_sequence_number == app_getter.get_latest_change_sequence_number()
+
+
+def test_catalog_lock_is_waited_for_until_request_deadline(app_storage, monkeypatch):
+    monkeypatch.setattr(Settings, "APP_STORAGE_LOCK_TIMEOUT", 0.5)
+    app_ids = [app_storage.add_app(package_name="com.example.app{}".format(index)).id for index in range(2)]
+
+    catalog_locked, test_finished = threading.Event(), threading.Event()
+
+    def hold_catalog_lock() -> None:
+        with AppStorageHelpers.lock_apps([app_ids[1]]), AppStorageHelpers.lock_catalog():
+            catalog_locked.set()
+            test_finished.wait(10.0)
+
+    holding_thread = threading.Thread(target=hold_catalog_lock)
+    holding_thread.start()
+    try:
+        assert catalog_locked.wait(10.0)
+
+        started_at = time.monotonic()
+        with pytest.raises(AppStorageLockTimeoutException):
+            with AppStorageHelpers.lock_apps_for_request([app_ids[0]]):
+                app_getter = AppGetter()
+                app_getter.start_new_snapshot()
+
+                AppDeleter(app_getter.get_db_model(app_ids[0])).delete_app_while_locked()
+
+        assert time.monotonic() - started_at < 5.0
+
+    finally:
+        test_finished.set()
+        holding_thread.join()
+
+    app_getter = AppGetter()
+    app_getter.start_new_snapshot()
+    assert app_getter.does_app_exist_in_database(app_ids[0])
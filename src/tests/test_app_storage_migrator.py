@@ -0,0 +1,172 @@
+# SPDX-License-Identifier: BSD-3-Clause
+#
+# Copyright (c) 2021 Vít Labuda. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+# following conditions are met:
+#  1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+#     disclaimer.
+#  2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the
+#     following disclaimer in the documentation and/or other materials provided with the distribution.
+#  3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote
+#     products derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+from typing import List
+import io
+import os
+import shutil
+import PIL.Image
+import pytest
+from selfdroid.Constants import Constants
+from selfdroid.appstorage.AppStorageHelpers import AppStorageHelpers
+from selfdroid.appstorage.AppStorageMigrator import AppStorageMigrator
+from selfdroid.appstorage.AppStorageConsistencyEnsurer import AppStorageConsistencyEnsurer
+from selfdroid.appstorage.AppIconRenditions import AppIconRenditions
+from selfdroid.appstorage.AppMetadataDBModel import AppMetadataDBModel
+from selfdroid.appstorage.apk.APKParser import APKParser
+from selfdroid import db
+
+
+def _add_app_in_baseline_layout(app_storage, package_name: str, icon_color=(0, 0, 255)) -> int:
+    # The older versions didn't store the hashes, and named the app's files by its ID
+    apk_path = app_storage.build_apk(package_name=package_name)
+    db_model = APKParser.parse_with_cache(apk_path, AppStorageHelpers.compute_file_sha256(apk_path)).create_new_db_model_with_metadata()
+    db_model.apk_sha256 = None
+
+    with AppStorageHelpers.lock_app_storage():
+        db.session.rollback()
+        db.session.add(db_model)
+        db.session.commit()
+        app_id = db_model.id
+
+    shutil.copyfile(apk_path, _get_id_named_apk_path(app_id))
+
+    icon_bytes_io = io.BytesIO()
+    PIL.Image.new("RGBA", (Constants.ICON_WIDTH_AND_HEIGHT, Constants.ICON_WIDTH_AND_HEIGHT), icon_color).save(icon_bytes_io, format="PNG")
+    with open(_get_id_named_icon_path(app_id), "wb") as icon_file:
+        icon_file.write(icon_bytes_io.getvalue())
+
+    return app_id
+
+
+def _get_id_named_apk_path(app_id: int) -> str:
+    return os.path.join(Constants.APKS_DIRECTORY, "{}.apk".format(app_id))
+
+
+def _get_id_named_icon_path(app_id: int) -> str:
+    return os.path.join(Constants.ICONS_DIRECTORY, "{}.png".format(app_id))
+
+
+def _migrate() -> None:
+    with AppStorageHelpers.lock_app_storage():
+        db.session.rollback()
+        AppStorageMigrator().migrate_while_locked()
+        db.session.rollback()
+
+
+def _get_db_models(app_ids: List[int]) -> List[AppMetadataDBModel]:
+    db.session.rollback()
+
+    return [AppMetadataDBModel.query.get(app_id) for app_id in app_ids]
+
+
+def _assert_migrated(app_ids: List[int]) -> None:
+    for db_model in _get_db_models(app_ids):
+        assert db_model.apk_sha256 == AppStorageHelpers.compute_file_sha256(AppStorageHelpers.get_apk_path_by_sha256(db_model.apk_sha256))
+        assert db_model.icon_sha256 == AppStorageHelpers.compute_file_sha256(AppStorageHelpers.get_icon_path_by_sha256(db_model.icon_sha256))
+
+        for size, image_format in AppIconRenditions.get_generated_renditions(Constants.ICON_WIDTH_AND_HEIGHT):
+            assert os.path.isfile(AppStorageHelpers.get_icon_rendition_path_by_sha256(db_model.icon_sha256, size, image_format))
+
+        assert not os.path.exists(_get_id_named_apk_path(db_model.id))
+        assert not os.path.exists(_get_id_named_icon_path(db_model.id))
+
+    # No app is considered inconsistent once the files have been moved
+    with AppStorageHelpers.lock_app_storage():
+        db.session.rollback()
+        assert not AppStorageConsistencyEnsurer().ensure_consistency_while_locked()
+        db.session.rollback()
+
+
+def test_migrate_baseline_layout(app_storage):
+    app_ids = [_add_app_in_baseline_layout(app_storage, "com.example.app{}".format(index), (0, 0, index)) for index in range(3)]
+
+    _migrate()
+
+    _assert_migrated(app_ids)
+
+
+def test_migrate_deletes_only_id_named_files_of_nonexistent_apps(app_storage):
+    app_id = _add_app_in_baseline_layout(app_storage, "com.example.app")
+
+    orphaned_paths = [_get_id_named_apk_path(app_id + 1000), _get_id_named_icon_path(app_id + 1000)]
+    unrelated_paths = [os.path.join(Constants.APKS_DIRECTORY, "backup.apk"), os.path.join(Constants.ICONS_DIRECTORY, "{}.png.bak".format(app_id))]
+    for path in (orphaned_paths + unrelated_paths):
+        with open(path, "wb") as file:
+            file.write(b"not an app file")
+
+    try:
+        _migrate()
+
+        _assert_migrated([app_id])
+        assert not any(os.path.exists(path) for path in orphaned_paths)
+        assert all(os.path.exists(path) for path in unrelated_paths)
+
+    finally:
+        for path in unrelated_paths:
+            os.remove(path)
+
+
+def test_migrate_resumes_interrupted_migration(app_storage, monkeypatch):
+    app_ids = [_add_app_in_baseline_layout(app_storage, "com.example.app{}".format(index), (0, 0, index)) for index in range(2)]
+
+    original_replace = os.replace
+    moved_file_count = 0
+
+    def replace_until_interrupted(source_path, destination_path):
+        nonlocal moved_file_count
+        if moved_file_count == 1:
+            raise OSError("The migration has been interrupted")
+
+        original_replace(source_path, destination_path)
+        moved_file_count += 1
+
+    monkeypatch.setattr(os, "replace", replace_until_interrupted)
+    with pytest.raises(OSError):
+        _migrate()
+    monkeypatch.undo()
+
+    # The hashes have been committed before the files were moved
+    db_models = _get_db_models(app_ids)
+    assert all((db_model.apk_sha256 is not None) and (db_model.icon_sha256 is not None) for db_model in db_models)
+    assert os.path.exists(_get_id_named_icon_path(app_ids[0]))
+
+    _migrate()
+
+    _assert_migrated(app_ids)
+
+
+def test_migrate_shared_icon(app_storage):
+    app_ids = [_add_app_in_baseline_layout(app_storage, "com.example.app{}".format(index)) for index in range(2)]
+
+    _migrate()
+
+    _assert_migrated(app_ids)
+    db_models = _get_db_models(app_ids)
+    assert db_models[0].icon_sha256 == db_models[1].icon_sha256
+
+    icon_path = AppStorageHelpers.get_icon_path_by_sha256(db_models[0].icon_sha256)
+    app_storage.delete_app(app_ids[0])
+    assert os.path.isfile(icon_path)
+
+    app_storage.delete_app(app_ids[1])
+    assert not os.path.exists(icon_path)
@@ -0,0 +1,143 @@
+# SPDX-License-Identifier: BSD-3-Clause
+#
+# Copyright (c) 2021 Vít Labuda. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+# following conditions are met:
+#  1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+#     disclaimer.
+#  2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the
+#     following disclaimer in the documentation and/or other materials provided with the distribution.
+#  3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote
+#     products derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+from typing import List
+import hashlib
+import os
+import threading
+from selfdroid.Constants import Constants
+from selfdroid.appstorage.AppMetadata import AppMetadata
+from selfdroid.appstorage.AppStorageHelpers import AppStorageHelpers
+from selfdroid.appstorage.AppIconRenditions import AppIconRenditions
+from selfdroid.appstorage.BlobStore import BlobStore
+from selfdroid.appstorage.crud.AppAdder import AppAdder
+from selfdroid import db
+
+
+def _get_icon_blob_paths(icon_sha256: str) -> List[str]:
+    rendition_paths = [AppStorageHelpers.get_icon_rendition_path_by_sha256(icon_sha256, size, image_format) for size, image_format in AppIconRenditions.get_generated_renditions(Constants.ICON_WIDTH_AND_HEIGHT)]
+
+    return [AppStorageHelpers.get_icon_path_by_sha256(icon_sha256)] + rendition_paths
+
+
+def _are_app_files_stored(app_metadata: AppMetadata) -> bool:
+    return os.path.isfile(app_metadata.get_apk_path()) and all(os.path.isfile(path) for path in _get_icon_blob_paths(app_metadata.icon_sha256))
+
+
+def test_delete_releases_blobs(app_storage):
+    app_metadata = app_storage.add_app()
+    assert _are_app_files_stored(app_metadata)
+
+    app_storage.delete_app(app_metadata.id)
+
+    assert not os.path.exists(app_metadata.get_apk_path())
+    assert not any(os.path.exists(path) for path in _get_icon_blob_paths(app_metadata.icon_sha256))
+
+
+def test_update_releases_replaced_blobs(app_storage):
+    old_app_metadata = app_storage.add_app(icon_color=(0, 0, 255))
+
+    new_app_metadata = app_storage.update_app(old_app_metadata.id, version_code=2, icon_color=(255, 0, 0))
+
+    assert _are_app_files_stored(new_app_metadata)
+    assert not os.path.exists(old_app_metadata.get_apk_path())
+    assert not any(os.path.exists(path) for path in _get_icon_blob_paths(old_app_metadata.icon_sha256))
+
+
+def test_shared_icon_is_kept_while_referenced(app_storage):
+    app_metadata_1 = app_storage.add_app(package_name="com.example.app1")
+    app_metadata_2 = app_storage.add_app(package_name="com.example.app2")
+    assert app_metadata_1.icon_sha256 == app_metadata_2.icon_sha256
+
+    # Neither updating nor deleting one of the apps releases the icon the other one still refers to
+    app_storage.update_app(app_metadata_1.id, package_name="com.example.app1", version_code=2, icon_color=(255, 0, 0))
+    assert _are_app_files_stored(app_metadata_2)
+
+    app_storage.add_app(package_name="com.example.app3")  # Refers to the same icon as the second app
+    app_storage.delete_app(app_metadata_2.id)
+    assert all(os.path.isfile(path) for path in _get_icon_blob_paths(app_metadata_2.icon_sha256))
+
+
+def test_release_keeps_referenced_blobs(app_storage):
+    app_metadata = app_storage.add_app()
+
+    with AppStorageHelpers.lock_apps([app_metadata.id]):
+        with AppStorageHelpers.lock_catalog():
+            db.session.rollback()
+            BlobStore().release_blobs_while_locked([app_metadata.apk_sha256, None], [app_metadata.icon_sha256, None])
+
+    assert _are_app_files_stored(app_metadata)
+
+
+def test_icon_released_before_commit_is_stored_again(app_storage, monkeypatch):
+    app_metadata_1 = app_storage.add_app(package_name="com.example.app1")
+    original_store_app_files = AppAdder._store_app_files
+
+    def store_app_files_and_delete_other_app(adder):
+        original_store_app_files(adder)
+
+        # A concurrent deletion of the other app (sharing the icon) once the added app's files have been stored, but
+        #  before its metadata are committed
+        if not other_app_deletions:
+            other_app_deletions.append(True)
+
+            deleting_thread = threading.Thread(target=app_storage.delete_app, args=(app_metadata_1.id,))
+            deleting_thread.start()
+            deleting_thread.join()
+
+    other_app_deletions = []
+    monkeypatch.setattr(AppAdder, "_store_app_files", store_app_files_and_delete_other_app)
+    app_metadata_2 = app_storage.add_app(package_name="com.example.app2")
+
+    assert other_app_deletions
+    assert app_metadata_2.icon_sha256 == app_metadata_1.icon_sha256
+    assert _are_app_files_stored(app_metadata_2)
+
+
+def test_store_apk_leaves_duplicate_file_in_place(app_storage):
+    app_metadata = app_storage.add_app()
+    duplicate_apk_path = app_storage.build_apk()
+
+    with AppStorageHelpers.lock_apps([]):
+        BlobStore().store_apk_while_locked(duplicate_apk_path, app_metadata.apk_sha256)
+
+    # It's the caller who deletes the file, once the metadata referring to the stored one have been committed
+    assert os.path.isfile(duplicate_apk_path)
+    assert os.path.isfile(app_metadata.get_apk_path())
+
+
+def test_garbage_collection_deletes_only_unreferenced_blobs(app_storage):
+    app_metadata = app_storage.add_app()
+
+    unreferenced_sha256 = hashlib.sha256(b"unreferenced").hexdigest()
+    unreferenced_blob_paths = [AppStorageHelpers.get_apk_path_by_sha256(unreferenced_sha256)] + _get_icon_blob_paths(unreferenced_sha256)
+    for blob_path in unreferenced_blob_paths:
+        os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+        with open(blob_path, "wb") as blob_file:
+            blob_file.write(b"unreferenced")
+
+    with AppStorageHelpers.lock_app_storage():
+        db.session.rollback()
+        assert BlobStore().collect_garbage_while_locked() == len(unreferenced_blob_paths)
+
+    assert not any(os.path.exists(blob_path) for blob_path in unreferenced_blob_paths)
+    assert _are_app_files_stored(app_metadata)
@@ -0,0 +1,61 @@
+# SPDX-License-Identifier: BSD-3-Clause
+#
+# Copyright (c) 2021 Vít Labuda. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+# following conditions are met:
+#  1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+#     disclaimer.
+#  2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the
+#     following disclaimer in the documentation and/or other materials provided with the distribution.
+#  3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote
+#     products derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+import pytest
+
+
+def _check_for_updates(client, api_headers, request_json):
+    response = client.post("/api/v1/check-for-updates", json=request_json, headers=api_headers)
+    assert response.status_code == 200
+
+    return [(update["package_name"], update["installed_version_code"], update["version_code"]) for update in response.get_json()["updates"]]
+
+
+def test_check_for_updates(client, api_headers, app_storage):
+    app_storage.add_app(package_name="com.example.newer", version_code=5)
+    app_storage.add_app(package_name="com.example.same", version_code=3)
+
+    updates = _check_for_updates(client, api_headers, {"installed_apps": [
+        {"package_name": "com.example.newer", "version_code": 4},
+        {"package_name": "com.example.same", "version_code": 3},
+        {"package_name": "com.example.missing", "version_code": 1}
+    ]})
+
+    assert updates == [("com.example.newer", 4, 5)]
+
+
+def test_check_for_updates_with_sdk(client, api_headers, app_storage):
+    app_storage.add_app(package_name="com.example.any", version_code=2)
+    app_storage.add_app(package_name="com.example.too_new", version_code=2, min_sdk_version=31)
+    app_storage.add_app(package_name="com.example.too_old", version_code=2, max_sdk_version=28)
+
+    installed_apps = [{"package_name": package_name, "version_code": 1} for package_name in ("com.example.any", "com.example.too_new", "com.example.too_old")]
+
+    assert _check_for_updates(client, api_headers, {"installed_apps": installed_apps, "sdk": 30}) == [("com.example.any", 1, 2)]
+    assert len(_check_for_updates(client, api_headers, {"installed_apps": installed_apps})) == 3
+
+
+@pytest.mark.parametrize("sdk", [0, -1, 2 ** 63, True, "30", 30.0])
+def test_check_for_updates_with_invalid_sdk(client, api_headers, sdk):
+    response = client.post("/api/v1/check-for-updates", json={"installed_apps": [], "sdk": sdk}, headers=api_headers)
+
+    assert response.status_code == 400
@@ -0,0 +1,197 @@
+# SPDX-License-Identifier: BSD-3-Clause
+#
+# Copyright (c) 2021 Vít Labuda. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+# following conditions are met:
+#  1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+#     disclaimer.
+#  2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the
+#     following disclaimer in the documentation and/or other materials provided with the distribution.
+#  3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote
+#     products derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+import contextlib
+import hashlib
+import io
+import os
+import pytest
+import werkzeug.exceptions
+from selfdroid.Constants import Constants
+from selfdroid.appstorage.jobs.AppStorageJobQueue import AppStorageJobQueue
+from selfdroid.appstorage.jobs.ChunkedUploadSession import ChunkedUploadSession
+from selfdroid.appstorage.jobs.ChunkedUploadSessionStore import ChunkedUploadSessionStore
+
+
+_UPLOADED_DATA: bytes = b"The contents of the uploaded APK file, split into chunks."
+
+
+@pytest.fixture
+def session_store(monkeypatch) -> ChunkedUploadSessionStore:
+    monkeypatch.setattr(Constants, "CHUNKED_UPLOAD_CHUNK_SIZE", 8)
+
+    return ChunkedUploadSessionStore()
+
+
+@pytest.fixture
+def session(session_store) -> ChunkedUploadSession:
+    session = session_store.create_session(len(_UPLOADED_DATA), "test.apk", None)
+    yield session
+
+    if os.path.exists(session.get_file_path()):
+        session_store.delete_session(session.id)
+
+
+def _write_chunk(session_store: ChunkedUploadSessionStore, session_id: str, offset: int, chunk: bytes = None, chunk_sha256: str = None) -> ChunkedUploadSession:
+    if chunk is None:
+        chunk = _UPLOADED_DATA[offset:offset + Constants.CHUNKED_UPLOAD_CHUNK_SIZE]
+
+    if chunk_sha256 is None:
+        chunk_sha256 = hashlib.sha256(chunk).hexdigest()
+
+    return session_store.write_chunk(session_id, offset, chunk_sha256, io.BytesIO(chunk), len(chunk))
+
+
+def _finish_enqueued_job(job_id: int) -> None:
+    job_queue = AppStorageJobQueue()
+    job = job_queue.claim_next_job()
+    assert job.id == job_id
+
+    os.remove(job.get_staged_apk_path())
+    job_queue.finish_job(job_id, False, "", None)
+
+
+def test_delete_session(session_store):
+    session = session_store.create_session(1000, "test.apk", None)
+
+    session_store.delete_session(session.id)
+
+    assert not os.path.exists(ChunkedUploadSession.get_file_path_by_id(session.id))
+    with pytest.raises(werkzeug.exceptions.NotFound):
+        session_store.get_session_or_404(session.id)
+
+
+def test_delete_session_finalized_while_waiting_for_lock(session_store, monkeypatch, tmp_path):
+    session = session_store.create_session(1000, "test.apk", None)
+    original_open_and_lock = session_store._open_and_lock_session_file_or_404
+
+    @contextlib.contextmanager
+    def open_and_lock_after_concurrent_finalization(session_id: str):
+        with original_open_and_lock(session_id) as file:
+            # What finalize_session() does while holding the lock, which the deleting request has just waited for
+            os.rename(ChunkedUploadSession.get_file_path_by_id(session_id), str(tmp_path / "staged.apk"))
+            session_store._delete_sessions_from_database([session_id])
+
+            yield file
+
+    monkeypatch.setattr(session_store, "_open_and_lock_session_file_or_404", open_and_lock_after_concurrent_finalization)
+
+    with pytest.raises(werkzeug.exceptions.NotFound):
+        session_store.delete_session(session.id)
+
+    assert os.path.exists(str(tmp_path / "staged.apk"))
+
+
+def test_chunks_written_in_any_order_are_finalized(session_store, session):
+    all_chunk_offsets = session.get_all_chunk_offsets()
+    assert len(all_chunk_offsets) > 2
+
+    for offset in reversed(all_chunk_offsets):
+        updated_session = _write_chunk(session_store, session.id, offset)
+
+    assert updated_session.get_missing_chunk_offsets() == []
+
+    job_id = session_store.finalize_session(session.id)
+
+    job = AppStorageJobQueue().get_job(job_id)
+    assert job.apk_sha256 == hashlib.sha256(_UPLOADED_DATA).hexdigest()
+    assert job.uploaded_filename == "test.apk"
+    with open(job.get_staged_apk_path(), "rb") as staged_apk_file:
+        assert staged_apk_file.read() == _UPLOADED_DATA
+
+    assert not os.path.exists(session.get_file_path())
+    with pytest.raises(werkzeug.exceptions.NotFound):
+        session_store.get_session_or_404(session.id)
+
+    _finish_enqueued_job(job_id)
+
+
+def test_chunk_not_matching_its_checksum_is_rejected(session_store, session):
+    with pytest.raises(werkzeug.exceptions.BadRequest):
+        _write_chunk(session_store, session.id, 0, chunk_sha256=hashlib.sha256(b"other contents").hexdigest())
+
+    assert 0 in session_store.get_session_or_404(session.id).get_missing_chunk_offsets()
+
+    # A failed rewrite of an already uploaded chunk makes it missing again, as it might have been partially overwritten
+    _write_chunk(session_store, session.id, 0)
+    with pytest.raises(werkzeug.exceptions.BadRequest):
+        _write_chunk(session_store, session.id, 0, chunk=b"X" * Constants.CHUNKED_UPLOAD_CHUNK_SIZE, chunk_sha256=hashlib.sha256(_UPLOADED_DATA[:Constants.CHUNKED_UPLOAD_CHUNK_SIZE]).hexdigest())
+
+    assert 0 in session_store.get_session_or_404(session.id).get_missing_chunk_offsets()
+
+
+def test_invalid_chunks_are_rejected(session_store, session):
+    last_offset = session.get_all_chunk_offsets()[-1]
+    invalid_chunks = [
+        (1, _UPLOADED_DATA[1:9]),  # Not aligned to the chunk size
+        (last_offset + Constants.CHUNKED_UPLOAD_CHUNK_SIZE, b"X"),  # Beyond the end of the file
+        (0, _UPLOADED_DATA[:7]),  # Too short
+        (last_offset, _UPLOADED_DATA[last_offset:] + b"X")  # Too long
+    ]
+
+    for offset, chunk in invalid_chunks:
+        with pytest.raises(werkzeug.exceptions.BadRequest):
+            _write_chunk(session_store, session.id, offset, chunk=chunk)
+
+    with pytest.raises(werkzeug.exceptions.BadRequest):
+        session_store.write_chunk(session.id, 0, "NOT A HASH", io.BytesIO(_UPLOADED_DATA[:8]), 8)
+
+    # The client has sent less data than it has declared
+    with pytest.raises(werkzeug.exceptions.BadRequest):
+        session_store.write_chunk(session.id, 0, hashlib.sha256(_UPLOADED_DATA[:8]).hexdigest(), io.BytesIO(_UPLOADED_DATA[:4]), 8)
+
+    assert len(session_store.get_session_or_404(session.id).get_missing_chunk_offsets()) == len(session.get_all_chunk_offsets())
+
+
+def test_session_with_missing_chunks_is_not_finalized(session_store, session):
+    all_chunk_offsets = session.get_all_chunk_offsets()
+    for offset in all_chunk_offsets[1:]:
+        _write_chunk(session_store, session.id, offset)
+
+    with pytest.raises(werkzeug.exceptions.Conflict):
+        session_store.finalize_session(session.id)
+
+    assert session_store.get_session_or_404(session.id).get_missing_chunk_offsets() == [all_chunk_offsets[0]]
+    assert os.path.exists(session.get_file_path())
+
+
+def test_corrupted_chunk_is_detected_when_finalizing(session_store, session):
+    all_chunk_offsets = session.get_all_chunk_offsets()
+    for offset in all_chunk_offsets:
+        _write_chunk(session_store, session.id, offset)
+
+    corrupted_offset = all_chunk_offsets[1]
+    with open(session.get_file_path(), "r+b") as session_file:
+        session_file.seek(corrupted_offset)
+        session_file.write(b"X")
+
+    with pytest.raises(werkzeug.exceptions.Conflict):
+        session_store.finalize_session(session.id)
+
+    # Only the corrupted chunk has to be uploaded again
+    assert session_store.get_session_or_404(session.id).get_missing_chunk_offsets() == [corrupted_offset]
+    _write_chunk(session_store, session.id, corrupted_offset)
+
+    job_id = session_store.finalize_session(session.id)
+    assert AppStorageJobQueue().get_job(job_id).apk_sha256 == hashlib.sha256(_UPLOADED_DATA).hexdigest()
+
+    _finish_enqueued_job(job_id)
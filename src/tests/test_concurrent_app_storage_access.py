@@ -0,0 +1,187 @@
+# SPDX-License-Identifier: BSD-3-Clause
+#
+# Copyright (c) 2021 Vít Labuda. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+# following conditions are met:
+#  1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+#     disclaimer.
+#  2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the
+#     following disclaimer in the documentation and/or other materials provided with the distribution.
+#  3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote
+#     products derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+from typing import List
+import hashlib
+import io
+import os
+import subprocess
+import sys
+import threading
+import time
+import zipfile
+
+
+_STRESS_DURATION: float = 3.0  # in seconds
+_READER_THREAD_COUNT: int = 4
+
+_LOCK_HOLDING_DURATION: float = 3.0  # in seconds
+_MAX_READ_DURATION_WHILE_LOCKED: float = 1.0  # in seconds
+
+_UPDATED_PACKAGE_NAME: str = "com.example.stress.updated"
+_RECREATED_PACKAGE_NAME: str = "com.example.stress.recreated"
+
+
+def _modify_apps(updated_app_id: int, staging_directory: str) -> None:
+    # Runs in a separate process, so that the app storage is modified the same way it is in a multi-process deployment
+    from AppStorageModifier import AppStorageModifier
+
+    app_storage_modifier = AppStorageModifier(staging_directory)
+
+    print("ready", flush=True)
+    deadline = time.time() + _STRESS_DURATION
+
+    recreated_app_id = app_storage_modifier.add_app(package_name=_RECREATED_PACKAGE_NAME).id
+    version_code = 1
+    update_count, recreation_count = 0, 0
+    while time.time() < deadline:
+        version_code += 1
+        app_storage_modifier.update_app(updated_app_id, package_name=_UPDATED_PACKAGE_NAME, version_code=version_code, padding_size=(64 + version_code) * 1024)
+        update_count += 1
+
+        app_storage_modifier.delete_app(recreated_app_id)
+        recreated_app_id = app_storage_modifier.add_app(package_name=_RECREATED_PACKAGE_NAME, version_code=version_code, padding_size=version_code * 1024).id
+        recreation_count += 1
+
+    print(update_count, recreation_count)
+
+
+def _hold_app_storage_locks(app_id: int) -> None:
+    # Runs in a separate process - holds all the locks a long upload of the app's new version would hold
+    from selfdroid.appstorage.AppStorageHelpers import AppStorageHelpers
+
+    with AppStorageHelpers.lock_apps([app_id]), AppStorageHelpers.lock_catalog():
+        print("locked", flush=True)
+        time.sleep(_LOCK_HOLDING_DURATION)
+
+
+def _start_subprocess(*args: str) -> subprocess.Popen:
+    environment = {**os.environ, "PYTHONPATH": os.pathsep.join([os.getcwd(), os.path.dirname(os.path.realpath(__file__))])}
+
+    return subprocess.Popen([sys.executable, os.path.realpath(__file__), *args], env=environment, stdout=subprocess.PIPE, text=True)
+
+
+def test_downloads_and_listings_during_concurrent_modifications(client, api_headers, app_storage, tmp_path):
+    updated_app_id = app_storage.add_app(package_name=_UPDATED_PACKAGE_NAME, padding_size=64 * 1024).id
+
+    modifier_process = _start_subprocess("modify", str(updated_app_id), str(tmp_path))
+
+    # The modifier process imports the app (which takes a while) before it starts modifying the app storage
+    assert modifier_process.stdout.readline() == "ready\n"
+    deadline = time.time() + _STRESS_DURATION
+
+    errors: List[str] = []
+    downloaded_apk_count = [0]
+
+    def check_download(app_id: int) -> None:
+        response = client.get("/api/v1/download-apk/{}".format(app_id), headers=api_headers)
+        if response.status_code == 404:
+            return
+
+        if response.status_code != 200:
+            errors.append("The download of the app #{} failed with status {}".format(app_id, response.status_code))
+            return
+
+        body = response.get_data()
+        if response.headers["ETag"] != '"apk-{}"'.format(hashlib.sha256(body).hexdigest()):
+            errors.append("The contents of the downloaded APK file don't match its ETag")
+            return
+
+        with zipfile.ZipFile(io.BytesIO(body)) as apk_file:
+            if apk_file.testzip() is not None:
+                errors.append("A corrupted APK file was downloaded")
+                return
+
+        downloaded_apk_count[0] += 1
+
+    def read_until_deadline() -> None:
+        try:
+            while time.time() < deadline:
+                catalog_response = client.get("/api/v1/app-details", headers=api_headers)
+                listing_response = client.get("/api/v1/app-details?limit=10&sort_by=name", headers=api_headers)
+                if catalog_response.status_code != 200 or listing_response.status_code != 200:
+                    errors.append("The listing failed with status {} / {}".format(catalog_response.status_code, listing_response.status_code))
+                    continue
+
+                listed_app_ids = {app_dict["id"] for app_dict in catalog_response.get_json()}
+                listed_app_ids.update(app_dict["id"] for app_dict in listing_response.get_json()["apps"])
+
+                for app_id in listed_app_ids:
+                    check_download(app_id)
+
+        except Exception as e:
+            errors.append(repr(e))
+
+    reader_threads = [threading.Thread(target=read_until_deadline) for _ in range(_READER_THREAD_COUNT)]
+    for reader_thread in reader_threads:
+        reader_thread.start()
+
+    for reader_thread in reader_threads:
+        reader_thread.join()
+
+    modifier_output, _ = modifier_process.communicate(timeout=60)
+    assert modifier_process.returncode == 0
+
+    update_count, recreation_count = map(int, modifier_output.split())
+    assert update_count > 0 and recreation_count > 0
+    assert downloaded_apk_count[0] > 0
+    assert errors == []
+
+
+def test_reads_while_app_storage_is_locked(client, api_headers, app_storage):
+    app_id = app_storage.add_app().id
+
+    lock_holder_process = _start_subprocess("hold-locks", str(app_id))
+    assert lock_holder_process.stdout.readline() == "locked\n"
+    deadline = time.time() + _LOCK_HOLDING_DURATION - 0.5
+
+    urls = [
+        "/api/v1/app-details",
+        "/api/v1/app-details?limit=10",
+        "/api/v1/app-details/{}".format(app_id),
+        "/api/v1/download-apk/{}".format(app_id),
+        "/api/v1/app-icon/{}".format(app_id)
+    ]
+
+    read_count = 0
+    while time.time() < deadline:
+        for url in urls:
+            started_at = time.monotonic()
+            response = client.get(url, headers=api_headers)
+            read_duration = time.monotonic() - started_at
+
+            assert response.status_code == 200, url
+            assert read_duration < _MAX_READ_DURATION_WHILE_LOCKED, url
+            read_count += 1
+
+    # The locks must have been held during all the reads
+    assert lock_holder_process.poll() is None
+    lock_holder_process.communicate(timeout=60)
+    assert lock_holder_process.returncode == 0
+    assert read_count > len(urls)
+
+
+if __name__ == "__main__":
+    if sys.argv[1] == "modify":
+        _modify_apps(int(sys.argv[2]), sys.argv[3])
+    elif sys.argv[1] == "hold-locks":
+        _hold_app_storage_locks(int(sys.argv[2]))
@@ -0,0 +1,436 @@
+# SPDX-License-Identifier: BSD-3-Clause
+#
+# Copyright (c) 2021 Vít Labuda. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification, are permitted provided that the
+# following conditions are met:
+#  1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+#     disclaimer.
+#  2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the
+#     following disclaimer in the documentation and/or other materials provided with the distribution.
+#  3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote
+#     products derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+import asyncio
+import ctypes
+import os
+import threading
+import time
+import pytest
+from flockbasedlock.flockbasedlock import FlockBasedLock
+
+
+# PyDLL keeps the GIL held during the call, so the forked process doesn't have to reacquire it
+_libc_fork = ctypes.PyDLL(None).fork
+
+
+def _c_fork(function) -> int:
+    """
+    Runs the function in a child process forked by calling the C library's fork() directly (as e.g. uWSGI does), so the
+    Python-level fork hooks (os.register_at_fork()) are not run. The function's return value is the child's exit code.
+    """
+
+    pid = _libc_fork()
+    if pid == 0:
+        exit_code = 255
+        try:
+            exit_code = function()
+        finally:
+            os._exit(exit_code)
+
+    assert pid > 0
+    return pid
+
+
+def _wait_for_exit_code(pid: int) -> int:
+    _, status = os.waitpid(pid, 0)
+
+    return os.waitstatus_to_exitcode(status)
+
+
+def _run_in_c_forked_process(function) -> int:
+    return _wait_for_exit_code(_c_fork(function))
+
+
+def _try_to_acquire_exclusively(lock_path: str) -> int:
+    lock = FlockBasedLock.get_process_wide_instance(lock_path)
+    try:
+        lock.acquire_exclusive(blocking=False)
+    except FlockBasedLock.LockTimeoutException:
+        return 1
+
+    lock.release()
+    return 0
+
+
+def _is_acquirable_by_another_instance(lock_path: str, shared: bool) -> bool:
+    # A different instance uses its own file descriptor, so it's coordinated with the other holders by flock() itself,
+    #  just like another process would be
+    other_lock = FlockBasedLock(lock_path, single_use=True)
+    try:
+        if shared:
+            other_lock.acquire_shared(blocking=False)
+        else:
+            other_lock.acquire_exclusive(blocking=False)
+    except FlockBasedLock.LockTimeoutException:
+        other_lock.close()
+        return False
+
+    other_lock.release()
+    return True
+
+
+def _wait_until(predicate) -> None:
+    deadline = time.monotonic() + 10
+    while not predicate():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def lock_path(tmp_path) -> str:
+    return str(tmp_path / "test.lock")
+
+
+@pytest.fixture
+def lock(lock_path) -> FlockBasedLock:
+    lock = FlockBasedLock(lock_path)
+    yield lock
+    lock.close()
+
+
+def test_process_wide_instance_is_reused(lock_path):
+    assert FlockBasedLock.get_process_wide_instance(lock_path) is FlockBasedLock.get_process_wide_instance(lock_path)
+
+
+def test_c_forked_process_does_not_share_the_parents_lock(lock_path):
+    parent_lock = FlockBasedLock.get_process_wide_instance(lock_path)
+
+    with parent_lock.exclusive():
+        # With an inherited file descriptor, the child would acquire the lock held by the parent process
+        assert _run_in_c_forked_process(lambda: _try_to_acquire_exclusively(lock_path)) == 1
+
+    assert _run_in_c_forked_process(lambda: _try_to_acquire_exclusively(lock_path)) == 0
+
+
+def test_c_forked_process_holding_the_lock_excludes_the_parent(lock_path):
+    parent_lock = FlockBasedLock.get_process_wide_instance(lock_path)
+    with parent_lock.shared():
+        pass  # The instance is used before the fork
+
+    acquired_read_fd, acquired_write_fd = os.pipe()
+    release_read_fd, release_write_fd = os.pipe()
+
+    def hold_lock_until_told_to_release() -> int:
+        child_lock = FlockBasedLock.get_process_wide_instance(lock_path)
+        if child_lock is parent_lock:
+            return 2
+
+        with child_lock.exclusive():
+            os.write(acquired_write_fd, b"x")
+            os.read(release_read_fd, 1)
+
+        return 0
+
+    pid = _c_fork(hold_lock_until_told_to_release)
+    os.close(acquired_write_fd)  # So that the read below doesn't block if the child process exits prematurely
+    os.close(release_read_fd)
+    try:
+        assert os.read(acquired_read_fd, 1) == b"x"
+
+        with pytest.raises(FlockBasedLock.LockTimeoutException):
+            parent_lock.acquire_shared(blocking=False)
+
+    finally:
+        os.write(release_write_fd, b"x")
+        exit_code = _wait_for_exit_code(pid)
+
+        for fd in (acquired_read_fd, release_write_fd):
+            os.close(fd)
+
+    assert exit_code == 0
+    with parent_lock.exclusive(timeout=5):
+        pass
+
+
+def test_shared_holders_overlap(lock, lock_path):
+    barrier = threading.Barrier(2, timeout=10)
+
+    def hold_shared_until_both_hold() -> None:
+        with lock.shared():
+            barrier.wait()
+
+    threads = [threading.Thread(target=hold_shared_until_both_hold) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not barrier.broken
+
+    with lock.shared():
+        assert _is_acquirable_by_another_instance(lock_path, shared=True)
+        assert not _is_acquirable_by_another_instance(lock_path, shared=False)
+
+
+def test_exclusive_holder_excludes_others(lock, lock_path):
+    with lock.exclusive():
+        assert not _is_acquirable_by_another_instance(lock_path, shared=True)
+        assert not _is_acquirable_by_another_instance(lock_path, shared=False)
+
+        acquisition_results = []
+
+        def try_to_acquire_shared() -> None:
+            try:
+                lock.acquire_shared(blocking=False)
+            except FlockBasedLock.LockTimeoutException:
+                acquisition_results.append(False)
+            else:
+                lock.release()
+                acquisition_results.append(True)
+
+        thread = threading.Thread(target=try_to_acquire_shared)
+        thread.start()
+        thread.join()
+        assert acquisition_results == [False]
+
+    assert _is_acquirable_by_another_instance(lock_path, shared=False)
+
+
+def test_acquisition_times_out(lock, lock_path):
+    other_lock = FlockBasedLock(lock_path)
+    try:
+        with other_lock.exclusive():
+            started_at = time.monotonic()
+            with pytest.raises(FlockBasedLock.LockTimeoutException):
+                lock.acquire_shared(timeout=0.2)
+
+            assert 0.2 <= (time.monotonic() - started_at) < 5
+            assert lock.get_hold_count() == 0
+
+        with lock.exclusive(timeout=5):
+            pass
+
+    finally:
+        other_lock.close()
+
+    with pytest.raises(ValueError):
+        lock.acquire_exclusive(timeout=-1)
+    with pytest.raises(ValueError):
+        lock.acquire_exclusive(blocking=False, timeout=1)
+
+
+def test_in_process_acquisition_times_out(lock):
+    lock.acquire_exclusive()
+    try:
+        acquisition_errors = []
+
+        def try_to_acquire_with_timeout() -> None:
+            try:
+                lock.acquire_exclusive(timeout=0.2)
+            except FlockBasedLock.LockTimeoutException as e:
+                acquisition_errors.append(e)
+
+        thread = threading.Thread(target=try_to_acquire_with_timeout)
+        thread.start()
+        thread.join()
+        assert len(acquisition_errors) == 1
+
+    finally:
+        lock.release()
+
+
+def test_lock_is_reentrant(lock, lock_path):
+    with lock.exclusive():
+        with lock.exclusive():
+            with lock.shared():
+                assert lock.get_hold_count() == 3
+
+        assert lock.get_hold_count() == 1
+        assert not _is_acquirable_by_another_instance(lock_path, shared=True)
+
+    assert lock.get_hold_count() == 0
+    assert _is_acquirable_by_another_instance(lock_path, shared=False)
+
+    with lock.shared():
+        with pytest.raises(FlockBasedLock.LockStateException):
+            lock.acquire_exclusive()
+
+        assert lock.get_hold_count() == 1
+
+    with pytest.raises(FlockBasedLock.LockStateException):
+        lock.release()
+
+
+def test_waiting_exclusive_holder_takes_precedence(lock):
+    lock.acquire_shared()
+    try:
+        exclusive_holds = []
+
+        def hold_exclusive() -> None:
+            with lock.exclusive(timeout=10):
+                exclusive_holds.append(True)
+
+        exclusive_acquisition_thread = threading.Thread(target=hold_exclusive)
+        exclusive_acquisition_thread.start()
+        _wait_until(lambda: lock._waiting_for_exclusive_count == 1)
+
+        shared_acquisition_results = []
+
+        def try_to_acquire_shared() -> None:
+            try:
+                lock.acquire_shared(blocking=False)
+            except FlockBasedLock.LockTimeoutException:
+                shared_acquisition_results.append(False)
+            else:
+                lock.release()
+                shared_acquisition_results.append(True)
+
+        shared_acquisition_thread = threading.Thread(target=try_to_acquire_shared)
+        shared_acquisition_thread.start()
+        shared_acquisition_thread.join()
+        assert shared_acquisition_results == [False]
+
+        # The thread which already holds the lock doesn't wait for the waiting one
+        with lock.shared(blocking=False):
+            assert lock.get_hold_count() == 2
+
+    finally:
+        lock.release()
+
+    exclusive_acquisition_thread.join()
+    assert exclusive_holds == [True]
+
+
+def test_upgrade_and_downgrade(lock, lock_path):
+    lock.acquire_shared()
+    lock.acquire_shared()
+    try:
+        lock.upgrade_to_exclusive()
+        assert lock.get_hold_count() == 2
+        assert not _is_acquirable_by_another_instance(lock_path, shared=True)
+
+        lock.downgrade_to_shared()
+        assert lock.get_hold_count() == 2
+        assert _is_acquirable_by_another_instance(lock_path, shared=True)
+        assert not _is_acquirable_by_another_instance(lock_path, shared=False)
+
+    finally:
+        lock.release()
+        lock.release()
+
+    with pytest.raises(FlockBasedLock.LockStateException):
+        lock.upgrade_to_exclusive()
+    with pytest.raises(FlockBasedLock.LockStateException):
+        lock.downgrade_to_shared()
+
+
+def test_upgrade_waits_for_other_shared_holders(lock):
+    other_holder_has_acquired = threading.Event()
+    other_holder_upgrade_errors = []
+
+    def hold_shared_until_upgrade_is_pending() -> None:
+        with lock.shared():
+            other_holder_has_acquired.set()
+            _wait_until(lambda: lock._is_upgrade_pending)
+
+            # Only one thread may wait for an upgrade at a time, as two such threads would wait for each other forever
+            try:
+                lock.upgrade_to_exclusive()
+            except FlockBasedLock.LockStateException as e:
+                other_holder_upgrade_errors.append(e)
+
+    other_holder = threading.Thread(target=hold_shared_until_upgrade_is_pending)
+    other_holder.start()
+    assert other_holder_has_acquired.wait(10)
+
+    with lock.shared():
+        lock.upgrade_to_exclusive()  # Returns only once the other holder has released the lock
+        other_holder.join()
+        assert len(other_holder_upgrade_errors) == 1
+        assert lock._exclusive_holder == threading.get_ident()
+
+
+def test_hold_listener_reports_finished_holdings(lock):
+    finished_holds = []
+    lock.set_hold_listener(finished_holds.append)
+
+    with lock.shared():
+        with lock.shared():
+            pass
+
+        assert finished_holds == []
+        lock.upgrade_to_exclusive()
+
+    assert len(finished_holds) == 1
+    assert finished_holds[0].was_held_exclusively
+    assert finished_holds[0].hold_duration >= 0
+
+
+def test_single_use_lock_is_closed_once_released(lock_path):
+    single_use_lock = FlockBasedLock(lock_path, single_use=True)
+    with single_use_lock.exclusive():
+        pass
+
+    with pytest.raises(FlockBasedLock.LockClosedException):
+        single_use_lock.acquire_shared()
+
+
+def test_async_holders(lock, lock_path):
+    async def hold_shared(barrier: asyncio.Barrier) -> None:
+        async with lock.shared_async(timeout=10):
+            await barrier.wait()
+
+    async def try_to_acquire_exclusive(timeout: float) -> bool:
+        try:
+            await lock.acquire_exclusive_async(timeout)
+        except FlockBasedLock.LockTimeoutException:
+            return False
+
+        await lock.release_async()
+        return True
+
+    async def run_tasks() -> None:
+        # Each task is a separate holder
+        barrier = asyncio.Barrier(2)
+        await asyncio.wait_for(asyncio.gather(hold_shared(barrier), hold_shared(barrier)), 10)
+
+        async with lock.exclusive_async(timeout=10):
+            async with lock.shared_async(timeout=0):  # Re-entrant per task
+                assert not _is_acquirable_by_another_instance(lock_path, shared=True)
+
+            assert not await asyncio.create_task(try_to_acquire_exclusive(0.1))
+
+        assert await asyncio.create_task(try_to_acquire_exclusive(0))
+
+        # A thread's holding is waited for without blocking the event loop
+        thread_has_acquired = threading.Event()
+        thread_may_release = threading.Event()
+
+        def hold_exclusive_until_told_to_release() -> None:
+            with lock.exclusive():
+                thread_has_acquired.set()
+                thread_may_release.wait(10)
+
+        thread = threading.Thread(target=hold_exclusive_until_told_to_release)
+        thread.start()
+        thread_has_acquired.wait(10)
+
+        acquisition_task = asyncio.create_task(try_to_acquire_exclusive(10))
+        await asyncio.sleep(0.1)
+        assert not acquisition_task.done()
+
+        thread_may_release.set()
+        assert await acquisition_task
+        thread.join()
+
+    asyncio.run(run_tasks())